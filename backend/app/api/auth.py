@@ -12,8 +12,8 @@ from ..schemas.user import UserCreate, UserLogin, UserResponse, Token
 from ..utils.security import get_password_hash, verify_password, create_access_token, create_refresh_token, decode_token
 from ..services.email_service import generate_verification_code, verify_code, send_verification_email
 from ..models.login_history import LoginHistory
-from ..utils.ua_parser import parse_user_agent
-from ..utils.ip_location import get_ip_location
+from .principal_cache import resolve_user
+from ..services.login_history_writer import login_history_writer
 import uuid
 from ..services.sms_service import generate_phone_code, verify_phone_code, send_verification_sms
 
@@ -66,33 +66,14 @@ def login(user_data: UserLogin, request: Request, db: Session = Depends(get_db))
     access_token = create_access_token(data={"sub": str(user.id), "sid": session_id})
     refresh_token = create_refresh_token(data={"sub": str(user.id), "sid": session_id})
     
-    # 로그인 기록 저장
+    # 로그인 기록 저장 (★ UA 파싱/IP 위치 조회/INSERT는 백그라운드 스레드에서)
     try:
         ip = request.headers.get("x-forwarded-for", "").split(",")[0].strip() or request.client.host if request.client else "unknown"
         ua_string = request.headers.get("user-agent", "")
-        ua_info = parse_user_agent(ua_string)
-        
-        # IP 위치 조회
-        loc_info = get_ip_location(ip)
-        
-        history = LoginHistory(
-            user_id=user.id,
-            ip_address=ip,
-            user_agent=ua_string,
-            browser=ua_info["browser"],
-            os_name=ua_info["os"],
-            device_type=ua_info["device_type"],
-            location=loc_info.get("location", ""),
-            country_code=loc_info.get("country_code", ""),
-            city=loc_info.get("city", ""),
-            session_id=session_id
-        )
-        db.add(history)
-        db.commit()
+        login_history_writer.submit(user.id, ip, ua_string, session_id)
     except Exception as e:
         print(f"[LOGIN HISTORY] 기록 저장 실패: {e}")
-        db.rollback()
-    
+
     return Token(access_token=access_token, refresh_token=refresh_token)
 
 @router.post("/refresh", response_model=Token)
@@ -144,8 +125,8 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
             detail="유효하지 않은 토큰입니다"
         )
 
-    user_id = payload.get("sub")
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    # ★ (user_id, sid) 캐시 우선 — 적중 시 DB 조회 없음
+    user = resolve_user(db, payload)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
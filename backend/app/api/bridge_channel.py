@@ -0,0 +1,277 @@
+# app/api/bridge_channel.py
+"""
+Windows MT5 브릿지 상시 연결 채널 (WebSocket /api/mt5/bridge/ws)
+
+기존: 브릿지가 0.2초마다 /bridge/batch HTTP POST (전 심볼 시세 + 계정 + 전체 포지션, 변화 없어도 전송)
+      캔들은 60초마다 TF별 100개 통째로 POST, 주문은 /bridge/orders/pending 롱폴링
+      → 초당 5회 TLS 요청 + 요청마다 JSON 전체 파싱, 주문 전달은 폴링 왕복만큼 지연
+변경: 연결 1개 유지, 바뀐 값만 전송 (델타)
+  - 브릿지 → 서버
+      {"t": "tick", "p": {심볼: {"bid", "ask", "last", "time"}}}          바뀐 심볼만
+      {"t": "account", "a": {...}}                                       바뀐 경우만
+      {"t": "pos", "full": [...]} / {"t": "pos", "up": [...], "rm": [티켓]} 연결 직후 전체, 이후 티켓 단위 증감
+      {"t": "candles", "s": 심볼, "tf": TF, "c": [...], "replace": bool}  연결 직후 전체, 이후 바뀐 봉만 (time 기준 병합)
+      {"t": "result", ...}                                               주문 결과 (/bridge/orders/result와 동일 본문)
+      {"t": "ping"}
+  - 서버 → 브릿지
+      {"t": "orders", "orders": [...]}  order_queue.claim 즉시 푸시 (폴링 왕복 없음)
+                                        전송 실패/연결 종료 시 미전송분은 order_queue.requeue로 즉시 복귀
+                                        (이미 도착했을 수 있음 — 브릿지가 order_id로 중복 수신/실행을 걸러냄)
+      {"t": "pong"}
+  - 워커 간: 브릿지 연결은 워커 1곳에만 붙음 → 받은 데이터 메시지를 Redis BRIDGE_CHANNEL로 재발행,
+    다른 워커는 구독해 자기 bridge_cache에 같은 델타 적용 (발행 워커는 pid로 자기 메시지 무시)
+
+[호환] 기존 HTTP 브릿지 엔드포인트는 그대로 유지 (구버전 브릿지 / WS 불가 환경 폴백)
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+BRIDGE_CHANNEL = "bridge:feed"
+# 주문 claim 1회 대기 (초) — 결과 없으면 다시 대기
+ORDER_CLAIM_BLOCK = 20.0
+# 심볼·TF별 보관 캔들 상한 (브릿지 초기 전송 1000개 기준)
+MAX_CANDLES = 1000
+
+_DATA_TYPES = ("tick", "account", "pos", "candles")
+
+
+def _account_fields(account: Dict) -> Dict:
+    # /bridge/batch와 같은 필드
+    return {
+        "broker": account.get("broker", "N/A"),
+        "login": account.get("login", 0),
+        "server": account.get("server", "N/A"),
+        "balance": account.get("balance", 0),
+        "equity": account.get("equity", 0),
+        "margin": account.get("margin", 0),
+        "free_margin": account.get("free_margin", 0),
+        "leverage": account.get("leverage", 0),
+    }
+
+
+def merge_candles(existing: List[Dict], updates: List[Dict], limit: int = MAX_CANDLES) -> List[Dict]:
+    """time 기준 병합 — 같은 봉은 교체, 새 봉은 추가 (대부분 마지막 봉 갱신 또는 1개 추가)"""
+    if not existing:
+        merged = sorted(updates, key=lambda c: c["time"])
+        return merged[-limit:]
+    for candle in sorted(updates, key=lambda c: c["time"]):
+        t = candle["time"]
+        last_t = existing[-1]["time"]
+        if t == last_t:
+            existing[-1] = candle
+        elif t > last_t:
+            existing.append(candle)
+        else:
+            # 과거 봉 수정 (드묾) — 뒤에서부터 탐색
+            for i in range(len(existing) - 2, -1, -1):
+                if existing[i]["time"] == t:
+                    existing[i] = candle
+                    break
+                if existing[i]["time"] < t:
+                    existing.insert(i + 1, candle)
+                    break
+    if len(existing) > limit:
+        del existing[:len(existing) - limit]
+    return existing
+
+
+class BridgeChannel:
+    """워커 전역 — 브릿지 델타 적용 + 워커 간 재발행/구독"""
+
+    def __init__(self):
+        self._positions: Dict = {}      # ticket → 포지션 dict
+        self._connected = 0             # 이 워커에 붙은 브릿지 소켓 수
+        self._task: Optional[asyncio.Task] = None
+        self.last_message_at: float = 0
+        self.stats = {"messages": 0, "relayed": 0, "orders_pushed": 0, "orders_requeued": 0, "results": 0,
+                      "connects": 0, "errors": 0}
+
+    # ========== 델타 적용 (소켓 수신 / 다른 워커 발행 공통) ==========
+    def apply(self, msg: Dict):
+        from .mt5 import bridge_cache
+        kind = msg.get("t")
+        now = time.time()
+
+        if kind == "tick":
+            prices = bridge_cache["prices"]
+            for symbol, p in msg.get("p", {}).items():
+                prices[symbol] = {
+                    "bid": p.get("bid", 0),
+                    "ask": p.get("ask", 0),
+                    "last": p.get("last", 0),
+                    "time": p.get("time", int(now)),
+                }
+        elif kind == "account":
+            bridge_cache["account"] = _account_fields(msg.get("a") or {})
+        elif kind == "pos":
+            if "full" in msg:
+                self._positions = {p.get("ticket"): p for p in msg["full"]}
+            else:
+                for p in msg.get("up", []):
+                    self._positions[p.get("ticket")] = p
+                for ticket in msg.get("rm", []):
+                    self._positions.pop(ticket, None)
+            bridge_cache["positions"] = list(self._positions.values())
+        elif kind == "candles":
+            from .mt5 import bridge_candle_watermarks
+            symbol, tf = msg.get("s"), msg.get("tf")
+            candles = msg.get("c") or []
+            if not symbol or not tf:
+                return
+            by_tf = bridge_cache["candles"].setdefault(symbol, {})
+            if msg.get("replace"):
+                by_tf[tf] = sorted(candles, key=lambda c: c["time"])[-MAX_CANDLES:]
+            else:
+                by_tf[tf] = merge_candles(by_tf.get(tf) or [], candles)
+            if candles:
+                times = [c["time"] for c in candles]
+                bridge_candle_watermarks.record(symbol, tf, min(times), max(times), "bridge")
+        else:
+            return
+
+        bridge_cache["last_update"] = now
+        self.last_message_at = now
+
+    def relay(self, msg: Dict):
+        """다른 워커로 델타 재발행 (fire-and-forget)"""
+        asyncio.get_running_loop().create_task(self._publish(msg))
+
+    async def _publish(self, msg: Dict):
+        from ..redis_client import get_async_redis
+        try:
+            await get_async_redis().publish(BRIDGE_CHANNEL, json.dumps({"pid": os.getpid(), "m": msg}))
+            self.stats["relayed"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            if self.stats["errors"] % 100 == 1:
+                print(f"[BridgeChannel] ⚠️ 재발행 오류: {e}")
+
+    # ========== 브릿지 소켓 ==========
+    async def serve(self, websocket):
+        """/api/mt5/bridge/ws 핸들러 본체 — accept 이후 호출"""
+        from .mt5 import update_bridge_heartbeat, submit_order_result
+        from ..monitor_counters import ws_connect, ws_disconnect
+        self.start()
+        self._connected += 1
+        self.stats["connects"] += 1
+        ws_connect("bridge")
+        send_lock = asyncio.Lock()
+
+        async def _send(payload: Dict):
+            async with send_lock:
+                await websocket.send_text(json.dumps(payload))
+
+        pusher = asyncio.create_task(self._push_orders(_send))
+        print(f"[BridgeChannel] ✅ 브릿지 연결 (pid {os.getpid()})")
+        last_heartbeat = 0.0
+        try:
+            while True:
+                msg = json.loads(await websocket.receive_text())
+                kind = msg.get("t")
+                self.stats["messages"] += 1
+
+                if kind in _DATA_TYPES:
+                    self.apply(msg)
+                    self.relay(msg)
+                elif kind == "result":
+                    self.stats["results"] += 1
+                    await submit_order_result(msg)
+                elif kind == "ping":
+                    await _send({"t": "pong"})
+
+                # 하트비트 파일 쓰기는 초당 1회로 제한 (기존: 요청마다)
+                now = time.time()
+                if now - last_heartbeat >= 1.0:
+                    update_bridge_heartbeat()
+                    last_heartbeat = now
+        finally:
+            pusher.cancel()
+            self._connected -= 1
+            ws_disconnect("bridge")
+            print(f"[BridgeChannel] 브릿지 연결 종료 (pid {os.getpid()})")
+
+    async def _push_orders(self, send):
+        from .mt5 import order_queue
+        while True:
+            orders = None
+            try:
+                orders = await order_queue.claim(block=ORDER_CLAIM_BLOCK)
+                if orders:
+                    await send({"t": "orders", "orders": orders})
+                    self.stats["orders_pushed"] += len(orders)
+                orders = None
+            except asyncio.CancelledError:
+                # 연결 종료(serve finally → cancel) — 보내지 못한 주문은 다음 브릿지 연결로 즉시 재배달
+                if orders:
+                    await self._requeue(orders)
+                raise
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"[BridgeChannel] ⚠️ 주문 푸시 오류: {e}")
+                if orders:
+                    await self._requeue(orders)
+                await asyncio.sleep(1.0)
+
+    async def _requeue(self, orders: List[Dict]):
+        """미전송 주문 대기열 복귀 — 실패해도 CLAIM_TIMEOUT 후 claim 쪽 회수가 재배달"""
+        from .mt5 import order_queue
+        try:
+            await order_queue.requeue(orders)
+            self.stats["orders_requeued"] += len(orders)
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"[BridgeChannel] ⚠️ 주문 {len(orders)}건 복귀 실패 — 회수 대기: {e}")
+
+    # ========== 다른 워커 델타 구독 ==========
+    async def _run(self):
+        from ..redis_client import get_async_redis
+        pid = os.getpid()
+        print(f"[BridgeChannel] 구독 루프 시작 (채널 {BRIDGE_CHANNEL})")
+        while True:
+            pubsub = None
+            try:
+                pubsub = get_async_redis().pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(BRIDGE_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        envelope = json.loads(message["data"])
+                        if envelope.get("pid") != pid:
+                            self.apply(envelope["m"])
+                    except Exception as e:
+                        self.stats["errors"] += 1
+                        print(f"[BridgeChannel] ⚠️ 델타 적용 오류: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[BridgeChannel] ⚠️ 구독 끊김 — 재연결 대기: {e}")
+                await asyncio.sleep(2.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
+
+    def start(self):
+        """구독 루프 시작 (main.py startup + 브릿지 연결 시 보장)"""
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def get_status(self) -> Dict:
+        return {
+            "connected": self._connected,
+            "positions": len(self._positions),
+            "last_message_age": round(time.time() - self.last_message_at, 3) if self.last_message_at else None,
+            **self.stats,
+        }
+
+
+# 워커 전역 인스턴스
+bridge_channel = BridgeChannel()
@@ -0,0 +1,368 @@
+# app/api/bridge_order_queue.py
+"""
+브릿지 주문 대기열 — Linux 서버 → Windows 브릿지 (mt5_bridge.py)
+
+기존: /tmp/mt5_orders.json, /tmp/mt5_order_results.json 을 fcntl.flock 으로 매번 전체 읽기 → 전체 쓰기
+      → 주문 1건마다 O(대기열 크기), 워커 간 읽기-쓰기 사이 레이스 (동시 append 시 주문 유실 가능)
+변경: 하나의 인터페이스 뒤에 두 가지 백엔드
+  - RedisStreamOrderQueue (기본) : Stream XADD / XREADGROUP(원자적 claim) / XACK, 결과는 주문별 리스트 → BLPOP 대기
+  - SQLiteOrderQueue (대체)     : WAL 모드 단일 파일, UPDATE ... RETURNING 으로 원자적 claim
+
+[사용]
+  order_id = await order_queue.enqueue({"action": "order", ...})
+  orders   = await order_queue.claim(block=20)            # 브릿지 롱폴링
+  await order_queue.requeue(orders)                       # 전달 실패 → 즉시 대기열 복귀
+  await order_queue.set_result(order_id, result)          # 브릿지 결과 → ack
+  result   = await order_queue.wait_result(order_id, 10)  # 클라이언트 대기 (폴링 불필요)
+
+BRIDGE_ORDER_QUEUE=redis | sqlite (config.py / .env) — 워커 간 같은 백엔드를 써야 하므로 자동 전환하지 않음
+
+[미확정 주문 회수] claim 후 결과(set_result)가 CLAIM_TIMEOUT 안에 오지 않은 주문 (브릿지 종료, 푸시 실패 등)
+  - claim 직전에 먼저 회수: Redis XAUTOCLAIM(min-idle) / SQLite status='claimed' AND claimed_at < now-CLAIM_TIMEOUT
+  - 재배달 주문에는 "redelivered": true — 브릿지는 order_id별 실행 기록(mt5_bridge.py OrderJournal)으로
+    이미 실행한 주문은 MT5에 다시 보내지 않고 기록된 결과만 재전송
+  - 생성 후 ORDER_EXPIRE 지난 주문은 재배달하지 않고 "status": "unknown" 결과로 종료
+    (클라이언트가 포기한 뒤 늦게 체결되는 것 방지 — 브릿지가 체결했고 결과만 유실됐을 수 있으므로 "미실행"으로 단정하지 않음)
+  - ack/삭제는 브릿지 결과(set_result) 수신 시에만
+  - 푸시(WS 전송) 실패 / 연결 종료로 보내지 못한 주문은 requeue()로 즉시 대기열 복귀 (CLAIM_TIMEOUT 대기 없음)
+    전송 도중 끊긴 경우 브릿지가 받았을 수도 있으므로 "redelivered": true 표시
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+# 결과 보관 시간 (초) — 클라이언트가 가져가지 않은 결과 자동 정리
+RESULT_TTL = 300
+# 롱폴링 최대 대기 (초) — 브릿지 requests 타임아웃(wait+5초)과 프록시 타임아웃 이내
+MAX_BLOCK_SECONDS = 25.0
+# 스트림 최대 길이 (근사 트리밍)
+STREAM_MAXLEN = 10000
+# claim 후 결과 없이 이 시간(초)이 지나면 재배달 대상
+CLAIM_TIMEOUT = 30.0
+# 생성 후 이 시간(초)이 지난 미확정 주문은 재배달 대신 실패 처리
+ORDER_EXPIRE = 120.0
+
+
+def _new_order(order: Dict) -> Dict:
+    order = dict(order)
+    order.setdefault("order_id", uuid.uuid4().hex)
+    order.setdefault("created_at", time.time())
+    return order
+
+
+def _is_expired(order: Dict, now: float) -> bool:
+    return now - float(order.get("created_at") or now) > ORDER_EXPIRE
+
+
+def _expired_result(order: Dict) -> Dict:
+    """claim 후 결과 없이 만료 — 브릿지가 이미 체결했을 수 있으므로 체결 여부 미확인 (재주문 유도 금지)"""
+    return {"order_id": order["order_id"], "success": False, "expired": True, "status": "unknown",
+            "message": "브릿지 응답 없음 — 체결 여부 미확인 (포지션 확인 후 재주문)"}
+
+
+class RedisStreamOrderQueue:
+    """Redis Streams 백엔드 — 소비자 그룹으로 원자적 claim/ack"""
+
+    STREAM_KEY = "bridge:orders"
+    GROUP = "bridge"
+    CLAIMS_KEY = "bridge:order_claims"       # order_id → stream entry id (ack용)
+    RESULT_KEY = "bridge:order_result:{}"    # 주문별 결과 리스트 (BLPOP 대기)
+
+    def __init__(self):
+        self._group_ready = False
+        self.stats = {"enqueued": 0, "claimed": 0, "results": 0, "reclaimed": 0, "expired": 0, "requeued": 0}
+
+    def _redis(self):
+        from ..redis_client import get_async_redis
+        return get_async_redis()
+
+    async def _ensure_group(self, r):
+        if self._group_ready:
+            return
+        try:
+            await r.xgroup_create(self.STREAM_KEY, self.GROUP, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    async def enqueue(self, order: Dict) -> str:
+        r = self._redis()
+        await self._ensure_group(r)
+        order = _new_order(order)
+        await r.xadd(self.STREAM_KEY, {"data": json.dumps(order, default=str)},
+                     maxlen=STREAM_MAXLEN, approximate=True)
+        self.stats["enqueued"] += 1
+        return order["order_id"]
+
+    async def _reclaim(self, r, count: int, consumer: str) -> List[Dict]:
+        """PEL에서 CLAIM_TIMEOUT 이상 미확정인 주문 회수 (XAUTOCLAIM) → 재배달 / 만료 처리"""
+        resp = await r.xautoclaim(self.STREAM_KEY, self.GROUP, consumer,
+                                  min_idle_time=int(CLAIM_TIMEOUT * 1000), start_id="0-0", count=count)
+        entries = resp[1] if resp and len(resp) > 1 else []
+        now = time.time()
+        orders = []
+        for entry_id, fields in entries:
+            try:
+                order = json.loads(fields["data"])
+            except (KeyError, TypeError, ValueError):
+                # 트리밍/삭제된 항목 — PEL에서만 정리
+                await r.xack(self.STREAM_KEY, self.GROUP, entry_id)
+                continue
+            if _is_expired(order, now):
+                await self.set_result(order["order_id"], _expired_result(order))
+                self.stats["expired"] += 1
+                print(f"[OrderQueue] ⚠️ 미확정 주문 만료: {order['order_id']}")
+                continue
+            order["redelivered"] = True
+            orders.append(order)
+        self.stats["reclaimed"] += len(orders)
+        return orders
+
+    async def claim(self, count: int = 50, block: float = 0, consumer: str = "bridge") -> List[Dict]:
+        r = self._redis()
+        await self._ensure_group(r)
+        # 미확정 주문 먼저 (claims 해시의 entry id는 최초 claim 때 기록된 그대로 유효)
+        reclaimed = await self._reclaim(r, count, consumer)
+        if reclaimed:
+            self.stats["claimed"] += len(reclaimed)
+            return reclaimed
+        block_ms = int(min(max(block, 0), MAX_BLOCK_SECONDS) * 1000) or None
+        resp = await r.xreadgroup(self.GROUP, consumer, {self.STREAM_KEY: ">"}, count=count, block=block_ms)
+        orders = []
+        claims = {}
+        for _stream, entries in resp or []:
+            for entry_id, fields in entries:
+                try:
+                    order = json.loads(fields["data"])
+                except (KeyError, ValueError):
+                    await r.xack(self.STREAM_KEY, self.GROUP, entry_id)
+                    continue
+                claims[order["order_id"]] = entry_id
+                orders.append(order)
+        if claims:
+            await r.hset(self.CLAIMS_KEY, mapping=claims)
+        self.stats["claimed"] += len(orders)
+        return orders
+
+    async def requeue(self, orders: List[Dict]):
+        """claim했지만 브릿지에 전달 못 한 주문 → 새 항목으로 다시 추가 + 기존 항목 ack/삭제 (한 트랜잭션)"""
+        if not orders:
+            return
+        r = self._redis()
+        entry_ids = await r.hmget(self.CLAIMS_KEY, [o["order_id"] for o in orders])
+        pipe = r.pipeline(transaction=True)
+        for order, entry_id in zip(orders, entry_ids):
+            order = dict(order, redelivered=True)
+            pipe.xadd(self.STREAM_KEY, {"data": json.dumps(order, default=str)},
+                      maxlen=STREAM_MAXLEN, approximate=True)
+            if entry_id:
+                pipe.xack(self.STREAM_KEY, self.GROUP, entry_id)
+                pipe.xdel(self.STREAM_KEY, entry_id)
+            pipe.hdel(self.CLAIMS_KEY, order["order_id"])
+        await pipe.execute()
+        self.stats["requeued"] += len(orders)
+
+    async def set_result(self, order_id: str, result: Dict):
+        r = self._redis()
+        key = self.RESULT_KEY.format(order_id)
+        entry_id = await r.hget(self.CLAIMS_KEY, order_id)
+        pipe = r.pipeline(transaction=True)
+        pipe.rpush(key, json.dumps(result, default=str))
+        pipe.expire(key, RESULT_TTL)
+        if entry_id:
+            pipe.xack(self.STREAM_KEY, self.GROUP, entry_id)
+            pipe.xdel(self.STREAM_KEY, entry_id)
+            pipe.hdel(self.CLAIMS_KEY, order_id)
+        await pipe.execute()
+        self.stats["results"] += 1
+
+    async def pop_result(self, order_id: str) -> Optional[Dict]:
+        raw = await self._redis().lpop(self.RESULT_KEY.format(order_id))
+        return json.loads(raw) if raw else None
+
+    async def wait_result(self, order_id: str, timeout: float) -> Optional[Dict]:
+        timeout = min(max(timeout, 0), MAX_BLOCK_SECONDS)
+        if timeout <= 0:
+            return await self.pop_result(order_id)
+        # BLPOP 타임아웃은 정수 초 → 최소 1초
+        resp = await self._redis().blpop(self.RESULT_KEY.format(order_id), timeout=max(1, int(timeout)))
+        return json.loads(resp[1]) if resp else None
+
+    async def get_status(self) -> Dict:
+        r = self._redis()
+        try:
+            length = await r.xlen(self.STREAM_KEY)
+            in_flight = await r.hlen(self.CLAIMS_KEY)
+        except Exception as e:
+            return {"backend": "redis", "error": str(e)[:100], **self.stats}
+        return {"backend": "redis", "stream_length": length, "in_flight": in_flight, **self.stats}
+
+
+class SQLiteOrderQueue:
+    """SQLite WAL 백엔드 — Redis 없는 환경용 (claim은 단일 UPDATE ... RETURNING)"""
+
+    # 결과 대기 폴링 간격 (초) — 프로세스 간 알림 수단이 없어 짧게 폴링
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, path: str = "/tmp/mt5_bridge_orders.db"):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()  # 연결 1개를 스레드 간 공유
+        self.stats = {"enqueued": 0, "claimed": 0, "results": 0, "reclaimed": 0, "expired": 0, "requeued": 0}
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS orders (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                order_id TEXT UNIQUE NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                claimed_at REAL
+            )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_orders_status ON orders(status, seq)")
+            conn.execute("""CREATE TABLE IF NOT EXISTS results (
+                order_id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )""")
+            self._conn = conn
+        return self._conn
+
+    # ---------- 동기 구현 (스레드에서 실행) ----------
+    def _enqueue(self, order: Dict) -> str:
+        order = _new_order(order)
+        self._db().execute("INSERT INTO orders (order_id, payload) VALUES (?, ?)",
+                           (order["order_id"], json.dumps(order, default=str)))
+        return order["order_id"]
+
+    def _reclaim(self) -> int:
+        """CLAIM_TIMEOUT 넘게 미확정인 주문 → pending 복귀 (재배달 표시) / 만료분은 실패 결과 기록 후 삭제"""
+        db = self._db()
+        now = time.time()
+        stale = db.execute("SELECT order_id, payload FROM orders WHERE status='claimed' AND claimed_at < ?",
+                           (now - CLAIM_TIMEOUT,)).fetchall()
+        if not stale:
+            return 0
+        requeued = 0
+        for order_id, payload in stale:
+            order = json.loads(payload)
+            if _is_expired(order, now):
+                self._set_result(order_id, _expired_result(order))
+                self.stats["expired"] += 1
+                print(f"[OrderQueue] ⚠️ 미확정 주문 만료: {order_id}")
+                continue
+            order["redelivered"] = True
+            db.execute("UPDATE orders SET status='pending', claimed_at=NULL, payload=? "
+                       "WHERE order_id=? AND status='claimed'", (json.dumps(order, default=str), order_id))
+            requeued += 1
+        self.stats["reclaimed"] += requeued
+        return requeued
+
+    def _claim(self, count: int) -> List[Dict]:
+        self._reclaim()
+        rows = self._db().execute(
+            "UPDATE orders SET status='claimed', claimed_at=? "
+            "WHERE seq IN (SELECT seq FROM orders WHERE status='pending' ORDER BY seq LIMIT ?) "
+            "RETURNING seq, payload",
+            (time.time(), count)).fetchall()
+        return [json.loads(payload) for _seq, payload in sorted(rows)]
+
+    def _requeue(self, orders: List[Dict]):
+        db = self._db()
+        for order in orders:
+            order = dict(order, redelivered=True)
+            db.execute("UPDATE orders SET status='pending', claimed_at=NULL, payload=? "
+                       "WHERE order_id=? AND status='claimed'", (json.dumps(order, default=str), order["order_id"]))
+
+    def _set_result(self, order_id: str, result: Dict):
+        db = self._db()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("INSERT OR REPLACE INTO results (order_id, payload, created_at) VALUES (?, ?, ?)",
+                       (order_id, json.dumps(result, default=str), now))
+            db.execute("DELETE FROM orders WHERE order_id=?", (order_id,))
+            db.execute("DELETE FROM results WHERE created_at < ?", (now - RESULT_TTL,))
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def _pop_result(self, order_id: str) -> Optional[Dict]:
+        row = self._db().execute("DELETE FROM results WHERE order_id=? RETURNING payload", (order_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _locked(self, fn, *args):
+        with self._lock:
+            return fn(*args)
+
+    async def _call(self, fn, *args):
+        return await asyncio.to_thread(self._locked, fn, *args)
+
+    # ---------- 비동기 인터페이스 ----------
+    async def enqueue(self, order: Dict) -> str:
+        order_id = await self._call(self._enqueue, order)
+        self.stats["enqueued"] += 1
+        return order_id
+
+    async def claim(self, count: int = 50, block: float = 0, consumer: str = "bridge") -> List[Dict]:
+        deadline = time.monotonic() + min(max(block, 0), MAX_BLOCK_SECONDS)
+        while True:
+            orders = await self._call(self._claim, count)
+            if orders or time.monotonic() >= deadline:
+                self.stats["claimed"] += len(orders)
+                return orders
+            await asyncio.sleep(self.POLL_INTERVAL)
+
+    async def requeue(self, orders: List[Dict]):
+        """claim했지만 브릿지에 전달 못 한 주문 → pending 복귀"""
+        if not orders:
+            return
+        await self._call(self._requeue, orders)
+        self.stats["requeued"] += len(orders)
+
+    async def set_result(self, order_id: str, result: Dict):
+        await self._call(self._set_result, order_id, result)
+        self.stats["results"] += 1
+
+    async def pop_result(self, order_id: str) -> Optional[Dict]:
+        return await self._call(self._pop_result, order_id)
+
+    async def wait_result(self, order_id: str, timeout: float) -> Optional[Dict]:
+        deadline = time.monotonic() + min(max(timeout, 0), MAX_BLOCK_SECONDS)
+        while True:
+            result = await self.pop_result(order_id)
+            if result is not None or time.monotonic() >= deadline:
+                return result
+            await asyncio.sleep(self.POLL_INTERVAL)
+
+    async def get_status(self) -> Dict:
+        def _counts():
+            rows = self._db().execute("SELECT status, COUNT(*) FROM orders GROUP BY status").fetchall()
+            return dict(rows)
+        counts = await self._call(_counts)
+        return {"backend": "sqlite", "pending": counts.get("pending", 0),
+                "in_flight": counts.get("claimed", 0), **self.stats}
+
+
+def _create_order_queue():
+    from ..config import settings
+    backend = (settings.BRIDGE_ORDER_QUEUE or "redis").lower()
+    if backend == "sqlite":
+        print("[OrderQueue] SQLite WAL 백엔드 사용")
+        return SQLiteOrderQueue()
+    print("[OrderQueue] Redis Streams 백엔드 사용")
+    return RedisStreamOrderQueue()
+
+
+# 워커 전역 인스턴스
+order_queue = _create_order_queue()
@@ -0,0 +1,185 @@
+# app/api/bulk_close.py
+"""
+라이브 일괄 청산 — close-all / close-by-type / close-by-profit 공통 실행기
+
+기존: 대상 포지션마다 await close_position_for_user(...) 순차 호출
+      → 마틴 10티켓 = RPC 왕복 10회 직렬 (그동안 시세는 계속 움직임), 청산 후 캐시 2종을 각각 수동 정리
+변경: 계정별 동시 실행 상한(ACCOUNT_CONCURRENCY) 안에서 병렬 청산
+  - 티켓별 결과는 끝나는 순서대로 기록 (results — 완료 순, elapsed_ms 포함)
+  - 배치 전체 마감(DEADLINE_SEC) — 넘긴 티켓은 취소하지 않음 (청산 RPC가 이미 나갔을 수 있음) → "timeout"으로 보고
+  - 마지막에 포지션 1회 재조회로 대조 (응답 실패/타임아웃이어도 실제로 닫혔으면 closed)
+  - user_metaapi_cache / user_live_cache 갱신 1회 (대조 결과 그대로 — 포지션별 수동 제거 없음)
+"""
+
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional
+
+from .. import metrics
+
+# 계정당 동시 청산 RPC 상한 (여러 일괄 요청이 겹쳐도 합산)
+ACCOUNT_CONCURRENCY = 4
+# 배치 전체 마감 (초)
+DEADLINE_SEC = 15.0
+
+
+def position_is_buy(pos: Dict) -> bool:
+    """공용 계정('BUY') / 유저 계정('POSITION_TYPE_BUY') 형식 공통"""
+    return "BUY" in str(pos.get("type", "")).upper()
+
+
+class BulkCloseExecutor:
+    """워커 전역 — 계정별 세마포어 + 일괄 청산"""
+
+    def __init__(self):
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.stats = {"batches": 0, "tickets": 0, "closed": 0, "failed": 0, "timeouts": 0, "reconciled": 0}
+
+    def _semaphore(self, account_key: str) -> asyncio.Semaphore:
+        sem = self._semaphores.get(account_key)
+        if sem is None:
+            sem = self._semaphores[account_key] = asyncio.Semaphore(ACCOUNT_CONCURRENCY)
+        return sem
+
+    async def close_positions(self, user_id: int, metaapi_account_id: Optional[str], positions: List[Dict],
+                              deadline: float = DEADLINE_SEC,
+                              on_result: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        positions 병렬 청산 → {"closed": [id], "failed": [id], "results": [...], "open_positions": [...]}
+        metaapi_account_id=None → 공용 Trade 계정 (metaapi_service.close_position)
+        """
+        from .metaapi_service import metaapi_service, close_position_for_user
+
+        self.stats["batches"] += 1
+        self.stats["tickets"] += len(positions)
+        sem = self._semaphore(metaapi_account_id or "shared")
+        started = time.perf_counter()
+        results: List[Dict] = []
+
+        async def _close(pos: Dict) -> Dict:
+            pos_id = pos.get("id")
+            # 병렬 RPC 시간이 요청에 중복 합산되지 않도록 — 요청 RPC 시간은 아래 close_batch 1회
+            metrics.detach_request()
+            async with sem:
+                try:
+                    if metaapi_account_id:
+                        res = await close_position_for_user(user_id, metaapi_account_id, pos_id)
+                    else:
+                        res = await metaapi_service.close_position(pos_id)
+                except Exception as e:
+                    res = {"success": False, "error": str(e)}
+            return {
+                "id": pos_id,
+                "success": bool(res.get("success")),
+                "error": res.get("error"),
+                "profit": pos.get("profit", 0),
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            }
+
+        # 요청 RPC 시간 = 병렬 청산 구간 벽시계 시간 (티켓별 합계가 아님)
+        with metrics.rpc_timer("close_batch"):
+            tasks = {asyncio.ensure_future(_close(pos)): pos.get("id") for pos in positions}
+            pending = set(tasks)
+            end_at = time.monotonic() + deadline
+            while pending:
+                remaining = end_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    entry = task.result()
+                    results.append(entry)
+                    if on_result is not None:
+                        on_result(entry)
+
+            # 마감 초과분 — 취소하지 않고 결과만 "timeout" (대조 단계에서 실제 상태 확인)
+            for task in pending:
+                entry = {"id": tasks[task], "success": False, "error": "timeout", "profit": 0,
+                         "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+                results.append(entry)
+                self.stats["timeouts"] += 1
+                if on_result is not None:
+                    on_result(entry)
+
+        # ★ 대조 1회 — 실제로 남아 있는 포지션 기준으로 성공/실패 확정
+        open_positions = await self._fetch_positions(user_id, metaapi_account_id)
+        closed, failed = [], []
+        if open_positions is None:
+            closed = [r["id"] for r in results if r["success"]]
+            failed = [r["id"] for r in results if not r["success"]]
+        else:
+            open_ids = {p.get("id") for p in open_positions}
+            for r in results:
+                if r["id"] in open_ids:
+                    failed.append(r["id"])
+                    if r["success"]:
+                        r["success"] = False
+                        r["error"] = "still open"
+                else:
+                    closed.append(r["id"])
+                    if not r["success"]:
+                        r["success"] = True
+                        r["reconciled"] = True
+                        self.stats["reconciled"] += 1
+
+        self.stats["closed"] += len(closed)
+        self.stats["failed"] += len(failed)
+        self._update_caches(user_id, metaapi_account_id, set(closed), open_positions)
+
+        return {
+            "closed": closed,
+            "failed": failed,
+            "results": results,
+            "open_positions": open_positions,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    async def _fetch_positions(self, user_id: int, metaapi_account_id: Optional[str]) -> Optional[List[Dict]]:
+        from .metaapi_service import metaapi_service, get_user_trade_connection
+        try:
+            if metaapi_account_id:
+                # get_user_positions는 실패 시 캐시를 돌려줌 → 대조용으로는 RPC 직접 호출
+                rpc = await get_user_trade_connection(user_id, metaapi_account_id)
+                if not rpc:
+                    return None
+                with metrics.rpc_timer("positions"):
+                    return list(await rpc.get_positions() or [])
+            return await metaapi_service.get_positions()
+        except Exception as e:
+            print(f"[BulkClose] ⚠️ 대조 조회 실패 (응답 결과 기준으로 처리): {e}")
+            return None
+
+    def _update_caches(self, user_id: int, metaapi_account_id: Optional[str], closed_ids: set,
+                       open_positions: Optional[List[Dict]]):
+        """user_metaapi_cache / user_live_cache 갱신 1회"""
+        from .metaapi_service import user_metaapi_cache
+        from .mt5 import user_live_cache
+
+        live = user_live_cache.get(user_id)
+        if live is not None:
+            live["positions"] = [p for p in live.get("positions", []) if p.get("id") not in closed_ids]
+
+        if not metaapi_account_id:
+            # 공용 계정 청산 — 유저 캐시에 같은 포지션이 있으면 제거만 (중복 주문 방지용)
+            cache = user_metaapi_cache.get(user_id)
+            if cache is not None:
+                cache["positions"] = [p for p in cache.get("positions", []) if p.get("id") not in closed_ids]
+            return
+        cache = user_metaapi_cache.setdefault(user_id, {})
+        if open_positions is not None:
+            cache["positions"] = open_positions
+            cache["last_sync"] = time.time()
+        else:
+            cache["positions"] = [p for p in cache.get("positions", []) if p.get("id") not in closed_ids]
+        try:
+            from .redis_writer import redis_writer
+            redis_writer.set_user_cache(user_id, cache, ttl=30)
+        except Exception as e:
+            print(f"[BulkClose] ⚠️ Redis 캐시 저장 실패: {e}")
+
+    def get_status(self) -> Dict:
+        return {"accounts": len(self._semaphores), **self.stats}
+
+
+# 워커 전역 인스턴스
+bulk_close_executor = BulkCloseExecutor()
@@ -0,0 +1,142 @@
+# app/api/candle_response_cache.py
+"""
+GET /api/mt5/candles/{symbol} 응답 캐시 — (symbol, timeframe, count)별 후처리 완료 페이로드
+
+기존: 차트 열기/TF 전환마다 null 필터 → 정렬 → dict 중복 제거 → trailing flat 제거 → (MN1 조합) → 인디케이터 → JSON 직렬화
+변경: 후처리 결과 + 직렬화된 JSON 바이트를 캐시
+  - 링 버퍼(candle_store.CandleRing)에 새 캔들이 추가/교체되지 않았으면 과거 구간은 그대로 재사용
+  - 틱은 형성 중 마지막 캔들만 바꿈 → 마지막 캔들 + 인디케이터 마지막 점만 다시 만들어
+    미리 직렬화한 과거 구간 JSON 조각 뒤에 붙임 (1000개 재직렬화 없음)
+  - since=<캔들 time> → 해당 시각 이후 캔들/인디케이터만 반환 (delta)
+"""
+
+import bisect
+import json
+from typing import Dict, List, Optional
+
+from ..services.indicator_engine import chart_indicator_cache
+
+_SEPARATORS = (",", ":")
+_SERIES = ("bb_upper", "bb_middle", "bb_lower", "lwma")
+
+
+def _dumps(obj) -> str:
+    return json.dumps(obj, separators=_SEPARATORS, default=str)
+
+
+def _prefix(items: List) -> str:
+    """리스트 JSON에서 마지막 원소와 닫는 괄호를 뺀 조각 — "[a,b" 또는 "[" """
+    if len(items) <= 1:
+        return "["
+    return _dumps(items[:-1])[:-1]
+
+
+def _join(prefix: str, last) -> str:
+    if prefix == "[":
+        return "[" + _dumps(last) + "]"
+    return prefix + "," + _dumps(last) + "]"
+
+
+def _is_flat(c: Dict) -> bool:
+    return c['open'] == c['high'] == c['low'] == c['close']
+
+
+class _Entry:
+    __slots__ = ("ring_uid", "ring_layout", "ring_appended", "forming", "candles", "times", "indicators", "prefixes", "body")
+
+
+class CandleResponseCache:
+    """캔들 응답 캐시 — 링 버퍼 상태(uid, 배치 재구성 횟수, 누적 append 수)로 과거 구간 유효성 판단"""
+
+    def __init__(self, max_entries: int = 256):
+        self._entries: Dict[tuple, _Entry] = {}
+        self.max_entries = max_entries
+        self.stats = {"hit": 0, "forming": 0, "miss": 0}
+
+    @staticmethod
+    def _forming_of(ring) -> tuple:
+        last = ring[-1]
+        return (last['time'], last['open'], last['high'], last['low'], last['close'], last['volume'])
+
+    def lookup(self, key: tuple, ring) -> Optional[_Entry]:
+        """유효한 캐시 항목 반환 (형성 중 캔들만 바뀌었으면 마지막 원소만 갱신) — 없으면 None"""
+        entry = self._entries.get(key)
+        # 백필 병합(교체만, append 0)도 배치 재구성(_layout)으로 감지
+        if entry is None or not ring or entry.ring_uid != ring._uid or entry.ring_layout != ring._layout \
+                or entry.ring_appended != ring._appended:
+            self.stats["miss"] += 1
+            return None
+
+        forming = self._forming_of(ring)
+        if forming == entry.forming:
+            self.stats["hit"] += 1
+            return entry
+
+        # 형성 중 캔들 변경 — 응답 마지막 캔들이 바로 그 캔들이고 여전히 유효(flat 아님)할 때만 부분 갱신
+        t, o, h, l, c, v = forming
+        last = {'time': t, 'open': o, 'high': h, 'low': l, 'close': c, 'volume': v}
+        if not entry.candles or entry.candles[-1]['time'] != t or not (o and h and l and c) or _is_flat(last):
+            self.stats["miss"] += 1
+            return None
+
+        entry.candles = entry.candles[:-1] + [last]
+        if entry.indicators:
+            updated = chart_indicator_cache.update_last(key, t, c)
+            if updated is None:
+                self.stats["miss"] += 1
+                return None
+            entry.indicators = updated
+        entry.forming = forming
+        entry.body = self._compose(entry)
+        self.stats["forming"] += 1
+        return entry
+
+    def store(self, key: tuple, ring, candles: List[Dict], indicators: Dict) -> _Entry:
+        entry = _Entry()
+        entry.ring_uid = ring._uid
+        entry.ring_layout = ring._layout
+        entry.ring_appended = ring._appended
+        entry.forming = self._forming_of(ring)
+        entry.candles = candles
+        entry.times = [c['time'] for c in candles]
+        entry.indicators = indicators
+        entry.prefixes = {"candles": _prefix(candles)}
+        for name in _SERIES:
+            entry.prefixes[name] = _prefix(indicators.get(name, []))
+        entry.body = self._compose(entry)
+
+        if len(self._entries) >= self.max_entries and key not in self._entries:
+            self._entries.pop(next(iter(self._entries)))
+        self._entries[key] = entry
+        return entry
+
+    @staticmethod
+    def _compose(entry: _Entry) -> bytes:
+        """미리 직렬화한 과거 구간 + 마지막 원소 → 전체 응답 JSON"""
+        parts = ['{"candles":', _join(entry.prefixes["candles"], entry.candles[-1]), ',"indicators":{']
+        if entry.indicators:
+            parts.append(",".join(
+                f'"{name}":' + (_join(entry.prefixes[name], entry.indicators[name][-1]) if entry.indicators.get(name) else "[]")
+                for name in _SERIES
+            ))
+        parts.append("}}")
+        return "".join(parts).encode()
+
+    @staticmethod
+    def delta(entry: _Entry, since: int) -> Dict:
+        """since 시각 이후(포함) 캔들 + 인디케이터 점만"""
+        i = bisect.bisect_left(entry.times, since)
+        indicators = {}
+        for name in _SERIES:
+            points = entry.indicators.get(name)
+            if points:
+                # 인디케이터 점은 마지막 len(points)개 캔들과 1:1 대응
+                offset = len(entry.candles) - len(points)
+                indicators[name] = points[max(0, i - offset):]
+        return {"candles": entry.candles[i:], "indicators": indicators, "delta": True, "since": since}
+
+    def get_status(self) -> Dict:
+        return {"entries": len(self._entries), **self.stats}
+
+
+candle_response_cache = CandleResponseCache()
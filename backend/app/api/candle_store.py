@@ -0,0 +1,481 @@
+# app/api/candle_store.py
+"""
+캔들 저장소 — 심볼/타임프레임별 고정 용량 링 버퍼 (quote_candle_cache 값)
+
+기존: {"BTCUSD": {"M1": [{"time":..,"open":..,...}, ...]}} — 캔들 1개 = dict 1개 (~300B)
+      update_candle_realtime 에서 candles.pop(0) → 1500개 리스트 O(n), 틱마다 × 9 TF × 심볼
+변경: 컬럼별 병렬 배열 (array 모듈 — time/volume int64 'q', OHLC float64 'd') → 캔들 1개 = 48B
+      - append / 마지막 캔들 갱신 O(1) (용량 초과 시 가장 오래된 캔들 덮어씀)
+      - columns(n): 최근 n개 컬럼 — 물리적으로 연속이면 memoryview (복사 없음), 랩어라운드 구간만 n개 복사
+                    (읽기는 링을 변경하지 않음 → 증분 저장 상태 유지)
+      - to_list(n): 차트 JSON 형태 [{"time", "open", "high", "low", "close", "volume"}, ...]
+
+호환: len(), bool(), candles[-1] (dict 사본), candles[-100:] (dict 리스트), for c in candles 그대로 동작
+      ★ candles[-1]['close'] = x 처럼 반환된 dict를 수정해도 저장소에는 반영되지 않음 → update_last() 사용
+
+[일괄 병합] merge_columns — 컬럼 배치(time 오름차순)를 time 기준 선형 병합 O(n + m), 재정렬 없음
+  - 배치 전체가 마지막 캔들 이후면 append 경로 (증분 저장 유지)
+  - 겹치면 기존/신규를 한 번 훑어 새 컬럼 구성 (같은 time은 신규 우선) → 용량 초과분은 오래된 것부터 버림
+  CandleWatermarks — 심볼/TF별 원본(히스토리 API·브릿지)으로 확인된 구간 [first, last] → 다음 로딩은 last 이후 갭만
+
+[영속화] CandleFileStore — 심볼/TF당 바이너리 파일 1개 ({root}/{symbol}/{tf}.bin)
+  파일 = 링 버퍼 메모리 레이아웃 그대로: 헤더 32B + 컬럼 6개 × capacity × 8B
+  - 저장: 지난 저장 이후 추가된 캔들 슬롯 + 형성 중 캔들만 pwrite (변경 없는 과거 캔들은 다시 쓰지 않음)
+          링 교체 · 병합 재구성(히스토리 겹침)/초기화 시에만 전체 파일 재작성 (tmp → rename)
+  - 로드: mmap → 컬럼별 frombytes (JSON 파싱 없음)
+"""
+
+import itertools
+import json
+import mmap
+import os
+import struct
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 컬럼 이름 + array 타입코드 (time/volume: int64, OHLC: float64)
+COLUMNS = (("time", "q"), ("open", "d"), ("high", "d"), ("low", "d"), ("close", "d"), ("volume", "q"))
+_ATTRS = ("_t", "_o", "_h", "_l", "_c", "_v")
+
+_ring_ids = itertools.count(1)
+
+
+class CandleRing:
+    """고정 용량 캔들 링 버퍼 (시간 오름차순 유지)"""
+
+    __slots__ = ("capacity", "_start", "_len", "_t", "_o", "_h", "_l", "_c", "_v", "_appended", "_layout", "_uid")
+
+    def __init__(self, capacity: int = 1500):
+        self.capacity = capacity
+        self._start = 0   # 가장 오래된 캔들의 물리 인덱스
+        self._len = 0
+        self._appended = 0           # 누적 append 수 (증분 저장 기준)
+        self._layout = 0             # 물리 배치 변경 횟수 (병합 재구성/초기화 → 전체 재작성, 읽기는 변경 없음)
+        self._uid = next(_ring_ids)  # 링 교체 감지용
+        self._t = array("q", bytes(8 * capacity))
+        self._o = array("d", bytes(8 * capacity))
+        self._h = array("d", bytes(8 * capacity))
+        self._l = array("d", bytes(8 * capacity))
+        self._c = array("d", bytes(8 * capacity))
+        self._v = array("q", bytes(8 * capacity))
+
+    @classmethod
+    def from_dicts(cls, candles: Iterable[Dict], capacity: int = 1500) -> "CandleRing":
+        """dict 리스트(시간 오름차순) → 링 버퍼 (용량 초과분은 오래된 것부터 버림)"""
+        ring = cls(capacity)
+        ring.extend(candles)
+        return ring
+
+    # ========== 쓰기 ==========
+    def append(self, t: int, o: float, h: float, l: float, c: float, v: int = 0):
+        """새 캔들 추가 — O(1), 가득 차면 가장 오래된 캔들 덮어씀"""
+        cap = self.capacity
+        if self._len < cap:
+            i = (self._start + self._len) % cap
+            self._len += 1
+        else:
+            i = self._start
+            self._start = (self._start + 1) % cap
+        self._appended += 1
+        self._t[i] = int(t)
+        self._o[i] = o
+        self._h[i] = h
+        self._l[i] = l
+        self._c[i] = c
+        self._v[i] = int(v or 0)
+
+    def append_dict(self, candle: Dict):
+        self.append(candle['time'], candle['open'], candle['high'], candle['low'], candle['close'], candle.get('volume', 0))
+
+    def extend(self, candles: Iterable[Dict]):
+        for c in candles:
+            self.append_dict(c)
+
+    def merge_columns(self, cols: Dict[str, Sequence]) -> Tuple[int, int]:
+        """
+        컬럼 배치 병합 (time 오름차순 가정, 역순/비정렬이면 인덱스만 정렬) → (추가 수, 교체 수)
+        두 수 모두 병합 후 링에 남은 캔들 기준 (용량 초과로 잘린 행은 세지 않음)
+        """
+        times = cols["time"]
+        n = len(times)
+        if n == 0:
+            return 0, 0
+        order = range(n)
+        if any(times[i] > times[i + 1] for i in range(n - 1)):
+            order = sorted(order, key=times.__getitem__)
+        vols = cols.get("volume")
+        inc = [(int(times[i]), cols["open"][i], cols["high"][i], cols["low"][i], cols["close"][i],
+                int(vols[i] or 0) if vols is not None else 0) for i in order]
+
+        # 빠른 경로: 마지막 캔들 이후만 (마지막 캔들 갱신 포함)
+        if not self._len or inc[0][0] >= self.last_time:
+            added = replaced = 0
+            prev_last = self.last_time if self._len else None
+            for row in inc:
+                if self._len and row[0] == self.last_time:
+                    self.set_last(*row[1:])
+                    # 배치 내 중복 time(방금 추가한 캔들 재기록)은 교체로 세지 않음
+                    replaced = 1 if row[0] == prev_last else replaced
+                elif not self._len or row[0] > self.last_time:
+                    self.append(*row)
+                    added += 1
+            # 배치가 용량보다 길면 앞쪽 신규 캔들(과 교체된 기존 마지막 캔들)은 덮어써짐
+            if added >= self.capacity:
+                added, replaced = self.capacity, 0
+            return added, replaced
+
+        # 일반 경로: 기존 논리 순서 + 신규를 선형 병합 (origin: 0 기존 / 1 추가 / 2 교체 — 잘린 뒤 남은 것만 집계)
+        out = [[] for _ in _ATTRS]
+        origin = []
+        i = j = 0
+        m = len(inc)
+        while i < self._len or j < m:
+            if j < m and (i >= self._len or inc[j][0] <= self._t[(self._start + i) % self.capacity]):
+                row = inc[j]
+                j += 1
+                # 신규 배치 내 중복 time → 마지막 값
+                while j < m and inc[j][0] == row[0]:
+                    row = inc[j]
+                    j += 1
+                if i < self._len and self._t[(self._start + i) % self.capacity] == row[0]:
+                    i += 1
+                    origin.append(2)
+                else:
+                    origin.append(1)
+            else:
+                p = (self._start + i) % self.capacity
+                row = (self._t[p], self._o[p], self._h[p], self._l[p], self._c[p], self._v[p])
+                i += 1
+                origin.append(0)
+            for col, v in zip(out, row):
+                col.append(v)
+
+        keep = min(len(out[0]), self.capacity)
+        kept = origin[len(origin) - keep:]
+        added = kept.count(1)
+        replaced = kept.count(2)
+        pad = self.capacity - keep
+        for (_, code), attr, col in zip(COLUMNS, _ATTRS, out):
+            data = array(code, col[len(col) - keep:])
+            data.frombytes(bytes(8 * pad))
+            setattr(self, attr, data)
+        self._start = 0
+        self._len = keep
+        self._appended += added
+        self._layout += 1
+        return added, replaced
+
+    def update_last(self, price: float):
+        """형성 중인 마지막 캔들에 틱 반영 (close/high/low) — O(1)"""
+        i = self._phys(-1)
+        self._c[i] = price
+        if price > self._h[i]:
+            self._h[i] = price
+        if price < self._l[i]:
+            self._l[i] = price
+
+    def set_last(self, o: float, h: float, l: float, c: float, v: int = 0):
+        """마지막 캔들 OHLCV 교체 (피드 델타 적용용)"""
+        i = self._phys(-1)
+        self._o[i] = o
+        self._h[i] = h
+        self._l[i] = l
+        self._c[i] = c
+        self._v[i] = int(v or 0)
+
+    def clear(self):
+        self._start = 0
+        self._len = 0
+        self._layout += 1
+
+    # ========== 읽기 ==========
+    @property
+    def last_time(self) -> int:
+        return self._t[self._phys(-1)] if self._len else 0
+
+    def _phys(self, idx: int) -> int:
+        if idx < 0:
+            idx += self._len
+        if not 0 <= idx < self._len:
+            raise IndexError("candle index out of range")
+        return (self._start + idx) % self.capacity
+
+    def _row(self, i: int) -> Dict:
+        return {
+            'time': self._t[i], 'open': self._o[i], 'high': self._h[i],
+            'low': self._l[i], 'close': self._c[i], 'volume': self._v[i],
+        }
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __bool__(self) -> bool:
+        return self._len > 0
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self._len)
+            if step == 1:
+                return self.to_list(stop - start, end=stop)
+            return [self._row(self._phys(i)) for i in range(start, stop, step)]
+        return self._row(self._phys(key))
+
+    def __iter__(self):
+        for i in range(self._len):
+            yield self._row((self._start + i) % self.capacity)
+
+    def columns(self, count: Optional[int] = None, end: Optional[int] = None) -> Dict[str, Sequence]:
+        """
+        최근 count개 컬럼 (end: 논리 끝 인덱스, 기본 전체) — 링 상태는 변경하지 않음
+        물리 구간이 연속이면 memoryview (복사 없음), 버퍼 끝에서 감기면 두 조각을 이은 array (count개 복사)
+        """
+        end = self._len if end is None else max(0, min(end, self._len))
+        start = 0 if count is None else max(0, end - count)
+        n = max(0, end - start)
+        p0 = (self._start + start) % self.capacity if self.capacity else 0
+        if p0 + n <= self.capacity:
+            return {name: memoryview(getattr(self, attr))[p0:p0 + n] for (name, _), attr in zip(COLUMNS, _ATTRS)}
+        tail = p0 + n - self.capacity
+        return {name: getattr(self, attr)[p0:] + getattr(self, attr)[:tail] for (name, _), attr in zip(COLUMNS, _ATTRS)}
+
+    def to_list(self, count: Optional[int] = None, end: Optional[int] = None) -> List[Dict]:
+        """차트 JSON 형태 dict 리스트 (최근 count개)"""
+        cols = self.columns(count, end)
+        return [
+            {'time': t, 'open': o, 'high': h, 'low': l, 'close': c, 'volume': v}
+            for t, o, h, l, c, v in zip(cols["time"], cols["open"], cols["high"], cols["low"], cols["close"], cols["volume"])
+        ]
+
+    def nbytes(self) -> int:
+        return 6 * 8 * self.capacity
+
+    def __repr__(self) -> str:
+        return f"CandleRing(len={self._len}, capacity={self.capacity}, last_time={self.last_time})"
+
+
+def rows_to_columns(rows: Iterable[Dict]) -> Dict[str, list]:
+    """dict 리스트 → 컬럼 배치 {"time": [...], "open": [...], ...}"""
+    cols = {name: [] for name, _ in COLUMNS}
+    t, o, h, l, c, v = (cols[name] for name, _ in COLUMNS)
+    for row in rows:
+        t.append(row['time'])
+        o.append(row['open'])
+        h.append(row['high'])
+        l.append(row['low'])
+        c.append(row['close'])
+        v.append(row.get('volume', 0))
+    return cols
+
+
+def merge_rows(existing: List[Dict], incoming: List[Dict], limit: int) -> List[Dict]:
+    """dict 리스트 캔들(time 오름차순) 선형 병합 — 같은 time은 신규 우선, 최근 limit개"""
+    if not incoming:
+        return existing[-limit:]
+    out = []
+    i = j = 0
+    while i < len(existing) or j < len(incoming):
+        if j < len(incoming) and (i >= len(existing) or incoming[j]['time'] <= existing[i]['time']):
+            row = incoming[j]
+            j += 1
+            if i < len(existing) and existing[i]['time'] == row['time']:
+                i += 1
+        else:
+            row = existing[i]
+            i += 1
+        if out and out[-1]['time'] == row['time']:
+            out[-1] = row
+        else:
+            out.append(row)
+    return out[-limit:]
+
+
+# ============================================================
+# 커버리지 워터마크
+# ============================================================
+class CandleWatermarks:
+    """(symbol, tf) → 원본으로 확인된 구간 {"first", "last", "source", "at"} (path 없으면 메모리 전용)"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else None
+        self._marks: Dict[Tuple[str, str], Dict] = {}
+
+    def get(self, symbol: str, tf: str) -> Optional[Dict]:
+        return self._marks.get((symbol, tf))
+
+    def record(self, symbol: str, tf: str, first: int, last: int, source: str):
+        mark = self._marks.get((symbol, tf))
+        if mark is None:
+            mark = self._marks[(symbol, tf)] = {"first": int(first), "last": int(last)}
+        else:
+            mark["first"] = min(mark["first"], int(first))
+            mark["last"] = max(mark["last"], int(last))
+        mark["source"] = source
+        mark["at"] = time.time()
+
+    def gap_count(self, symbol: str, tf: str, ring: Optional["CandleRing"], tf_sec: int,
+                  full: int, now: Optional[float] = None) -> int:
+        """다음 히스토리 요청 개수 — 저장된 마지막 캔들(형성 중이었을 수 있음)부터 현재까지, 이력이 없으면 full"""
+        mark = self.get(symbol, tf)
+        # 캐시가 원본 구간보다 짧아짐(파일 손상 등) → 전체
+        if mark is None or not ring or (len(ring) < full and ring[0]['time'] > mark["first"]):
+            return full
+        if now is None:
+            now = time.time()
+        start = min(mark["last"], ring.last_time)
+        return max(2, min(full, int((now - start) // tf_sec) + 2))
+
+    def to_dict(self) -> Dict[str, Dict[str, Dict]]:
+        out: Dict[str, Dict[str, Dict]] = {}
+        for (symbol, tf), mark in self._marks.items():
+            out.setdefault(symbol, {})[tf] = dict(mark)
+        return out
+
+    def save(self):
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, self.path)
+
+    def load(self):
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self._marks = {(symbol, tf): mark for symbol, tfs in data.items() for tf, mark in tfs.items()}
+        except Exception as e:
+            print(f"[CandleStore] ⚠️ 워터마크 파일 손상 — 무시: {e}")
+            self._marks = {}
+
+
+# ============================================================
+# 바이너리 파일 저장소
+# ============================================================
+_MAGIC = b"CRB1"
+_HEADER = struct.Struct("<4sIIIQ")  # magic, capacity, start, length, appended
+_HEADER_SIZE = 32
+
+
+class CandleFileStore:
+    """quote_candle_cache ↔ {root}/{symbol}/{tf}.bin — 증분 저장 + mmap 로드"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        # (symbol, tf) → 마지막 저장 시점의 (링 uid, layout, appended)
+        self._persisted: Dict[Tuple[str, str], Tuple[int, int, int]] = {}
+
+    def _path(self, symbol: str, tf: str) -> Path:
+        return self.root / symbol / f"{tf}.bin"
+
+    def exists(self) -> bool:
+        return self.root.is_dir() and any(self.root.glob("*/*.bin"))
+
+    # ========== 저장 ==========
+    def snapshot(self, cache: Dict[str, Dict[str, CandleRing]]) -> List[tuple]:
+        """기록할 바이트 추출 — 이벤트 루프에서 호출 (링 변경과 경합 없음, O(신규 캔들))"""
+        jobs = []
+        for symbol, tfs in list(cache.items()):
+            for tf, ring in list(tfs.items()):
+                if not isinstance(ring, CandleRing) or not ring:
+                    continue
+                key = (symbol, tf)
+                state = (ring._uid, ring._layout, ring._appended)
+                cap = ring.capacity
+                header = _HEADER.pack(_MAGIC, cap, ring._start, ring._len, ring._appended).ljust(_HEADER_SIZE, b"\0")
+                prev = self._persisted.get(key)
+
+                if prev is None or prev[0] != ring._uid or prev[1] != ring._layout:
+                    cols = [getattr(ring, attr).tobytes() for attr in _ATTRS]
+                    jobs.append(("full", key, state, header, cols))
+                    continue
+
+                # 지난 저장 이후 추가분 + 직전 형성 캔들(이제 마감) + 현재 형성 캔들
+                n = min(ring._appended - prev[2] + 1, ring._len)
+                first = (ring._start + ring._len - n) % cap
+                runs = [(first, min(first + n, cap))]
+                if first + n > cap:
+                    runs.append((0, first + n - cap))
+                patches = []
+                for ci, attr in enumerate(_ATTRS):
+                    col = getattr(ring, attr)
+                    base = _HEADER_SIZE + ci * cap * 8
+                    for p0, p1 in runs:
+                        patches.append((base + p0 * 8, col[p0:p1].tobytes()))
+                jobs.append(("patch", key, state, header, patches))
+        return jobs
+
+    def write(self, jobs: List[tuple]) -> Dict[str, int]:
+        """파일 기록 — 스레드에서 실행 가능 (snapshot 결과만 사용)"""
+        stats = {"full": 0, "patch": 0, "bytes": 0}
+        for kind, key, state, header, payload in jobs:
+            path = self._path(*key)
+            if kind == "patch" and not path.exists():
+                continue  # 파일이 지워졌으면 다음 저장에서 전체 재작성
+            if kind == "full":
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_suffix(".tmp")
+                with open(tmp, "wb") as f:
+                    f.write(header)
+                    for col in payload:
+                        f.write(col)
+                os.replace(tmp, path)
+                stats["bytes"] += len(header) + sum(len(c) for c in payload)
+            else:
+                fd = os.open(path, os.O_WRONLY)
+                try:
+                    for offset, data in payload:
+                        os.pwrite(fd, data, offset)
+                        stats["bytes"] += len(data)
+                    os.pwrite(fd, header, 0)
+                finally:
+                    os.close(fd)
+            self._persisted[key] = state
+            stats[kind] += 1
+        return stats
+
+    # ========== 로드 ==========
+    def load(self) -> Dict[str, Dict[str, CandleRing]]:
+        """{root}/*/*.bin → {symbol: {tf: CandleRing}} (손상 파일은 건너뜀)"""
+        cache: Dict[str, Dict[str, CandleRing]] = {}
+        if not self.root.is_dir():
+            return cache
+        for path in sorted(self.root.glob("*/*.bin")):
+            symbol, tf = path.parent.name, path.stem
+            try:
+                ring = self._load_file(path)
+            except Exception as e:
+                print(f"[CandleStore] ⚠️ {symbol}/{tf} 파일 손상 — 건너뜀: {e}")
+                continue
+            if ring is None:
+                continue
+            cache.setdefault(symbol, {})[tf] = ring
+            self._persisted[(symbol, tf)] = (ring._uid, ring._layout, ring._appended)
+        return cache
+
+    @staticmethod
+    def _load_file(path: Path) -> Optional[CandleRing]:
+        with open(path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                magic, cap, start, length, appended = _HEADER.unpack_from(mm, 0)
+                if magic != _MAGIC or len(mm) != _HEADER_SIZE + 6 * cap * 8 or length > cap or start >= max(cap, 1):
+                    raise ValueError("invalid header")
+                if length == 0:
+                    return None
+                ring = CandleRing.__new__(CandleRing)
+                ring.capacity = cap
+                ring._start = start
+                ring._len = length
+                ring._appended = appended
+                ring._layout = 0
+                ring._uid = next(_ring_ids)
+                for ci, ((_, code), attr) in enumerate(zip(COLUMNS, _ATTRS)):
+                    col = array(code)
+                    off = _HEADER_SIZE + ci * cap * 8
+                    col.frombytes(mm[off:off + cap * 8])
+                    setattr(ring, attr, col)
+                return ring
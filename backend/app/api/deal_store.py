@@ -0,0 +1,287 @@
+# app/api/deal_store.py
+"""
+유저별 딜 저장소 — /api/mt5/history, /trading-report-summary, /trading-report-analysis, /last-trade
+
+기존: 요청마다 rpc.get_deals_by_time_range(7~365일 전체 구간)
+      → 느리고 MetaAPI rate limit 소모, 리포트 탭 전환마다 같은 구간 재조회
+변경: live_deals 테이블에 딜 원본 저장, 조회는 (user_id, time) 인덱스 구간 스캔
+  - UserStreamingListener.on_deal_added → 즉시 저장
+  - live_deal_sync.[covered_from, covered_to] = RPC로 채운 구간 (high-water mark)
+      요청 구간 시작이 covered_from 이전 → 앞쪽 빈 구간만 RPC 백필
+      covered_to 이후 → 이 워커에 스트리밍이 살아있으면 RPC 없이 now까지 확장,
+                        아니면 TAIL_REFRESH_SEC 지났을 때만 꼬리 구간 RPC (겹침 TAIL_OVERLAP)
+  - MetaAPI 계정이 바뀌면 저장분 폐기 후 다시 채움
+
+[시간] naive datetime 인자는 UTC로 해석 (MetaAPI SDK get_deals_by_time_range와 동일)
+[반환] MetaAPI 딜 dict와 같은 키 (type, entryType, profit, swap, commission, time ...) — 기존 집계 코드 그대로 사용
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from dateutil import parser as dateutil_parser
+
+# 스트리밍 없을 때 꼬리 구간 재조회 최소 간격 (초)
+TAIL_REFRESH_SEC = 30
+# 꼬리 구간 재조회 시 겹침 (서버 딜 시각 지연 보정)
+TAIL_OVERLAP = timedelta(minutes=5)
+
+
+def _utc(dt) -> Optional[datetime]:
+    if dt is None:
+        return None
+    if isinstance(dt, str):
+        dt = dateutil_parser.isoparse(dt)
+    elif isinstance(dt, (int, float)):
+        return datetime.fromtimestamp(dt, tz=timezone.utc)
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def _row_values(user_id: int, deal: Dict) -> Optional[Dict]:
+    deal_id = deal.get('id')
+    deal_time = _utc(deal.get('time'))
+    if not deal_id or deal_time is None:
+        return None
+    return {
+        "user_id": user_id,
+        "deal_id": str(deal_id),
+        "deal_type": deal.get('type'),
+        "entry_type": deal.get('entryType'),
+        "symbol": deal.get('symbol'),
+        "volume": deal.get('volume', 0) or 0,
+        "price": deal.get('price', 0) or 0,
+        "profit": deal.get('profit', 0) or 0,
+        "commission": deal.get('commission', 0) or 0,
+        "swap": deal.get('swap', 0) or 0,
+        "position_id": str(deal['positionId']) if deal.get('positionId') else None,
+        "order_id": str(deal['orderId']) if deal.get('orderId') else None,
+        "magic": deal.get('magic', 0) or 0,
+        "time": deal_time,
+    }
+
+
+def _to_deal(row) -> Dict:
+    return {
+        'id': row.deal_id,
+        'type': row.deal_type,
+        'entryType': row.entry_type,
+        'symbol': row.symbol,
+        'volume': row.volume,
+        'price': row.price,
+        'profit': row.profit,
+        'commission': row.commission,
+        'swap': row.swap,
+        'positionId': row.position_id,
+        'orderId': row.order_id,
+        'magic': row.magic,
+        'time': _utc(row.time),
+    }
+
+
+class DealStore:
+    """워커 전역 — DB 접근은 스레드에서 (이벤트 루프 블로킹 방지)"""
+
+    def __init__(self):
+        self._live: Dict[int, datetime] = {}   # 이 워커에서 스트리밍 딜 동기화 완료 시각
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self.stats = {"streamed": 0, "backfill_rpc": 0, "tail_rpc": 0, "queries": 0}
+
+    # ========== 스트리밍 (UserStreamingListener) ==========
+    def mark_live(self, user_id: int):
+        """on_deals_synchronized — 이후 딜은 on_deal_added로 모두 들어옴"""
+        self._live[user_id] = datetime.now(timezone.utc)
+
+    def mark_offline(self, user_id: int):
+        self._live.pop(user_id, None)
+
+    async def add_streamed(self, user_id: int, deal: Dict):
+        try:
+            await asyncio.to_thread(self._upsert, user_id, [deal])
+            self.stats["streamed"] += 1
+        except Exception as e:
+            print(f"[DealStore] ⚠️ User {user_id} 스트리밍 딜 저장 실패: {e}")
+
+    # ========== DB (스레드) ==========
+    def _upsert(self, user_id: int, deals: List[Dict]) -> int:
+        from ..database import SessionLocal
+        from ..models.live_deal import LiveDeal
+        rows = {}
+        for deal in deals:
+            values = _row_values(user_id, deal)
+            if values:
+                rows[values["deal_id"]] = values
+        if not rows:
+            return 0
+        db = SessionLocal()
+        try:
+            existing = {
+                d.deal_id: d for d in db.query(LiveDeal).filter(
+                    LiveDeal.user_id == user_id, LiveDeal.deal_id.in_(list(rows.keys()))
+                )
+            }
+            for deal_id, values in rows.items():
+                row = existing.get(deal_id)
+                if row is None:
+                    db.add(LiveDeal(**values))
+                else:
+                    # 스트리밍 딜 → RPC 딜로 값이 보정될 수 있음 (profit/commission 등)
+                    for k, v in values.items():
+                        setattr(row, k, v)
+            db.commit()
+            return len(rows)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _load_sync(self, user_id: int):
+        from ..database import SessionLocal
+        from ..models.live_deal import LiveDealSync
+        db = SessionLocal()
+        try:
+            sync = db.query(LiveDealSync).filter(LiveDealSync.user_id == user_id).first()
+            if sync is None:
+                return None
+            return sync.metaapi_account_id, _utc(sync.covered_from), _utc(sync.covered_to)
+        finally:
+            db.close()
+
+    def _save_sync(self, user_id: int, account_id: str, covered_from: datetime, covered_to: datetime):
+        from ..database import SessionLocal
+        from ..models.live_deal import LiveDealSync
+        db = SessionLocal()
+        try:
+            sync = db.query(LiveDealSync).filter(LiveDealSync.user_id == user_id).first()
+            if sync is None:
+                sync = LiveDealSync(user_id=user_id)
+                db.add(sync)
+            sync.metaapi_account_id = account_id
+            sync.covered_from = covered_from
+            sync.covered_to = covered_to
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _reset(self, user_id: int):
+        """MetaAPI 계정 변경 → 이전 계정 딜 폐기"""
+        from ..database import SessionLocal
+        from ..models.live_deal import LiveDeal, LiveDealSync
+        db = SessionLocal()
+        try:
+            db.query(LiveDeal).filter(LiveDeal.user_id == user_id).delete(synchronize_session=False)
+            db.query(LiveDealSync).filter(LiveDealSync.user_id == user_id).delete(synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _query(self, user_id: int, start: datetime, end: datetime) -> List[Dict]:
+        from ..database import SessionLocal
+        from ..models.live_deal import LiveDeal
+        db = SessionLocal()
+        try:
+            rows = db.query(LiveDeal).filter(
+                LiveDeal.user_id == user_id,
+                LiveDeal.time >= start,
+                LiveDeal.time <= end,
+            ).order_by(LiveDeal.time).all()
+            return [_to_deal(r) for r in rows]
+        finally:
+            db.close()
+
+    # ========== RPC 백필 ==========
+    async def _fetch(self, user_id: int, account_id: str, start: datetime, end: datetime) -> Optional[List[Dict]]:
+        from .metaapi_service import get_user_trade_connection
+        rpc = await get_user_trade_connection(user_id, account_id)
+        if not rpc:
+            return None
+        try:
+            result = await rpc.get_deals_by_time_range(start, end)
+        except Exception as e:
+            print(f"[DealStore] ⚠️ User {user_id} 딜 조회 실패 ({start:%m/%d %H:%M}~{end:%m/%d %H:%M}): {e}")
+            return None
+        deals = result.get('deals', []) if isinstance(result, dict) else (result or [])
+        await asyncio.to_thread(self._upsert, user_id, deals)
+        return deals
+
+    def _lock(self, user_id: int) -> asyncio.Lock:
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = self._locks[user_id] = asyncio.Lock()
+        return lock
+
+    async def ensure_range(self, user_id: int, account_id: str, start: datetime,
+                           max_stale: float = TAIL_REFRESH_SEC) -> bool:
+        """[start, now] 구간이 저장소에 채워지도록 빈 구간만 RPC — 실패 시 False (저장분은 그대로 사용)"""
+        start = _utc(start)
+        async with self._lock(user_id):
+            now = datetime.now(timezone.utc)
+            sync = await asyncio.to_thread(self._load_sync, user_id)
+
+            if sync is None or sync[0] != account_id:
+                if sync is not None:
+                    print(f"[DealStore] User {user_id} MetaAPI 계정 변경 — 저장 딜 초기화")
+                    await asyncio.to_thread(self._reset, user_id)
+                deals = await self._fetch(user_id, account_id, start, now)
+                if deals is None:
+                    return False
+                self.stats["backfill_rpc"] += 1
+                await asyncio.to_thread(self._save_sync, user_id, account_id, start, now)
+                print(f"[DealStore] User {user_id} 초기 백필: {len(deals)}건 ({start:%Y-%m-%d}~)")
+                return True
+
+            _, covered_from, covered_to = sync
+            ok = True
+            changed = False
+
+            # ★ 앞쪽 빈 구간 (더 긴 기간 요청)
+            if start < covered_from:
+                deals = await self._fetch(user_id, account_id, start, covered_from)
+                if deals is None:
+                    ok = False
+                else:
+                    self.stats["backfill_rpc"] += 1
+                    covered_from = start
+                    changed = True
+
+            # ★ 꼬리 구간 — 스트리밍이 covered_to 이전부터 살아있으면 RPC 불필요
+            live_since = self._live.get(user_id)
+            if live_since is not None and live_since <= covered_to:
+                covered_to = now
+                changed = True
+            elif (now - covered_to).total_seconds() > max_stale:
+                deals = await self._fetch(user_id, account_id, covered_to - TAIL_OVERLAP, now)
+                if deals is None:
+                    ok = False
+                else:
+                    self.stats["tail_rpc"] += 1
+                    covered_to = now
+                    changed = True
+
+            if changed:
+                await asyncio.to_thread(self._save_sync, user_id, account_id, covered_from, covered_to)
+            return ok
+
+    async def get_deals(self, user_id: int, account_id: str, start: datetime, end: datetime = None,
+                        max_stale: float = TAIL_REFRESH_SEC) -> List[Dict]:
+        """구간 내 딜 (시간순) — 빈 구간은 먼저 RPC로 채움"""
+        await self.ensure_range(user_id, account_id, start, max_stale=max_stale)
+        end = _utc(end) or datetime.now(timezone.utc) + timedelta(minutes=1)
+        self.stats["queries"] += 1
+        return await asyncio.to_thread(self._query, user_id, _utc(start), end)
+
+    def get_status(self) -> Dict:
+        return {"live_users": len(self._live), **self.stats}
+
+
+# 워커 전역 인스턴스
+deal_store = DealStore()
@@ -8,7 +8,7 @@ from fastapi import APIRouter, Depends, HTTPException, status, WebSocket, Query,
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import Integer
+from sqlalchemy import Integer, select
 from datetime import datetime, timedelta
 import pytz as _demo_pytz
 _DEMO_KST = _demo_pytz.timezone('Asia/Seoul')
@@ -26,7 +26,7 @@ import random
 import httpx
 import time
 
-from ..database import get_db
+from ..database import get_db, release_session, async_session
 
 # ========== 외부 API 가격 캐시 ==========
 price_cache = {
@@ -89,10 +89,12 @@ async def fetch_external_prices():
 from math import ceil
 from ..models.user import User
 from ..models.demo_trade import DemoTrade, DemoPosition, DemoMartinState, DemoTransaction
-from .demo_service import reset_account, topup_account, record_trade_transaction, get_anchor_point, get_period_initial_balance, get_net_deposits, get_filtered_trades
+from .demo_service import reset_account, topup_account, lock_for_close, record_trade_transaction, close_positions_bulk, get_anchor_point, get_period_initial_balance, get_net_deposits, get_period_rollup
 from ..utils.security import decode_token
+from .principal_cache import resolve_user_async
 from ..services.indicator_service import IndicatorService
 from .mt5 import get_bridge_prices, get_bridge_candles, bridge_cache
+from .demo_matching_engine import demo_matching_engine, calc_profit as calc_demo_engine_profit
 
 # ========== 시그널 게이지 로직 (원칙 기반) ==========
 # 이전 점수 저장 (스무딩용)
@@ -317,8 +319,8 @@ async def get_current_user(
     if not payload:
         raise HTTPException(status_code=401, detail="유효하지 않은 토큰")
     
-    user_id = payload.get("sub")
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    # ★ (user_id, sid) 캐시 우선 — 적중 시 DB 조회 없음
+    user = await resolve_user_async(db, payload)
     
     if not user:
         raise HTTPException(status_code=404, detail="사용자 없음")
@@ -356,7 +358,8 @@ async def create_demo_account(
     next_num = (max_result or 10000) + 1
     new_account_number = f"D-500{next_num}"
 
-    # 유저에게 할당 + 초기 잔고 세팅
+    # 유저에게 할당 + 초기 잔고 세팅 (잔고 컬럼은 잠금 후 최신 값 기준)
+    lock_for_close(db, current_user.id)
     current_user.demo_account_number = new_account_number
     current_user.demo_balance = 10000.0
     current_user.demo_equity = 10000.0
@@ -480,6 +483,10 @@ async def get_demo_account(
             if not should_close and target > 0:
                 print(f"[MARTIN-DEBUG] No close: profit={profit:.2f}, target_range=[{-target*0.99:.2f}, {target:.2f}]")
 
+            # ★ 포지션 → User 잠금 (롤업 생성과 직렬화 + 최신 잔고) — 이미 다른 경로에서 청산됐으면 건너뜀
+            if should_close and not lock_for_close(db, current_user.id, position.id):
+                should_close = False
+
             if should_close:
                 print(f"[DEBUG-BRIDGE] AUTO CLOSING! {'WIN' if is_win else 'LOSE'} - Profit: {profit}")
 
@@ -518,6 +525,7 @@ async def get_demo_account(
                 current_user.demo_today_profit = (current_user.demo_today_profit or 0.0) + profit
                 db.delete(position)
                 db.commit()
+                demo_matching_engine.untrack(position.id)
 
                 message = f"🎯 목표 도달! +${profit:,.2f}" if is_win else f"💔 손절! ${profit:,.2f}"
 
@@ -646,6 +654,10 @@ async def get_demo_account(
                         is_win = False
                         print(f"[DEBUG] LOSE! Profit {profit} <= -Target*0.99 {-target * 0.99}")
                 
+                # ★ 포지션 → User 잠금 (롤업 생성과 직렬화 + 최신 잔고) — 이미 다른 경로에서 청산됐으면 건너뜀
+                if should_close and not lock_for_close(db, current_user.id, position.id):
+                    should_close = False
+
                 if should_close:
                     print(f"[DEBUG] AUTO CLOSING! {'WIN' if is_win else 'LOSE'} - Profit: {profit}")
                     
@@ -683,6 +695,7 @@ async def get_demo_account(
                     # 포지션 삭제
                     db.delete(position)
                     db.commit()
+                    demo_matching_engine.untrack(position.id)
                     
                     # 청산된 상태로 반환
                     if is_win:
@@ -996,6 +1009,7 @@ async def place_demo_order(
     db.add(new_position)
     db.commit()
     db.refresh(new_position)
+    demo_matching_engine.track(new_position)
 
     print(f"[DEMO ORDER] ✅ Position created! ID: {new_position.id}, User: {new_position.user_id}")
     print(f"[DEMO ORDER] 📦 Position details - Symbol: {new_position.symbol}, Type: {new_position.trade_type}, Entry: {new_position.entry_price}, Target: {new_position.target_profit}")
@@ -1251,6 +1265,7 @@ async def close_demo_position(
                         profit = (entry_price - exit_price) * position.volume
             else:
                 # bridge cache도 없으면 → Binance API fallback
+                release_session(db)  # ★ 외부 HTTP 대기 중 동기 풀 커넥션 반납 (청산 전 lock_for_close가 다시 잠금)
                 try:
                     external_prices = await fetch_external_prices()
                     if external_prices and position.symbol in external_prices:
@@ -1271,6 +1286,11 @@ async def close_demo_position(
                     profit = 0
     
     profit = round(profit, 2)
+
+    # ★ 포지션 → User 잠금 (롤업 생성과 직렬화 + 최신 잔고)
+    if not lock_for_close(db, current_user.id, position.id):
+        db.rollback()
+        return JSONResponse({"success": False, "message": "이미 청산된 포지션"})
     
     # 거래 내역 저장
     trade = DemoTrade(
@@ -1309,6 +1329,7 @@ async def close_demo_position(
     # 포지션 삭제
     db.delete(position)
     db.commit()
+    demo_matching_engine.untrack(position.id)
 
     return JSONResponse({
         "success": True,
@@ -1391,6 +1412,7 @@ async def reset_demo_balance(
 ):
     """데모 잔고 초기화 — 서비스 레이어 호출"""
     result = reset_account(db, current_user)
+    demo_matching_engine.untrack_user(current_user.id)
     return JSONResponse({
         "success": True,
         "message": "데모 계정이 초기화되었습니다. 잔고: $10,000",
@@ -1573,6 +1595,7 @@ async def place_demo_martin_order(
             print(f"[MARTIN ORDER] 📊 Using bridge cache price: {entry_price}")
 
     if entry_price <= 0:
+        release_session(db)  # ★ 외부 HTTP 대기 중 동기 풀 커넥션 반납
         try:
             external_prices = await fetch_external_prices()
             if external_prices and symbol in external_prices:
@@ -1607,6 +1630,8 @@ async def place_demo_martin_order(
 
     db.add(new_position)
     db.commit()
+    db.refresh(new_position)
+    demo_matching_engine.track(new_position)
 
     return JSONResponse({
         "success": True,
@@ -1749,6 +1774,64 @@ async def reset_demo_martin_full(
         "magic": magic
     })
 
+# ========== 일괄 청산 공통 ==========
+def _price_demo_positions(positions) -> list:
+    """
+    일괄 청산 가격 계산 — 심볼별 호가/틱 스펙 1회 조회 후 전 포지션 손익 일괄 계산
+    (기존: 포지션마다 mt5.symbol_info_tick/symbol_info 또는 calculate_demo_profit 호출)
+    Returns: [(position, exit_price, profit)] — 가격 없음 → (entry_price, 0.0)
+    """
+    mt5_connected = MT5_AVAILABLE and mt5.initialize() if MT5_AVAILABLE else False
+    from .metaapi_service import quote_price_cache
+    bridge_prices = get_bridge_prices() or {}
+
+    quotes = {}
+    for sym in {p.symbol for p in positions}:
+        if mt5_connected:
+            tick = mt5.symbol_info_tick(sym)
+            if not tick:
+                quotes[sym] = None
+                continue
+            symbol_info = mt5.symbol_info(sym)
+            if symbol_info and symbol_info.trade_tick_size > 0:
+                spec = (symbol_info.trade_tick_size, symbol_info.trade_tick_value)
+            else:
+                spec = (1.0, 1.0)  # 가격차 × 랏
+            quotes[sym] = (tick.bid, tick.ask, spec)
+        else:
+            # MetaAPI 실시간 가격 우선, 없으면 bridge (calculate_demo_profit과 동일)
+            q = (quote_price_cache or {}).get(sym) or {}
+            br = bridge_prices.get(sym) or {}
+            bid = q.get('bid', 0) if q.get('bid', 0) > 0 else br.get('bid', 0)
+            ask = q.get('ask', 0) if q.get('ask', 0) > 0 else br.get('ask', 0)
+            quotes[sym] = (bid, ask, None)
+
+    priced = []
+    for pos in positions:
+        quote = quotes.get(pos.symbol)
+        exit_price = (quote[0] if pos.trade_type == "BUY" else quote[1]) if quote else 0
+        if not exit_price or exit_price <= 0:
+            priced.append((pos, pos.entry_price, 0.0))
+            continue
+        spec = quote[2]
+        if spec is None:
+            profit = calc_demo_engine_profit(pos.symbol, pos.trade_type, pos.entry_price, pos.volume, exit_price)
+        else:
+            price_diff = exit_price - pos.entry_price if pos.trade_type == "BUY" else pos.entry_price - exit_price
+            profit = round(price_diff / spec[0] * spec[1] * pos.volume, 2)
+        priced.append((pos, exit_price, profit))
+    return priced
+
+
+def _bulk_close_demo(db: Session, user: User, priced: list) -> dict:
+    """집합 단위 청산 기록 + 커밋 + 매칭 엔진 해제"""
+    result = close_positions_bulk(db, user, priced)
+    db.commit()
+    for pid in result["closed_ids"]:
+        demo_matching_engine.untrack(pid)
+    return result
+
+
 # ========== 일괄 청산 ==========
 @router.post("/close-all")
 async def close_all_demo_positions(
@@ -1770,69 +1853,9 @@ async def close_all_demo_positions(
     if not positions:
         return JSONResponse({"success": False, "message": "열린 포지션 없음"})
 
-    total_profit = 0
-    _running_bal = current_user.demo_balance or 10000.0
-    closed_count = 0
-    mt5_connected = MT5_AVAILABLE and mt5.initialize() if MT5_AVAILABLE else False
-
-    for position in positions:
-        entry_price = position.entry_price
-        exit_price = entry_price
-        profit = 0
-
-        if mt5_connected:
-            tick = mt5.symbol_info_tick(position.symbol)
-            if tick:
-                exit_price = tick.bid if position.trade_type == "BUY" else tick.ask
-
-                symbol_info = mt5.symbol_info(position.symbol)
-                if symbol_info and symbol_info.trade_tick_size > 0:
-                    if position.trade_type == "BUY":
-                        price_diff = exit_price - entry_price
-                    else:
-                        price_diff = entry_price - exit_price
-                    ticks = price_diff / symbol_info.trade_tick_size
-                    profit = ticks * symbol_info.trade_tick_value * position.volume
-                else:
-                    if position.trade_type == "BUY":
-                        profit = (exit_price - entry_price) * position.volume
-                    else:
-                        profit = (entry_price - exit_price) * position.volume
-        else:
-            # MT5 없음 - bridge 기반 계산
-            exit_price, profit = calculate_demo_profit(
-                position.symbol, entry_price, position.trade_type, position.volume
-            )
-
-        profit = round(profit, 2)
-        total_profit += profit
-
-        # 거래 내역 저장
-        trade = DemoTrade(
-            user_id=current_user.id,
-            symbol=position.symbol,
-            trade_type=position.trade_type,
-            volume=position.volume,
-            entry_price=entry_price,
-            exit_price=exit_price,
-            profit=profit,
-            is_closed=True,
-            closed_at=datetime.now()
-        )
-        db.add(trade)
-        db.flush()
-        _bal_after = round(_running_bal + profit, 2)
-        record_trade_transaction(db, current_user.id, trade.id, position.symbol, position.trade_type, profit, _running_bal, _bal_after)
-        _running_bal = _bal_after
-        db.delete(position)
-        closed_count += 1
-
-    # 잔고 업데이트
-    current_user.demo_balance = (current_user.demo_balance or 10000.0) + total_profit
-    current_user.demo_equity = current_user.demo_balance
-    current_user.demo_today_profit = (current_user.demo_today_profit or 0.0) + total_profit
-
-    db.commit()
+    result = _bulk_close_demo(db, current_user, _price_demo_positions(positions))
+    closed_count = len(result["closed_ids"])
+    total_profit = result["total_profit"]
 
     return JSONResponse({
         "success": True,
@@ -1863,69 +1886,9 @@ async def close_demo_by_type(
     if not positions:
         return JSONResponse({"success": False, "message": f"{type} 포지션 없음"})
 
-    total_profit = 0
-    _running_bal = current_user.demo_balance or 10000.0
-    closed_count = 0
-    mt5_connected = MT5_AVAILABLE and mt5.initialize() if MT5_AVAILABLE else False
-
-    for position in positions:
-        entry_price = position.entry_price
-        exit_price = entry_price
-        profit = 0
-
-        if mt5_connected:
-            tick = mt5.symbol_info_tick(position.symbol)
-            if tick:
-                exit_price = tick.bid if position.trade_type == "BUY" else tick.ask
-
-                symbol_info = mt5.symbol_info(position.symbol)
-                if symbol_info and symbol_info.trade_tick_size > 0:
-                    if position.trade_type == "BUY":
-                        price_diff = exit_price - entry_price
-                    else:
-                        price_diff = entry_price - exit_price
-                    ticks = price_diff / symbol_info.trade_tick_size
-                    profit = ticks * symbol_info.trade_tick_value * position.volume
-                else:
-                    if position.trade_type == "BUY":
-                        profit = (exit_price - entry_price) * position.volume
-                    else:
-                        profit = (entry_price - exit_price) * position.volume
-        else:
-            # MT5 없음 - bridge 기반 계산
-            exit_price, profit = calculate_demo_profit(
-                position.symbol, entry_price, position.trade_type, position.volume
-            )
-
-        profit = round(profit, 2)
-        total_profit += profit
-
-        # 거래 내역 저장
-        trade = DemoTrade(
-            user_id=current_user.id,
-            symbol=position.symbol,
-            trade_type=position.trade_type,
-            volume=position.volume,
-            entry_price=entry_price,
-            exit_price=exit_price,
-            profit=profit,
-            is_closed=True,
-            closed_at=datetime.now()
-        )
-        db.add(trade)
-        db.flush()
-        _bal_after = round(_running_bal + profit, 2)
-        record_trade_transaction(db, current_user.id, trade.id, position.symbol, position.trade_type, profit, _running_bal, _bal_after)
-        _running_bal = _bal_after
-        db.delete(position)
-        closed_count += 1
-
-    # 잔고 업데이트
-    current_user.demo_balance = (current_user.demo_balance or 10000.0) + total_profit
-    current_user.demo_equity = current_user.demo_balance
-    current_user.demo_today_profit = (current_user.demo_today_profit or 0.0) + total_profit
-
-    db.commit()
+    result = _bulk_close_demo(db, current_user, _price_demo_positions(positions))
+    closed_count = len(result["closed_ids"])
+    total_profit = result["total_profit"]
 
     return JSONResponse({
         "success": True,
@@ -1955,78 +1918,21 @@ async def close_demo_by_profit(
     if not positions:
         return JSONResponse({"success": False, "message": "열린 포지션 없음"})
 
-    mt5_connected = MT5_AVAILABLE and mt5.initialize() if MT5_AVAILABLE else False
-
-    total_profit = 0
-    _running_bal = current_user.demo_balance or 10000.0
+    # 조건 체크: positive면 수익만, negative면 손실만
+    priced = [
+        (pos, exit_price, profit) for pos, exit_price, profit in _price_demo_positions(positions)
+        if (profit > 0 if profit_type == "positive" else profit < 0)
+    ]
     closed_count = 0
-
-    for position in positions:
-        entry_price = position.entry_price
-        exit_price = entry_price
-        profit = 0
-
-        if mt5_connected:
-            tick = mt5.symbol_info_tick(position.symbol)
-            if tick:
-                exit_price = tick.bid if position.trade_type == "BUY" else tick.ask
-
-                # 손익 계산
-                symbol_info = mt5.symbol_info(position.symbol)
-                if symbol_info and symbol_info.trade_tick_size > 0:
-                    if position.trade_type == "BUY":
-                        price_diff = exit_price - entry_price
-                    else:
-                        price_diff = entry_price - exit_price
-                    ticks = price_diff / symbol_info.trade_tick_size
-                    profit = ticks * symbol_info.trade_tick_value * position.volume
-                else:
-                    if position.trade_type == "BUY":
-                        profit = (exit_price - entry_price) * position.volume
-                    else:
-                        profit = (entry_price - exit_price) * position.volume
-
-        profit = round(profit, 2)
-
-        # 조건 체크: positive면 수익만, negative면 손실만
-        if profit_type == "positive" and profit <= 0:
-            continue
-        if profit_type == "negative" and profit >= 0:
-            continue
-
-        total_profit += profit
-
-        # 거래 내역 저장
-        trade = DemoTrade(
-            user_id=current_user.id,
-            symbol=position.symbol,
-            trade_type=position.trade_type,
-            volume=position.volume,
-            entry_price=entry_price,
-            exit_price=exit_price,
-            profit=profit,
-            is_closed=True,
-            closed_at=datetime.now()
-        )
-        db.add(trade)
-        db.flush()
-        _bal_after = round(_running_bal + profit, 2)
-        record_trade_transaction(db, current_user.id, trade.id, position.symbol, position.trade_type, profit, _running_bal, _bal_after)
-        _running_bal = _bal_after
-        db.delete(position)
-        closed_count += 1
+    if priced:
+        result = _bulk_close_demo(db, current_user, priced)
+        closed_count = len(result["closed_ids"])
+        total_profit = result["total_profit"]
 
     if closed_count == 0:
         msg = "수익 포지션 없음" if profit_type == "positive" else "손실 포지션 없음"
         return JSONResponse({"success": False, "message": msg})
-    
-    # 잔고 업데이트
-    current_user.demo_balance = (current_user.demo_balance or 10000.0) + total_profit
-    current_user.demo_equity = current_user.demo_balance
-    current_user.demo_today_profit = (current_user.demo_today_profit or 0.0) + total_profit
-    
-    db.commit()
-    
+
     type_name = "수익" if profit_type == "positive" else "손실"
     return JSONResponse({
         "success": True,
@@ -2069,24 +1975,44 @@ async def demo_websocket_endpoint(websocket: WebSocket):
     _ws_loop_count = 0
     _last_history_time = 0
 
-    while True:
+    # ★ 유저 잔고 캐시 (demo_matching_engine 변경 카운터 기준 재조회)
+    user = None
+    _user_version = -1
+    _user_refresh_time = 0.0
+
+    # ★★★ 마켓 스냅샷 허브 구독 (시세/캔들/인디케이터는 워커당 1회 생성·인코딩) ★★★
+    from .market_hub import market_hub, compose_frame, frame_built, frame_sent
+    _hub_sub = market_hub.subscribe()
+    _sent_seq = 0  # ★ 틱→전송 지연은 스냅샷당 1회만 기록
+
+    # ★★★ Phase 2: 클라이언트 메시지 수신 전용 태스크 (심볼 변경) ★★★
+    # 기존: 프레임마다 receive_text 0.05초 대기 + 0.2초 sleep → 소켓당 최대 ~4프레임/s, 틱→전송 최대 250ms 추가
+    # 변경: 전송 루프는 next_snapshot만 대기, 수신 종료(연결 끊김)는 다음 반복에서 감지
+    async def _receive_client():
+        global indicator_symbol
         try:
-            # ★★★ Phase 2: 클라이언트 메시지 수신 (심볼 변경) ★★★
-            global indicator_symbol
-            try:
-                # Non-blocking receive with short timeout
-                msg = await asyncio.wait_for(websocket.receive_text(), timeout=0.05)
-                data = json.loads(msg)
+            while True:
+                msg = await websocket.receive_text()
+                try:
+                    data = json.loads(msg)
+                except ValueError:
+                    continue  # Ignore parse errors
                 if data.get("type") == "symbol_change":
-                    new_symbol = data.get("symbol", "BTCUSD")
-                    indicator_symbol = new_symbol
+                    indicator_symbol = data.get("symbol", "BTCUSD")
                     print(f"[DEMO WS] 🔄 Symbol changed to: {indicator_symbol}")
-            except asyncio.TimeoutError:
-                pass  # No message, continue
-            except Exception:
-                pass  # Ignore parse errors
+        except Exception:
+            pass  # 수신 실패 = 연결 죽음 → 전송 루프 종료
+
+    _receiver = asyncio.create_task(_receive_client())
+
+    while True:
+        try:
+            if _receiver.done():
+                break
 
             realtime = None  # ★ 추가
+            snapshot = None  # ★ 허브 스냅샷 (MetaAPI 경로)
+            _frame_started = time.perf_counter()
             # MT5 사용 가능 여부 체크
             mt5_connected = False
             if MT5_AVAILABLE and mt5 is not None:
@@ -2115,8 +2041,14 @@ async def demo_websocket_endpoint(websocket: WebSocket):
                     neutral_count = indicators["neutral"]
                     base_score = indicators["score"]
             else:
-                from .metaapi_service import get_realtime_data
-                realtime = get_realtime_data()
+                # ★ 새 스냅샷 대기 (틱 도착 시 즉시, 없으면 1초 하트비트)
+                snapshot = await market_hub.next_snapshot(_hub_sub, timeout=1.0)
+                _frame_started = time.perf_counter()
+                if snapshot is None:
+                    from .metaapi_service import get_realtime_data
+                    realtime = get_realtime_data()
+                else:
+                    realtime = {"prices": snapshot.prices, "candles": snapshot.candles, "indicators": snapshot.indicators}
                 realtime_indicators = realtime.get("indicators", {})
                 buy_count = realtime_indicators.get("buy", 50)
                 sell_count = realtime_indicators.get("sell", 30)
@@ -2126,6 +2058,7 @@ async def demo_websocket_endpoint(websocket: WebSocket):
             # 모든 심볼 가격 정보
             all_prices = {}
             all_candles = {}
+            _prices_from_stream = False  # MetaAPI 스트리밍 가격이면 엔진이 이미 틱 매칭함
 
             if mt5_connected:
                 for symbol in symbols_list:
@@ -2154,6 +2087,7 @@ async def demo_websocket_endpoint(websocket: WebSocket):
                     realtime = get_realtime_data()
                 all_prices = realtime.get("prices", {})
                 all_candles = realtime.get("candles", {})
+                _prices_from_stream = bool(all_prices)
 
                 # MetaAPI도 비어있으면 브릿지 캐시 fallback
                 if not all_prices:
@@ -2192,244 +2126,91 @@ async def demo_websocket_endpoint(websocket: WebSocket):
             total_margin = 0.0
             total_profit = 0.0
 
-            # ★★★ 자동청산 정보 - 유저별로 일정 시간 유지 ★★★
-            # _auto_closed_cache[user_id] = {"info": {...}, "until": timestamp}
-            if not hasattr(demo_websocket_endpoint, '_auto_closed_cache'):
-                demo_websocket_endpoint._auto_closed_cache = {}
-
-            auto_closed_info = None
-            current_time = time.time()
-
-            # 이전에 저장된 자동청산 정보가 있고 아직 유효하면 사용
-            if user_id and user_id in demo_websocket_endpoint._auto_closed_cache:
-                cached = demo_websocket_endpoint._auto_closed_cache[user_id]
-                if current_time < cached.get("until", 0):
-                    auto_closed_info = cached.get("info")
-                else:
-                    # 만료됨 - 삭제
-                    del demo_websocket_endpoint._auto_closed_cache[user_id]
+            # ★★★ 자동청산은 demo_matching_engine이 틱 단위로 처리 — 여기서는 결과만 읽음 ★★★
+            auto_closed_info = demo_matching_engine.get_auto_closed(user_id) if user_id else None
+            if not _prices_from_stream and all_prices:
+                # 스트리밍 틱이 없을 때(브릿지/Binance fallback)는 WS 가격으로 매칭
+                demo_matching_engine.on_prices(all_prices)
 
             if user_id:
                 try:
-                    # DB 세션 생성
-                    from ..database import SessionLocal
-                    db = SessionLocal()
-
-                    try:
-                        # 사용자 정보 조회
-                        user = db.query(User).filter(User.id == user_id).first()
-                        if user:
-                            demo_balance = user.demo_balance or 10000.0
-                            demo_equity = user.demo_equity or 10000.0
-                            demo_today_profit = user.demo_today_profit or 0.0  # ★ Today P/L
-
-                            # 열린 포지션들 조회 (다중 포지션)
-                            positions = db.query(DemoPosition).filter(
-                                DemoPosition.user_id == user_id
-                            ).all()
-
-                            positions_count = len(positions)
-
-                            # 포지션들의 실시간 profit 계산 + 자동청산 체크
-                            total_profit = 0.0
-                            total_margin = 0.0  # 총 사용 마진
-                            auto_closed_info = None  # 자동청산 정보
-
-                            for pos in positions:
-                                current_price = all_prices.get(pos.symbol)
-                                entry = pos.entry_price
-                                volume = pos.volume
-                                profit = 0.0
-                                current_px = entry  # 기본값
-
-                                if current_price:
-                                    current_px = current_price['bid'] if pos.trade_type == "BUY" else current_price['ask']
-
-                                    # MT5 연결 시 정확한 손익 계산
-                                    if mt5_connected:
-                                        symbol_info = mt5.symbol_info(pos.symbol)
-                                        if symbol_info and symbol_info.trade_tick_size > 0:
-                                            if pos.trade_type == "BUY":
-                                                price_diff = current_price['bid'] - entry
-                                            else:
-                                                price_diff = entry - current_price['ask']
-                                            ticks = price_diff / symbol_info.trade_tick_size
-                                            profit = ticks * symbol_info.trade_tick_value * volume
-                                        else:
-                                            if pos.trade_type == "BUY":
-                                                profit = (current_price['bid'] - entry) * volume
-                                            else:
-                                                profit = (entry - current_price['ask']) * volume
+                    # ★ 잔고는 엔진 변경 카운터가 바뀌었거나 2초 경과 시에만 DB 재조회
+                    _ver = demo_matching_engine.user_version(user_id)
+                    if user is None or _ver != _user_version or time.time() - _user_refresh_time >= 2:
+                        # 비동기 세션 — 느린 쿼리가 같은 워커의 다른 소켓을 멈추지 않도록
+                        async with async_session() as _adb:
+                            user = (await _adb.execute(select(User).where(User.id == user_id))).scalar_one_or_none()
+                        _user_version = _ver
+                        _user_refresh_time = time.time()
+
+                    if user:
+                        demo_balance = user.demo_balance or 10000.0
+                        demo_equity = user.demo_equity or 10000.0
+                        demo_today_profit = user.demo_today_profit or 0.0  # ★ Today P/L
+
+                        # 열린 포지션들 (엔진 보관 스냅샷 — DB 조회 없음)
+                        positions = demo_matching_engine.positions_for_user(user_id)
+                        positions_count = len(positions)
+
+                        # 포지션들의 실시간 profit 계산
+                        total_profit = 0.0
+                        total_margin = 0.0  # 총 사용 마진
+
+                        for pos in positions:
+                            current_price = all_prices.get(pos["symbol"])
+                            entry = pos["entry_price"]
+                            volume = pos["volume"]
+                            profit = 0.0
+                            current_px = entry  # 기본값
+
+                            if current_price:
+                                current_px = current_price['bid'] if pos["trade_type"] == "BUY" else current_price['ask']
+
+                                # MT5 연결 시 정확한 손익 계산
+                                symbol_info = mt5.symbol_info(pos["symbol"]) if mt5_connected else None
+                                if symbol_info and symbol_info.trade_tick_size > 0:
+                                    if pos["trade_type"] == "BUY":
+                                        price_diff = current_price['bid'] - entry
                                     else:
-                                        # MT5 없음 - bridge symbol_info 기반 계산
-                                        sym_info = bridge_cache.get("symbol_info", {}).get(pos.symbol)
-                                        if sym_info and sym_info.get('tick_size', 0) > 0 and sym_info.get('tick_value', 0) > 0:
-                                            ts = sym_info['tick_size']
-                                            tv = sym_info['tick_value']
-                                            if pos.trade_type == "BUY":
-                                                pd = current_price['bid'] - entry
-                                            else:
-                                                pd = entry - current_price['ask']
-                                            profit = (pd / ts) * tv * volume
-                                        else:
-                                            specs = DEFAULT_SYMBOL_SPECS.get(pos.symbol, {"tick_size": 0.01, "tick_value": 0.01})
-                                            ts = specs['tick_size']
-                                            tv = specs['tick_value']
-                                            if pos.trade_type == "BUY":
-                                                pd = current_price['bid'] - entry
-                                            else:
-                                                pd = entry - current_price['ask']
-                                            profit = (pd / ts) * tv * volume
-
-                                profit = round(profit, 2)
-                                target = pos.target_profit or 0
-
-                                # ★★★ 자동청산 체크 (WS에서 실시간 처리) ★★★
-                                should_close = False
-                                is_win = False
-
-                                if target > 0 and auto_closed_info is None:  # 아직 청산 안 됐을 때만
-                                    # ★ B안: 가격 기반 청산 (tp_price/sl_price 우선)
-                                    if pos.magic == 100003:  # Quick&Easy 디버그
-                                        print(f"[QE-DEBUG] {pos.trade_type} current={current_px:.2f} TP={pos.tp_price:.2f} SL={pos.sl_price:.2f}")
-                                    if pos.tp_price and pos.sl_price and current_px > 0:
-                                        if pos.trade_type == "BUY":
-                                            if current_px >= pos.tp_price:
-                                                should_close = True
-                                                is_win = True
-                                                print(f"[DEMO WS] 🎯 BUY TP 도달! current={current_px} >= tp={pos.tp_price}")
-                                            elif current_px <= pos.sl_price:
-                                                should_close = True
-                                                is_win = False
-                                                print(f"[DEMO WS] 💔 BUY SL 도달! current={current_px} <= sl={pos.sl_price}")
-                                        else:  # SELL
-                                            if current_px <= pos.tp_price:
-                                                should_close = True
-                                                is_win = True
-                                                print(f"[DEMO WS] 🎯 SELL TP 도달! current={current_px} <= tp={pos.tp_price}")
-                                            elif current_px >= pos.sl_price:
-                                                should_close = True
-                                                is_win = False
-                                                print(f"[DEMO WS] 💔 SELL SL 도달! current={current_px} >= sl={pos.sl_price}")
-                                    else:
-                                        # fallback: profit 기반 (tp_price 없는 기존 포지션)
-                                        if profit >= target:  # WIN
-                                            should_close = True
-                                            is_win = True
-                                            print(f"[DEMO WS] 🎯 Fallback WIN! Profit ${profit:.2f} >= Target ${target:.2f}")
-                                        elif profit <= -target * 0.99:  # LOSE (99% 도달 시)
-                                            should_close = True
-                                            is_win = False
-                                            print(f"[DEMO WS] 💔 Fallback LOSE! Profit ${profit:.2f} <= -Target*0.99 ${-target * 0.99:.2f}")
-
-                                if should_close:
-                                    # 자동청산 실행
-                                    try:
-                                        # ★★★ 마틴 상태 업데이트 (DemoMartinState) ★★★
-                                        martin_state = get_or_create_martin_state(db, user.id, pos.magic)
-                                        martin_step = martin_state.step
-                                        martin_accumulated_loss = martin_state.accumulated_loss
-                                        martin_reset = False
-                                        martin_step_up = False
-
-                                        if martin_state.enabled:
-                                            # ★★★ DB 변경 안 함! 프론트 팝업에서 유저 선택 후 API로 처리 ★★★
-                                            print(f"[DEMO WS] 마틴 상태 읽기만: step={martin_state.step}, acc_loss={martin_state.accumulated_loss}")
-
-                                        # 거래 내역 저장
-                                        trade = DemoTrade(
-                                            user_id=user_id,
-                                            symbol=pos.symbol,
-                                            trade_type=pos.trade_type,
-                                            volume=volume,
-                                            entry_price=entry,
-                                            exit_price=current_px,
-                                            profit=profit,
-                                            is_closed=True,
-                                            closed_at=datetime.now()
-                                        )
-                                        db.add(trade)
-                                        db.flush()
-                                        _bal_bf = user.demo_balance or 10000.0
-                                        record_trade_transaction(db, user_id, trade.id, pos.symbol, pos.trade_type, profit, _bal_bf, round(_bal_bf + profit, 2))
-
-                                        # 잔고 업데이트
-                                        user.demo_balance = (user.demo_balance or 10000.0) + profit
-                                        user.demo_equity = user.demo_balance
-                                        user.demo_today_profit = (user.demo_today_profit or 0.0) + profit
-
-                                        # 포지션 삭제
-                                        db.delete(pos)
-                                        db.commit()
-
-                                        # 자동청산 정보 저장 (응답에 포함)
-                                        auto_closed_info = {
-                                            "auto_closed": True,
-                                            "closed_profit": profit,
-                                            "is_win": is_win,
-                                            "magic": pos.magic,  # ★ Quick&Easy 패널 연동용
-                                            "message": f"🎯 목표 도달! +${profit:,.2f}" if is_win else f"💔 손절! ${profit:,.2f}",
-                                            "closed_at": current_time,  # ★ 청산 시간 추가
-                                            "martin_step": martin_step,
-                                            "martin_accumulated_loss": martin_accumulated_loss,
-                                            "martin_reset": martin_reset,
-                                            "martin_step_up": martin_step_up
-                                        }
-
-                                        # ★★★ 3초 동안 자동청산 정보 유지 (프론트엔드가 놓치지 않도록) ★★★
-                                        demo_websocket_endpoint._auto_closed_cache[user_id] = {
-                                            "info": auto_closed_info,
-                                            "until": current_time + 3  # 3초 동안 유지 (0.2초 간격 = 약 15회)
-                                        }
-
-                                        # 잔고 업데이트
-                                        demo_balance = user.demo_balance
-                                        positions_count -= 1
-
-                                        print(f"[DEMO WS] ✅ Auto-closed position: {'WIN' if is_win else 'LOSE'} ${profit:.2f}")
-                                        continue  # 다음 포지션으로
-
-                                    except Exception as close_err:
-                                        print(f"[DEMO WS] ❌ Auto-close error: {close_err}")
-                                        db.rollback()
-
-                                total_profit += profit
-
-                                # 마진 계산
-                                pos_margin = calculate_demo_margin(pos.symbol, volume, current_px)
-                                total_margin += pos_margin
-
-                                # 포지션 데이터 추가
-                                pos_data = {
-                                    "id": pos.id,
-                                    "ticket": pos.id,
-                                    "type": pos.trade_type,
-                                    "symbol": pos.symbol,
-                                    "volume": pos.volume,
-                                    "entry": entry,
-                                    "current": current_px,
-                                    "profit": profit,
-                                    "target": target,
-                                    "margin": pos_margin,
-                                    "magic": pos.magic,  # ★ 패널 구분용
-                                    "tp_price": pos.tp_price,
-                                    "sl_price": pos.sl_price,
-                                    "opened_at": str(pos.created_at) if pos.created_at else "",
-            "tp_price": pos.tp_price,
-            "sl_price": pos.sl_price
-                                }
-                                positions_data.append(pos_data)
-
-                                # ★★★ magic 일치 포지션만 패널에 표시 ★★★
-                                if demo_position is None and pos.magic == magic:
-                                    demo_position = pos_data
+                                        price_diff = entry - current_price['ask']
+                                    ticks = price_diff / symbol_info.trade_tick_size
+                                    profit = ticks * symbol_info.trade_tick_value * volume
+                                else:
+                                    # bridge symbol_info → DEFAULT_SYMBOL_SPECS 기반 계산
+                                    profit = calc_demo_engine_profit(pos["symbol"], pos["trade_type"], entry, volume, current_px)
+
+                            profit = round(profit, 2)
+                            total_profit += profit
+
+                            # 마진 계산
+                            pos_margin = calculate_demo_margin(pos["symbol"], volume, current_px)
+                            total_margin += pos_margin
+
+                            # 포지션 데이터 추가
+                            pos_data = {
+                                "id": pos["id"],
+                                "ticket": pos["id"],
+                                "type": pos["trade_type"],
+                                "symbol": pos["symbol"],
+                                "volume": volume,
+                                "entry": entry,
+                                "current": current_px,
+                                "profit": profit,
+                                "target": pos["target_profit"],
+                                "margin": pos_margin,
+                                "magic": pos["magic"],  # ★ 패널 구분용
+                                "tp_price": pos["tp_price"],
+                                "sl_price": pos["sl_price"],
+                                "opened_at": pos["created_at"]
+                            }
+                            positions_data.append(pos_data)
 
-                            # Equity 업데이트
-                            demo_equity = demo_balance + total_profit
+                            # ★★★ magic 일치 포지션만 패널에 표시 ★★★
+                            if demo_position is None and pos["magic"] == magic:
+                                demo_position = pos_data
 
-                            print(f"[DEMO WS] 💼 User {user_id}: Balance=${demo_balance:.2f}, Positions={positions_count}, TotalProfit=${total_profit:.2f}")
-                    finally:
-                        db.close()
+                        # Equity 업데이트
+                        demo_equity = demo_balance + total_profit
 
                 except Exception as e:
                     print(f"[DEMO WS] ❌ DB fetch error: {e}")
@@ -2462,13 +2243,13 @@ async def demo_websocket_endpoint(websocket: WebSocket):
             _should_send_history = (_ws_loop_count == 1) or (time.time() - _last_history_time >= 30)
             if _should_send_history and user_id:
                 try:
-                    from ..database import SessionLocal
-                    hist_db = SessionLocal()
-                    try:
-                        trades = hist_db.query(DemoTrade).filter(
-                            DemoTrade.user_id == user_id,
-                            DemoTrade.is_closed == True
-                        ).order_by(DemoTrade.closed_at.desc()).limit(50).all()
+                    async with async_session() as hist_db:
+                        trades = (await hist_db.execute(
+                            select(DemoTrade).where(
+                                DemoTrade.user_id == user_id,
+                                DemoTrade.is_closed == True
+                            ).order_by(DemoTrade.closed_at.desc()).limit(50)
+                        )).scalars().all()
 
                         ws_history = []
                         for t in trades:
@@ -2486,8 +2267,6 @@ async def demo_websocket_endpoint(websocket: WebSocket):
                         _last_history_time = time.time()
                         if _ws_loop_count == 1:
                             print(f"[DEMO WS] 📜 첫 연결 히스토리 전송: {len(ws_history)}건")
-                    finally:
-                        hist_db.close()
                 except Exception as hist_err:
                     print(f"[DEMO WS] ⚠️ 히스토리 조회 오류: {hist_err}")
 
@@ -2495,8 +2274,18 @@ async def demo_websocket_endpoint(websocket: WebSocket):
             if auto_closed_info:
                 data.update(auto_closed_info)
 
-            await websocket.send_text(json.dumps(data))
-            await asyncio.sleep(0.2)  # ★ 0.2초 간격으로 실시간 업데이트 (손익 게이지 즉시 반영)
+            if snapshot is not None and all_prices is snapshot.prices and all_candles is snapshot.candles:
+                # ★ 허브 스냅샷 그대로 → 유저 데이터만 직렬화 + 사전 인코딩된 마켓 조각 결합
+                for _k in ("buy_count", "sell_count", "neutral_count", "base_score", "all_prices", "all_candles"):
+                    data.pop(_k, None)
+                frame = compose_frame(data, snapshot)
+            else:
+                frame = json.dumps(data)
+            _send_started = frame_built("demo", _frame_started)
+            await websocket.send_text(frame)
+            _sent_seq = frame_sent("demo", snapshot, _sent_seq, _frame_started, _send_started)
+            if mt5_connected:
+                await asyncio.sleep(0.2)  # ★ MT5 직접 조회 경로만 0.2초 간격 (허브 경로는 next_snapshot이 틱 단위로 대기)
 
         except Exception as e:
             error_type = type(e).__name__
@@ -2506,13 +2295,19 @@ async def demo_websocket_endpoint(websocket: WebSocket):
             traceback.print_exc()
             break
 
+    _receiver.cancel()
+    market_hub.unsubscribe(_hub_sub)
+
     # ★ 모니터링: 데모 WS 해제 카운트
     try:
         from app.monitor_counters import ws_disconnect
         ws_disconnect("demo")
     except Exception:
         pass
-    await websocket.close()
+    try:
+        await websocket.close()
+    except Exception:
+        pass  # 클라이언트가 이미 끊음
 @router.get("/deposit-history")
 async def get_deposit_history(
     current_user: User = Depends(get_current_user),
@@ -2574,23 +2369,15 @@ async def get_demo_trading_report_summary(
     # ★ 앵커 포인트 조회 (마지막 리셋 시점)
     anchor_time, anchor_balance = get_anchor_point(current_user)
 
-    # ★ 서비스 함수로 거래 조회 (앵커 이후 + 기간 내)
-    trades = get_filtered_trades(db, user_id, start_time, end_time, anchor_time)
+    # ★ 일별 롤업으로 기간 집계 (앵커 이후 + 기간 내)
+    rollup = get_period_rollup(db, user_id, start_time, end_time, anchor_time)
 
-    trade_profit = 0.0
-    deal_count = len(trades)
-    daily_pl = {}
-
-    for t in trades:
-        profit = t.profit or 0
-        trade_profit += profit
-
-        if t.closed_at:
-            day_key = t.closed_at.strftime("%Y-%m-%d")
-            if day_key not in daily_pl:
-                daily_pl[day_key] = {"profit": 0, "swap": 0, "commission": 0, "total": 0}
-            daily_pl[day_key]["profit"] += profit
-            daily_pl[day_key]["total"] += profit
+    trade_profit = rollup["trade_pl"]
+    deal_count = rollup["trade_count"]
+    daily_pl = {
+        day_key: {"profit": pl, "swap": 0, "commission": 0, "total": pl}
+        for day_key, pl in rollup["days"].items()
+    }
 
     # ★ 합산
     trade_profit = round(trade_profit, 2)
@@ -2686,35 +2473,14 @@ async def get_demo_trading_report_analysis(
         start_time = now - timedelta(days=365)
         end_time = now
 
-    # ★ 앵커 기반 거래 조회 (리셋 이후 데이터만)
+    # ★ 앵커 기반 일별 롤업 집계 (리셋 이후 데이터만)
     anchor_time, anchor_balance = get_anchor_point(current_user)
-    trades = get_filtered_trades(db, user_id, start_time, end_time, anchor_time)
+    rollup = get_period_rollup(db, user_id, start_time, end_time, anchor_time)
 
     print(f"[ANALYSIS] User {user_id}: period={period}, anchor={anchor_time}, "
-          f"start={start_time}, end={end_time}, trades={len(trades)}")
+          f"start={start_time}, end={end_time}, trades={rollup['trade_count']}")
 
-    # ★ 딜 데이터 가공
-    closed_deals = []
-    for t in trades:
-        profit = round(t.profit or 0, 2)
-        hour = -1
-        time_str = ""
-        if t.closed_at:
-            kst_time = t.closed_at + timedelta(hours=9)  # UTC → KST
-            hour = kst_time.hour
-            time_str = kst_time.strftime("%m/%d")
-
-        closed_deals.append({
-            "symbol": t.symbol,
-            "type": t.trade_type,
-            "volume": t.volume or 0.01,
-            "profit": profit,
-            "raw_profit": profit,
-            "hour": hour,
-            "time_str": time_str
-        })
-
-    total_count = len(closed_deals)
+    total_count = rollup["trade_count"]
     if total_count == 0:
         return {
             "total_count": 0, "period": period,
@@ -2725,13 +2491,13 @@ async def get_demo_trading_report_analysis(
     # ═══════════════════════════════════════
     # 카드 1: 승률 분석
     # ═══════════════════════════════════════
-    wins = [d for d in closed_deals if d["profit"] > 0]
-    losses = [d for d in closed_deals if d["profit"] <= 0]
-    win_count = len(wins)
-    lose_count = len(losses)
+    win_count = rollup["win_count"]
+    lose_count = rollup["loss_count"]
     win_rate = round(win_count / total_count * 100, 1) if total_count > 0 else 0
-    avg_win = round(sum(d["profit"] for d in wins) / win_count, 2) if win_count > 0 else 0
-    avg_loss = round(sum(d["profit"] for d in losses) / lose_count, 2) if lose_count > 0 else 0
+    avg_win = round(rollup["gross_win"] / win_count, 2) if win_count > 0 else 0
+    # 손실 = 0 이하 (본전 포함) → 손익 합 = 승리 합 + 손실 합
+    loss_sum = sum(v[2] for v in rollup["sides"].values()) - rollup["gross_win"]
+    avg_loss = round(loss_sum / lose_count, 2) if lose_count > 0 else 0
     rr_ratio = round(abs(avg_win / avg_loss), 2) if avg_loss != 0 else 0
 
     winrate_data = {
@@ -2742,49 +2508,36 @@ async def get_demo_trading_report_analysis(
     # ═══════════════════════════════════════
     # 카드 2: 종목별 분석
     # ═══════════════════════════════════════
-    symbol_map = {}
-    for d in closed_deals:
-        s = d["symbol"]
-        if s not in symbol_map:
-            symbol_map[s] = {"count": 0, "wins": 0, "total_pl": 0, "volume": 0}
-        symbol_map[s]["count"] += 1
-        if d["profit"] > 0:
-            symbol_map[s]["wins"] += 1
-        symbol_map[s]["total_pl"] += d["profit"]
-        symbol_map[s]["volume"] += d["volume"]
-
     symbols_data = []
-    for s, v in sorted(symbol_map.items(), key=lambda x: abs(x[1]["total_pl"]), reverse=True):
+    for s, (count, wins, total_pl, volume) in sorted(rollup["symbols"].items(), key=lambda x: abs(x[1][2]), reverse=True):
         symbols_data.append({
             "symbol": s,
-            "count": v["count"],
-            "win_rate": round(v["wins"] / v["count"] * 100, 1) if v["count"] > 0 else 0,
-            "total_pl": round(v["total_pl"], 2),
-            "volume": round(v["volume"], 2)
+            "count": count,
+            "win_rate": round(wins / count * 100, 1) if count > 0 else 0,
+            "total_pl": round(total_pl, 2),
+            "volume": round(volume, 2)
         })
 
     # ═══════════════════════════════════════
     # 카드 3: Buy/Sell 분석
     # ═══════════════════════════════════════
-    buys = [d for d in closed_deals if d["type"] == "BUY"]
-    sells = [d for d in closed_deals if d["type"] == "SELL"]
-    buy_wins = len([d for d in buys if d["profit"] > 0])
-    sell_wins = len([d for d in sells if d["profit"] > 0])
-    buy_pl = round(sum(d["profit"] for d in buys), 2)
-    sell_pl = round(sum(d["profit"] for d in sells), 2)
+    buy_count, buy_wins, buy_pl = rollup["sides"].get("BUY", [0, 0, 0])
+    sell_count, sell_wins, sell_pl = rollup["sides"].get("SELL", [0, 0, 0])
+    buy_pl = round(buy_pl, 2)
+    sell_pl = round(sell_pl, 2)
 
     buysell_data = {
         "buy": {
-            "count": len(buys),
-            "win_rate": round(buy_wins / len(buys) * 100, 1) if buys else 0,
+            "count": buy_count,
+            "win_rate": round(buy_wins / buy_count * 100, 1) if buy_count else 0,
             "total_pl": buy_pl,
-            "avg_pl": round(buy_pl / len(buys), 2) if buys else 0
+            "avg_pl": round(buy_pl / buy_count, 2) if buy_count else 0
         },
         "sell": {
-            "count": len(sells),
-            "win_rate": round(sell_wins / len(sells) * 100, 1) if sells else 0,
+            "count": sell_count,
+            "win_rate": round(sell_wins / sell_count * 100, 1) if sell_count else 0,
             "total_pl": sell_pl,
-            "avg_pl": round(sell_pl / len(sells), 2) if sells else 0
+            "avg_pl": round(sell_pl / sell_count, 2) if sell_count else 0
         }
     }
 
@@ -2793,11 +2546,8 @@ async def get_demo_trading_report_analysis(
     # ═══════════════════════════════════════
     hourly_map = {}
     for h in range(24):
-        hourly_map[h] = {"count": 0, "total_pl": 0}
-    for d in closed_deals:
-        if 0 <= d["hour"] <= 23:
-            hourly_map[d["hour"]]["count"] += 1
-            hourly_map[d["hour"]]["total_pl"] += d["profit"]
+        count, total_pl = rollup["hours"].get(str(h), [0, 0])
+        hourly_map[h] = {"count": count, "total_pl": total_pl}
 
     best_hour = max(hourly_map.items(), key=lambda x: x[1]["total_pl"])
     worst_hour = min(hourly_map.items(), key=lambda x: x[1]["total_pl"])
@@ -2813,49 +2563,31 @@ async def get_demo_trading_report_analysis(
     # ═══════════════════════════════════════
     # 카드 5: 거래량 분석
     # ═══════════════════════════════════════
-    volumes = [d["volume"] for d in closed_deals]
-    total_vol = round(sum(volumes), 2)
+    total_vol = round(rollup["volume"], 2)
     avg_vol = round(total_vol / total_count, 2) if total_count > 0 else 0
-    max_vol_deal = max(closed_deals, key=lambda d: d["volume"])
-    min_vol_deal = min(closed_deals, key=lambda d: d["volume"])
+    max_vol, max_vol_symbol, max_vol_type, max_vol_time = rollup["max_vol"]
+    min_vol = rollup["min_vol"][0]
 
     volume_data = {
         "total": total_vol,
         "avg": avg_vol,
-        "max": round(max_vol_deal["volume"], 2),
-        "max_detail": f"{max_vol_deal['symbol']} {max_vol_deal['type']} · {max_vol_deal['time_str']}",
-        "min": round(min_vol_deal["volume"], 2)
+        "max": round(max_vol, 2),
+        "max_detail": f"{max_vol_symbol} {max_vol_type} · {max_vol_time}",
+        "min": round(min_vol, 2)
     }
 
     # ═══════════════════════════════════════
     # 카드 6: 리스크 지표
     # ═══════════════════════════════════════
-    max_win_streak = 0; max_loss_streak = 0
-    cur_win = 0; cur_loss = 0
-    win_streak_pl = 0; loss_streak_pl = 0
-    best_streak_pl = 0; worst_streak_pl = 0
-
-    for d in closed_deals:
-        if d["profit"] > 0:
-            cur_win += 1
-            win_streak_pl += d["profit"]
-            if cur_win > max_win_streak:
-                max_win_streak = cur_win
-                best_streak_pl = win_streak_pl
-            cur_loss = 0; loss_streak_pl = 0
-        else:
-            cur_loss += 1
-            loss_streak_pl += d["profit"]
-            if cur_loss > max_loss_streak:
-                max_loss_streak = cur_loss
-                worst_streak_pl = loss_streak_pl
-            cur_win = 0; win_streak_pl = 0
-
-    best_deal = max(closed_deals, key=lambda d: d["profit"])
-    worst_deal = min(closed_deals, key=lambda d: d["profit"])
-
-    gross_profit = sum(d["profit"] for d in closed_deals if d["profit"] > 0)
-    gross_loss = abs(sum(d["profit"] for d in closed_deals if d["profit"] < 0))
+    # 연속 승/패: 롤업의 최장 구간 — 같은 길이면 먼저 나온 구간 (거래 순회와 동일)
+    max_win_streak, best_streak_pl = rollup["max_win"] or (0, 0)
+    max_loss_streak, worst_streak_pl = rollup["max_loss"] or (0, 0)
+
+    best_pl, best_symbol, best_time = rollup["best"]
+    worst_pl, worst_symbol, worst_time = rollup["worst"]
+
+    gross_profit = rollup["gross_win"]
+    gross_loss = rollup["gross_loss"]
     profit_factor = round(gross_profit / gross_loss, 2) if gross_loss > 0 else 0
 
     risk_data = {
@@ -2863,10 +2595,10 @@ async def get_demo_trading_report_analysis(
         "max_win_streak_pl": round(best_streak_pl, 2),
         "max_loss_streak": max_loss_streak,
         "max_loss_streak_pl": round(worst_streak_pl, 2),
-        "best_deal_pl": round(best_deal["profit"], 2),
-        "best_deal_detail": f"{best_deal['symbol']} · {best_deal['time_str']}",
-        "worst_deal_pl": round(worst_deal["profit"], 2),
-        "worst_deal_detail": f"{worst_deal['symbol']} · {worst_deal['time_str']}",
+        "best_deal_pl": round(best_pl, 2),
+        "best_deal_detail": f"{best_symbol} · {best_time}",
+        "worst_deal_pl": round(worst_pl, 2),
+        "worst_deal_detail": f"{worst_symbol} · {worst_time}",
         "profit_factor": profit_factor
     }
 
@@ -0,0 +1,583 @@
+# app/api/demo_matching_engine.py
+"""
+데모 매칭 엔진 — 심볼별 TP/SL 트리거 북
+
+기존: demo WS가 유저마다 0.2초마다 SessionLocal() → User + DemoPosition 전체 조회 → TP/SL 인라인 체크
+변경: 워커당 1개의 인메모리 엔진이 열린 데모 포지션을 심볼별 정렬 트리거 북에 보관하고,
+      QuotePriceListener 틱마다 O(log n + 발동 수)로 청산 대상만 골라 백그라운드에서 청산
+
+[트리거 북 (심볼별 4개의 정렬 리스트, 원소 = (가격, position_id))]
+  buy_tp  : bid >= tp 발동 → 앞쪽부터
+  buy_sl  : bid <= sl 발동 → 뒤쪽부터
+  sell_tp : ask <= tp 발동 → 뒤쪽부터
+  sell_sl : ask >= sl 발동 → 앞쪽부터
+
+[워커 간 정합성]
+  - DB가 원본. 주문/청산한 워커가 Redis pub/sub(demo:positions)로 open/close 알림 → 다른 워커 엔진에 즉시 반영
+  - 1초마다 증분 동기화: id > 마지막으로 본 id 인 포지션만 조회 (알림 유실 대비, 인덱스 범위 조회)
+  - 전체 대조(demo_positions 전체 조회)는 RECONCILE_INTERVAL(5분)마다 1회 — 유실된 close 알림 정리
+  - 청산은 포지션 행 FOR UPDATE 후 진행 → 두 워커가 동시에 발동해도 1번만 청산
+  - 자동청산 알림은 로컬에 AUTO_CLOSED_HOLD초 보관 + 같은 pub/sub 채널("auto")로 다른 워커에 전달 → 어느 워커의 WS든 수신
+    (WS 프레임마다 Redis GET 하던 방식 제거 — 이벤트 루프에서 소켓·프레임 수만큼 동기 왕복)
+"""
+
+import asyncio
+import bisect
+import json
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+_INF = float('inf')
+
+# 증분 동기화 주기 (초) / 전체 대조 주기 (초) / 자동청산 알림 유지 시간 (초)
+SYNC_INTERVAL = 1.0
+RECONCILE_INTERVAL = 300.0
+AUTO_CLOSED_HOLD = 3
+
+# 워커 간 포지션 open/close 알림 채널 — {"p": 발행 워커 pid, "op": "open"|"close"|"user"|"auto", "s": snapshot | "id" | "u" (+ "i": 자동청산 정보)}
+DEMO_POSITION_CHANNEL = "demo:positions"
+
+
+def _tick_spec(symbol: str) -> Tuple[float, float]:
+    """손익 계산용 (tick_size, tick_value) — bridge symbol_info 우선, 없으면 DEFAULT_SYMBOL_SPECS"""
+    from .mt5 import bridge_cache
+    from .demo import DEFAULT_SYMBOL_SPECS
+    sym_info = bridge_cache.get("symbol_info", {}).get(symbol)
+    if sym_info and sym_info.get('tick_size', 0) > 0 and sym_info.get('tick_value', 0) > 0:
+        return sym_info['tick_size'], sym_info['tick_value']
+    specs = DEFAULT_SYMBOL_SPECS.get(symbol, {"tick_size": 0.01, "tick_value": 0.01})
+    return specs['tick_size'], specs['tick_value']
+
+
+def calc_profit(symbol: str, trade_type: str, entry: float, volume: float, current_px: float) -> float:
+    """현재가 기준 손익 (demo WS / calculate_demo_profit과 동일 공식)"""
+    tick_size, tick_value = _tick_spec(symbol)
+    price_diff = current_px - entry if trade_type == "BUY" else entry - current_px
+    return round((price_diff / tick_size) * tick_value * volume, 2)
+
+
+def _snapshot(pos) -> Dict:
+    """DemoPosition ORM → 엔진 보관용 dict (세션과 분리)"""
+    return {
+        "id": pos.id,
+        "user_id": pos.user_id,
+        "symbol": pos.symbol,
+        "trade_type": pos.trade_type,
+        "volume": pos.volume,
+        "entry_price": pos.entry_price,
+        "target_profit": pos.target_profit or 0,
+        "magic": pos.magic,
+        "tp_price": pos.tp_price,
+        "sl_price": pos.sl_price,
+        "created_at": str(pos.created_at) if pos.created_at else "",
+    }
+
+
+def _trigger_prices(snap: Dict) -> Tuple[Optional[float], Optional[float]]:
+    """
+    포지션의 (TP 가격, SL 가격).
+    - tp_price/sl_price 있으면 그대로 (B안)
+    - 없으면 target 기반 fallback을 가격으로 환산 (WIN: +target, LOSE: -target*0.99)
+    - target <= 0 이면 자동청산 없음
+    """
+    target = snap["target_profit"] or 0
+    if target <= 0:
+        return None, None
+    if snap["tp_price"] and snap["sl_price"]:
+        return snap["tp_price"], snap["sl_price"]
+
+    tick_size, tick_value = _tick_spec(snap["symbol"])
+    ppp = snap["volume"] * tick_value / tick_size if tick_size > 0 else 0
+    if ppp <= 0:
+        return None, None
+    tp_diff = target / ppp
+    sl_diff = (target * 0.99) / ppp
+    entry = snap["entry_price"]
+    if snap["trade_type"] == "BUY":
+        return entry + tp_diff, entry - sl_diff
+    return entry - tp_diff, entry + sl_diff
+
+
+class _TriggerBook:
+    """한 심볼의 TP/SL 트리거 북"""
+
+    def __init__(self):
+        self.buy_tp: List[Tuple[float, int]] = []
+        self.buy_sl: List[Tuple[float, int]] = []
+        self.sell_tp: List[Tuple[float, int]] = []
+        self.sell_sl: List[Tuple[float, int]] = []
+
+    def __len__(self):
+        return len(self.buy_tp) + len(self.sell_tp)
+
+    @staticmethod
+    def _remove(book: List[Tuple[float, int]], entry: Tuple[float, int]):
+        i = bisect.bisect_left(book, entry)
+        if i < len(book) and book[i] == entry:
+            del book[i]
+
+    def add(self, trade_type: str, pos_id: int, tp: float, sl: float):
+        if trade_type == "BUY":
+            bisect.insort(self.buy_tp, (tp, pos_id))
+            bisect.insort(self.buy_sl, (sl, pos_id))
+        else:
+            bisect.insort(self.sell_tp, (tp, pos_id))
+            bisect.insort(self.sell_sl, (sl, pos_id))
+
+    def remove(self, trade_type: str, pos_id: int, tp: float, sl: float):
+        if trade_type == "BUY":
+            self._remove(self.buy_tp, (tp, pos_id))
+            self._remove(self.buy_sl, (sl, pos_id))
+        else:
+            self._remove(self.sell_tp, (tp, pos_id))
+            self._remove(self.sell_sl, (sl, pos_id))
+
+    def match(self, bid: float, ask: float) -> List[Tuple[int, bool]]:
+        """
+        가격을 넘은 트리거 추출 (북에서 제거).
+        Returns: [(position_id, is_win), ...] — TP가 SL보다 우선
+        """
+        fired: Dict[int, bool] = {}
+
+        if bid and bid > 0:
+            i = bisect.bisect_right(self.buy_tp, (bid, _INF))
+            for _, pid in self.buy_tp[:i]:
+                fired[pid] = True
+            del self.buy_tp[:i]
+            j = bisect.bisect_left(self.buy_sl, (bid, -_INF))
+            for _, pid in self.buy_sl[j:]:
+                fired.setdefault(pid, False)
+            del self.buy_sl[j:]
+
+        if ask and ask > 0:
+            i = bisect.bisect_left(self.sell_tp, (ask, -_INF))
+            for _, pid in self.sell_tp[i:]:
+                fired[pid] = True
+            del self.sell_tp[i:]
+            j = bisect.bisect_right(self.sell_sl, (ask, _INF))
+            for _, pid in self.sell_sl[:j]:
+                fired.setdefault(pid, False)
+            del self.sell_sl[:j]
+
+        return list(fired.items())
+
+
+class DemoMatchingEngine:
+    """워커당 1개 — 열린 데모 포지션 보관 + 틱 매칭 + 자동청산"""
+
+    def __init__(self):
+        self._positions: Dict[int, Dict] = {}          # position_id → snapshot
+        self._triggers: Dict[int, Tuple[float, float]] = {}  # position_id → (tp, sl) 북에 등록된 값
+        self._user_positions: Dict[int, set] = {}      # user_id → {position_id}
+        self._user_version: Dict[int, int] = {}        # user_id → 변경 카운터 (WS 잔고 재조회 판단용)
+        self._books: Dict[str, _TriggerBook] = {}
+        self._closing: set = set()                     # 청산 진행 중 position_id
+        self._auto_closed: Dict[int, Dict] = {}        # user_id → {"info": {...}, "until": ts}
+        self._sync_task: Optional[asyncio.Task] = None
+        self._notify_task: Optional[asyncio.Task] = None
+        self._last_id = 0                              # 증분 동기화 워터마크 (본 적 있는 최대 position_id)
+        self._last_reconcile = 0.0
+        self._pid = os.getpid()
+        self.stats = {"ticks": 0, "fired": 0, "closed": 0, "syncs": 0, "reconciles": 0,
+                      "notified": 0, "remote": 0, "errors": 0}
+
+    # ========== 포지션 등록/해제 ==========
+    def track(self, position, broadcast: bool = True) -> None:
+        """DemoPosition(ORM) 또는 snapshot dict 등록 — 주문 직후 호출 (broadcast: 다른 워커에 open 알림)"""
+        snap = position if isinstance(position, dict) else _snapshot(position)
+        pid = snap["id"]
+        if pid in self._closing:
+            return
+        self._last_id = max(self._last_id, pid)
+        if broadcast:
+            self._notify({"op": "open", "s": snap})
+        if pid in self._positions:
+            self._unbook(pid)
+        self._positions[pid] = snap
+        self._user_positions.setdefault(snap["user_id"], set()).add(pid)
+        self._book(snap)
+        self._bump(snap["user_id"])
+
+    def untrack(self, position_id: int, broadcast: bool = True) -> Optional[Dict]:
+        """포지션 해제 — 수동 청산/삭제 직후 호출 (broadcast: 다른 워커에 close 알림)"""
+        if broadcast:
+            self._notify({"op": "close", "id": position_id})
+        if position_id not in self._positions:
+            return None
+        self._unbook(position_id)
+        snap = self._positions.pop(position_id)
+        ids = self._user_positions.get(snap["user_id"])
+        if ids is not None:
+            ids.discard(position_id)
+            if not ids:
+                del self._user_positions[snap["user_id"]]
+        self._bump(snap["user_id"])
+        return snap
+
+    def untrack_user(self, user_id: int, broadcast: bool = True) -> None:
+        """유저의 모든 포지션 해제 (리셋 등)"""
+        if broadcast:
+            self._notify({"op": "user", "u": user_id})
+        for pid in list(self._user_positions.get(user_id, ())):
+            self.untrack(pid, broadcast=False)
+        self._bump(user_id)
+
+    def _book(self, snap: Dict):
+        tp, sl = _trigger_prices(snap)
+        if tp is None or sl is None:
+            return
+        self._books.setdefault(snap["symbol"], _TriggerBook()).add(snap["trade_type"], snap["id"], tp, sl)
+        self._triggers[snap["id"]] = (tp, sl)
+
+    def _unbook(self, position_id: int):
+        trig = self._triggers.pop(position_id, None)
+        snap = self._positions.get(position_id)
+        if trig is None or snap is None:
+            return
+        book = self._books.get(snap["symbol"])
+        if book is not None:
+            book.remove(snap["trade_type"], position_id, trig[0], trig[1])
+
+    def _bump(self, user_id: int):
+        self._user_version[user_id] = self._user_version.get(user_id, 0) + 1
+
+    # ========== 조회 (WS용) ==========
+    def positions_for_user(self, user_id: int) -> List[Dict]:
+        ids = self._user_positions.get(user_id)
+        if not ids:
+            return []
+        return [self._positions[pid] for pid in sorted(ids) if pid in self._positions]
+
+    def user_version(self, user_id: int) -> int:
+        return self._user_version.get(user_id, 0)
+
+    def get_auto_closed(self, user_id: int) -> Optional[Dict]:
+        """유지 시간 내 자동청산 정보 (로컬만 — 다른 워커 청산분은 "auto" 알림으로 들어옴, I/O 없음)"""
+        cached = self._auto_closed.get(user_id)
+        if cached:
+            if time.time() < cached["until"]:
+                return cached["info"]
+            del self._auto_closed[user_id]
+        return None
+
+    def _hold_auto_closed(self, user_id: int, info: Dict):
+        self._auto_closed[user_id] = {"info": info, "until": time.time() + AUTO_CLOSED_HOLD}
+
+    def _publish_auto_closed(self, user_id: int, info: Dict):
+        self._hold_auto_closed(user_id, info)
+        self._notify({"op": "auto", "u": user_id, "i": info})
+
+    # ========== 틱 매칭 ==========
+    def on_tick(self, symbol: str, bid: float, ask: float) -> int:
+        """
+        틱 1건 매칭 — QuotePriceListener.on_symbol_price_updated에서 호출.
+        발동된 포지션은 백그라운드 태스크에서 청산. Returns: 발동 수
+        """
+        self.stats["ticks"] += 1
+        book = self._books.get(symbol)
+        if not book:
+            return 0
+        fired = book.match(bid, ask)
+        if not fired:
+            return 0
+
+        orders = []
+        for pid, is_win in fired:
+            trig = self._triggers.pop(pid, None)
+            snap = self._positions.get(pid)
+            if snap is None or pid in self._closing:
+                continue
+            # 반대편 트리거도 북에서 제거 (이미 빠진 쪽은 무시됨)
+            if trig is not None:
+                book.remove(snap["trade_type"], pid, trig[0], trig[1])
+            exit_px = bid if snap["trade_type"] == "BUY" else ask
+            self._closing.add(pid)
+            orders.append((snap, exit_px, is_win))
+            print(f"[DemoEngine] {'🎯 TP' if is_win else '💔 SL'} 발동: {symbol} {snap['trade_type']} #{pid} @ {exit_px}")
+
+        if orders:
+            self.stats["fired"] += len(orders)
+            try:
+                asyncio.get_running_loop().create_task(self._close_fired(orders))
+            except RuntimeError:
+                # 이벤트 루프 밖 (스크립트 등) → 동기 실행
+                self._apply_close_results(orders, _execute_closes(orders))
+        return len(orders)
+
+    def on_prices(self, prices: Dict[str, Dict]) -> int:
+        """여러 심볼 일괄 매칭 (브릿지/Binance fallback 가격일 때 WS에서 호출)"""
+        fired = 0
+        for symbol, p in prices.items():
+            if symbol in self._books:
+                fired += self.on_tick(symbol, p.get("bid", 0), p.get("ask", 0))
+        return fired
+
+    # ========== 청산 ==========
+    async def _close_fired(self, orders: List[Tuple[Dict, float, bool]]):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(None, _execute_closes, orders)
+        except Exception as e:
+            print(f"[DemoEngine] ❌ 자동청산 실행 오류: {e}")
+            results = {}
+        self._apply_close_results(orders, results)
+
+    def _apply_close_results(self, orders, results: Dict[int, Optional[Dict]]):
+        for snap, _, _ in orders:
+            pid = snap["id"]
+            self._closing.discard(pid)
+            # 청산 완료 / 이미 다른 곳에서 청산 → 다른 워커에도 close 알림
+            # 실패 → 로컬에서만 제거, 다음 동기화를 전체 대조로 당겨 다시 등록 (DB에 남아 있음)
+            if pid in results:
+                self.untrack(pid)
+            else:
+                self.untrack(pid, broadcast=False)
+                self._last_reconcile = 0.0
+            info = results.get(pid)
+            if info:
+                self.stats["closed"] += 1
+                self._publish_auto_closed(snap["user_id"], info)
+
+    # ========== 워커 간 알림 (Redis pub/sub) ==========
+    def _notify(self, msg: Dict):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # 이벤트 루프 밖 (스크립트 등) — 다른 워커는 증분 동기화/전체 대조로 반영
+        loop.create_task(self._publish_remote(msg))
+
+    async def _publish_remote(self, msg: Dict):
+        from ..redis_client import get_async_redis
+        try:
+            msg["p"] = self._pid
+            await get_async_redis().publish(DEMO_POSITION_CHANNEL, json.dumps(msg, separators=(",", ":"), default=str))
+            self.stats["notified"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            if self.stats["errors"] % 100 == 1:
+                print(f"[DemoEngine] ⚠️ 알림 발행 오류: {e}")
+
+    def _apply_remote(self, msg: Dict):
+        if msg.get("p") == self._pid:
+            return
+        op = msg.get("op")
+        if op == "open":
+            self.track(msg["s"], broadcast=False)
+        elif op == "close":
+            self.untrack(int(msg["id"]), broadcast=False)
+        elif op == "user":
+            self.untrack_user(int(msg["u"]), broadcast=False)
+        elif op == "auto":
+            self._hold_auto_closed(int(msg["u"]), msg["i"])
+        self.stats["remote"] += 1
+
+    async def run_notify_loop(self):
+        """다른 워커의 open/close 알림 수신 루프"""
+        from ..redis_client import get_async_redis
+        print(f"[DemoEngine] 알림 구독 시작 (채널 {DEMO_POSITION_CHANNEL})")
+        while True:
+            pubsub = None
+            try:
+                pubsub = get_async_redis().pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(DEMO_POSITION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        self._apply_remote(json.loads(message["data"]))
+                    except Exception as e:
+                        self.stats["errors"] += 1
+                        print(f"[DemoEngine] ⚠️ 알림 적용 오류: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[DemoEngine] ⚠️ 알림 구독 끊김 — 재연결 대기: {e}")
+                await asyncio.sleep(2.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
+
+    # ========== DB 동기화 ==========
+    def apply_new_rows(self, rows: List[Dict]):
+        """증분 조회 결과 (id > 워터마크) 등록 — 알림을 놓친 다른 워커의 신규 포지션"""
+        for snap in rows:
+            self._last_id = max(self._last_id, snap["id"])
+            if snap["id"] not in self._positions:
+                self.track(snap, broadcast=False)
+        self.stats["syncs"] += 1
+
+    def apply_db_rows(self, rows: List[Dict]):
+        """DB 스냅샷 전체와 대조 — 추가/변경/삭제 반영"""
+        seen = set()
+        for snap in rows:
+            pid = snap["id"]
+            seen.add(pid)
+            self._last_id = max(self._last_id, pid)
+            if pid in self._closing:
+                continue
+            cur = self._positions.get(pid)
+            if cur is None or cur["tp_price"] != snap["tp_price"] or cur["sl_price"] != snap["sl_price"] \
+                    or cur["target_profit"] != snap["target_profit"]:
+                self.track(snap, broadcast=False)
+        for pid in [p for p in self._positions if p not in seen and p not in self._closing]:
+            self.untrack(pid, broadcast=False)
+        self.stats["reconciles"] += 1
+
+    async def sync_once(self, full: bool = False):
+        loop = asyncio.get_running_loop()
+        if full:
+            rows = await loop.run_in_executor(None, _load_open_positions)
+            if rows is not None:
+                self._last_reconcile = time.time()
+                self.apply_db_rows(rows)
+            return
+        rows = await loop.run_in_executor(None, _load_new_positions, self._last_id)
+        if rows is not None:
+            self.apply_new_rows(rows)
+
+    async def run_sync_loop(self, interval: float = SYNC_INTERVAL, reconcile_interval: float = RECONCILE_INTERVAL):
+        """DB 동기화 루프 — main.py startup에서 1회 시작 (첫 회 + reconcile_interval마다 전체 대조, 나머지는 증분)"""
+        print(f"[DemoEngine] 동기화 루프 시작 (증분 {interval}초 / 전체 대조 {reconcile_interval:.0f}초)")
+        while True:
+            try:
+                await self.sync_once(full=time.time() - self._last_reconcile >= reconcile_interval)
+            except Exception as e:
+                print(f"[DemoEngine] ⚠️ 동기화 오류: {e}")
+            await asyncio.sleep(interval)
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        if self._sync_task is None or self._sync_task.done():
+            self._sync_task = loop.create_task(self.run_sync_loop())
+        if self._notify_task is None or self._notify_task.done():
+            self._notify_task = loop.create_task(self.run_notify_loop())
+
+    def get_status(self) -> Dict:
+        return {
+            "positions": len(self._positions),
+            "users": len(self._user_positions),
+            "symbols": {s: len(b) for s, b in self._books.items() if len(b)},
+            "closing": len(self._closing),
+            "last_id": self._last_id,
+            **self.stats,
+        }
+
+
+# ========== DB 작업 (executor 스레드에서 실행) ==========
+def _load_open_positions() -> Optional[List[Dict]]:
+    from ..database import SessionLocal
+    from ..models.demo_trade import DemoPosition
+    db = SessionLocal()
+    try:
+        return [_snapshot(p) for p in db.query(DemoPosition).all()]
+    except Exception as e:
+        print(f"[DemoEngine] ⚠️ 포지션 로드 실패: {e}")
+        return None
+    finally:
+        db.close()
+
+
+def _load_new_positions(after_id: int) -> Optional[List[Dict]]:
+    """
+    id > after_id 포지션만 (PK 범위 조회).
+    커밋 순서가 id 순서와 다르면(동시 INSERT) 워터마크 아래로 늦게 커밋된 행은 여기서 빠지지만,
+    open 알림 또는 다음 전체 대조에서 반영됨
+    """
+    from ..database import SessionLocal
+    from ..models.demo_trade import DemoPosition
+    db = SessionLocal()
+    try:
+        rows = db.query(DemoPosition).filter(DemoPosition.id > after_id).order_by(DemoPosition.id).all()
+        return [_snapshot(p) for p in rows]
+    except Exception as e:
+        print(f"[DemoEngine] ⚠️ 신규 포지션 로드 실패: {e}")
+        return None
+    finally:
+        db.close()
+
+
+def _execute_closes(orders: List[Tuple[Dict, float, bool]]) -> Dict[int, Optional[Dict]]:
+    """
+    발동된 포지션 청산 — WS 인라인 자동청산과 동일한 기록 방식.
+    Returns: {position_id: auto_closed_info | None(이미 청산됨)}
+    """
+    from ..database import SessionLocal
+    from ..models.user import User
+    from ..models.demo_trade import DemoTrade, DemoPosition
+    from .demo_service import record_trade_transaction
+    from .demo import get_or_create_martin_state
+
+    results: Dict[int, Optional[Dict]] = {}
+    db = SessionLocal()
+    try:
+        for snap, exit_px, is_win in orders:
+            pid = snap["id"]
+            try:
+                pos = db.query(DemoPosition).filter(DemoPosition.id == pid).with_for_update().first()
+                if pos is None:
+                    results[pid] = None
+                    db.rollback()
+                    continue
+                user = db.query(User).filter(User.id == pos.user_id).with_for_update().first()
+                if user is None:
+                    results[pid] = None
+                    db.rollback()
+                    continue
+
+                profit = calc_profit(pos.symbol, pos.trade_type, pos.entry_price, pos.volume, exit_px)
+
+                # ★ 마틴 상태는 읽기만 (프론트 팝업에서 유저 선택 후 API로 처리)
+                martin_state = get_or_create_martin_state(db, user.id, pos.magic)
+
+                trade = DemoTrade(
+                    user_id=user.id,
+                    symbol=pos.symbol,
+                    trade_type=pos.trade_type,
+                    volume=pos.volume,
+                    entry_price=pos.entry_price,
+                    exit_price=exit_px,
+                    profit=profit,
+                    is_closed=True,
+                    closed_at=datetime.now()
+                )
+                db.add(trade)
+                db.flush()
+                _bal_bf = user.demo_balance or 10000.0
+                record_trade_transaction(db, user.id, trade.id, pos.symbol, pos.trade_type, profit, _bal_bf, round(_bal_bf + profit, 2))
+
+                user.demo_balance = _bal_bf + profit
+                user.demo_equity = user.demo_balance
+                user.demo_today_profit = (user.demo_today_profit or 0.0) + profit
+
+                magic = pos.magic
+                db.delete(pos)
+                db.commit()
+
+                results[pid] = {
+                    "auto_closed": True,
+                    "closed_profit": profit,
+                    "is_win": is_win,
+                    "magic": magic,
+                    "message": f"🎯 목표 도달! +${profit:,.2f}" if is_win else f"💔 손절! ${profit:,.2f}",
+                    "closed_at": time.time(),
+                    "martin_step": martin_state.step,
+                    "martin_accumulated_loss": martin_state.accumulated_loss,
+                    "martin_reset": False,
+                    "martin_step_up": False
+                }
+                print(f"[DemoEngine] ✅ Auto-closed #{pid} (User {user.id}): {'WIN' if is_win else 'LOSE'} ${profit:.2f}")
+            except Exception as e:
+                print(f"[DemoEngine] ❌ Auto-close error #{pid}: {e}")
+                db.rollback()
+    finally:
+        db.close()
+    return results
+
+
+# 워커 전역 인스턴스
+demo_matching_engine = DemoMatchingEngine()
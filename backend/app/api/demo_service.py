@@ -12,11 +12,13 @@ API 엔드포인트(demo.py)와 향후 어드민(admin.py)에서 공통 호출.
   Model Layer (DemoTransaction, DemoTrade, User)
 """
 
-from datetime import datetime, timedelta
+import json
+from datetime import datetime, timedelta, time as dt_time
 from sqlalchemy.orm import Session
-from sqlalchemy import func as sa_func
+from sqlalchemy import func as sa_func, insert, delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
-from ..models.demo_trade import DemoTrade, DemoPosition, DemoMartinState, DemoTransaction
+from ..models.demo_trade import DemoTrade, DemoPosition, DemoMartinState, DemoTransaction, DemoDailyRollup, DemoRollupState
 from ..models.user import User
 
 
@@ -48,12 +50,14 @@ def record_transaction(
     balance_before: float,
     balance_after: float,
     description: str = "",
-    reference_id: int = None
+    reference_id: int = None,
+    created_at: datetime = None
 ) -> DemoTransaction:
     """
     DemoTransaction 원장에 기록.
     tx_type: "reset" | "topup" | "trade"
     reference_id: trade인 경우 DemoTrade.id 참조
+    created_at: 지정 시 DB 기본값(now()) 대신 사용 — 롤업 날짜와 맞추기 위함
     """
     tx = DemoTransaction(
         user_id=user_id,
@@ -64,6 +68,8 @@ def record_transaction(
         description=description,
         reference_id=reference_id
     )
+    if created_at is not None:
+        tx.created_at = created_at
     db.add(tx)
     db.flush()
     return tx
@@ -81,6 +87,7 @@ def reset_account(db: Session, user: User) -> dict:
     - 앵커 포인트(demo_reset_at) 설정
     - DemoTransaction 기록
     """
+    lock_for_close(db, user.id)
     old_balance = user.demo_balance or 10000.0
     now = datetime.now()
 
@@ -134,6 +141,8 @@ def topup_account(db: Session, user: User, amount: float) -> dict:
     if amount not in allowed_amounts:
         amount = 10000.0
 
+    lock_for_close(db, user.id)
+
     current_balance = user.demo_balance or 10000.0
     max_balance = 100000.0
 
@@ -151,6 +160,7 @@ def topup_account(db: Session, user: User, amount: float) -> dict:
     user.demo_balance = new_balance
     user.demo_equity = new_balance
 
+    now = datetime.now()
     record_transaction(
         db=db,
         user_id=user.id,
@@ -158,8 +168,13 @@ def topup_account(db: Session, user: User, amount: float) -> dict:
         amount=added,
         balance_before=current_balance,
         balance_after=new_balance,
-        description=f"충전 ${added:,.0f}"
+        description=f"충전 ${added:,.0f}",
+        created_at=now
     )
+    if _rollup_ready(db, user.id):
+        bucket = _new_bucket()
+        bucket["topup"] = round(added, 2)
+        _rollup_add(db, user.id, now.date(), bucket)
 
     db.commit()
     print(f"[TOPUP] User {user.id}: ${current_balance:,.2f} + ${added:,.0f} → ${new_balance:,.2f}")
@@ -172,6 +187,25 @@ def topup_account(db: Session, user: User, amount: float) -> dict:
     }
 
 
+# ================================================================
+# 3-1) lock_for_close — 청산/충전 기록 전 행 잠금
+# ================================================================
+def lock_for_close(db: Session, user_id: int, position_id: int = None) -> bool:
+    """
+    포지션 → User 순서로 행 잠금 (매칭 엔진 자동청산과 같은 순서 — 교착 방지).
+    - User 잠금: ensure_rollups(롤업 최초 생성)와 직렬화 → _rollup_ready 확인 전에 잡아야
+      생성 직전에 커밋된 청산이 롤업에서 빠지지 않음
+    - populate_existing: 잠금 전에 읽은 값이 아닌 잠금 이후 최신 잔고로 원장 체인 계산
+    Returns: position_id 포지션이 아직 남아 있으면 True (다른 경로에서 이미 청산 → False)
+    """
+    if position_id is not None:
+        pos = db.query(DemoPosition).filter(DemoPosition.id == position_id).with_for_update().populate_existing().first()
+        if pos is None:
+            return False
+    db.query(User).filter(User.id == user_id).with_for_update().populate_existing().first()
+    return True
+
+
 # ================================================================
 # 4) record_trade_transaction — 거래 청산 시 원장 기록
 # ================================================================
@@ -185,8 +219,11 @@ def record_trade_transaction(
     balance_before: float,
     balance_after: float
 ) -> DemoTransaction:
-    """거래 청산 시 DemoTransaction 원장에 기록."""
-    return record_transaction(
+    """
+    거래 청산 시 DemoTransaction 원장에 기록 + 일별 롤업 갱신 (같은 트랜잭션).
+    호출자는 먼저 User 행을 잠가야 함 (lock_for_close / 매칭 엔진).
+    """
+    tx = record_transaction(
         db=db,
         user_id=user_id,
         tx_type="trade",
@@ -196,6 +233,92 @@ def record_trade_transaction(
         description=f"{symbol} {trade_type} {'+'if profit>=0 else ''}{profit:.2f}",
         reference_id=trade_id
     )
+    if _rollup_ready(db, user_id):
+        # flush된 DemoTrade는 세션 identity map에 있음 → 추가 쿼리 없음
+        trade = db.get(DemoTrade, trade_id)
+        closed_at = (trade.closed_at if trade else None) or datetime.now()
+        volume = trade.volume if trade else 0
+        _rollup_add(db, user_id, closed_at.date(), _trade_bucket(symbol, trade_type, volume, profit, closed_at))
+    return tx
+
+
+# ================================================================
+# 4-1) close_positions_bulk — 일괄 청산 (집합 단위 SQL)
+# ================================================================
+def close_positions_bulk(db: Session, user: User, closes: list) -> dict:
+    """
+    여러 포지션 청산을 문장 몇 개로 기록 (포지션마다 INSERT/flush/원장/DELETE 반복 없음).
+    closes: [(DemoPosition, exit_price, profit)] — profit은 반올림된 값, 청산 순서대로
+    - DELETE ... RETURNING id 로 먼저 삭제 → 그 사이 다른 경로(매칭 엔진 자동청산)로 닫힌 포지션은 기록 제외
+    - DemoTrade 다중 행 INSERT ... RETURNING id (입력 순서 보장)
+    - 원장 잔고 체인(balance_before/after)은 메모리에서 계산 → DemoTransaction 다중 행 INSERT 1회
+    - 일별 롤업은 같은 날 버킷을 합쳐 1회 갱신
+    커밋은 호출자가 수행.
+    Returns: {"closed_ids": [...], "total_profit": float}
+    """
+    if not closes:
+        return {"closed_ids": [], "total_profit": 0.0}
+
+    deleted = set(db.execute(
+        delete(DemoPosition)
+        .where(DemoPosition.user_id == user.id, DemoPosition.id.in_([pos.id for pos, _, _ in closes]))
+        .returning(DemoPosition.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all())
+    closes = [c for c in closes if c[0].id in deleted]
+    if not closes:
+        return {"closed_ids": [], "total_profit": 0.0}
+    # 포지션(DELETE) → User 순서 — 잔고 체인은 잠근 뒤 최신 값으로
+    lock_for_close(db, user.id)
+
+    now = datetime.now()
+    trade_ids = db.scalars(
+        insert(DemoTrade).returning(DemoTrade.id, sort_by_parameter_order=True),
+        [
+            {
+                "user_id": user.id,
+                "symbol": pos.symbol,
+                "trade_type": pos.trade_type,
+                "volume": pos.volume,
+                "entry_price": pos.entry_price,
+                "exit_price": exit_price,
+                "profit": profit,
+                "is_closed": True,
+                "closed_at": now,
+            }
+            for pos, exit_price, profit in closes
+        ]
+    ).all()
+
+    # 잔고 체인 — record_trade_transaction 순차 호출과 같은 반올림 규칙
+    balance = user.demo_balance or 10000.0
+    ledger = []
+    rollup = None
+    for (pos, _, profit), trade_id in zip(closes, trade_ids):
+        after = round(balance + profit, 2)
+        ledger.append({
+            "user_id": user.id,
+            "tx_type": "trade",
+            "amount": round(profit, 2),
+            "balance_before": round(balance, 2),
+            "balance_after": after,
+            "description": f"{pos.symbol} {pos.trade_type} {'+'if profit>=0 else ''}{profit:.2f}",
+            "reference_id": trade_id,
+        })
+        balance = after
+        bucket = _trade_bucket(pos.symbol, pos.trade_type, pos.volume, profit, now)
+        rollup = bucket if rollup is None else _merge_bucket(rollup, bucket)
+    db.execute(insert(DemoTransaction), ledger)
+
+    if _rollup_ready(db, user.id):
+        _rollup_add(db, user.id, now.date(), rollup)
+
+    total_profit = sum(profit for _, _, profit in closes)
+    user.demo_balance = (user.demo_balance or 10000.0) + total_profit
+    user.demo_equity = user.demo_balance
+    user.demo_today_profit = (user.demo_today_profit or 0.0) + total_profit
+
+    return {"closed_ids": [pos.id for pos, _, _ in closes], "total_profit": total_profit}
 
 
 # ================================================================
@@ -226,23 +349,13 @@ def get_period_initial_balance(
 ) -> float:
     """
     정방향 계산: 앵커 → 기간 시작 시점의 잔고를 정확하게 산출.
+    ★ 구간 합계는 일별 롤업(경계일만 원본 SUM) — _range_sums
     """
     # 앵커가 없으면 전체 기간 (최초 가입 시점부터)
     if anchor_time is None:
         base = 10000.0
-        trade_pl = db.query(sa_func.coalesce(sa_func.sum(DemoTrade.profit), 0)).filter(
-            DemoTrade.user_id == user_id,
-            DemoTrade.is_closed == True,
-            DemoTrade.closed_at < period_start
-        ).scalar() or 0
-
-        topup_sum = db.query(sa_func.coalesce(sa_func.sum(DemoTransaction.amount), 0)).filter(
-            DemoTransaction.user_id == user_id,
-            DemoTransaction.tx_type == "topup",
-            DemoTransaction.created_at < period_start
-        ).scalar() or 0
-
-        initial = round(base + float(trade_pl) + float(topup_sum), 2)
+        trade_pl, topup_sum = _range_sums(db, user_id, end=period_start)
+        initial = round(base + trade_pl + topup_sum, 2)
         return max(initial, 0) or 10000.0
 
     # Python 비교용 naive 변환
@@ -251,33 +364,17 @@ def get_period_initial_balance(
     # 앵커가 기간 시작보다 뒤 (리셋이 기간 중에 발생)
     if naive_anchor >= period_start:
         # 앵커 이후 충전도 초기금액에 포함
-        topup_after_anchor = db.query(sa_func.coalesce(sa_func.sum(DemoTransaction.amount), 0)).filter(
-            DemoTransaction.user_id == user_id,
-            DemoTransaction.tx_type == "topup",
-            DemoTransaction.created_at >= anchor_time  # ★ SQL에는 원본 전달
-        ).scalar() or 0
+        _, topup_after_anchor = _range_sums(db, user_id, start=naive_anchor, start_sql=anchor_time)
 
-        initial = round(anchor_balance + float(topup_after_anchor), 2)
+        initial = round(anchor_balance + topup_after_anchor, 2)
         print(f"[INITIAL] User {user_id}: anchor({naive_anchor}) >= start({period_start}) → base={anchor_balance} + topup={topup_after_anchor} = {initial}")
         return initial
 
     # 앵커 ~ 기간 시작 사이의 변동 합산 (정방향)
     # ★ SQL 쿼리에는 anchor_time 원본 전달 (PostgreSQL이 TIMESTAMPTZ 비교 처리)
-    trade_pl = db.query(sa_func.coalesce(sa_func.sum(DemoTrade.profit), 0)).filter(
-        DemoTrade.user_id == user_id,
-        DemoTrade.is_closed == True,
-        DemoTrade.closed_at >= anchor_time,
-        DemoTrade.closed_at < period_start
-    ).scalar() or 0
+    trade_pl, topup_sum = _range_sums(db, user_id, start=naive_anchor, start_sql=anchor_time, end=period_start)
 
-    topup_sum = db.query(sa_func.coalesce(sa_func.sum(DemoTransaction.amount), 0)).filter(
-        DemoTransaction.user_id == user_id,
-        DemoTransaction.tx_type == "topup",
-        DemoTransaction.created_at >= anchor_time,
-        DemoTransaction.created_at < period_start
-    ).scalar() or 0
-
-    initial = round(anchor_balance + float(trade_pl) + float(topup_sum), 2)
+    initial = round(anchor_balance + trade_pl + topup_sum, 2)
     return max(initial, 0) or anchor_balance
 
 
@@ -294,21 +391,17 @@ def get_net_deposits(
     """기간 내 충전(topup) 합계. 리셋은 입금으로 보지 않음."""
     # 앵커가 기간 시작보다 뒤면 앵커 이후부터 집계
     effective_start = start_time
+    effective_start_sql = start_time
     if anchor_time:
         naive_anchor = _make_naive(anchor_time)
         if naive_anchor > start_time:
-            effective_start = anchor_time  # ★ SQL에는 원본
-        else:
-            effective_start = start_time
+            effective_start = naive_anchor
+            effective_start_sql = anchor_time  # ★ SQL에는 원본
 
-    topup_sum = db.query(sa_func.coalesce(sa_func.sum(DemoTransaction.amount), 0)).filter(
-        DemoTransaction.user_id == user_id,
-        DemoTransaction.tx_type == "topup",
-        DemoTransaction.created_at >= effective_start,
-        DemoTransaction.created_at <= end_time
-    ).scalar() or 0
+    _, topup_sum = _range_sums(db, user_id, start=effective_start, start_sql=effective_start_sql,
+                               end=end_time, end_inclusive=True)
 
-    return round(float(topup_sum), 2)
+    return round(topup_sum, 2)
 
 
 # ================================================================
@@ -339,3 +432,348 @@ def get_filtered_trades(
     trades = query.order_by(DemoTrade.closed_at.asc()).all()
     print(f"[FILTER] User {user_id}: start={start_time}, end={end_time}, anchor={anchor_time} → {len(trades)}건")
     return trades
+
+
+# ================================================================
+# 9) 일별 롤업 — (user_id, day) 거래/충전 집계
+# ================================================================
+# 기존: 리포트 요청마다 demo_trades/demo_transactions SUM 여러 번 + 기간 내 모든 거래 Python 순회
+# 변경: demo_daily_rollups 에 일별 집계 유지 (청산/충전과 같은 트랜잭션에서 증분 갱신)
+#       기간 조회 = 사이 날짜 롤업 행(최대 365행) + 경계일(시작일·종료일) 원본 거래만
+#       앵커(리셋)는 경계일 원본 조회에서 시각 단위로 걸러짐 → 리셋 시 롤업 삭제 불필요
+#
+# [버킷] 하루(또는 구간) 집계 dict — 시간순 병합(_merge_bucket)이 거래를 순서대로 순회한 결과와 같도록 유지
+#   symbols {종목: [건수, 승, 손익, 랏]}, sides {BUY/SELL: [건수, 승, 손익]}, hours {KST시: [건수, 손익]}
+#   best/worst [손익, 종목, MM/DD], max_vol/min_vol [랏, 종목, 방향, MM/DD]
+#   head/tail [승리여부, 연속건수, 손익] — 첫/마지막 연속 승/패 구간 (경계에서 같은 부호면 이어 붙임)
+#   max_win/max_loss [연속건수, 손익] — 최장 연속 승/패 (같은 길이면 먼저 나온 구간)
+#   (구간 목록 전체를 두면 승/패가 번갈아 나올 때마다 detail이 커짐 → 병합에 필요한 양 끝 + 최장만 유지)
+#   days {YYYY-MM-DD: 손익} — Summary 일별 그래프
+
+_DETAIL_KEYS = ("loss_count", "gross_win", "gross_loss", "symbols", "sides", "hours",
+                "best", "worst", "max_vol", "min_vol", "head", "tail", "max_win", "max_loss", "days")
+
+# 롤업 생성 완료 유저 (워커 로컬 캐시 — 한 번 생성되면 계속 유효)
+_rollup_ready_users = set()
+
+
+def _new_bucket() -> dict:
+    return {
+        "trade_count": 0, "win_count": 0, "trade_pl": 0.0, "volume": 0.0, "topup": 0.0,
+        "loss_count": 0, "gross_win": 0.0, "gross_loss": 0.0,
+        "symbols": {}, "sides": {}, "hours": {},
+        "best": None, "worst": None, "max_vol": None, "min_vol": None,
+        "head": None, "tail": None, "max_win": None, "max_loss": None, "days": {},
+    }
+
+
+def _trade_bucket(symbol: str, trade_type: str, volume: float, profit: float, closed_at: datetime) -> dict:
+    """거래 1건 → 버킷 (분석 리포트와 같은 값 규칙: 손익 소수 2자리, 랏 없으면 0.01, 시간대는 +9h)"""
+    raw_profit = profit or 0
+    profit = round(raw_profit, 2)
+    volume = volume or 0.01
+    kst_time = closed_at + timedelta(hours=9)  # UTC → KST (분석 리포트와 동일)
+    time_str = kst_time.strftime("%m/%d")
+    is_win = profit > 0
+
+    b = _new_bucket()
+    b["trade_count"] = 1
+    b["win_count"] = 1 if is_win else 0
+    b["loss_count"] = 0 if is_win else 1
+    b["trade_pl"] = raw_profit
+    b["volume"] = volume
+    b["gross_win"] = profit if profit > 0 else 0.0
+    b["gross_loss"] = -profit if profit < 0 else 0.0
+    b["symbols"] = {symbol: [1, int(is_win), profit, volume]}
+    b["sides"] = {trade_type: [1, int(is_win), profit]}
+    b["hours"] = {str(kst_time.hour): [1, profit]}
+    b["best"] = b["worst"] = [profit, symbol, time_str]
+    b["max_vol"] = b["min_vol"] = [volume, symbol, trade_type, time_str]
+    b["head"] = [is_win, 1, profit]
+    b["tail"] = [is_win, 1, profit]
+    b["max_win"] = [1, profit] if is_win else None
+    b["max_loss"] = None if is_win else [1, profit]
+    b["days"] = {closed_at.strftime("%Y-%m-%d"): raw_profit}
+    return b
+
+
+def _longer_run(cur, cand):
+    """[연속건수, 손익] — 더 길 때만 교체 (같은 길이면 먼저 나온 cur 유지)"""
+    if cand is not None and (cur is None or cand[0] > cur[0]):
+        return list(cand)
+    return cur
+
+
+def _merge_runs(acc: dict, b: dict):
+    """연속 구간 요약 병합 — acc/b의 trade_count는 병합 전 값이어야 함"""
+    if not b["head"]:
+        return
+    if not acc["tail"]:
+        for k in ("head", "tail", "max_win", "max_loss"):
+            acc[k] = list(b[k]) if b[k] else None
+        return
+    tail, head = acc["tail"], b["head"]
+    if tail[0] == head[0]:
+        joined = [tail[0], tail[1] + head[1], tail[2] + head[2]]
+        key = "max_win" if joined[0] else "max_loss"
+        acc[key] = _longer_run(acc[key], joined[1:])
+        if acc["head"][1] == acc["trade_count"]:
+            acc["head"] = list(joined)
+        acc["tail"] = list(joined) if b["tail"][1] == b["trade_count"] else list(b["tail"])
+    else:
+        acc["tail"] = list(b["tail"])
+    acc["max_win"] = _longer_run(acc["max_win"], b["max_win"])
+    acc["max_loss"] = _longer_run(acc["max_loss"], b["max_loss"])
+
+
+def _runs_summary(runs: list) -> dict:
+    """구 형식 detail["runs"] (구간 목록) → head/tail/max_win/max_loss"""
+    out = {"head": None, "tail": None, "max_win": None, "max_loss": None}
+    if runs:
+        out["head"] = list(runs[0])
+        out["tail"] = list(runs[-1])
+        for is_win, length, pl in runs:
+            key = "max_win" if is_win else "max_loss"
+            out[key] = _longer_run(out[key], [length, pl])
+    return out
+
+
+def _merge_bucket(acc: dict, b: dict) -> dict:
+    """acc 뒤에 b를 시간순으로 이어 붙임 (acc 변경)"""
+    _merge_runs(acc, b)
+    for k in ("trade_count", "win_count", "loss_count", "trade_pl", "volume", "topup", "gross_win", "gross_loss"):
+        acc[k] += b[k]
+    for k in ("symbols", "sides", "hours"):
+        dst = acc[k]
+        for key, vals in b[k].items():
+            cur = dst.get(key)
+            dst[key] = list(vals) if cur is None else [x + y for x, y in zip(cur, vals)]
+    for key, pl in b["days"].items():
+        acc["days"][key] = acc["days"].get(key, 0) + pl
+    # 동률이면 먼저 나온 거래 유지 (max/min 첫 원소와 동일)
+    if b["best"] and (acc["best"] is None or b["best"][0] > acc["best"][0]):
+        acc["best"] = b["best"]
+    if b["worst"] and (acc["worst"] is None or b["worst"][0] < acc["worst"][0]):
+        acc["worst"] = b["worst"]
+    if b["max_vol"] and (acc["max_vol"] is None or b["max_vol"][0] > acc["max_vol"][0]):
+        acc["max_vol"] = b["max_vol"]
+    if b["min_vol"] and (acc["min_vol"] is None or b["min_vol"][0] < acc["min_vol"][0]):
+        acc["min_vol"] = b["min_vol"]
+    return acc
+
+
+def _bucket_from_row(row: DemoDailyRollup) -> dict:
+    b = _new_bucket()
+    b["trade_count"] = row.trade_count or 0
+    b["win_count"] = row.win_count or 0
+    b["trade_pl"] = row.trade_pl or 0.0
+    b["volume"] = row.volume or 0.0
+    b["topup"] = row.topup or 0.0
+    detail = json.loads(row.detail or "{}")
+    if "runs" in detail:
+        detail.update(_runs_summary(detail.pop("runs")))
+    for k in _DETAIL_KEYS:
+        if k in detail:
+            b[k] = detail[k]
+    return b
+
+
+def _store_bucket(row: DemoDailyRollup, b: dict):
+    row.trade_count = b["trade_count"]
+    row.win_count = b["win_count"]
+    row.trade_pl = b["trade_pl"]
+    row.volume = b["volume"]
+    row.topup = b["topup"]
+    row.detail = json.dumps({k: b[k] for k in _DETAIL_KEYS}, separators=(",", ":"))
+
+
+def _rollup_ready(db: Session, user_id: int) -> bool:
+    if user_id in _rollup_ready_users:
+        return True
+    if db.query(DemoRollupState.user_id).filter(DemoRollupState.user_id == user_id).first():
+        _rollup_ready_users.add(user_id)
+        return True
+    return False  # 아직 생성 전 → 첫 리포트 조회 시 원본에서 한 번에 생성
+
+
+def _rollup_add(db: Session, user_id: int, day, bucket: dict):
+    """(user_id, day) 행에 버킷 병합 — 행 잠금으로 동시 청산 간 갱신 유실 방지"""
+    db.execute(
+        pg_insert(DemoDailyRollup)
+        .values(user_id=user_id, day=day, trade_count=0, win_count=0, trade_pl=0.0, volume=0.0, topup=0.0, detail="{}")
+        .on_conflict_do_nothing(index_elements=["user_id", "day"])
+    )
+    row = db.query(DemoDailyRollup).filter(
+        DemoDailyRollup.user_id == user_id, DemoDailyRollup.day == day
+    ).with_for_update().first()
+    _store_bucket(row, _merge_bucket(_bucket_from_row(row), bucket))
+
+
+def ensure_rollups(db: Session, user_id: int):
+    """롤업 미생성 유저 → 기존 거래/충전 원본으로 일별 롤업 1회 생성"""
+    if _rollup_ready(db, user_id):
+        return
+    # 생성 중 청산 기록과 겹치지 않도록 유저 행 잠금 (매칭 엔진 청산도 같은 잠금 사용)
+    db.query(User).filter(User.id == user_id).with_for_update().first()
+    if db.query(DemoRollupState.user_id).filter(DemoRollupState.user_id == user_id).first():
+        db.commit()
+        _rollup_ready_users.add(user_id)
+        return
+
+    days = {}
+    trades = db.query(DemoTrade).filter(
+        DemoTrade.user_id == user_id,
+        DemoTrade.is_closed == True,
+        DemoTrade.closed_at.isnot(None)
+    ).order_by(DemoTrade.closed_at.asc()).all()
+    for t in trades:
+        day = t.closed_at.date()
+        bucket = days.get(day)
+        if bucket is None:
+            bucket = days[day] = _new_bucket()
+        _merge_bucket(bucket, _trade_bucket(t.symbol, t.trade_type, t.volume, t.profit, t.closed_at))
+
+    topups = db.query(DemoTransaction.created_at, DemoTransaction.amount).filter(
+        DemoTransaction.user_id == user_id,
+        DemoTransaction.tx_type == "topup"
+    ).all()
+    for created_at, amount in topups:
+        if created_at is None:
+            continue
+        day = created_at.date()
+        bucket = days.get(day)
+        if bucket is None:
+            bucket = days[day] = _new_bucket()
+        bucket["topup"] += amount or 0
+
+    db.query(DemoDailyRollup).filter(DemoDailyRollup.user_id == user_id).delete(synchronize_session=False)
+    for day, bucket in sorted(days.items()):
+        row = DemoDailyRollup(user_id=user_id, day=day)
+        _store_bucket(row, bucket)
+        db.add(row)
+    db.add(DemoRollupState(user_id=user_id))
+    db.commit()
+    _rollup_ready_users.add(user_id)
+    print(f"[ROLLUP] User {user_id}: 거래 {len(trades)}건 / 충전 {len(topups)}건 → 일별 롤업 {len(days)}행 생성")
+
+
+def _day_bounds(day) -> tuple:
+    start = datetime.combine(day, dt_time.min)
+    return start, start + timedelta(days=1)
+
+
+def _range_sums(
+    db: Session,
+    user_id: int,
+    start: datetime = None,
+    end: datetime = None,
+    start_sql=None,
+    end_inclusive: bool = False
+) -> tuple:
+    """
+    [start, end) 구간 (거래 P/L 합계, 충전 합계) — start/end None이면 열린 구간
+    사이 날짜는 롤업 SUM, 경계일은 원본 SUM (start_sql: SQL 하한 원본값 — 앵커 TIMESTAMPTZ)
+    """
+    ensure_rollups(db, user_id)
+    lo_day = start.date() if start is not None else None
+    hi_day = end.date() if end is not None else None
+    lower = start_sql if start_sql is not None else start
+
+    q = db.query(
+        sa_func.coalesce(sa_func.sum(DemoDailyRollup.trade_pl), 0),
+        sa_func.coalesce(sa_func.sum(DemoDailyRollup.topup), 0)
+    ).filter(DemoDailyRollup.user_id == user_id)
+    if lo_day is not None:
+        q = q.filter(DemoDailyRollup.day > lo_day)
+    if hi_day is not None:
+        q = q.filter(DemoDailyRollup.day < hi_day)
+    trade_pl, topup = q.one()
+    trade_pl, topup = float(trade_pl or 0), float(topup or 0)
+
+    for day in sorted({d for d in (lo_day, hi_day) if d is not None}):
+        day_start, day_end = _day_bounds(day)
+        tq = db.query(sa_func.coalesce(sa_func.sum(DemoTrade.profit), 0)).filter(
+            DemoTrade.user_id == user_id,
+            DemoTrade.is_closed == True,
+            DemoTrade.closed_at >= day_start,
+            DemoTrade.closed_at < day_end
+        )
+        xq = db.query(sa_func.coalesce(sa_func.sum(DemoTransaction.amount), 0)).filter(
+            DemoTransaction.user_id == user_id,
+            DemoTransaction.tx_type == "topup",
+            DemoTransaction.created_at >= day_start,
+            DemoTransaction.created_at < day_end
+        )
+        if lower is not None:
+            tq = tq.filter(DemoTrade.closed_at >= lower)
+            xq = xq.filter(DemoTransaction.created_at >= lower)
+        if end is not None:
+            if end_inclusive:
+                tq = tq.filter(DemoTrade.closed_at <= end)
+                xq = xq.filter(DemoTransaction.created_at <= end)
+            else:
+                tq = tq.filter(DemoTrade.closed_at < end)
+                xq = xq.filter(DemoTransaction.created_at < end)
+        trade_pl += float(tq.scalar() or 0)
+        topup += float(xq.scalar() or 0)
+
+    return trade_pl, topup
+
+
+# ================================================================
+# 10) get_period_rollup — 앵커 이후 + 기간 내 거래 집계 (리포트용)
+# ================================================================
+def get_period_rollup(
+    db: Session,
+    user_id: int,
+    start_time: datetime,
+    end_time: datetime,
+    anchor_time: datetime = None
+) -> dict:
+    """
+    get_filtered_trades 결과를 순서대로 순회한 것과 같은 집계 버킷.
+    사이 날짜는 롤업 행, 시작일/종료일만 원본 거래 조회.
+    """
+    ensure_rollups(db, user_id)
+    result = _new_bucket()
+
+    effective_start = start_time
+    naive_anchor = _make_naive(anchor_time)
+    if naive_anchor is not None and naive_anchor > start_time:
+        effective_start = naive_anchor
+    if effective_start > end_time:
+        return result
+
+    first_day = effective_start.date()
+    last_day = end_time.date()
+
+    def _merge_raw_day(day):
+        day_start, day_end = _day_bounds(day)
+        query = db.query(DemoTrade).filter(
+            DemoTrade.user_id == user_id,
+            DemoTrade.is_closed == True,
+            DemoTrade.closed_at >= start_time,
+            DemoTrade.closed_at <= end_time,
+            DemoTrade.closed_at >= day_start,
+            DemoTrade.closed_at < day_end
+        )
+        if anchor_time:
+            query = query.filter(DemoTrade.closed_at >= anchor_time)
+        for t in query.order_by(DemoTrade.closed_at.asc()).all():
+            _merge_bucket(result, _trade_bucket(t.symbol, t.trade_type, t.volume, t.profit, t.closed_at))
+
+    _merge_raw_day(first_day)
+    rows = 0
+    if last_day > first_day:
+        for row in db.query(DemoDailyRollup).filter(
+            DemoDailyRollup.user_id == user_id,
+            DemoDailyRollup.day > first_day,
+            DemoDailyRollup.day < last_day
+        ).order_by(DemoDailyRollup.day.asc()).all():
+            _merge_bucket(result, _bucket_from_row(row))
+            rows += 1
+        _merge_raw_day(last_day)
+
+    print(f"[ROLLUP] User {user_id}: start={start_time}, end={end_time}, anchor={anchor_time} → 롤업 {rows}행 + 경계일, {result['trade_count']}건")
+    return result
+
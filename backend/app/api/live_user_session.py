@@ -0,0 +1,275 @@
+# app/api/live_user_session.py
+"""
+라이브 WS 유저 세션 — 같은 유저의 /api/mt5/ws 소켓들이 공유하는 상태
+
+기존: 탭/패널/기기마다 소켓 1개 (magic별) → 소켓마다
+      - 30초 DB 갱신 (User 조회)
+      - MetaAPI RPC 동기화 (get_user_account_info + get_user_positions)
+      - 포지션 사라짐 감지 상태 (_prev_user_position, _position_disappeared_count)
+      → 작업량이 소켓 수에 비례, 같은 청산을 소켓마다 따로 판정
+변경: 워커당 유저 1개 세션 (첫 소켓이 생성, 마지막 소켓이 해제)
+      - DB 갱신 / MetaAPI 동기화는 세션이 1회 (동시 호출은 Lock으로 합침)
+        (주기 MetaAPI 동기화는 백그라운드 태스크 — 소켓 프레임 루프는 RPC 왕복을 기다리지 않음)
+      - 청산 감지는 magic별 상태 1개, 스냅샷 seq당 1회 판정 → 같은 magic 소켓들은 같은 이벤트 수신
+      - 각 소켓은 세션 값을 읽어 자기 magic으로 필터링한 프레임만 만듦
+"""
+
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+# DB 갱신 주기 (초)
+DB_REFRESH_INTERVAL = 30
+# 포지션 사라짐 연속 확인 횟수 (스냅샷 기준) — 2회 연속이면 청산 확정
+CLOSE_CONFIRM_COUNT = 2
+
+
+class _CloseState:
+    """magic 1개의 청산 감지 상태"""
+    __slots__ = ("prev_position", "disappeared", "seq", "event_id", "event")
+
+    def __init__(self):
+        self.prev_position: Optional[Dict] = None
+        self.disappeared = 0
+        self.seq = -1
+        self.event_id = 0
+        self.event: Optional[Dict] = None
+
+
+class LiveUserSession:
+    """유저 1명의 라이브 WS 공유 상태 (워커 로컬)"""
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.sockets = 0
+        self.loaded = False
+
+        # DB (User) 값
+        self.mt5_account = None
+        self.mt5_server = None
+        self.mt5_balance = None
+        self.mt5_equity = None
+        self.mt5_margin = None
+        self.mt5_free_margin = None
+        self.mt5_profit = None
+        self.mt5_leverage = None
+        self.metaapi_id = None
+        self.metaapi_status = None
+
+        self.last_db_refresh = 0.0
+        self.last_metaapi_sync = 0.0
+        self.has_position = False
+        self.sync_soon_at: List[float] = []
+
+        self._close: Dict[int, _CloseState] = {}
+        self._sync_lock = asyncio.Lock()
+        self._sync_task: Optional[asyncio.Task] = None
+
+    @property
+    def use_user_metaapi(self) -> bool:
+        return bool(self.metaapi_id and self.metaapi_status == 'deployed')
+
+    # ========== DB ==========
+    def apply_user(self, user):
+        """User 행 → 세션 값"""
+        if user and user.has_mt5_account:
+            self.mt5_account = user.mt5_account_number
+            self.mt5_server = user.mt5_server
+            self.mt5_balance = user.mt5_balance
+            self.mt5_equity = user.mt5_equity
+            self.mt5_margin = user.mt5_margin
+            self.mt5_free_margin = user.mt5_free_margin
+            self.mt5_profit = user.mt5_profit
+            self.mt5_leverage = user.mt5_leverage
+            self.metaapi_id = user.metaapi_account_id
+            self.metaapi_status = user.metaapi_status
+        self.loaded = True
+        self.last_db_refresh = time.time()
+
+    async def refresh_db(self, now: float):
+        """유저 MT5 계정 정보 주기적 DB 갱신 — 세션당 DB_REFRESH_INTERVAL마다 1회 (비동기 세션)"""
+        if now - self.last_db_refresh <= DB_REFRESH_INTERVAL:
+            return
+        self.last_db_refresh = now
+        from sqlalchemy import select
+        from ..database import async_session
+        from ..models.user import User
+        try:
+            async with async_session() as db:
+                user = (await db.execute(select(User).where(User.id == self.user_id))).scalar_one_or_none()
+                if user and user.has_mt5_account:
+                    if user.mt5_account_number != self.mt5_account:
+                        print(f"[LIVE WS] 🔄 User {self.user_id} MT5 계정 갱신: {self.mt5_account} → {user.mt5_account_number}")
+                    self.mt5_account = user.mt5_account_number
+                    self.mt5_server = user.mt5_server
+                    self.mt5_balance = user.mt5_balance
+                    self.mt5_equity = user.mt5_equity
+                    self.mt5_leverage = user.mt5_leverage
+
+                    # ★★★ MetaAPI 상태 갱신 ★★★
+                    old_status = self.metaapi_status
+                    self.metaapi_id = user.metaapi_account_id
+                    self.metaapi_status = user.metaapi_status
+                    if old_status != self.metaapi_status:
+                        print(f"[LIVE WS] 🔄 User {self.user_id} MetaAPI 상태 변경: {old_status} → {self.metaapi_status}")
+                elif user and not user.has_mt5_account and self.mt5_account:
+                    print(f"[LIVE WS] 🔄 User {self.user_id} MT5 계정 해제 감지")
+                    self.mt5_account = None
+                    self.mt5_server = None
+        except Exception as e:
+            print(f"[LIVE WS] DB refresh error: {e}")
+
+    # ========== MetaAPI 동기화 ==========
+    async def sync_metaapi(self, now: float):
+        """
+        유저별 MetaAPI 데이터 동기화 (적응형 주기) — 여러 소켓이 동시에 불러도 RPC 1회
+        첫 동기화만 대기, 이후 주기 동기화는 백그라운드 (RPC 왕복 동안 프레임 루프가 멈추지 않음 → 다음 스냅샷 프레임에 반영)
+        """
+        if not self.use_user_metaapi or self._sync_lock.locked() or (self._sync_task and not self._sync_task.done()):
+            return  # 다른 소켓이 이미 동기화 중 → 결과는 user_metaapi_cache로 공유
+        from .metaapi_service import user_metaapi_cache, user_trade_connections
+        from .user_stream_hub import user_stream_hub, RECONCILE_INTERVAL
+
+        user_id = self.user_id
+        # ★★★ Streaming 이벤트 수신 중이면 user_stream_hub 푸시로 갱신 → RPC는 긴 주기 보정용 ★★★
+        has_streaming = user_stream_hub.is_streaming(user_id) or (
+            user_id in user_trade_connections and user_trade_connections[user_id].get("streaming") is not None)
+        if has_streaming:
+            self.has_position = len(user_metaapi_cache.get(user_id, {}).get("positions", [])) > 0
+        sync_interval = RECONCILE_INTERVAL if has_streaming else (5 if self.has_position else 30)
+        should_sync = (now - self.last_metaapi_sync) > sync_interval
+
+        # ★★★ 첫 연결 시 강제 즉시 동기화 (stale 캐시 방지) ★★★
+        if self.last_metaapi_sync == 0:
+            should_sync = True
+            print(f"[LIVE WS] User {user_id} 첫 연결 - 강제 동기화 실행")
+
+        # ★ 주문 직후 빠른 동기화 (예약된 시간 도달 시)
+        if self.sync_soon_at and now >= self.sync_soon_at[0]:
+            should_sync = True
+            self.sync_soon_at.pop(0)
+            print(f"[LIVE WS] User {user_id} 주문 후 빠른 동기화 실행")
+
+        if not should_sync:
+            return
+        if self.last_metaapi_sync == 0:
+            await self._sync(now)
+        else:
+            self._sync_task = asyncio.create_task(self._sync(now))
+
+    async def _sync(self, now: float):
+        from .metaapi_service import get_user_account_info, get_user_positions, user_metaapi_cache
+
+        user_id = self.user_id
+        async with self._sync_lock:
+            self.last_metaapi_sync = now
+            try:
+                account = await get_user_account_info(user_id, self.metaapi_id)
+                # ★★★ 항상 포지션 조회 (모든 magic 포지션 표시 필요) ★★★
+                positions = await get_user_positions(user_id, self.metaapi_id)
+                if account:
+                    user_metaapi_cache[user_id] = {
+                        "account_info": account,
+                        "positions": positions or [],
+                        "last_sync": now
+                    }
+                    # ★ 포지션 보유 여부 업데이트 (모든 magic 포지션 기준)
+                    self.has_position = len(positions or []) > 0
+            except Exception as e:
+                print(f"[LIVE WS] User {user_id} MetaAPI sync error: {e}")
+
+    # ========== 청산 감지 ==========
+    def last_close_event_id(self, magic: int) -> int:
+        """새 소켓의 시작 id — 접속 전에 판정된 청산 이벤트는 다시 보내지 않음"""
+        state = self._close.get(magic)
+        return state.event_id if state else 0
+
+    def detect_close(self, magic: int, seq: int, now: float) -> Tuple[int, Optional[Dict]]:
+        """
+        magic별 포지션 사라짐 → 자동 청산 판정 (스냅샷 seq당 1회)
+        반환: (event_id, event) — 소켓은 마지막으로 받은 event_id보다 클 때만 전송
+        """
+        state = self._close.get(magic)
+        if state is None:
+            state = self._close[magic] = _CloseState()
+        if state.seq == seq:
+            return state.event_id, state.event
+        state.seq = seq
+
+        from .metaapi_service import user_metaapi_cache
+        from .mt5 import user_live_cache, user_close_acknowledged
+
+        user_id = self.user_id
+        ack_time = user_close_acknowledged.get(user_id, 0)
+        is_user_close_recent = (now - ack_time) < 20  # 20초 이내 사용자 청산
+
+        positions_now = user_metaapi_cache.get(user_id, {}).get("positions", [])
+        magic_positions = [p for p in positions_now if p.get("magic", 0) == magic]
+
+        if state.prev_position and not magic_positions:
+            if is_user_close_recent:
+                # ★★★ 사용자가 직접 청산 → WS 자동감지 완전 스킵 + 캐시 강제 정리 ★★★
+                print(f"[LIVE WS] ⏭️ User {user_id} 사용자 청산 후 {now - ack_time:.1f}초 — 자동감지 스킵")
+                # ★ 청산된 포지션만 캐시에서 제거 (다른 포지션은 유지!)
+                closed_pos_id = state.prev_position.get("id")
+                if closed_pos_id and user_id in user_live_cache:
+                    user_live_cache[user_id]["positions"] = [
+                        p for p in user_live_cache[user_id].get("positions", [])
+                        if p.get("id") != closed_pos_id
+                    ]
+                state.prev_position = None
+                state.disappeared = 0
+            else:
+                state.disappeared += 1
+                # 연속 확인 시 청산으로 확정 (SL/TP 빠른 감지 필요)
+                if state.disappeared >= CLOSE_CONFIRM_COUNT:
+                    prev = state.prev_position
+                    prev_profit = prev.get("profit", 0)
+                    prev_symbol = prev.get("symbol", "")
+                    state.event_id += 1
+                    state.event = {
+                        "profit": prev_profit,
+                        "symbol": prev_symbol,
+                        "is_win": prev_profit >= 0,
+                        "position_id": prev.get("id", ""),
+                    }
+                    print(f"[LIVE WS] 🔔 자동 청산 감지! User {user_id}, {prev_symbol} P/L=${prev_profit:.2f}")
+                    state.prev_position = None
+                    state.disappeared = 0
+        elif magic_positions:
+            state.prev_position = magic_positions[0]
+            state.disappeared = 0
+            # ★★★ 포지션 있으면 acknowledged 클리어 (새 포지션 진입 의미) ★★★
+            if user_id in user_close_acknowledged:
+                del user_close_acknowledged[user_id]
+
+        return state.event_id, state.event
+
+
+class LiveUserSessionRegistry:
+    """워커 전역 — user_id → 세션 (소켓 수 참조 카운트)"""
+
+    def __init__(self):
+        self._sessions: Dict[int, LiveUserSession] = {}
+
+    def acquire(self, user_id: int) -> LiveUserSession:
+        session = self._sessions.get(user_id)
+        if session is None:
+            session = self._sessions[user_id] = LiveUserSession(user_id)
+        session.sockets += 1
+        return session
+
+    def release(self, session: LiveUserSession):
+        session.sockets -= 1
+        if session.sockets <= 0 and self._sessions.get(session.user_id) is session:
+            del self._sessions[session.user_id]
+
+    def get_status(self) -> Dict:
+        return {
+            "users": len(self._sessions),
+            "sockets": sum(s.sockets for s in self._sessions.values()),
+        }
+
+
+# 워커 전역 인스턴스
+live_user_sessions = LiveUserSessionRegistry()
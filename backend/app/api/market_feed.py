@@ -0,0 +1,279 @@
+# app/api/market_feed.py
+"""
+시세 피드 전송 — 전용 ingest 프로세스 ↔ uvicorn 워커
+
+기존: --workers 2 → 워커마다 startup_metaapi()
+      → MetaAPI Quote 스트리밍 연결 2개, quote_price_cache/quote_candle_cache 2벌, update_candle_realtime 2배
+변경: MARKET_DATA_MODE
+  - "local"      : 기존 동작 (워커가 직접 Quote 연결) — 기본값
+  - "ingest"     : app.market_ingest 프로세스 전용. Quote 연결 + 캔들 빌더 소유, 틱/캔들 델타를 Redis pub/sub 발행
+  - "subscriber" : 워커. Quote 연결 없음, Redis 채널 구독 → 로컬 캐시에 적용 후 WS 팬아웃/데모 매칭만 수행
+
+[메시지] 채널 md:tick, JSON 1건 = 틱 1건
+  {"s": 심볼, "b": bid, "a": ask, "t": 브로커시간, "r": ingest 수신시각, "c": {"M1": [time, o, h, l, c, v], ...},
+   "bt": 브로커시간(소수 초), "cd": 캔들 갱신 소요(초)}
+  "c" = 해당 틱으로 갱신된 각 TF의 마지막 캔들 (장 마감 등으로 캔들 갱신 안 되면 생략)
+  "bt" / "cd" = 틱 지연 추적용 (tick_trace.py) — 없으면 생략
+
+[캔들 스냅샷] 델타만으로는 구독 시작 전에 마감된 캔들이 비므로 (파일 캐시는 5분 주기 저장, 새 배포면 파일 없음)
+  - ingest: 기동(캐시 로드) 직후 + 히스토리 로딩 완료 후 + 요청 시 전체 링을 해시 md:candles 에 기록
+            (필드 "심볼|TF" → {"time": [...], "open": [...], ...}) 후 md:candles:ready 발행
+  - 워커: md:tick 구독 연결마다 md:candles:req 발행(재연결 중 놓친 델타 포함 갭 보정) + 현재 해시 즉시 병합,
+          md:candles:ready 수신 시 다시 병합 → 첫 델타 이전 캔들이 모두 채워짐
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+TICK_CHANNEL = "md:tick"
+INGEST_ALIVE_KEY = "md:ingest:alive"
+INGEST_ALIVE_TTL = 15
+CANDLE_SNAPSHOT_KEY = "md:candles"
+CANDLE_SNAPSHOT_CHANNEL = "md:candles:ready"
+CANDLE_REQUEST_CHANNEL = "md:candles:req"
+# 스냅샷 요청이 몰려도 이 간격(초) 안에서는 1회만 기록 (워커 여러 개 동시 기동)
+CANDLE_SNAPSHOT_MIN_INTERVAL = 3.0
+
+
+class MarketFeedPublisher:
+    """ingest 프로세스 — 틱을 모아 파이프라인 1회로 발행"""
+
+    def __init__(self):
+        self._pending: List[str] = []
+        self._event: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._request_task: Optional[asyncio.Task] = None
+        self._snapshot_task: Optional[asyncio.Task] = None
+        self._snapshot_again = False
+        self._snapshot_at = 0.0
+        self.stats = {"published": 0, "flushes": 0, "errors": 0, "snapshots": 0}
+
+    def publish_tick(self, symbol: str, bid: float, ask: float, price_time, candles: Optional[Dict[str, list]] = None,
+                     recv_ts: Optional[float] = None, broker_ts: Optional[float] = None,
+                     candle_seconds: Optional[float] = None):
+        msg = {"s": symbol, "b": bid, "a": ask, "t": price_time, "r": recv_ts or time.time()}
+        if candles:
+            msg["c"] = candles
+        if broker_ts:
+            msg["bt"] = broker_ts
+        if candle_seconds is not None:
+            msg["cd"] = round(candle_seconds, 6)
+        self._pending.append(json.dumps(msg, separators=(",", ":"), default=str))
+        if self._event is not None:
+            self._event.set()
+
+    async def _run(self):
+        from ..redis_client import get_async_redis
+        r = get_async_redis()
+        last_alive = 0.0
+        print(f"[MarketFeed] 발행 루프 시작 (채널 {TICK_CHANNEL})")
+        while True:
+            try:
+                try:
+                    await asyncio.wait_for(self._event.wait(), timeout=5.0)
+                except asyncio.TimeoutError:
+                    pass
+                self._event.clear()
+
+                batch, self._pending = self._pending, []
+                now = time.time()
+                if not batch and now - last_alive < 5:
+                    continue
+
+                pipe = r.pipeline(transaction=False)
+                for msg in batch:
+                    pipe.publish(TICK_CHANNEL, msg)
+                if now - last_alive >= 5:
+                    pipe.set(INGEST_ALIVE_KEY, os.getpid(), ex=INGEST_ALIVE_TTL)
+                    last_alive = now
+                await pipe.execute()
+                self.stats["published"] += len(batch)
+                self.stats["flushes"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"[MarketFeed] ⚠️ 발행 오류: {e}")
+                await asyncio.sleep(1.0)
+
+    # ========== 캔들 스냅샷 ==========
+    def publish_candle_snapshot(self):
+        """전체 링 스냅샷 기록 예약 — 진행 중이면 끝난 뒤 1회 더 (요청 이후 시점의 링이 반드시 기록되게)"""
+        if self._snapshot_task is not None and not self._snapshot_task.done():
+            self._snapshot_again = True
+            return
+        self._snapshot_task = asyncio.get_running_loop().create_task(self._snapshot_loop())
+
+    async def _snapshot_loop(self):
+        self._snapshot_again = True
+        while self._snapshot_again:
+            self._snapshot_again = False
+            await self._write_candle_snapshot()
+
+    async def _write_candle_snapshot(self):
+        from ..redis_client import get_async_redis
+        from .metaapi_service import candle_snapshot_columns
+        try:
+            wait = CANDLE_SNAPSHOT_MIN_INTERVAL - (time.time() - self._snapshot_at)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._snapshot_at = time.time()
+            t0 = time.perf_counter()
+            cols = candle_snapshot_columns()  # 루프에서 컬럼 복사만
+            fields = await asyncio.to_thread(
+                lambda: {key: json.dumps(c, separators=(",", ":")) for key, c in cols.items()})
+            if not fields:
+                return
+            r = get_async_redis()
+            pipe = r.pipeline(transaction=True)
+            pipe.delete(CANDLE_SNAPSHOT_KEY)
+            pipe.hset(CANDLE_SNAPSHOT_KEY, mapping=fields)
+            pipe.publish(CANDLE_SNAPSHOT_CHANNEL, str(self._snapshot_at))
+            await pipe.execute()
+            self.stats["snapshots"] += 1
+            size = sum(len(v) for v in fields.values())
+            print(f"[MarketFeed] ✅ 캔들 스냅샷 기록: {len(fields)}TF ({size / 1024:.0f}KB, "
+                  f"{(time.perf_counter() - t0) * 1000:.0f}ms)")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"[MarketFeed] ⚠️ 캔들 스냅샷 기록 오류: {e}")
+
+    async def _serve_candle_requests(self):
+        """워커의 스냅샷 요청(md:candles:req) 수신 → 스냅샷 재기록"""
+        from ..redis_client import get_async_redis
+        while True:
+            pubsub = None
+            try:
+                pubsub = get_async_redis().pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(CANDLE_REQUEST_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self.publish_candle_snapshot()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[MarketFeed] ⚠️ 스냅샷 요청 구독 끊김 — 재연결 대기: {e}")
+                await asyncio.sleep(2.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        if self._request_task is None or self._request_task.done():
+            self._request_task = loop.create_task(self._serve_candle_requests())
+        if self._task is not None and not self._task.done():
+            return
+        self._event = asyncio.Event()
+        self._task = loop.create_task(self._run())
+
+
+class MarketFeedSubscriber:
+    """워커 — md:tick 구독 → 로컬 시세/캔들 캐시 적용 + WS 팬아웃"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._snapshot_task: Optional[asyncio.Task] = None
+        self._snapshot_again = False
+        self.last_message_at: float = 0
+        self.stats = {"received": 0, "errors": 0, "reconnects": 0, "snapshots": 0}
+
+    def load_candle_snapshot(self):
+        """md:candles 병합 예약 — 진행 중이면 끝난 뒤 1회 더"""
+        if self._snapshot_task is not None and not self._snapshot_task.done():
+            self._snapshot_again = True
+            return
+        self._snapshot_task = asyncio.get_running_loop().create_task(self._snapshot_loop())
+
+    async def _snapshot_loop(self):
+        self._snapshot_again = True
+        while self._snapshot_again:
+            self._snapshot_again = False
+            await self._load_candle_snapshot()
+
+    async def _load_candle_snapshot(self):
+        from ..redis_client import get_async_redis
+        from .metaapi_service import apply_candle_snapshot
+        try:
+            fields = await get_async_redis().hgetall(CANDLE_SNAPSHOT_KEY)
+            if not fields:
+                return
+            cols = await asyncio.to_thread(lambda: {key: json.loads(v) for key, v in fields.items()})
+            added = await apply_candle_snapshot(cols)
+            self.stats["snapshots"] += 1
+            print(f"[MarketFeed] ✅ 캔들 스냅샷 병합: {len(cols)}TF, 보충 {added}캔들")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"[MarketFeed] ⚠️ 캔들 스냅샷 병합 오류: {e}")
+
+    async def _run(self):
+        from ..redis_client import get_async_redis
+        from .metaapi_service import apply_feed_tick
+        print(f"[MarketFeed] 구독 루프 시작 (채널 {TICK_CHANNEL})")
+        while True:
+            pubsub = None
+            try:
+                r = get_async_redis()
+                pubsub = r.pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(TICK_CHANNEL, CANDLE_SNAPSHOT_CHANNEL)
+                # ★ 델타 구독 후 백필 — 현재 스냅샷 즉시 병합 + ingest에 최신 스냅샷 요청 (ready 수신 시 재병합)
+                self.load_candle_snapshot()
+                await r.publish(CANDLE_REQUEST_CHANNEL, os.getpid())
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    if message.get("channel") == CANDLE_SNAPSHOT_CHANNEL:
+                        self.load_candle_snapshot()
+                        continue
+                    try:
+                        msg = json.loads(message["data"])
+                        apply_feed_tick(msg)
+                        self.stats["received"] += 1
+                        self.last_message_at = time.time()
+                    except Exception as e:
+                        self.stats["errors"] += 1
+                        print(f"[MarketFeed] ⚠️ 틱 적용 오류: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["reconnects"] += 1
+                print(f"[MarketFeed] ⚠️ 구독 끊김 — 재연결 대기: {e}")
+                await asyncio.sleep(2.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
+
+    def start(self):
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def get_status(self) -> Dict:
+        return {
+            "last_message_age": round(time.time() - self.last_message_at, 3) if self.last_message_at else None,
+            **self.stats,
+        }
+
+
+def get_market_data_mode() -> str:
+    """local | ingest | subscriber"""
+    from ..config import settings
+    mode = (settings.MARKET_DATA_MODE or "local").lower()
+    return mode if mode in ("local", "ingest", "subscriber") else "local"
+
+
+market_feed_publisher = MarketFeedPublisher()
+market_feed_subscriber = MarketFeedSubscriber()
@@ -0,0 +1,222 @@
+# app/api/market_hub.py
+"""
+마켓 스냅샷 팬아웃 허브 — /api/mt5/ws, /api/demo/ws 공용
+
+기존: 소켓마다 while 루프에서 get_realtime_data() 호출 + 0.1~0.2초 sleep
+      → 같은 시세/캔들/인디케이터 dict를 소켓 수만큼 매초 여러 번 재생성 + 재직렬화
+변경: 워커당 1개 허브가 틱 도착 시 스냅샷을 1번만 만들고 1번만 JSON 인코딩
+      → 구독 소켓은 크기 제한 큐로 사전 인코딩된 프레임을 받음 (밀리면 오래된 프레임 버림)
+
+[입력] QuotePriceListener.on_symbol_price_updated → ws_broadcast_queue.append + market_hub.notify_tick()
+[출력] MarketSnapshot.encoded — {"all_prices", "all_candles", "buy_count", ...} JSON 조각
+       compose_frame(유저별 dict, snapshot) 으로 유저 데이터와 문자열 결합 (시세 부분 재직렬화 없음)
+[지표] MarketSnapshot.tick_at — 스냅샷에 담긴 가장 이른 미소비 틱 도착 시각 (perf_counter)
+       WS 루프는 frame_built / frame_sent로 프레임 생성 시간 + 틱→전송 지연 기록 (app.metrics)
+       단계별 지연 / 샘플 스팬은 tick_trace.py (샘플 틱이 담긴 스냅샷은 "tick_trace" 키 포함)
+"""
+
+import asyncio
+import json
+import time
+from typing import Dict, List, Optional
+
+from .. import metrics
+from .tick_trace import tick_tracer
+
+# 스냅샷 최소 생성 간격 (초) — 틱 폭주 시 병합
+MIN_BUILD_INTERVAL = 0.1
+# 틱이 없어도 이 간격마다 스냅샷 재생성 (클라이언트 1초 하트비트 유지)
+IDLE_BUILD_INTERVAL = 1.0
+
+
+class MarketSnapshot:
+    """1회 생성된 마켓 스냅샷 (모든 소켓이 공유, 수정 금지)"""
+    __slots__ = ("seq", "timestamp", "tick_at", "trace", "built_at", "prices", "candles", "indicators", "encoded")
+
+    def __init__(self, seq: int, realtime: Dict, tick_at: Optional[float] = None, trace: Optional[Dict] = None):
+        self.seq = seq
+        self.tick_at = tick_at
+        self.trace = trace
+        self.timestamp = realtime.get("timestamp", time.time())
+        self.prices = realtime.get("prices", {})
+        self.candles = realtime.get("candles", {})
+        self.indicators = realtime.get("indicators", {})
+        self.encoded = json.dumps({
+            "buy_count": self.indicators.get("buy", 50),
+            "sell_count": self.indicators.get("sell", 30),
+            "neutral_count": self.indicators.get("neutral", 20),
+            "base_score": self.indicators.get("score", 50.0),
+            "all_prices": self.prices,
+            "all_candles": self.candles,
+            **({"tick_trace": trace} if trace else {}),
+        }, default=str)
+        self.built_at = time.perf_counter()
+
+
+def compose_frame(user_data: Dict, snapshot: Optional[MarketSnapshot]) -> str:
+    """유저별 dict + 사전 인코딩된 마켓 조각 → 최종 WS 프레임 문자열"""
+    body = json.dumps(user_data, default=str)
+    if snapshot is None:
+        return body
+    if body == "{}":
+        return snapshot.encoded
+    return body[:-1] + "," + snapshot.encoded[1:]
+
+
+def frame_built(mode: str, started: float) -> float:
+    """WS 루프 — 스냅샷 수신(started, perf_counter) → 프레임 문자열 완성. 반환: 전송 시작 시각"""
+    now = time.perf_counter()
+    metrics.ws_frame_build.observe(now - started, mode)
+    return now
+
+
+def frame_sent(mode: str, snapshot: Optional[MarketSnapshot], last_seq: int,
+               started: float, send_started: float) -> int:
+    """WS 루프 — 프레임 전송 직후. 스냅샷당 1회만 틱→전송 지연 + 단계 기록 (하트비트 재전송 제외)
+    반환값을 다음 호출의 last_seq로 전달"""
+    if snapshot is None or snapshot.seq == last_seq:
+        return last_seq
+    now = time.perf_counter()
+    if snapshot.tick_at is not None:
+        metrics.tick_to_ws_send.observe(now - snapshot.tick_at, mode)
+    tick_tracer.on_send(mode, snapshot, started, send_started, now)
+    return snapshot.seq
+
+
+class _Subscriber:
+    """소켓 1개의 구독 — 최신 프레임만 유지하는 제한 큐"""
+    __slots__ = ("queue", "dropped")
+
+    def __init__(self, maxsize: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+
+class MarketHub:
+    """워커당 1개 — 스냅샷 생성/인코딩 1회 → 구독 소켓 팬아웃"""
+
+    def __init__(self):
+        self._subscribers: List[_Subscriber] = []
+        self._latest: Optional[MarketSnapshot] = None
+        self._seq = 0
+        self._tick_event: Optional[asyncio.Event] = None
+        self._tick_at: Optional[float] = None   # 다음 스냅샷에 담길 첫 틱 도착 시각
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"builds": 0, "ticks": 0, "dropped": 0, "build_ms": 0.0}
+
+    @property
+    def latest(self) -> Optional[MarketSnapshot]:
+        return self._latest
+
+    # ========== 입력 ==========
+    def notify_tick(self):
+        """새 틱 도착 알림 (QuotePriceListener에서 호출, 이벤트 루프 안)"""
+        if self._tick_at is None:
+            self._tick_at = time.perf_counter()
+        if self._tick_event is not None:
+            self._tick_event.set()
+
+    # ========== 구독 ==========
+    def subscribe(self, maxsize: int = 1) -> _Subscriber:
+        self.start()
+        sub = _Subscriber(maxsize)
+        self._subscribers.append(sub)
+        if self._latest is not None:
+            sub.queue.put_nowait(self._latest)
+        return sub
+
+    def unsubscribe(self, sub: _Subscriber):
+        try:
+            self._subscribers.remove(sub)
+        except ValueError:
+            pass
+
+    def wake(self, sub: _Subscriber):
+        """소켓 1개만 즉시 깨우기 — 최신 스냅샷을 다시 넣어 유저 데이터 변경을 다음 틱 전에 전송"""
+        if self._latest is None or sub.queue.full():
+            return  # 이미 대기 중인 프레임이 있으면 그 프레임에서 새 유저 데이터가 나감
+        sub.queue.put_nowait(self._latest)
+
+    async def next_snapshot(self, sub: _Subscriber, timeout: float = IDLE_BUILD_INTERVAL) -> Optional[MarketSnapshot]:
+        """다음 스냅샷 대기 — 타임아웃이면 최신 스냅샷 반환"""
+        try:
+            return await asyncio.wait_for(sub.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return self._latest
+
+    # ========== 생성 + 팬아웃 ==========
+    def _build(self) -> MarketSnapshot:
+        from .metaapi_service import get_realtime_data, ws_broadcast_queue
+        # ★ 틱 큐 비우기 (소켓이 직접 읽지 않으므로 여기서 소비)
+        ticks = list(ws_broadcast_queue)
+        ws_broadcast_queue.clear()
+        self.stats["ticks"] += len(ticks)
+
+        tick_at, self._tick_at = self._tick_at, None
+        t0 = time.perf_counter()
+        self._seq += 1
+        trace = tick_tracer.on_build(ticks, t0, self._seq)
+        snap = MarketSnapshot(self._seq, get_realtime_data(), tick_at, trace)
+        build_seconds = time.perf_counter() - t0
+        tick_tracer.finish_build(build_seconds)
+        self.stats["build_ms"] = round(build_seconds * 1000, 3)
+        self.stats["builds"] += 1
+        return snap
+
+    def _publish(self, snap: MarketSnapshot):
+        self._latest = snap
+        for sub in self._subscribers:
+            q = sub.queue
+            if q.full():
+                # 느린 소켓 → 오래된 프레임 버리고 최신으로 교체
+                try:
+                    q.get_nowait()
+                    sub.dropped += 1
+                    self.stats["dropped"] += 1
+                except asyncio.QueueEmpty:
+                    pass
+            q.put_nowait(snap)
+
+    async def _run(self):
+        print("[MarketHub] 스냅샷 팬아웃 루프 시작")
+        last_build = 0.0
+        while True:
+            try:
+                try:
+                    await asyncio.wait_for(self._tick_event.wait(), timeout=IDLE_BUILD_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                self._tick_event.clear()
+
+                # 틱 병합: 최소 간격 미달이면 잠시 대기 후 한 번에 생성
+                wait = MIN_BUILD_INTERVAL - (time.monotonic() - last_build)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    self._tick_event.clear()
+
+                last_build = time.monotonic()
+                self._publish(self._build())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[MarketHub] ⚠️ 스냅샷 생성 오류: {e}")
+                await asyncio.sleep(1.0)
+
+    def start(self):
+        """팬아웃 루프 시작 (main.py startup + 첫 구독 시 보장)"""
+        if self._task is not None and not self._task.done():
+            return
+        self._tick_event = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def get_status(self) -> Dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "seq": self._seq,
+            "latest_age": round(time.time() - self._latest.timestamp, 3) if self._latest else None,
+            **self.stats,
+        }
+
+
+# 워커 전역 인스턴스
+market_hub = MarketHub()
@@ -9,7 +9,7 @@ import os
 import time
 import random
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from dotenv import load_dotenv
 
 import json
@@ -26,10 +26,31 @@ except ImportError:
     is_redis_available = lambda: False
     print("[MetaAPI] ⚠️ Redis client not available — dict fallback only")
 
+# ★ 데모 매칭 엔진 (틱마다 TP/SL 트리거 체크)
+from .demo_matching_engine import demo_matching_engine
+# ★ WS 팬아웃 허브 (틱마다 스냅샷 1회 생성)
+from .market_hub import market_hub
+from .user_stream_hub import user_stream_hub
+from .deal_store import deal_store
+# ★ Redis 병합 쓰기 (시세/유저 캐시 — 틱마다 동기 SET 대신 주기적 파이프라인)
+from .redis_writer import redis_writer
+# ★ 캔들 링 버퍼 (심볼/TF별 고정 용량 컬럼 배열)
+from .candle_store import CandleRing, CandleFileStore, CandleWatermarks
+# ★ ingest 프로세스 ↔ 워커 시세 피드
+from .market_feed import market_feed_publisher, market_feed_subscriber
+# ★ 프로세스 내 지표 (틱 수신 카운터, RPC 시간)
+from .. import metrics
+# ★ 틱 단계별 지연 추적 (콜백 → 캔들 → 스냅샷 → WS 전송)
+from .tick_trace import tick_tracer
+
 # ★ 심볼 설정 단일 관리 (symbol_config.py에서 import)
-from app.symbol_config import SYMBOLS, SYMBOL_SPECS, _MARKET_SCHEDULE, SYMBOL_VOLATILITY
+from app.symbol_config import SYMBOLS, SYMBOL_SPECS, SYMBOL_VOLATILITY
+# ★ 종목별 거래시간 캘린더 (틱마다 스케줄 파싱/DST 계산 없음)
+from ..services.market_calendar import market_calendar
 
-# ★ 캔들 캐시 파일 경로
+# ★ 캔들 캐시 파일 경로 (바이너리 디렉토리 — candle_store.CandleFileStore)
+CANDLE_CACHE_DIR = Path("/var/www/trading-x/backend/candle_cache")
+# 구버전 JSON 캐시 (바이너리 캐시가 없을 때 1회 마이그레이션용)
 CANDLE_CACHE_FILE = Path("/var/www/trading-x/backend/candle_cache.json")
 
 # .env 로드
@@ -49,7 +70,7 @@ except ImportError:
 # 전역 캐시 (WS에서 직접 접근용) - bridge_cache 대체
 # ============================================================
 quote_price_cache: Dict[str, Dict] = {}  # {"BTCUSD": {"bid": 70000, "ask": 70010}, ...}
-quote_candle_cache: Dict[str, Dict[str, List]] = {}  # {"BTCUSD": {"M1": [...], "M5": [...]}, ...}
+quote_candle_cache: Dict[str, Dict[str, CandleRing]] = {}  # {"BTCUSD": {"M1": CandleRing, "M5": CandleRing}, ...} — candle_store.py
 quote_last_update: float = 0
 quote_connected: bool = False
 
@@ -317,8 +338,8 @@ async def initialize_candles_from_api(account, symbol: str, timeframe: str = "M1
             print(f"[MetaAPI] {symbol} 히스토리 캔들 없음")
             return False
 
-        # 캔들 변환 및 저장
-        candles = []
+        # 캔들 변환 (컬럼 배치 — dict 생성/정렬 없음)
+        cols = {"time": [], "open": [], "high": [], "low": [], "close": [], "volume": []}
         for c in candles_data:
             # datetime을 timestamp로 변환
             candle_time = c.get('time')
@@ -327,43 +348,21 @@ async def initialize_candles_from_api(account, symbol: str, timeframe: str = "M1
             elif isinstance(candle_time, str):
                 candle_time = int(datetime.fromisoformat(candle_time.replace('Z', '+00:00')).timestamp())
 
-            candles.append({
-                'time': candle_time,
-                'open': c.get('open', 0),
-                'high': c.get('high', 0),
-                'low': c.get('low', 0),
-                'close': c.get('close', 0),
-                'volume': c.get('tickVolume', 0) or c.get('volume', 0)
-            })
-
-        # 시간순 정렬 (오래된 것부터)
-        candles.sort(key=lambda x: x['time'])
-
-        if symbol not in quote_candle_cache:
-            quote_candle_cache[symbol] = {}
-
-        # ★★★ 기존 캐시와 병합 (갭 방지) ★★★
-        existing = quote_candle_cache[symbol].get(timeframe, [])
-        if existing:
-            # 기존 캔들 + 새 캔들 합치고 time 기준 정렬 + 중복 제거
-            merged = {c['time']: c for c in existing}
-            for c in candles:
-                merged[c['time']] = c  # 새 데이터가 우선
-            candles = sorted(merged.values(), key=lambda x: x['time'])
-            # 최대 개수 제한
-            max_candles = _TF_CONFIG.get(timeframe, (1, 1500))[1]
-            if len(candles) > max_candles:
-                candles = candles[-max_candles:]
-            print(f"[MetaAPI] ✅ {symbol}/{timeframe} 병합 완료: 기존 {len(existing)}개 + 신규 → {len(candles)}개")
+            cols["time"].append(candle_time)
+            cols["open"].append(c.get('open', 0))
+            cols["high"].append(c.get('high', 0))
+            cols["low"].append(c.get('low', 0))
+            cols["close"].append(c.get('close', 0))
+            cols["volume"].append(c.get('tickVolume', 0) or c.get('volume', 0))
+
+        # ★★★ 기존 캐시와 time 기준 병합 (갭 방지) + 워터마크 기록 ★★★
+        existed = len(quote_candle_cache.get(symbol, {}).get(timeframe) or [])
+        added, replaced = ingest_candle_batch(symbol, timeframe, cols, source="metaapi")
+        total = len(quote_candle_cache[symbol][timeframe])
+        if existed:
+            print(f"[MetaAPI] ✅ {symbol}/{timeframe} 병합 완료: 기존 {existed}개 + 신규 {added}개 (갱신 {replaced}개) → {total}개")
         else:
-            print(f"[MetaAPI] ✅ {symbol}/{timeframe} 히스토리 캔들 {len(candles)}개 로딩 완료")
-        quote_candle_cache[symbol][timeframe] = candles
-
-        # 첫 5개 캔들 출력 (검증용)
-        if symbol == "BTCUSD" and len(candles) >= 5:
-            print(f"[MetaAPI] {symbol} 캔들 첫 5개:")
-            for i, c in enumerate(candles[:5]):
-                print(f"  [{i}] time={c['time']} O={c['open']} H={c['high']} L={c['low']} C={c['close']}")
+            print(f"[MetaAPI] ✅ {symbol}/{timeframe} 히스토리 캔들 {total}개 로딩 완료")
 
         return True
 
@@ -388,7 +387,7 @@ def initialize_candles_synthetic(symbol: str, current_price: float, count: int =
     candle_time = current_ts - (current_ts % 60)  # 1분 단위 정렬
 
     if symbol not in quote_candle_cache:
-        quote_candle_cache[symbol] = {"M1": []}
+        quote_candle_cache[symbol] = {}
 
     # 이미 캔들이 있으면 스킵
     if quote_candle_cache[symbol].get("M1") and len(quote_candle_cache[symbol]["M1"]) >= count:
@@ -428,7 +427,7 @@ def initialize_candles_synthetic(symbol: str, current_price: float, count: int =
 
         price = close_price  # 다음 캔들의 시작가
 
-    quote_candle_cache[symbol]["M1"] = candles
+    quote_candle_cache[symbol]["M1"] = CandleRing.from_dicts(candles, _TF_CONFIG["M1"][1])
     print(f"[MetaAPI] ⚠️ {symbol} 합성 캔들 {len(candles)}개 생성 (Fallback, 가격: {current_price:.2f})")
 
 
@@ -450,69 +449,27 @@ _TF_CONFIG = {
     "MN1": (43200, 200),
 }
 
-# ★★★ _MARKET_SCHEDULE → symbol_config.py에서 자동 import됨 ★★★
-
-def _get_mt5_offset():
-    """MT5 서버 시간 오프셋 (UTC+2 겨울, UTC+3 여름)"""
-    now = datetime.now()
-    year = now.year
-    # 유럽 DST: 3월 마지막 일요일 ~ 10월 마지막 일요일
-    import calendar
-    mar_last = max(d for d in range(25, 32) if calendar.weekday(year, 3, d) == 6)
-    oct_last = max(d for d in range(25, 32) if calendar.weekday(year, 10, d) == 6)
-    dst_start = datetime(year, 3, mar_last, 1, 0, 0)  # UTC 기준
-    dst_end = datetime(year, 10, oct_last, 1, 0, 0)
-    return 3 if dst_start <= now.replace(tzinfo=None) < dst_end else 2
+# ★★★ _MARKET_SCHEDULE → services/market_calendar에서 시작 시 1회 컴파일 ★★★
 
 def _is_market_open(symbol: str) -> bool:
-    """★ 종목별 거래시간 체크 (MT5 서버시간 기준)"""
-    schedule = _MARKET_SCHEDULE.get(symbol)
-    if not schedule:
-        return True  # 스케줄 없으면 열린 것으로 간주
-
-    # 현재 MT5 서버시간 계산
-    offset = _get_mt5_offset()
-    now_utc = datetime.utcnow()
-    server_time = now_utc + timedelta(hours=offset)
-    day_names = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
-    day_key = day_names[server_time.weekday()]
-
-    day_hours = schedule.get(day_key)
-    if not day_hours:
-        return False  # 해당 요일에 스케줄 없음 = 휴장
-
-    current_min = server_time.hour * 60 + server_time.minute
-
-    # 복수 세션 지원: "00:02-23:57,12:30-14:00"
-    for session in day_hours.split(","):
-        session = session.strip()
-        parts = session.split("-")
-        if len(parts) == 2:
-            open_parts = parts[0].strip().split(":")
-            close_parts = parts[1].strip().split(":")
-            if len(open_parts) == 2 and len(close_parts) == 2:
-                open_min = int(open_parts[0]) * 60 + int(open_parts[1])
-                close_min = int(close_parts[0]) * 60 + int(close_parts[1])
-                if open_min <= current_min <= close_min:
-                    return True
-
-    return False
+    """★ 종목별 거래시간 체크 (MT5 서버시간 기준) — 컴파일된 캘린더, 경계 전이면 비교 1회"""
+    return market_calendar.is_open(symbol)
 
 # 동일가 감지용 카운터 (장 마감 보조 체크)
 _same_price_counter = {}
 _last_prices = {}
 
 
-def update_candle_realtime(symbol: str, current_price: float):
-    """실시간 캔들 업데이트 - 모든 타임프레임 동시 업데이트"""
+def update_candle_realtime(symbol: str, current_price: float) -> bool:
+    """실시간 캔들 업데이트 - 모든 타임프레임 동시 업데이트 (갱신했으면 True)"""
     global quote_candle_cache, _same_price_counter, _last_prices
 
     if current_price <= 0:
-        return
+        return False
 
     # ★★★ 체크 1: 거래시간 스케줄 체크 (종목별 정확한 운영시간) ★★★
     if not _is_market_open(symbol):
-        return  # 장 마감 → 캔들 생성 중단
+        return False  # 장 마감 → 캔들 생성 중단
 
     # ★★★ 체크 2: 동일가 연속 감지 (보조 안전장치) ★★★
     _now_price = round(current_price, 5)
@@ -522,66 +479,178 @@ def update_candle_realtime(symbol: str, current_price: float):
     if _prev_price is not None and _prev_price == _now_price:
         _same_price_counter[symbol] = _same_price_counter.get(symbol, 0) + 1
         if _same_price_counter[symbol] >= 60:  # 60회 연속 동일가 → 장 마감 추정
-            return
+            return False
     else:
         _same_price_counter[symbol] = 0
 
     current_ts = int(time.time())
 
-    if symbol not in quote_candle_cache:
-        quote_candle_cache[symbol] = {}
-
     for tf, (minutes, max_candles) in _TF_CONFIG.items():
         seconds = minutes * 60
-
-        if tf not in quote_candle_cache[symbol]:
-            quote_candle_cache[symbol][tf] = []
-
-        candles = quote_candle_cache[symbol][tf]
+        candles = _candle_ring(symbol, tf)
 
         # ★ D1/W1/MN1: 히스토리 캔들의 시간 기준 유지 (MetaAPI=16:00/22:00 vs UTC=00:00 충돌 방지)
         if tf in ("D1", "W1", "MN1") and candles:
-            last_time = candles[-1]['time']
+            last_time = candles.last_time
             if current_ts < last_time + seconds:
                 # 현재 캔들 기간 내 — OHLC 업데이트
-                candles[-1]['close'] = current_price
-                candles[-1]['high'] = max(candles[-1]['high'], current_price)
-                candles[-1]['low'] = min(candles[-1]['low'], current_price)
+                candles.update_last(current_price)
             else:
-                # 새 캔들 기간 — 히스토리 기준 시간으로 생성
+                # 새 캔들 기간 — 히스토리 기준 시간으로 생성 (용량 초과 시 가장 오래된 캔들 덮어씀)
                 periods = (current_ts - last_time) // seconds
                 new_time = last_time + periods * seconds
-                candles.append({
-                    'time': new_time,
-                    'open': current_price,
-                    'high': current_price,
-                    'low': current_price,
-                    'close': current_price,
-                    'volume': 0
-                })
-                while len(candles) > max_candles:
-                    candles.pop(0)
+                candles.append(new_time, current_price, current_price, current_price, current_price, 0)
             continue
 
         # 기존 로직 (M1~H4)
         candle_time = (current_ts // seconds) * seconds
 
-        if candles and candles[-1].get('time') == candle_time:
-            candles[-1]['close'] = current_price
-            candles[-1]['high'] = max(candles[-1]['high'], current_price)
-            candles[-1]['low'] = min(candles[-1]['low'], current_price)
+        if candles and candles.last_time == candle_time:
+            candles.update_last(current_price)
         else:
-            new_candle = {
-                'time': candle_time,
-                'open': current_price,
-                'high': current_price,
-                'low': current_price,
-                'close': current_price,
-                'volume': 0
-            }
-            candles.append(new_candle)
-            while len(candles) > max_candles:
-                candles.pop(0)
+            candles.append(candle_time, current_price, current_price, current_price, current_price, 0)
+
+    return True
+
+
+def _candle_ring(symbol: str, tf: str) -> CandleRing:
+    """심볼/TF 링 버퍼 조회 (없으면 _TF_CONFIG 용량으로 생성)"""
+    tfs = quote_candle_cache.get(symbol)
+    if tfs is None:
+        tfs = quote_candle_cache[symbol] = {}
+    ring = tfs.get(tf)
+    if ring is None:
+        ring = tfs[tf] = CandleRing(_TF_CONFIG.get(tf, (1, 1500))[1])
+    return ring
+
+
+# 심볼/TF별 히스토리 커버리지 (candle_cache/watermarks.json) — 재시작 시 갭만 요청
+candle_watermarks = CandleWatermarks(CANDLE_CACHE_DIR / "watermarks.json")
+
+
+def ingest_candle_batch(symbol: str, tf: str, cols: Dict[str, list], source: str = "metaapi") -> Tuple[int, int]:
+    """히스토리 컬럼 배치 → 링 버퍼 time 기준 병합 + 워터마크 기록 → (추가 수, 교체 수)"""
+    times = cols.get("time") or []
+    if not times:
+        return 0, 0
+    added, replaced = _candle_ring(symbol, tf).merge_columns(cols)
+    candle_watermarks.record(symbol, tf, min(times), max(times), source)
+    return added, replaced
+
+
+def history_gap_count(symbol: str, tf: str, full: int) -> int:
+    """다음 히스토리 요청 개수 — 워터마크 이후 갭만 (이력 없으면 full)"""
+    ring = quote_candle_cache.get(symbol, {}).get(tf)
+    return candle_watermarks.gap_count(symbol, tf, ring, _TF_CONFIG.get(tf, (1, 1500))[0] * 60, full)
+
+
+def _candle_delta(symbol: str) -> Dict[str, list]:
+    """피드 발행용 — 각 TF 마지막 캔들 [time, open, high, low, close, volume]"""
+    delta = {}
+    for tf, candles in quote_candle_cache.get(symbol, {}).items():
+        if candles:
+            c = candles[-1]
+            delta[tf] = [c['time'], c['open'], c['high'], c['low'], c['close'], c.get('volume', 0)]
+    return delta
+
+
+def apply_candle_delta(symbol: str, tf: str, row: list):
+    """피드 구독용 — 마지막 캔들 교체 또는 새 캔들 추가 (update_candle_realtime 재계산 없음)"""
+    t, o, h, l, c, v = row
+    candles = _candle_ring(symbol, tf)
+    if candles and candles.last_time == t:
+        candles.set_last(o, h, l, c, v)
+    elif not candles or t > candles.last_time:
+        candles.append(t, o, h, l, c, v)
+
+
+def candle_snapshot_columns() -> Dict[str, Dict[str, list]]:
+    """ingest 스냅샷용 — {"심볼|TF": {"time": [...], "open": [...], ...}} (이벤트 루프에서 컬럼 복사만)"""
+    out = {}
+    for symbol, tfs in list(quote_candle_cache.items()):
+        for tf, ring in list(tfs.items()):
+            if ring:
+                out[f"{symbol}|{tf}"] = {name: col.tolist() for name, col in ring.columns().items()}
+    return out
+
+
+async def apply_candle_snapshot(snapshot: Dict[str, Dict[str, list]]) -> int:
+    """
+    피드 구독용 — ingest 스냅샷을 링에 time 기준 병합 (구독 시작 전/재연결 중 마감된 캔들 백필)
+    스냅샷 마지막 캔들은 기록 시점의 형성 중 캔들 → 이미 델타로 그 시각 이후를 받았으면 델타 값 유지
+    링 하나 병합마다 양보 (이벤트 루프 점유 최소화). Returns: 보충된 캔들 수
+    """
+    added = 0
+    for key, cols in snapshot.items():
+        symbol, _, tf = key.partition("|")
+        times = cols.get("time") or []
+        if not times:
+            continue
+        ring = _candle_ring(symbol, tf)
+        if ring and ring.last_time >= times[-1]:
+            cols = {name: col[:-1] for name, col in cols.items()}
+        if cols["time"]:
+            added += ring.merge_columns(cols)[0]
+        await asyncio.sleep(0)
+    return added
+
+
+# ★ 시세 수신 역할 (startup_metaapi에서 설정) — market_feed.py 참고
+# local: 직접 Quote 연결 / ingest: Quote 연결 + 피드 발행 (WS 없음) / subscriber: 피드 구독
+_market_role = "local"
+# 틱 카운터 라벨 키 (심볼별 1회 생성 — 틱마다 튜플 할당 없음)
+_tick_metric_keys: Dict[str, Tuple[str, str]] = {}
+
+
+def _fanout_tick(symbol: str, bid, ask, price_time, rx: Optional[float] = None, span: Optional[Dict] = None):
+    """틱 후처리 — 데모 매칭 + 인디케이터 기준값 + WS 팬아웃 (WS가 있는 워커에서만)
+    rx: 워커 도착 시각 (perf_counter), span: tick_tracer 샘플 스팬 — 스냅샷 생성까지 틱 큐 항목에 실어 보냄"""
+    # 데모 매칭 엔진: 심볼 트리거 북에서 TP/SL 발동분만 추출 (유저별 DB 조회 없음)
+    if bid and ask:
+        try:
+            demo_matching_engine.on_tick(symbol, bid, ask)
+        except Exception as e:
+            print(f"[DemoEngine] ⚠️ 틱 매칭 오류 ({symbol}): {e}")
+
+    # 인디케이터 기준값 재계산 (BTCUSD 기준) - 새 틱 도착 시 리셋
+    if symbol == "BTCUSD":
+        calculate_indicators_base("BTCUSD")
+
+    # WS 브로드캐스트 큐에 추가 (market_hub가 소비 → 스냅샷 1회 생성 후 팬아웃)
+    ws_broadcast_queue.append({
+        'type': 'price_update',
+        'symbol': symbol,
+        'bid': bid,
+        'ask': ask,
+        'time': price_time,
+        'rx': rx,
+        'trace': span
+    })
+    market_hub.notify_tick()
+    if rx is not None:
+        tick_tracer.stage(span, "fanout", time.perf_counter() - rx)
+
+
+def apply_feed_tick(msg: Dict):
+    """subscriber 워커 — ingest 프로세스가 발행한 틱 1건 적용"""
+    global quote_last_update, quote_connected
+    symbol = msg.get('s')
+    if symbol not in SYMBOLS:
+        return
+    rx = time.perf_counter()
+    # ★ 틱 추적: ingest 수신 시각(r) 기준 — broker/candle은 ingest가 측정해 실어 보낸 값
+    sent_ts = msg.get('r') or time.time()
+    span = tick_tracer.admit(symbol, msg.get('bt'), sent_ts)
+    tick_tracer.stage(span, "feed", time.time() - sent_ts)
+    if msg.get('cd') is not None:
+        tick_tracer.stage(span, "candle", msg['cd'])
+    bid, ask, price_time = msg.get('b'), msg.get('a'), msg.get('t')
+    quote_price_cache[symbol] = {'bid': bid, 'ask': ask, 'time': price_time}
+    quote_last_update = time.time()
+    quote_connected = True
+    for tf, row in (msg.get('c') or {}).items():
+        apply_candle_delta(symbol, tf, row)
+    _fanout_tick(symbol, bid, ask, price_time, rx, span)
 
 
 # ============================================================
@@ -597,11 +666,22 @@ class QuotePriceListener:
         symbol = price.get('symbol')
         if symbol not in SYMBOLS:
             return
+        # ★ 틱 추적: 수신 시각 (벽시계 — 브로커 시각과 비교 / perf — 단계 간격)
+        recv_ts = time.time()
+        rx = time.perf_counter()
+
+        tick_key = _tick_metric_keys.get(symbol)
+        if tick_key is None or tick_key[1] != _market_role:
+            tick_key = _tick_metric_keys[symbol] = (symbol, _market_role)
+        metrics.ticks_total.inc(tick_key)
 
-        # datetime을 timestamp로 변환
+        # datetime을 timestamp로 변환 (추적용 소수 초는 따로 보관)
         price_time = price.get('time')
+        broker_ts = None
         if isinstance(price_time, datetime):
-            price_time = int(price_time.timestamp())
+            broker_ts = price_time.timestamp()
+            price_time = int(broker_ts)
+        span = tick_tracer.admit(symbol, broker_ts, recv_ts) if _market_role != "ingest" else None
 
         bid = price.get('bid')
         ask = price.get('ask')
@@ -617,29 +697,29 @@ class QuotePriceListener:
         # ★ Redis 병행 저장
         try:
             if redis_set_price and bid and ask:
-                redis_set_price(symbol, bid, ask)
+                redis_writer.set_price(symbol, bid, ask)
         except Exception:
             pass
 
         # 2. 캔들 실시간 업데이트 (모든 심볼)
+        candle_updated = False
         if bid and bid > 0:
-            update_candle_realtime(symbol, bid)
+            candle_updated = update_candle_realtime(symbol, bid)
             # 디버그: XAUUSD 틱 수신 확인
             if symbol == "XAUUSD.r":
                 print(f"[MetaAPI Tick] {symbol} bid={bid:.2f} ask={ask:.2f}")
+        candle_seconds = time.perf_counter() - rx
 
-        # 3. 인디케이터 기준값 재계산 (BTCUSD 기준) - 새 틱 도착 시 리셋
-        if symbol == "BTCUSD":
-            calculate_indicators_base("BTCUSD")
+        # 3. ingest 프로세스: 워커들에게 틱 + 캔들 델타 발행 (WS/데모 매칭은 워커 담당)
+        #    추적 단계(broker/candle)는 워커가 자기 tick_tracer에 기록 (수집 프로세스는 조회 엔드포인트 없음)
+        if _market_role == "ingest":
+            market_feed_publisher.publish_tick(symbol, bid, ask, price_time, _candle_delta(symbol) if candle_updated else None,
+                                               recv_ts=recv_ts, broker_ts=broker_ts, candle_seconds=candle_seconds)
+            return
 
-        # 4. WS 브로드캐스트 큐에 추가 (별도 태스크에서 처리)
-        ws_broadcast_queue.append({
-            'type': 'price_update',
-            'symbol': symbol,
-            'bid': bid,
-            'ask': ask,
-            'time': price_time
-        })
+        # 4. 데모 매칭 + 인디케이터 + WS 팬아웃
+        tick_tracer.stage(span, "candle", candle_seconds)
+        _fanout_tick(symbol, bid, ask, price_time, rx, span)
 
     async def on_connected(self, instance_index, replicas):
         global quote_connected
@@ -1177,7 +1257,7 @@ class MetaAPIService:
             if redis_set_price:
                 for _sym, _pd in prices.items():
                     if _pd.get('bid') and _pd.get('ask'):
-                        redis_set_price(_sym, _pd['bid'], _pd['ask'])
+                        redis_writer.set_price(_sym, _pd['bid'], _pd['ask'])
         except Exception:
             pass
 
@@ -1496,18 +1576,19 @@ class MetaAPIService:
                 else:
                     print(f"[MetaAPI] 경고: 현재가 없음 ({symbol}), SL/TP 생략")
 
-            if order_type.upper() == 'BUY':
-                result = await self.trade_connection.create_market_buy_order(
-                    symbol=symbol,
-                    volume=volume,
-                    options=options
-                )
-            else:
-                result = await self.trade_connection.create_market_sell_order(
-                    symbol=symbol,
-                    volume=volume,
-                    options=options
-                )
+            with metrics.rpc_timer("create_order"):
+                if order_type.upper() == 'BUY':
+                    result = await self.trade_connection.create_market_buy_order(
+                        symbol=symbol,
+                        volume=volume,
+                        options=options
+                    )
+                else:
+                    result = await self.trade_connection.create_market_sell_order(
+                        symbol=symbol,
+                        volume=volume,
+                        options=options
+                    )
 
             print(f"[MetaAPI] 주문 응답: {result}")
 
@@ -1521,11 +1602,12 @@ class MetaAPIService:
                     # 1차: modify_position으로 TP/SL 확실히 설정
                     try:
                         await asyncio.sleep(0.5)
-                        modify_result = await self.trade_connection.modify_position(
-                            position_id=position_id,
-                            stop_loss=options.get('stopLoss'),
-                            take_profit=options.get('takeProfit')
-                        )
+                        with metrics.rpc_timer("modify_position"):
+                            modify_result = await self.trade_connection.modify_position(
+                                position_id=position_id,
+                                stop_loss=options.get('stopLoss'),
+                                take_profit=options.get('takeProfit')
+                            )
                         print(f"[MetaAPI] SL/TP 설정 결과: {modify_result}")
                         if modify_result and modify_result.get('stringCode') == 'TRADE_RETCODE_DONE':
                             tp_sl_confirmed = True
@@ -1539,11 +1621,12 @@ class MetaAPIService:
                     if not tp_sl_confirmed:
                         try:
                             await asyncio.sleep(1.0)
-                            modify_result2 = await self.trade_connection.modify_position(
-                                position_id=position_id,
-                                stop_loss=options.get('stopLoss'),
-                                take_profit=options.get('takeProfit')
-                            )
+                            with metrics.rpc_timer("modify_position"):
+                                modify_result2 = await self.trade_connection.modify_position(
+                                    position_id=position_id,
+                                    stop_loss=options.get('stopLoss'),
+                                    take_profit=options.get('takeProfit')
+                                )
                             print(f"[MetaAPI] SL/TP 재시도 결과: {modify_result2}")
                             if modify_result2 and modify_result2.get('stringCode') == 'TRADE_RETCODE_DONE':
                                 tp_sl_confirmed = True
@@ -1595,7 +1678,8 @@ class MetaAPIService:
                 return {'success': False, 'error': 'Trade 계정 연결 실패'}
 
         try:
-            result = await self.trade_connection.close_position(position_id)
+            with metrics.rpc_timer("close_position"):
+                result = await self.trade_connection.close_position(position_id)
 
             if result.get('stringCode') == 'TRADE_RETCODE_DONE':
                 # ★★★ MT5 실제 체결 손익 조회 ★★★
@@ -1605,7 +1689,8 @@ class MetaAPIService:
                 try:
                     import asyncio
                     await asyncio.sleep(0.5)  # MT5 처리 대기
-                    deals = await self.get_deals_by_position(position_id)
+                    with metrics.rpc_timer("deals_by_position"):
+                        deals = await self.get_deals_by_position(position_id)
                     if deals:
                         # 청산 딜(entryType=DEAL_ENTRY_OUT)에서 실제 손익 추출
                         for deal in deals:
@@ -1984,50 +2069,88 @@ def get_realtime_data() -> Dict:
 # ============================================================
 # 캔들 캐시 파일 저장/로드
 # ============================================================
+_candle_file_store = CandleFileStore(CANDLE_CACHE_DIR)
+
+
+def _log_candle_save(stats: Dict, elapsed_ms: float):
+    print(f"[CandleCache] ✅ 저장 완료: 전체 {stats['full']}TF / 증분 {stats['patch']}TF "
+          f"({stats['bytes'] / 1024:.0f}KB, {elapsed_ms:.1f}ms)")
+
+
 def save_candle_cache():
-    """캔들 캐시를 JSON 파일로 저장 (atomic write)"""
-    global quote_candle_cache
+    """캔들 캐시 바이너리 저장 (동기 — 종료 시 사용, 변경분만 기록)"""
     try:
-        tmp_file = CANDLE_CACHE_FILE.with_suffix('.tmp')
-        with open(tmp_file, 'w') as f:
-            json.dump(quote_candle_cache, f)
-        tmp_file.rename(CANDLE_CACHE_FILE)
-        total = sum(len(tfs) for tfs in quote_candle_cache.values())
-        print(f"[CandleCache] ✅ 저장 완료: {total}개 TF ({CANDLE_CACHE_FILE.stat().st_size / 1024:.0f}KB)")
+        t0 = time.perf_counter()
+        stats = _candle_file_store.write(_candle_file_store.snapshot(quote_candle_cache))
+        candle_watermarks.save()
+        _log_candle_save(stats, (time.perf_counter() - t0) * 1000)
+    except Exception as e:
+        print(f"[CandleCache] ❌ 저장 실패: {e}")
+
+
+async def save_candle_cache_async():
+    """캔들 캐시 바이너리 저장 — 스냅샷만 루프에서, 파일 I/O는 스레드에서 (이벤트 루프 블로킹 없음)"""
+    try:
+        t0 = time.perf_counter()
+        jobs = _candle_file_store.snapshot(quote_candle_cache)
+        stats = await asyncio.to_thread(_candle_file_store.write, jobs)
+        await asyncio.to_thread(candle_watermarks.save)
+        _log_candle_save(stats, (time.perf_counter() - t0) * 1000)
     except Exception as e:
         print(f"[CandleCache] ❌ 저장 실패: {e}")
 
+
+def _load_legacy_json_cache() -> Dict[str, Dict[str, CandleRing]]:
+    """구버전 candle_cache.json → 링 버퍼 (다음 저장부터 바이너리로 기록)"""
+    with open(CANDLE_CACHE_FILE, 'r') as f:
+        data = json.load(f)
+    if not data or not isinstance(data, dict):
+        return {}
+    return {
+        symbol: {
+            tf: CandleRing.from_dicts(candles, _TF_CONFIG.get(tf, (1, 1500))[1])
+            for tf, candles in tfs.items()
+        }
+        for symbol, tfs in data.items()
+    }
+
+
 def load_candle_cache() -> bool:
-    """캔들 캐시 파일에서 로드"""
+    """캔들 캐시 로드 (바이너리 mmap → 없으면 구버전 JSON)"""
     global quote_candle_cache
     try:
-        if not CANDLE_CACHE_FILE.exists():
+        t0 = time.perf_counter()
+        if _candle_file_store.exists():
+            data = _candle_file_store.load()
+            candle_watermarks.load()
+            source = "바이너리"
+        elif CANDLE_CACHE_FILE.exists():
+            data = _load_legacy_json_cache()
+            source = "JSON(구버전)"
+        else:
             print("[CandleCache] 캐시 파일 없음 - API에서 로딩 필요")
             return False
-        
-        file_age = time.time() - CANDLE_CACHE_FILE.stat().st_mtime
-        with open(CANDLE_CACHE_FILE, 'r') as f:
-            data = json.load(f)
-        
-        if not data or not isinstance(data, dict):
+
+        if not data:
             print("[CandleCache] 캐시 파일 비정상 - 무시")
             return False
-        
+
         quote_candle_cache = data
         total = sum(len(tfs) for tfs in quote_candle_cache.values())
         candle_total = sum(len(candles) for tfs in quote_candle_cache.values() for candles in tfs.values())
-        print(f"[CandleCache] ✅ 파일에서 로드 완료: {len(data)}심볼, {total}TF, {candle_total}캔들 (파일 나이: {file_age:.0f}초)")
+        elapsed = (time.perf_counter() - t0) * 1000
+        print(f"[CandleCache] ✅ {source} 로드 완료: {len(data)}심볼, {total}TF, {candle_total}캔들 ({elapsed:.1f}ms)")
         return True
     except Exception as e:
         print(f"[CandleCache] ❌ 로드 실패: {e}")
         return False
 
 async def _auto_save_candle_cache():
-    """5분마다 캔들 캐시 자동 저장"""
+    """5분마다 캔들 캐시 자동 저장 (변경분만)"""
     while True:
         await asyncio.sleep(300)  # 5분
         if quote_candle_cache:
-            save_candle_cache()
+            await save_candle_cache_async()
 
 # ============================================================
 # 백그라운드 캔들 로딩 함수 (병렬화 + 캐시 저장)
@@ -2036,6 +2159,7 @@ async def _load_all_candles_background():
     """
     모든 타임프레임 캔들을 백그라운드에서 로딩
     3개 심볼 동시 병렬 처리 (Rate Limit 안전)
+    ★ 캐시 파일 + 워터마크가 있으면 마지막 저장 캔들 이후 갭만 요청 (없으면 1000개)
     """
     timeframes = {
         "1m": "M1", "5m": "M5", "15m": "M15", "30m": "M30",
@@ -2046,18 +2170,21 @@ async def _load_all_candles_background():
 
     semaphore = asyncio.Semaphore(3)  # ★ 동시 3개 심볼 제한
     total_loaded = 0
+    requested = 0
 
     async def load_symbol(symbol):
-        nonlocal total_loaded
+        nonlocal total_loaded, requested
         failed_tfs = []
         for meta_tf, cache_tf in timeframes.items():
             async with semaphore:
                 try:
+                    count = history_gap_count(symbol, cache_tf, 1000)
+                    requested += count
                     success = await initialize_candles_from_api(
                         metaapi_service.trade_account,
                         symbol,
                         timeframe=cache_tf,
-                        count=1000
+                        count=count
                     )
                     if success:
                         total_loaded += 1
@@ -2079,7 +2206,7 @@ async def _load_all_candles_background():
                             metaapi_service.trade_account,
                             symbol,
                             timeframe=cache_tf,
-                            count=1000
+                            count=history_gap_count(symbol, cache_tf, 1000)
                         )
                         if success:
                             total_loaded += 1
@@ -2092,7 +2219,7 @@ async def _load_all_candles_background():
     tasks = [load_symbol(symbol) for symbol in SYMBOLS]
     await asyncio.gather(*tasks)
 
-    print(f"[MetaAPI Background] 캔들 로딩 완료: {total_loaded}개 TF 로딩됨")
+    print(f"[MetaAPI Background] 캔들 로딩 완료: {total_loaded}개 TF 로딩됨 (요청 {requested}캔들 / 전체 로딩 시 {len(SYMBOLS) * len(timeframes) * 1000})")
 
     # 각 심볼별 캔들 개수 로그 (M1 기준)
     candle_counts = []
@@ -2102,18 +2229,29 @@ async def _load_all_candles_background():
     print(f"[MetaAPI Background] M1 캔들: {', '.join(candle_counts)}")
 
     # ★ 로딩 완료 후 캐시 파일 저장
-    save_candle_cache()
+    await save_candle_cache_async()
+
+    # ★ ingest: 히스토리로 채운 링을 워커에 스냅샷으로 전달 (ingest 재기동 중 마감된 캔들 백필)
+    if _market_role == "ingest":
+        market_feed_publisher.publish_candle_snapshot()
 
 
 # ============================================================
 # 서버 시작 시 호출할 초기화 함수
 # ============================================================
-async def startup_metaapi():
+async def startup_metaapi(role: str = "local"):
     """
     서버 시작 시 MetaAPI 초기화 및 시세 수신 시작
-    main.py의 startup 이벤트에서 호출
+    main.py의 startup 이벤트 / market_ingest.py에서 호출
+
+    role (market_feed.py 참고):
+      local      - 워커가 직접 Quote 연결 + 캔들 빌더 (기존 동작)
+      ingest     - 전용 프로세스: Quote 연결 + 캔들 빌더 + Redis 피드 발행 (포지션 동기화/undeploy 없음)
+      subscriber - 워커: Quote 연결 없음, Redis 피드 구독으로 시세/캔들 수신
     """
-    print("[MetaAPI Startup] 초기화 시작...")
+    global _market_role
+    _market_role = role
+    print(f"[MetaAPI Startup] 초기화 시작... (role={role})")
 
     try:
         # 1. MetaAPI 초기화
@@ -2121,40 +2259,60 @@ async def startup_metaapi():
             print("[MetaAPI Startup] 초기화 실패")
             return False
 
-        # 2. Quote 계정 먼저 연결 (시세 수신이 더 중요)
-        try:
-            if await metaapi_service.connect_quote_account():
-                print("[MetaAPI Startup] ✅ Quote 스트리밍 연결 완료")
-            else:
-                print("[MetaAPI Startup] ⚠️ Quote 스트리밍 연결 실패 (폴링으로 대체)")
-        except Exception as e:
-            print(f"[MetaAPI Startup] ⚠️ Quote 스트리밍 오류: {e}")
+        # 2. Quote 계정 먼저 연결 (시세 수신이 더 중요) — subscriber는 ingest 프로세스가 대신 수신
+        if role != "subscriber":
+            try:
+                if await metaapi_service.connect_quote_account():
+                    print("[MetaAPI Startup] ✅ Quote 스트리밍 연결 완료")
+                else:
+                    print("[MetaAPI Startup] ⚠️ Quote 스트리밍 연결 실패 (폴링으로 대체)")
+            except Exception as e:
+                print(f"[MetaAPI Startup] ⚠️ Quote 스트리밍 오류: {e}")
 
-        # 3. Trade 계정 연결 (실패해도 계속 진행)
-        try:
-            if await metaapi_service.connect_trade_account():
-                print("[MetaAPI Startup] ✅ Trade 계정 연결 완료")
-            else:
-                print("[MetaAPI Startup] ⚠️ Trade 계정 연결 실패 (유저별 연결로 대체)")
-        except Exception as e:
-            print(f"[MetaAPI Startup] ⚠️ Trade 계정 연결 오류: {e}")
+        # 3. Trade 계정 연결 (실패해도 계속 진행) — subscriber 워커는 연결하지 않음 (공용 Trade 연결은 ingest만 보유)
+        if role != "subscriber":
+            try:
+                if await metaapi_service.connect_trade_account():
+                    print("[MetaAPI Startup] ✅ Trade 계정 연결 완료")
+                else:
+                    print("[MetaAPI Startup] ⚠️ Trade 계정 연결 실패 (유저별 연결로 대체)")
+            except Exception as e:
+                print(f"[MetaAPI Startup] ⚠️ Trade 계정 연결 오류: {e}")
+
+        if role == "subscriber":
+            # 4. 캔들 캐시 파일 로드 (즉시 표시용 — 최신화/자동 저장은 ingest 프로세스 담당)
+            if load_candle_cache():
+                print("[MetaAPI Startup] ★ 캐시에서 캔들 즉시 로드 완료! 스냅샷 병합 후 시세 피드로 갱신")
+
+            # 5. 시세 피드 구독 시작 (Quote 스트리밍 + 시세 폴링 루프 대체)
+            #    구독 연결 직후 ingest 캔들 스냅샷 병합 → 파일 저장 이후/첫 델타 이전 캔들 백필
+            market_feed_subscriber.start()
+            print("[MetaAPI Startup] ✅ 시세 피드 구독 시작")
+        else:
+            # 3. 초기 시세 조회
+            prices = await metaapi_service.get_all_prices()
+            print(f"[MetaAPI Startup] 초기 시세 조회 완료: {len(prices)}개 심볼")
+
+            # 4. 캔들 캐시 파일에서 즉시 로드 → 백그라운드에서 최신화
+            cache_loaded = load_candle_cache()
+            asyncio.create_task(_load_all_candles_background())
+
+            # 4.5. 캔들 캐시 자동 저장 루프 시작 (5분마다)
+            asyncio.create_task(_auto_save_candle_cache())
 
-        # 3. 초기 시세 조회
-        prices = await metaapi_service.get_all_prices()
-        print(f"[MetaAPI Startup] 초기 시세 조회 완료: {len(prices)}개 심볼")
+            if cache_loaded:
+                print("[MetaAPI Startup] ★ 캐시에서 캔들 즉시 로드 완료! 백그라운드에서 최신화 중...")
 
-        # 4. 캔들 캐시 파일에서 즉시 로드 → 백그라운드에서 최신화
-        cache_loaded = load_candle_cache()
-        asyncio.create_task(_load_all_candles_background())
-        
-        # 4.5. 캔들 캐시 자동 저장 루프 시작 (5분마다)
-        asyncio.create_task(_auto_save_candle_cache())
-        
-        if cache_loaded:
-            print("[MetaAPI Startup] ★ 캐시에서 캔들 즉시 로드 완료! 백그라운드에서 최신화 중...")
+            # 5. 시세 업데이트 루프 시작 (10초 간격 - Rate Limit 방지)
+            await metaapi_service.start_price_update_loop(interval=60.0)  # 크레딧 절약: 10초→60초 (스트리밍이 메인, 이건 백업)
 
-        # 5. 시세 업데이트 루프 시작 (10초 간격 - Rate Limit 방지)
-        await metaapi_service.start_price_update_loop(interval=60.0)  # 크레딧 절약: 10초→60초 (스트리밍이 메인, 이건 백업)
+            if role == "ingest":
+                # ingest 프로세스는 시세 전용 → 워커에게 피드 발행만 (+ 캐시 로드분 스냅샷, 히스토리 로딩 후 재기록)
+                market_feed_publisher.start()
+                market_feed_publisher.publish_candle_snapshot()
+                print("[MetaAPI Startup] ✅ 시세 피드 발행 시작 (ingest)")
+                print("[MetaAPI Startup] 초기화 완료!")
+                return True
 
         # 6. 포지션 동기화 루프 시작 (120초 주기)
         await metaapi_service.start_position_sync_loop(interval=300.0)  # 크레딧 절약: 120초→300초 (TradeSyncListener가 메인, 이건 백업)
@@ -2402,11 +2560,23 @@ class UserStreamingListener:
         if self.user_id not in user_metaapi_cache:
             user_metaapi_cache[self.user_id] = {"positions": [], "account_info": None, "last_sync": 0}
 
+    def _publish(self, persist: bool = True):
+        """캐시 변경 반영 — Redis 병행 저장 + 해당 유저 라이브 WS 즉시 푸시 (user_stream_hub)"""
+        cache = user_metaapi_cache[self.user_id]
+        try:
+            if persist and redis_set_price:  # redis 사용 가능 확인
+                redis_writer.set_user_cache(self.user_id, cache, ttl=30)
+        except Exception:
+            pass
+        user_stream_hub.publish(self.user_id, cache)
+
     async def on_connected(self, instance_index, replicas):
         print(f"[UserStreaming] 🟢 User {self.user_id} Streaming 연결됨")
 
     async def on_disconnected(self, instance_index):
         print(f"[UserStreaming] 🔴 User {self.user_id} Streaming 연결 해제")
+        # ★ 끊긴 동안의 딜은 스트리밍으로 못 받음 → 저장소 꼬리 구간은 RPC로 보충
+        deal_store.mark_offline(self.user_id)
 
     async def on_account_information_updated(self, instance_index, account_information):
         """계정 정보 실시간 업데이트"""
@@ -2422,13 +2592,7 @@ class UserStreamingListener:
             "login": account_information.get("login", 0)
         }
         user_metaapi_cache[self.user_id]["last_sync"] = time.time()
-        # ★ Redis 병행 저장 (유저 캐시)
-        try:
-            if redis_set_price:  # redis 사용 가능 확인
-                from ..redis_client import set_user_cache
-                set_user_cache(self.user_id, user_metaapi_cache[self.user_id], ttl=30)
-        except Exception:
-            pass
+        self._publish()
 
     async def on_positions_replaced(self, instance_index, positions):
         """전체 포지션 교체 (초기 동기화)"""
@@ -2451,13 +2615,7 @@ class UserStreamingListener:
             })
         user_metaapi_cache[self.user_id]["positions"] = pos_list
         user_metaapi_cache[self.user_id]["last_sync"] = time.time()
-        # ★ Redis 병행 저장
-        try:
-            if redis_set_price:
-                from ..redis_client import set_user_cache
-                set_user_cache(self.user_id, user_metaapi_cache[self.user_id], ttl=30)
-        except Exception:
-            pass
+        self._publish()
         print(f"[UserStreaming] User {self.user_id} 포지션 동기화: {len(pos_list)}개")
 
     async def on_position_updated(self, instance_index, position):
@@ -2492,13 +2650,7 @@ class UserStreamingListener:
 
         user_metaapi_cache[self.user_id]["positions"] = positions
         user_metaapi_cache[self.user_id]["last_sync"] = time.time()
-        # ★ Redis 병행 저장
-        try:
-            if redis_set_price:
-                from ..redis_client import set_user_cache
-                set_user_cache(self.user_id, user_metaapi_cache[self.user_id], ttl=30)
-        except Exception:
-            pass
+        self._publish()
 
     async def on_position_removed(self, instance_index, position_id):
         """포지션 청산 (실시간 감지!)"""
@@ -2518,13 +2670,7 @@ class UserStreamingListener:
 
         user_metaapi_cache[self.user_id]["positions"] = positions
         user_metaapi_cache[self.user_id]["last_sync"] = time.time()
-        # ★ Redis 병행 저장
-        try:
-            if redis_set_price:
-                from ..redis_client import set_user_cache
-                set_user_cache(self.user_id, user_metaapi_cache[self.user_id], ttl=30)
-        except Exception:
-            pass
+        self._publish()
 
         if removed_pos:
             profit = removed_pos.get('profit', 0)
@@ -2548,6 +2694,8 @@ class UserStreamingListener:
 
     async def on_deal_added(self, instance_index, deal):
         """거래 추가 (SL/TP 등 청산 거래 감지) — 실제 체결 손익으로 업데이트"""
+        # ★ 로컬 딜 저장소 (히스토리/리포트 조회용)
+        await deal_store.add_streamed(self.user_id, deal)
         if deal.get('entryType') == 'DEAL_ENTRY_OUT':
             profit = deal.get('profit', 0)
             commission = deal.get('commission', 0)
@@ -2600,7 +2748,26 @@ class UserStreamingListener:
     async def on_symbol_specification_updated(self, instance_index, specification):
         pass
     async def on_symbol_prices_updated(self, instance_index, prices, equity, margin, free_margin, margin_level, account_currency_exchange_rate):
-        pass
+        """시세 변경 → 서버 계산 equity/margin 반영 (포지션 보유 시 P/L 실시간 갱신)"""
+        if equity is None:
+            return
+        self._ensure_cache()
+        acc = user_metaapi_cache[self.user_id].get("account_info")
+        if not acc:
+            return
+        changed = {}
+        if acc.get("equity") != equity:
+            changed["equity"] = equity
+        if margin is not None and acc.get("margin") != margin:
+            changed["margin"] = margin
+        if free_margin is not None and acc.get("freeMargin") != free_margin:
+            changed["freeMargin"] = free_margin
+        if not changed:
+            return
+        acc.update(changed)
+        user_metaapi_cache[self.user_id]["last_sync"] = time.time()
+        # ★ 틱 빈도 — 바뀐 필드만 dirty 표시, 허브가 5Hz로 모아서 wake/발행 (동기 Redis 저장은 다른 이벤트에 맡김)
+        user_stream_hub.publish_account(self.user_id, changed)
     async def on_health_status(self, instance_index, status):
         pass
     async def on_symbol_price_updated(self, instance_index, price):
@@ -2608,7 +2775,7 @@ class UserStreamingListener:
     async def on_history_orders_synchronized(self, instance_index, synchronization_id):
         pass
     async def on_deals_synchronized(self, instance_index, synchronization_id):
-        pass
+        deal_store.mark_live(self.user_id)
     async def on_positions_updated(self, instance_index, updated_positions, removed_position_ids):
         """벌크 포지션 업데이트"""
         if updated_positions:
@@ -2651,7 +2818,8 @@ async def get_user_trade_connection(user_id: int, metaapi_account_id: str):
             conn_data["last_active"] = time_module.time()
             return rpc
 
-    # 2. 없으면 새로 연결
+    # 2. 없으면 새로 연결 (연결 생성 시간은 RPC 시간으로 기록)
+    connect_started = time_module.perf_counter()
     if not metaapi_service.api:
         if not await metaapi_service.initialize():
             return None
@@ -2699,10 +2867,12 @@ async def get_user_trade_connection(user_id: int, metaapi_account_id: str):
         }
 
         print(f"[MetaAPI Pool] ✅ User {user_id} 연결 완료 (RPC + {'Streaming' if streaming else 'Streaming 없음'})")
+        metrics.record_rpc("user_connect", time_module.perf_counter() - connect_started)
         return rpc
 
     except Exception as e:
         print(f"[MetaAPI Pool] ❌ User {user_id} 연결 실패: {e}")
+        metrics.record_rpc("user_connect", time_module.perf_counter() - connect_started)
         return None
 
 
@@ -2713,7 +2883,8 @@ async def get_user_account_info(user_id: int, metaapi_account_id: str) -> Option
         return None
 
     try:
-        info = await rpc.get_account_information()
+        with metrics.rpc_timer("account_information"):
+            info = await rpc.get_account_information()
         result = {
             "broker": info.get("broker", ""),
             "balance": info.get("balance", 0),
@@ -2733,8 +2904,7 @@ async def get_user_account_info(user_id: int, metaapi_account_id: str) -> Option
         # ★ Redis 병행 저장
         try:
             if redis_set_price:
-                from ..redis_client import set_user_cache
-                set_user_cache(user_id, user_metaapi_cache[user_id], ttl=30)
+                redis_writer.set_user_cache(user_id, user_metaapi_cache[user_id], ttl=30)
         except Exception:
             pass
 
@@ -2751,7 +2921,8 @@ async def get_user_positions(user_id: int, metaapi_account_id: str) -> List[Dict
         return []
 
     try:
-        positions = await rpc.get_positions()
+        with metrics.rpc_timer("positions"):
+            positions = await rpc.get_positions()
         result = positions if positions else []
 
         # 캐시 업데이트
@@ -2762,8 +2933,7 @@ async def get_user_positions(user_id: int, metaapi_account_id: str) -> List[Dict
         # ★ Redis 병행 저장
         try:
             if redis_set_price:
-                from ..redis_client import set_user_cache
-                set_user_cache(user_id, user_metaapi_cache[user_id], ttl=30)
+                redis_writer.set_user_cache(user_id, user_metaapi_cache[user_id], ttl=30)
         except Exception:
             pass
 
@@ -2803,10 +2973,11 @@ async def place_order_for_user(user_id: int, metaapi_account_id: str, symbol: st
                     if sl_points > 0:
                         options['stopLoss'] = round(bid + (sl_points * tick_size), 5)
 
-        if order_type.upper() == 'BUY':
-            result = await rpc.create_market_buy_order(symbol=symbol, volume=volume, options=options)
-        else:
-            result = await rpc.create_market_sell_order(symbol=symbol, volume=volume, options=options)
+        with metrics.rpc_timer("create_order"):
+            if order_type.upper() == 'BUY':
+                result = await rpc.create_market_buy_order(symbol=symbol, volume=volume, options=options)
+            else:
+                result = await rpc.create_market_sell_order(symbol=symbol, volume=volume, options=options)
 
         print(f"[MetaAPI User Order] User {user_id}: {order_type} {symbol} {volume} lot → {result}")
 
@@ -2820,11 +2991,12 @@ async def place_order_for_user(user_id: int, metaapi_account_id: str, symbol: st
                 # 1차: modify_position으로 TP/SL 설정
                 try:
                     await asyncio.sleep(0.5)
-                    modify_result = await rpc.modify_position(
-                        position_id=position_id,
-                        stop_loss=options.get('stopLoss'),
-                        take_profit=options.get('takeProfit')
-                    )
+                    with metrics.rpc_timer("modify_position"):
+                        modify_result = await rpc.modify_position(
+                            position_id=position_id,
+                            stop_loss=options.get('stopLoss'),
+                            take_profit=options.get('takeProfit')
+                        )
                     print(f"[MetaAPI User Order] SL/TP 설정 결과: {modify_result}")
                     if modify_result and modify_result.get('stringCode') == 'TRADE_RETCODE_DONE':
                         tp_sl_confirmed = True
@@ -2838,11 +3010,12 @@ async def place_order_for_user(user_id: int, metaapi_account_id: str, symbol: st
                 if not tp_sl_confirmed:
                     try:
                         await asyncio.sleep(1.0)
-                        modify_result2 = await rpc.modify_position(
-                            position_id=position_id,
-                            stop_loss=options.get('stopLoss'),
-                            take_profit=options.get('takeProfit')
-                        )
+                        with metrics.rpc_timer("modify_position"):
+                            modify_result2 = await rpc.modify_position(
+                                position_id=position_id,
+                                stop_loss=options.get('stopLoss'),
+                                take_profit=options.get('takeProfit')
+                            )
                         print(f"[MetaAPI User Order] SL/TP 재시도 결과: {modify_result2}")
                         if modify_result2 and modify_result2.get('stringCode') == 'TRADE_RETCODE_DONE':
                             tp_sl_confirmed = True
@@ -2854,7 +3027,8 @@ async def place_order_for_user(user_id: int, metaapi_account_id: str, symbol: st
                 if not tp_sl_confirmed:
                     print(f"[MetaAPI User Order] 🚨 SL/TP 설정 불가! 포지션 강제 청산: {position_id}")
                     try:
-                        await rpc.close_position(position_id)
+                        with metrics.rpc_timer("close_position"):
+                            await rpc.close_position(position_id)
                         return {
                             "success": False,
                             "error": "Target 금액 설정 실패로 안전을 위해 주문이 취소되었습니다. 다시 시도해주세요.",
@@ -2894,7 +3068,8 @@ async def close_position_for_user(user_id: int, metaapi_account_id: str, positio
         return {"success": False, "error": "MetaAPI 연결 실패"}
 
     try:
-        result = await rpc.close_position(position_id)
+        with metrics.rpc_timer("close_position"):
+            result = await rpc.close_position(position_id)
         print(f"[MetaAPI User Close] User {user_id}: position {position_id} → {result}")
 
         if result.get('stringCode') == 'TRADE_RETCODE_DONE':
@@ -2906,11 +3081,10 @@ async def close_position_for_user(user_id: int, metaapi_account_id: str, positio
         return {"success": False, "error": str(e)}
 
 
-async def get_user_history(user_id: int, metaapi_account_id: str, start_time=None, end_time=None) -> List[Dict]:
-    """유저별 MetaAPI 계정에서 거래 히스토리 조회"""
-    rpc = await get_user_trade_connection(user_id, metaapi_account_id)
-    if not rpc:
-        return []
+async def get_user_history(user_id: int, metaapi_account_id: str, start_time=None, end_time=None,
+                           max_stale: float = None) -> List[Dict]:
+    """유저별 MetaAPI 계정 거래 히스토리 — 로컬 딜 저장소(deal_store) 조회, 빈 구간만 RPC"""
+    from .deal_store import TAIL_REFRESH_SEC
 
     try:
         if not start_time:
@@ -2918,8 +3092,9 @@ async def get_user_history(user_id: int, metaapi_account_id: str, start_time=Non
         if not end_time:
             end_time = datetime.now() + timedelta(minutes=1)
 
-        result = await rpc.get_deals_by_time_range(start_time, end_time)
-        deals = result.get('deals', []) if isinstance(result, dict) else result
+        deals = await deal_store.get_deals(
+            user_id, metaapi_account_id, start_time, end_time,
+            max_stale=TAIL_REFRESH_SEC if max_stale is None else max_stale)
 
         history = []
         for deal in deals:
@@ -2993,7 +3168,9 @@ def _get_slot_usage_ratio(db) -> float:
 async def _evict_least_active_user(db, exclude_user_id=None) -> bool:
     """가장 오래 비활성인 유저 1명 퇴출 (긴급 슬롯 확보용)"""
     from ..models.user import User
+    from .user_snapshot_buffer import user_snapshot_buffer
     try:
+        await user_snapshot_buffer.flush()
         query = db.query(User).filter(
             User.metaapi_status == 'deployed',
             User.metaapi_account_id.isnot(None),
@@ -3041,6 +3218,10 @@ async def _auto_undeploy_inactive_users():
         try:
             await asyncio.sleep(CHECK_INTERVAL)
 
+            # ★ write-behind 버퍼의 활동 시각 먼저 반영
+            from .user_snapshot_buffer import user_snapshot_buffer
+            await user_snapshot_buffer.flush()
+
             db = SessionLocal()
             try:
                 usage_ratio = _get_slot_usage_ratio(db)
@@ -3078,6 +3259,9 @@ async def _auto_undeploy_inactive_users():
                 ).order_by(User.metaapi_last_active.asc().nullsfirst()).all()
 
                 for user in inactive_users:
+                    # DB 반영 전 활동 (ACTIVE_PERSIST_SEC 이내) 은 버퍼 기준으로 재확인
+                    if user_snapshot_buffer.is_active_since(user.id, threshold_time):
+                        continue
                     if user.metaapi_account_id:
                         last_active_str = user.metaapi_last_active.strftime('%H:%M:%S') if user.metaapi_last_active else 'NULL'
                         print(f"[MetaAPI AutoUndeploy] User {user.id} 비활동 감지 (last={last_active_str}) - undeploy")
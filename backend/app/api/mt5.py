@@ -5,9 +5,9 @@ Trading-X Backend
 """
 
 from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, Query, status, Body
-from typing import List
+from typing import List, Optional
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from sqlalchemy.orm import Session
 try:
     import MetaTrader5 as mt5
@@ -39,7 +39,8 @@ def safe_json_value(val):
         return val.decode('utf-8', errors='replace')
     return val
 
-from ..database import get_db
+from ..database import get_db, release_session, async_session
+from sqlalchemy import select
 from ..utils.crypto import encrypt, decrypt
 # ★ 심볼 스펙 (symbol_config.py에서 단일 관리)
 from ..symbol_config import SYMBOL_SPECS
@@ -94,6 +95,8 @@ from ..models.user import User
 from ..models.live_martin_state import LiveMartinState
 from ..models.live_trade import LiveTrade
 from ..utils.security import decode_token
+from .principal_cache import resolve_user_async
+from .user_snapshot_buffer import user_snapshot_buffer
 from ..services.indicator_service import IndicatorService
 from ..services.martin_service import martin_service
 from math import ceil
@@ -107,6 +110,9 @@ from ..services.mt5_service import MT5_DISABLED
 
 # ========== MT5 브릿지 데이터 캐시 (전역) ==========
 # Windows MT5 브릿지에서 전송된 데이터를 저장
+# 브릿지 캔들 심볼/TF별 보관 상한 (초기 히스토리 1000개 기준)
+BRIDGE_MAX_CANDLES = 1000
+
 bridge_cache = {
     "prices": {},
     "positions": [],  # ★Bridge 포지션 캐시
@@ -116,15 +122,23 @@ bridge_cache = {
     "last_update": 0   # 마지막 업데이트 시간
 }
 
-# ========== 주문 대기열 (브릿지용) - 파일 기반 ==========
+# ========== 주문 대기열 (브릿지용) - bridge_order_queue.py ==========
 # Linux에서 주문을 받아 Windows 브릿지가 실행
-# 워커 간 공유를 위해 파일 기반으로 구현
+# 워커 간 공유: Redis Streams (또는 SQLite WAL) — 원자적 claim/ack + 결과 대기
 import uuid
 import fcntl
+from .bridge_order_queue import order_queue
+from .candle_store import CandleRing, CandleWatermarks, merge_rows
+from .candle_response_cache import candle_response_cache
+from .live_user_session import live_user_sessions
+from .deal_store import deal_store
 
 # ★ Redis 캐시 (병행 저장용)
 try:
-    from ..redis_client import set_user_cache as redis_set_user, get_user_cache as redis_get_user, is_redis_available as redis_available
+    from ..redis_client import get_user_cache as redis_get_user, is_redis_available as redis_available
+    # ★ 쓰기는 병합 쓰기 (이벤트 루프 블로킹 없음)
+    from .redis_writer import redis_writer
+    redis_set_user = redis_writer.set_user_cache
     print("[MT5] ✅ Redis client imported")
 except ImportError:
     redis_set_user = None
@@ -132,8 +146,6 @@ except ImportError:
     redis_available = lambda: False
     print("[MT5] ⚠️ Redis client not available")
 
-ORDER_QUEUE_FILE = "/tmp/mt5_orders.json"
-ORDER_RESULTS_FILE = "/tmp/mt5_order_results.json"
 BRIDGE_HEARTBEAT_FILE = "/tmp/mt5_bridge_heartbeat"
 
 # ★★★ 유저별 라이브 데이터 캐시 (주문/청산 후 업데이트) ★★★
@@ -197,68 +209,6 @@ def get_bridge_heartbeat() -> float:
     except (FileNotFoundError, ValueError):
         return 0
 
-def _read_order_queue() -> list:
-    """주문 대기열 읽기 (잠금 적용)"""
-    try:
-        with open(ORDER_QUEUE_FILE, 'r') as f:
-            fcntl.flock(f.fileno(), fcntl.LOCK_SH)
-            data = json.load(f)
-            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
-            return data if isinstance(data, list) else []
-    except (FileNotFoundError, json.JSONDecodeError):
-        return []
-
-def _write_order_queue(data: list):
-    """주문 대기열 쓰기 (잠금 적용)"""
-    with open(ORDER_QUEUE_FILE, 'w') as f:
-        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
-        json.dump(data, f)
-        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
-
-def append_order(order_data: dict):
-    """주문 대기열에 추가"""
-    queue = _read_order_queue()
-    queue.append(order_data)
-    _write_order_queue(queue)
-
-def pop_all_orders() -> list:
-    """모든 대기 주문 가져오고 비우기"""
-    queue = _read_order_queue()
-    _write_order_queue([])
-    return queue
-
-def _read_order_results() -> dict:
-    """주문 결과 읽기 (잠금 적용)"""
-    try:
-        with open(ORDER_RESULTS_FILE, 'r') as f:
-            fcntl.flock(f.fileno(), fcntl.LOCK_SH)
-            data = json.load(f)
-            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
-            return data if isinstance(data, dict) else {}
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
-
-def _write_order_results(data: dict):
-    """주문 결과 쓰기 (잠금 적용)"""
-    with open(ORDER_RESULTS_FILE, 'w') as f:
-        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
-        json.dump(data, f)
-        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
-
-def set_order_result(order_id: str, result: dict):
-    """주문 결과 저장"""
-    results = _read_order_results()
-    results[order_id] = result
-    _write_order_results(results)
-
-def pop_order_result(order_id: str) -> dict:
-    """주문 결과 가져오고 삭제"""
-    results = _read_order_results()
-    result = results.pop(order_id, None)
-    if result:
-        _write_order_results(results)
-    return result
-
 # ========== 계정 검증 대기열 (브릿지용) - 파일 기반 ==========
 # 워커 간 공유를 위해 파일 기반으로 구현
 
@@ -403,7 +353,8 @@ async def get_current_user(
             detail="유효하지 않은 토큰입니다"
         )
     
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    # ★ (user_id, sid) 캐시 우선 — 적중 시 DB 조회 없음
+    user = await resolve_user_async(db, payload)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -438,6 +389,13 @@ async def get_symbol_specs(
     return {"success": True, "specs": specs}
 
 
+@router.get("/market-sessions")
+async def get_market_sessions():
+    """종목별 거래시간 상태 — 열림 여부 + 다음 개장/마감 시각 (UTC)"""
+    from ..services.market_calendar import market_calendar
+    return {"success": True, "sessions": {sym: market_calendar.session_info(sym) for sym in SYMBOL_SPECS}}
+
+
 @router.get("/account-info")
 async def get_account_info(
     magic: int = 100001,
@@ -503,16 +461,9 @@ async def get_account_info(
                         }
                         break
 
-                # DB 업데이트
+                # DB 업데이트 (★ write-behind — 변경분만 주기적으로 일괄 UPDATE)
                 if current_user.has_mt5_account:
-                    current_user.mt5_balance = balance
-                    current_user.mt5_equity = equity
-                    current_user.mt5_margin = margin
-                    current_user.mt5_free_margin = free_margin
-                    current_user.mt5_profit = profit
-                    current_user.mt5_leverage = leverage
-                    current_user.metaapi_last_active = datetime.utcnow()
-                    db.commit()
+                    user_snapshot_buffer.record(current_user.id, balance, equity, margin, free_margin, profit, leverage)
 
                 return {
                     "broker": "HedgeHood Pty Ltd",
@@ -693,13 +644,17 @@ async def get_account_info(
 async def get_candles(
     symbol: str,
     timeframe: str = "M1",
-    count: int = 1000
+    count: int = 1000,
+    since: Optional[int] = None
 ):
-    """캔들 데이터 + 인디케이터 조회"""
+    """캔들 데이터 + 인디케이터 조회 (since=캔들 time → 그 이후분만 delta 반환)"""
     candles = []
     closes = []
     highs = []
     lows = []
+    # ★ 응답 캐시 (candle_response_cache.py) — MetaAPI 링 버퍼에서 바로 만든 응답만 캐시
+    cache_key = (symbol, timeframe, count)
+    source_ring = None
 
     if mt5_initialize_safe():
         # MT5 사용 가능
@@ -736,6 +691,15 @@ async def get_candles(
         # MT5 없음 - MetaAPI 캔들 캐시에서 직접 반환 (모든 TF 실시간 업데이트됨)
         from .metaapi_service import quote_candle_cache, initialize_candles_from_api, metaapi_service
         cached_candles = quote_candle_cache.get(symbol, {}).get(timeframe, [])
+
+        # ★ 캐시 히트: 새 캔들이 안 열렸으면 후처리/직렬화 생략 (형성 중 캔들만 갱신)
+        if cached_candles and len(cached_candles) >= count:
+            entry = candle_response_cache.lookup(cache_key, cached_candles)
+            if entry is not None:
+                if since is not None:
+                    return candle_response_cache.delta(entry, since)
+                return Response(content=entry.body, media_type="application/json")
+
         # fallback: 브릿지 캐시
         if not cached_candles:
             cached_candles = get_bridge_candles(symbol, timeframe)
@@ -758,7 +722,9 @@ async def get_candles(
                 print(f"[Candles] 히스토리 로딩 실패: {e}")
 
         if cached_candles:
-            candles = cached_candles[-count:] if len(cached_candles) > count else cached_candles
+            if isinstance(cached_candles, CandleRing):
+                source_ring = cached_candles
+            candles = cached_candles[-count:]  # 링 버퍼 → dict 리스트 사본
             closes = [c['close'] for c in candles]
             highs = [c['high'] for c in candles]
             lows = [c['low'] for c in candles]
@@ -838,6 +804,7 @@ async def get_candles(
                         m['volume'] = m.get('volume', 0) + c.get('volume', 0)
 
                 candles = sorted(monthly.values(), key=lambda x: x['time'])
+                source_ring = None  # D1 조합 결과는 캐시 대상 아님
                 closes = [c['close'] for c in candles]
                 highs = [c['high'] for c in candles]
                 lows = [c['low'] for c in candles]
@@ -849,7 +816,14 @@ async def get_candles(
         return {"candles": [], "indicators": {}, "source": "no_data", "timeframe": timeframe}
 
     # 인디케이터 계산
-    indicators = IndicatorService.calculate_chart_indicators(candles, closes, highs, lows)
+    # ★ (symbol, TF, count)별 캐시 — 형성 중 캔들만 바뀌면 마지막 점만 재계산
+    indicators = IndicatorService.calculate_chart_indicators(candles, closes, highs, lows, cache_key=cache_key)
+
+    if source_ring is not None:
+        entry = candle_response_cache.store(cache_key, source_ring, candles, indicators)
+        if since is not None:
+            return candle_response_cache.delta(entry, since)
+        return Response(content=entry.body, media_type="application/json")
 
     return {"candles": candles, "indicators": indicators}
 
@@ -1138,6 +1112,58 @@ async def receive_bridge_symbol_info(symbol: str, data: dict):
         return {"status": "error", "message": str(e)}
 
 
+# ========== 브릿지 캔들 일괄 수신 (컬럼 배치 + 워터마크) ==========
+# 브릿지 캔들 커버리지 (메모리 — bridge_cache와 수명 동일)
+bridge_candle_watermarks = CandleWatermarks()
+
+
+def _merge_bridge_candles(symbol: str, timeframe: str, rows: List[dict]) -> int:
+    """bridge_cache 캔들 time 기준 선형 병합 + 워터마크 기록 → 보관 개수"""
+    by_tf = bridge_cache["candles"].setdefault(symbol, {})
+    by_tf[timeframe] = merge_rows(by_tf.get(timeframe) or [], rows, BRIDGE_MAX_CANDLES)
+    if rows:
+        bridge_candle_watermarks.record(symbol, timeframe, rows[0]["time"], rows[-1]["time"], "bridge")
+    return len(by_tf[timeframe])
+
+
+@router.get("/bridge/candles/watermarks")
+async def get_bridge_candle_watermarks():
+    """브릿지 시작 시 조회 — 심볼/TF별 보관 중인 마지막 캔들 시각 (이후 갭만 전송)"""
+    return bridge_candle_watermarks.to_dict()
+
+
+@router.post("/bridge/candles/bulk")
+async def receive_bridge_candles_bulk(data: dict = Body(...)):
+    """
+    캔들 일괄 수신 (여러 심볼/TF를 요청 1회로)
+
+    데이터 형식: {"series": [{"symbol": "BTCUSD", "tf": "M1",
+                              "time": [...], "open": [...], "high": [...], "low": [...], "close": [...], "volume": [...]}, ...]}
+    각 시리즈는 time 오름차순 — 기존 캔들과 time 기준 병합 (재정렬 없음)
+    """
+    import time as time_module
+    from .bridge_channel import bridge_channel
+    merged = {}
+    for series in data.get("series", []):
+        symbol, timeframe = series.get("symbol"), series.get("tf")
+        times = series.get("time") or []
+        if not symbol or not timeframe or not times:
+            continue
+        vols = series.get("volume") or [0] * len(times)
+        rows = [
+            {"time": t, "open": o, "high": h, "low": l, "close": c, "volume": v}
+            for t, o, h, l, c, v in zip(times, series["open"], series["high"], series["low"], series["close"], vols)
+        ]
+        merged[f"{symbol}/{timeframe}"] = _merge_bridge_candles(symbol, timeframe, rows)
+        # 다른 워커 bridge_cache에도 반영 (bridge_channel 델타 형식)
+        bridge_channel.relay({"t": "candles", "s": symbol, "tf": timeframe, "c": rows})
+
+    bridge_cache["last_update"] = time_module.time()
+    update_bridge_heartbeat()
+    print(f"[Bridge] 캔들 일괄 수신: {len(merged)}개 시리즈, {sum(len(s.get('time') or []) for s in data.get('series', []))}캔들")
+    return {"status": "success", "series": merged}
+
+
 # 중요: 구체적인 경로가 먼저 와야 함 (FastAPI 라우터 순서)
 @router.post("/bridge/{symbol}/candles/{timeframe}")
 async def receive_bridge_candles_tf(symbol: str, timeframe: str, candles: List[dict] = Body(...)):
@@ -1149,22 +1175,18 @@ async def receive_bridge_candles_tf(symbol: str, timeframe: str, candles: List[d
     """
     import time as time_module
     try:
-        # 심볼별 딕셔너리 초기화
-        if symbol not in bridge_cache["candles"]:
-            bridge_cache["candles"][symbol] = {}
-
-        # 타임프레임별 캔들 데이터 저장
-        bridge_cache["candles"][symbol][timeframe] = candles
+        # ★ 기존 히스토리와 time 기준 병합 (기존: 통째 교체 → 주기 전송 100개가 초기 1000개를 덮어씀)
+        total = _merge_bridge_candles(symbol, timeframe, sorted(candles, key=lambda c: c["time"]))
         bridge_cache["last_update"] = time_module.time()
         update_bridge_heartbeat()
 
-        print(f"[Bridge] {symbol}/{timeframe} 캔들 {len(candles)}개 수신")
+        print(f"[Bridge] {symbol}/{timeframe} 캔들 {len(candles)}개 수신 (보관 {total}개)")
 
         return {
             "status": "success",
             "symbol": symbol,
             "timeframe": timeframe,
-            "total_candles": len(candles)
+            "total_candles": total
         }
     except Exception as e:
         print(f"[Bridge] 캔들 수신 오류: {e}")
@@ -1211,21 +1233,35 @@ async def get_bridge_status():
     }
 
 
+# ========== 브릿지 상시 연결 (WebSocket) ==========
+@router.websocket("/bridge/ws")
+async def bridge_websocket(websocket: WebSocket):
+    """Windows 브릿지 상시 연결 — 시세/계정/포지션/캔들 델타 수신 + 주문 즉시 푸시 (bridge_channel.py)"""
+    from .bridge_channel import bridge_channel
+    await websocket.accept()
+    try:
+        await bridge_channel.serve(websocket)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"[Bridge WS] 오류: {e}")
+
+
 # ========== 브릿지 주문 API ==========
 @router.get("/bridge/orders/pending")
-async def get_pending_orders():
-    """브릿지가 대기 중인 주문을 가져감 (파일 기반)"""
-    pending = pop_all_orders()
+async def get_pending_orders(wait: float = 0):
+    """브릿지가 대기 중인 주문을 가져감 (원자적 claim, wait초 동안 롱폴링)"""
+    pending = await order_queue.claim(block=wait)
     return {"orders": pending}
 
 
 @router.post("/bridge/orders/result")
 async def submit_order_result(result: dict):
-    """브릿지가 주문 실행 결과를 전송 (파일 기반)"""
+    """브릿지가 주문 실행 결과를 전송 (결과 저장 + 주문 ack)"""
     import time as time_module
     order_id = result.get("order_id")
     if order_id:
-        set_order_result(order_id, result)
+        await order_queue.set_result(order_id, result)
         print(f"[Bridge] 주문 결과 수신: {order_id} - {result.get('success')}")
 
         # 주문 성공시 bridge에 포지션 갱신 요청을 위해 last_update 기록
@@ -1263,9 +1299,9 @@ async def submit_order_result(result: dict):
 
 
 @router.get("/bridge/orders/result/{order_id}")
-async def get_order_result(order_id: str):
-    """주문 결과 조회 (클라이언트 폴링용, 파일 기반)"""
-    result = pop_order_result(order_id)
+async def get_order_result(order_id: str, wait: float = 0):
+    """주문 결과 조회 (wait초 동안 결과 도착 대기 — 반복 폴링 불필요)"""
+    result = await order_queue.wait_result(order_id, wait)
     if result:
         return result
     return {"status": "pending"}
@@ -1398,6 +1434,8 @@ async def place_order(
             target = real_target
 
     print(f"[MetaAPI Order] 주문 요청: {order_type} {symbol} {volume} lot, target=${target}, martin={is_martin}")
+    # ★ 마틴 상태 조회/저장 끝 → 브로커 RPC를 기다리는 동안 동기 풀 커넥션을 쥐지 않도록 반납
+    release_session(db)
 
     # ★★★ 종목별 1 lot 증거금 (실제 브로커 기준) ★★★
     SYMBOL_MARGIN_PER_LOT = {
@@ -1569,8 +1607,7 @@ async def place_order(
                 comment=f"Trading-X {order_type.upper()}"
             )
             # 활동 시각 갱신
-            current_user.metaapi_last_active = datetime.utcnow()
-            db.commit()
+            user_snapshot_buffer.touch(current_user.id)
             print(f"[Order] User {current_user.id} 유저별 MetaAPI 주문")
         else:
             result = await metaapi_service.place_order(
@@ -1806,8 +1843,7 @@ async def close_position(
         if position_id:
             if _use_user_metaapi:
                 result = await close_position_for_user(current_user.id, _user_mid, position_id)
-                current_user.metaapi_last_active = datetime.utcnow()
-                db.commit()
+                user_snapshot_buffer.touch(current_user.id)
             else:
                 result = await metaapi_service.close_position(position_id)
             if result.get('success'):
@@ -1926,8 +1962,7 @@ async def close_position(
         pos_id = pos.get('id')
         if _use_user_metaapi:
             result = await close_position_for_user(current_user.id, _user_mid, pos_id)
-            current_user.metaapi_last_active = datetime.utcnow()
-            db.commit()
+            user_snapshot_buffer.touch(current_user.id)
         else:
             result = await metaapi_service.close_position(pos_id)
 
@@ -2175,24 +2210,16 @@ async def get_positions(
         "leverage": leverage
     }
 
-# ========== 전체 청산 ==========
-@router.post("/close-all")
-async def close_all_positions(
-    magic: int = None,
-    symbol: str = None,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """모든 포지션 청산 (magic/symbol 필터 옵션) - MetaAPI 버전"""
-    from .metaapi_service import metaapi_service, close_position_for_user, get_user_positions
+# ========== 일괄 청산 공통 (bulk_close.py — 계정별 병렬 + 대조 1회) ==========
+async def _live_bulk_close(current_user: User, predicate, label: str, log_tag: str) -> JSONResponse:
+    """포지션 조회 → predicate로 대상 선별 → 병렬 청산 → 응답"""
+    from .metaapi_service import metaapi_service, get_user_positions
+    from .bulk_close import bulk_close_executor
 
     # ★★★ 유저별 MetaAPI 판단 ★★★
     _use_user_metaapi = bool(current_user.metaapi_account_id and current_user.metaapi_status == 'deployed')
     _user_mid = current_user.metaapi_account_id if _use_user_metaapi else None
 
-    print(f"[MetaAPI CloseAll] 전체 청산 요청: magic={magic}, symbol={symbol}, user_metaapi={_use_user_metaapi}")
-
-    # ★★★ MetaAPI를 통한 전체 청산 ★★★
     try:
         # 모든 포지션 조회
         if _use_user_metaapi:
@@ -2202,94 +2229,70 @@ async def close_all_positions(
         if not positions:
             return JSONResponse({"success": False, "message": "열린 포지션 없음"})
 
-        # 필터링 (magic, symbol)
-        target_positions = []
-        for pos in positions:
-            if symbol and pos.get('symbol') != symbol:
-                continue
-            if magic is not None and pos.get('magic') != magic:
-                continue
-            target_positions.append(pos)
-
+        target_positions = [pos for pos in positions if predicate(pos)]
         if not target_positions:
-            return JSONResponse({"success": False, "message": "청산할 포지션 없음"})
-
-        closed_count = 0
-        total_profit = 0
-        errors = []
+            return JSONResponse({"success": False, "message": f"{label}청산할 포지션 없음"})
 
-        for pos in target_positions:
-            pos_id = pos.get('id')
-            if _use_user_metaapi:
-                result = await close_position_for_user(current_user.id, _user_mid, pos_id)
-            else:
-                result = await metaapi_service.close_position(pos_id)
+        def _on_result(entry):
+            mark = "✅" if entry["success"] else "❌"
+            print(f"[{log_tag}] {mark} {entry['id']} ({entry['elapsed_ms']}ms) {entry.get('error') or ''}")
 
-            if result.get('success'):
-                closed_count += 1
-                total_profit += pos.get('profit', 0)
-            else:
-                errors.append(f"{pos_id}: {result.get('error')}")
+        outcome = await bulk_close_executor.close_positions(
+            current_user.id, _user_mid, target_positions, on_result=_on_result)
 
-        # user_live_cache 초기화
-        if current_user.id in user_live_cache:
-            if symbol or magic is not None:
-                # 필터링된 포지션만 제거
-                closed_ids = [p.get('id') for p in target_positions]
-                cache_positions = user_live_cache[current_user.id].get("positions", [])
-                user_live_cache[current_user.id]["positions"] = [
-                    p for p in cache_positions if p.get("id") not in closed_ids
-                ]
-            else:
-                # 전체 청산
-                user_live_cache[current_user.id]["positions"] = []
-
-        # ★★★ user_metaapi_cache도 동일하게 초기화 (중복 주문 방지용) ★★★
-        from .metaapi_service import user_metaapi_cache
-        if current_user.id in user_metaapi_cache:
-            if symbol or magic is not None:
-                closed_ids = [p.get('id') for p in target_positions]
-                cache_positions = user_metaapi_cache[current_user.id].get("positions", [])
-                user_metaapi_cache[current_user.id]["positions"] = [
-                    p for p in cache_positions if p.get("id") not in closed_ids
-                ]
-                print(f"[MetaAPI CloseAll] 🧹 user_metaapi_cache 포지션 {len(closed_ids)}개 제거")
-            else:
-                user_metaapi_cache[current_user.id]["positions"] = []
-                print(f"[MetaAPI CloseAll] 🧹 user_metaapi_cache 전체 초기화")
+        closed_ids = set(outcome["closed"])
+        closed_count = len(closed_ids)
+        total_profit = sum(p.get('profit', 0) or 0 for p in target_positions if p.get('id') in closed_ids)
+        errors = [f"{r['id']}: {r.get('error')}" for r in outcome["results"] if not r["success"]]
 
         if closed_count > 0:
             if _use_user_metaapi:
-                current_user.metaapi_last_active = datetime.utcnow()
-                db.commit()
-            print(f"[MetaAPI CloseAll] ✅ {closed_count}개 청산 완료, 총 P/L=${total_profit:.2f}")
+                user_snapshot_buffer.touch(current_user.id)
+            print(f"[{log_tag}] ✅ {closed_count}/{len(target_positions)}개 청산 완료, 총 P/L=${total_profit:.2f} ({outcome['elapsed_ms']}ms)")
             return JSONResponse({
                 "success": True,
-                "message": f"{closed_count}개 청산 완료! 총 P/L: ${total_profit:,.2f}",
+                "message": f"{label}{closed_count}개 청산 완료! 총 P/L: ${total_profit:,.2f}",
                 "closed_count": closed_count,
                 "total_profit": total_profit,
                 "errors": errors if errors else None,
+                "results": outcome["results"],
                 "metaapi_mode": True
             })
         else:
             return JSONResponse({
                 "success": False,
                 "message": "청산 실패",
-                "errors": errors
+                "errors": errors,
+                "results": outcome["results"]
             })
 
     except Exception as e:
-        print(f"[MetaAPI CloseAll] ❌ 예외 발생: {e}")
+        print(f"[{log_tag}] ❌ 예외 발생: {e}")
         return JSONResponse({
             "success": False,
             "message": f"청산 오류: {str(e)}"
         })
 
-    # ========== 기존 MT5 코드 (주석 처리) ==========
-    # if not mt5_initialize_safe():
-    #     return JSONResponse({"success": False, "message": "MT5 초기화 실패"})
-    # positions = mt5.positions_get()
-    # ... (기존 MT5 직접 연결 코드)
+
+# ========== 전체 청산 ==========
+@router.post("/close-all")
+async def close_all_positions(
+    magic: int = None,
+    symbol: str = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """모든 포지션 청산 (magic/symbol 필터 옵션) - MetaAPI 버전"""
+    print(f"[MetaAPI CloseAll] 전체 청산 요청: magic={magic}, symbol={symbol}, user={current_user.id}")
+
+    def _match(pos):
+        if symbol and pos.get('symbol') != symbol:
+            return False
+        if magic is not None and pos.get('magic') != magic:
+            return False
+        return True
+
+    return await _live_bulk_close(current_user, _match, "", "MetaAPI CloseAll")
 
 
 # ========== 타입별 청산 (BUY/SELL) ==========
@@ -2299,61 +2302,19 @@ async def close_by_type(
     magic: int = None,
     current_user: User = Depends(get_current_user)
 ):
-    """BUY 또는 SELL 포지션만 청산"""
-    if not mt5_initialize_safe():
-        return JSONResponse({"success": False, "message": "MT5 초기화 실패"})
-    
-    positions = mt5.positions_get()
-    if not positions:
-        return JSONResponse({"success": False, "message": "열린 포지션 없음"})
-    
-    target_type = 0 if type.upper() == "BUY" else 1
-    closed_count = 0
-    total_profit = 0
-    
-    for pos in positions:
-        if pos.type != target_type:
-            continue
+    """BUY 또는 SELL 포지션만 청산 - MetaAPI 버전"""
+    from .bulk_close import position_is_buy
+    want_buy = type.upper() == "BUY"
+
+    def _match(pos):
+        if position_is_buy(pos) != want_buy:
+            return False
         # magic 필터링
-        if magic is not None and pos.magic != magic:
-            continue
-            
-        tick = mt5.symbol_info_tick(pos.symbol)
-        if not tick:
-            continue
-            
-        close_type = mt5.ORDER_TYPE_SELL if pos.type == 0 else mt5.ORDER_TYPE_BUY
-        close_price = tick.bid if pos.type == 0 else tick.ask
-        
-        request = {
-            "action": mt5.TRADE_ACTION_DEAL,
-            "symbol": pos.symbol,
-            "volume": pos.volume,
-            "type": close_type,
-            "position": pos.ticket,
-            "price": close_price,
-            "deviation": 20,
-            "magic": 123456,
-            "comment": f"Trading-X CLOSE {type.upper()}",
-            "type_time": mt5.ORDER_TIME_GTC,
-            "type_filling": mt5.ORDER_FILLING_IOC,
-        }
-        
-        result = mt5.order_send(request)
-        
-        if result.retcode == mt5.TRADE_RETCODE_DONE:
-            closed_count += 1
-            total_profit += pos.profit
-    
-    if closed_count > 0:
-        return JSONResponse({
-            "success": True,
-            "message": f"{type.upper()} {closed_count}개 청산! P/L: ${total_profit:,.2f}",
-            "closed_count": closed_count,
-            "total_profit": total_profit
-        })
-    else:
-        return JSONResponse({"success": False, "message": f"{type.upper()} 포지션 없음"})
+        if magic is not None and pos.get('magic') != magic:
+            return False
+        return True
+
+    return await _live_bulk_close(current_user, _match, f"{type.upper()} ", "MetaAPI CloseByType")
 
 
 # ========== 손익별 청산 (수익/손실) ==========
@@ -2363,65 +2324,22 @@ async def close_by_profit(
     magic: int = None,
     current_user: User = Depends(get_current_user)
 ):
-    """수익 또는 손실 포지션만 청산"""
-    if not mt5_initialize_safe():
-        return JSONResponse({"success": False, "message": "MT5 초기화 실패"})
-    
-    positions = mt5.positions_get()
-    if not positions:
-        return JSONResponse({"success": False, "message": "열린 포지션 없음"})
-    
-    closed_count = 0
-    total_profit = 0
-    
-    for pos in positions:
+    """수익 또는 손실 포지션만 청산 - MetaAPI 버전"""
+    type_name = "수익" if profit_type == "positive" else "손실"
+
+    def _match(pos):
         # magic 필터링
-        if magic is not None and pos.magic != magic:
-            continue
+        if magic is not None and pos.get('magic') != magic:
+            return False
         # 수익/손실 필터링
-        if profit_type == "positive" and pos.profit <= 0:
-            continue
-        if profit_type == "negative" and pos.profit >= 0:
-            continue
-            
-        tick = mt5.symbol_info_tick(pos.symbol)
-        if not tick:
-            continue
-            
-        close_type = mt5.ORDER_TYPE_SELL if pos.type == 0 else mt5.ORDER_TYPE_BUY
-        close_price = tick.bid if pos.type == 0 else tick.ask
-        
-        request = {
-            "action": mt5.TRADE_ACTION_DEAL,
-            "symbol": pos.symbol,
-            "volume": pos.volume,
-            "type": close_type,
-            "position": pos.ticket,
-            "price": close_price,
-            "deviation": 20,
-            "magic": 123456,
-            "comment": f"Trading-X CLOSE {'PROFIT' if profit_type == 'positive' else 'LOSS'}",
-            "type_time": mt5.ORDER_TIME_GTC,
-            "type_filling": mt5.ORDER_FILLING_IOC,
-        }
-        
-        result = mt5.order_send(request)
-        
-        if result.retcode == mt5.TRADE_RETCODE_DONE:
-            closed_count += 1
-            total_profit += pos.profit
-    
-    type_name = "수익" if profit_type == "positive" else "손실"
-    
-    if closed_count > 0:
-        return JSONResponse({
-            "success": True,
-            "message": f"{type_name} {closed_count}개 청산! P/L: ${total_profit:,.2f}",
-            "closed_count": closed_count,
-            "total_profit": total_profit
-        })
-    else:
-        return JSONResponse({"success": False, "message": f"{type_name} 포지션 없음"})
+        profit = pos.get('profit', 0) or 0
+        if profit_type == "positive" and profit <= 0:
+            return False
+        if profit_type == "negative" and profit >= 0:
+            return False
+        return True
+
+    return await _live_bulk_close(current_user, _match, f"{type_name} ", "MetaAPI CloseByProfit")
 
 # ========== 최신 거래 1건 (magic 필터) ==========
 @router.get("/last-trade")
@@ -2445,7 +2363,8 @@ async def get_last_trade(
         history = await get_user_history(
             user_id=user_id,
             metaapi_account_id=current_user.metaapi_account_id,
-            start_time=start_time
+            start_time=start_time,
+            max_stale=0  # 방금 청산된 건 확인용 — 스트리밍 없으면 꼬리 구간 항상 재조회
         )
 
         if not history:
@@ -2535,8 +2454,7 @@ async def get_trading_report_summary(
     account = current_user.mt5_account_number or "-"
     current_balance = current_user.mt5_balance or 0
 
-    # ★ MetaAPI에서 원본 deals 직접 조회 (type 변환 없이 raw 데이터)
-    from .metaapi_service import metaapi_service, is_metaapi_connected, get_user_trade_connection
+    # ★ 원본 deals 조회 (type 변환 없이 raw 데이터)
 
     _use_user_metaapi = bool(current_user.metaapi_account_id and current_user.metaapi_status == 'deployed')
 
@@ -2550,13 +2468,10 @@ async def get_trading_report_summary(
     try:
         raw_deals = []
 
-        # ★ 유저별 MetaAPI — RPC에서 raw deals 직접 조회
+        # ★ 유저별 MetaAPI — 로컬 딜 저장소에서 raw deals 조회 (빈 구간만 RPC)
         if _use_user_metaapi:
-            rpc = await get_user_trade_connection(user_id, current_user.metaapi_account_id)
-            if rpc:
-                result = await rpc.get_deals_by_time_range(start_time, end_time)
-                raw_deals = result.get('deals', []) if isinstance(result, dict) else (result or [])
-                print(f"[TradingReport] User {user_id}: raw deals {len(raw_deals)}개 조회")
+            raw_deals = await deal_store.get_deals(user_id, current_user.metaapi_account_id, start_time, end_time)
+            print(f"[TradingReport] User {user_id}: raw deals {len(raw_deals)}개 조회")
 
         # ★ 유저 본인 MetaAPI 없으면 빈 데이터 (공유 계좌 fallback 제거)
         else:
@@ -2723,18 +2638,14 @@ async def get_trading_report_analysis(
         start_time = now - timedelta(days=365)
         end_time = now
 
-    # ★ MetaAPI 원본 deals 조회
-    from .metaapi_service import metaapi_service, is_metaapi_connected, get_user_trade_connection
+    # ★ 원본 deals 조회 (로컬 딜 저장소)
 
     _use_user_metaapi = bool(current_user.metaapi_account_id and current_user.metaapi_status == 'deployed')
 
     raw_deals = []
     try:
         if _use_user_metaapi:
-            rpc = await get_user_trade_connection(user_id, current_user.metaapi_account_id)
-            if rpc:
-                result = await rpc.get_deals_by_time_range(start_time, end_time)
-                raw_deals = result.get('deals', []) if isinstance(result, dict) else (result or [])
+            raw_deals = await deal_store.get_deals(user_id, current_user.metaapi_account_id, start_time, end_time)
         else:
             # ★ 유저 본인 MetaAPI 없으면 빈 데이터 (공유 계좌 fallback 제거)
             print(f"[TradingReport] Analysis User {user_id}: MetaAPI 미연결 — 빈 데이터 반환")
@@ -3674,6 +3585,7 @@ async def connect_mt5_account(
         })
 
     # ★★★ 신규 계정: MetaAPI create_account로 등록 ★★★
+    release_session(db)  # ★ 프로비저닝(수 초) 대기 중 동기 풀 커넥션 반납
     try:
         print(f"[CONNECT] 📝 MetaAPI 계정 등록 시작: {request.account}@{request.server}")
         provision_result = await provision_user_metaapi(
@@ -3790,7 +3702,6 @@ async def pre_deploy_metaapi(
     - undeployed/error → 쿨다운 체크 → 슬롯 확인 → Deploy 시작
     """
     import time as _time
-    from datetime import datetime
     from .metaapi_service import (
         _get_slot_usage_ratio, _evict_least_active_user,
         SLOT_CRITICAL_RATIO, _provision_metaapi_background,
@@ -3803,8 +3714,7 @@ async def pre_deploy_metaapi(
 
     # 1) 이미 deployed → last_active 갱신 후 즉시 성공
     if _status == 'deployed' and _account_id:
-        current_user.metaapi_last_active = datetime.utcnow()
-        db.commit()
+        user_snapshot_buffer.touch(current_user.id)
         return JSONResponse({
             "success": True,
             "status": "deployed",
@@ -3953,6 +3863,18 @@ async def admin_get_users(
     })
 
 # ========== WebSocket 실시간 데이터 ==========
+# 프레임용 마틴 상태 재조회 간격 (초) — 프레임은 스냅샷마다(최대 10/s) 나가므로 매 프레임 DB 조회 대신 주기 재조회
+# (마틴 변경 라우트는 응답에 새 상태를 담아 반환 → WS 프레임 반영은 최대 이 간격만큼 늦어도 됨)
+LIVE_MARTIN_REFRESH_SEC = 1.0
+
+
+async def _load_live_martin(user_id: int, magic: int):
+    """라이브 마틴 상태 조회 (WS 루프용 비동기 세션 — 이벤트 루프 블로킹 없음)"""
+    async with async_session() as adb:
+        result = await adb.execute(select(LiveMartinState).filter_by(user_id=user_id, magic=magic))
+        return result.scalar_one_or_none()
+
+
 @router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """실시간 데이터 WebSocket (Live 모드) - MetaAPI 버전"""
@@ -3967,11 +3889,10 @@ async def websocket_endpoint(websocket: WebSocket):
     # ★★★ MetaAPI 실시간 데이터 import ★★★
     from .metaapi_service import (
         get_metaapi_prices, get_metaapi_candles, is_metaapi_connected,
-        get_metaapi_last_update, get_metaapi_indicators, get_realtime_data,
+        get_metaapi_last_update, get_metaapi_indicators,
         quote_price_cache, quote_last_update,
         get_metaapi_positions, get_metaapi_account, pop_metaapi_closed_events,
-        get_user_account_info, get_user_positions, user_metaapi_cache,
-        user_trade_connections  # ★ Streaming 연결 체크용
+        user_metaapi_cache
     )
 
     # ★ Query parameter에서 토큰/magic으로 유저 식별
@@ -3986,54 +3907,60 @@ async def websocket_endpoint(websocket: WebSocket):
     user_mt5_profit = None
     user_mt5_leverage = None
     user_mt5_server = None
+    _session = None
 
     if token:
         try:
             payload = decode_token(token)
             if payload:
                 user_id = int(payload.get("sub"))
-                # DB에서 유저의 MT5 계정 정보 조회
-                db = next(get_db())
-                user = db.query(User).filter(User.id == user_id).first()
-                if user and user.has_mt5_account:
-                    user_mt5_account = user.mt5_account_number
-                    user_mt5_balance = user.mt5_balance
-                    user_mt5_equity = user.mt5_equity
-                    user_mt5_margin = user.mt5_margin
-                    user_mt5_free_margin = user.mt5_free_margin
-                    user_mt5_profit = user.mt5_profit
-                    user_mt5_leverage = user.mt5_leverage
-                    user_mt5_server = user.mt5_server
-
-                    # ★★★ 유저별 MetaAPI 정보 ★★★
-                    _ws_user_metaapi_id = user.metaapi_account_id
-                    _ws_user_metaapi_status = user.metaapi_status
-                    _ws_use_user_metaapi = bool(_ws_user_metaapi_id and _ws_user_metaapi_status == 'deployed')
-                    if _ws_use_user_metaapi:
-                        print(f"[LIVE WS] User {user_id} connected (MT5: {user_mt5_account}, Balance: ${user_mt5_balance}, MetaAPI: ✅ {_ws_user_metaapi_id[:8]}...)")
-                    else:
-                        print(f"[LIVE WS] User {user_id} connected (MT5: {user_mt5_account}, Balance: ${user_mt5_balance}, MetaAPI: ❌ {_ws_user_metaapi_status})")
-                        # ★★★ undeployed/error 상태면 자동 deploy 시도 (쿨다운 60초) ★★★
-                        if _ws_user_metaapi_id and _ws_user_metaapi_status in ('undeployed', 'error', None):
-                            import time as _time
-                            _now = _time.time()
-                            _last_attempt = _auto_deploy_cooldown.get(user_id, 0)
-                            if _now - _last_attempt >= AUTO_DEPLOY_COOLDOWN_SEC:
-                                _auto_deploy_cooldown[user_id] = _now
-                                print(f"[LIVE WS] 🔄 User {user_id} MetaAPI 자동 deploy 시작...")
-                                _mt5_pw = decrypt(user.mt5_password_encrypted) if user.mt5_password_encrypted else ""
-                                if _mt5_pw:
-                                    asyncio.create_task(_provision_metaapi_background(
-                                        user_id=user_id,
-                                        login=user.mt5_account_number,
-                                        password=_mt5_pw,
-                                        server=user.mt5_server or "HedgeHood-MT5"
-                                    ))
-                            else:
-                                print(f"[LIVE WS] ⏳ User {user_id} deploy 쿨다운 중 ({int(AUTO_DEPLOY_COOLDOWN_SEC - (_now - _last_attempt))}초 남음)")
+                # ★★★ 유저 세션 (같은 유저 소켓들이 DB 갱신/MetaAPI 동기화/청산 감지 공유) ★★★
+                _session = live_user_sessions.acquire(user_id)
+                if _session.loaded:
+                    print(f"[LIVE WS] User {user_id} connected (magic={magic}, 세션 공유: 소켓 {_session.sockets}개)")
                 else:
-                    print(f"[LIVE WS] User {user_id} connected (No MT5 account)")
-                db.close()
+                    # DB에서 유저의 MT5 계정 정보 조회 (비동기 세션)
+                    async with async_session() as _adb:
+                        user = (await _adb.execute(select(User).where(User.id == user_id))).scalar_one_or_none()
+                    if user and user.has_mt5_account:
+                        user_mt5_account = user.mt5_account_number
+                        user_mt5_balance = user.mt5_balance
+                        user_mt5_equity = user.mt5_equity
+                        user_mt5_margin = user.mt5_margin
+                        user_mt5_free_margin = user.mt5_free_margin
+                        user_mt5_profit = user.mt5_profit
+                        user_mt5_leverage = user.mt5_leverage
+                        user_mt5_server = user.mt5_server
+
+                        # ★★★ 유저별 MetaAPI 정보 ★★★
+                        _ws_user_metaapi_id = user.metaapi_account_id
+                        _ws_user_metaapi_status = user.metaapi_status
+                        _ws_use_user_metaapi = bool(_ws_user_metaapi_id and _ws_user_metaapi_status == 'deployed')
+                        if _ws_use_user_metaapi:
+                            print(f"[LIVE WS] User {user_id} connected (MT5: {user_mt5_account}, Balance: ${user_mt5_balance}, MetaAPI: ✅ {_ws_user_metaapi_id[:8]}...)")
+                        else:
+                            print(f"[LIVE WS] User {user_id} connected (MT5: {user_mt5_account}, Balance: ${user_mt5_balance}, MetaAPI: ❌ {_ws_user_metaapi_status})")
+                            # ★★★ undeployed/error 상태면 자동 deploy 시도 (쿨다운 60초) ★★★
+                            if _ws_user_metaapi_id and _ws_user_metaapi_status in ('undeployed', 'error', None):
+                                import time as _time
+                                _now = _time.time()
+                                _last_attempt = _auto_deploy_cooldown.get(user_id, 0)
+                                if _now - _last_attempt >= AUTO_DEPLOY_COOLDOWN_SEC:
+                                    _auto_deploy_cooldown[user_id] = _now
+                                    print(f"[LIVE WS] 🔄 User {user_id} MetaAPI 자동 deploy 시작...")
+                                    _mt5_pw = decrypt(user.mt5_password_encrypted) if user.mt5_password_encrypted else ""
+                                    if _mt5_pw:
+                                        asyncio.create_task(_provision_metaapi_background(
+                                            user_id=user_id,
+                                            login=user.mt5_account_number,
+                                            password=_mt5_pw,
+                                            server=user.mt5_server or "HedgeHood-MT5"
+                                        ))
+                                else:
+                                    print(f"[LIVE WS] ⏳ User {user_id} deploy 쿨다운 중 ({int(AUTO_DEPLOY_COOLDOWN_SEC - (_now - _last_attempt))}초 남음)")
+                    else:
+                        print(f"[LIVE WS] User {user_id} connected (No MT5 account)")
+                    _session.apply_user(user)
         except Exception as e:
             print(f"[LIVE WS] Token decode error: {e}")
     else:
@@ -4044,11 +3971,7 @@ async def websocket_endpoint(websocket: WebSocket):
         _ws_use_user_metaapi = False
         _ws_user_metaapi_id = None
         _ws_user_metaapi_status = None
-    last_user_metaapi_sync = 0  # 유저 MetaAPI 동기화 타이머
-    _prev_user_position = None  # ★ 이전 유저 포지션 (청산 감지용)
-    _position_disappeared_count = 0  # ★ 포지션 사라짐 연속 카운트 (오탐 방지)
-    _user_has_position = False  # ★ 유저 포지션 보유 여부 (동기화 주기 결정)
-    _user_sync_soon_at = []  # ★ 주문 직후 빠른 동기화 예약 시간 리스트
+    _last_close_event_id = _session.last_close_event_id(magic) if _session else 0  # ★ 이 소켓이 마지막으로 받은 세션 청산 이벤트 id
     _last_sent_position = None  # ★ 포지션 홀드: 마지막 전송 포지션
     _last_position_time = 0  # ★ 포지션 홀드: 마지막 포지션 있었던 시간
     POSITION_HOLD_SEC = 3  # ★ 포지션 홀드: null 유예 시간 (초)
@@ -4058,106 +3981,84 @@ async def websocket_endpoint(websocket: WebSocket):
     # ★★★ 마지막 전송 시간 추적 (실시간 전환용) ★★★
     last_send_time = 0
     last_data_timestamp = 0
-    last_user_refresh = 0  # ★ 유저 MT5 정보 DB 갱신 타이머
     last_ping_time = 0  # ★ 서버 ping 타이머
     last_client_pong = time.time() if 'time' in dir() else 0  # ★ 클라이언트 응답 시간
 
+    # ★★★ 마켓 스냅샷 허브 구독 (시세/캔들/인디케이터는 워커당 1회 생성·인코딩) ★★★
+    from .market_hub import market_hub, compose_frame, frame_built, frame_sent
+    _hub_sub = market_hub.subscribe()
+    _sent_seq = 0  # ★ 틱→전송 지연은 스냅샷당 1회만 기록
+    # ★★★ 유저 Streaming 이벤트 → 이 소켓 즉시 깨움 (계정/포지션 푸시) ★★★
+    from .user_stream_hub import user_stream_hub
+    if user_id:
+        user_stream_hub.register(user_id, _hub_sub)
+
+    # ★★★ 클라이언트 메시지 수신 전용 태스크 (pong/symbol_change) ★★★
+    # 기존: 프레임마다 receive_text 0.05초 대기 + 0.15초 sleep → 소켓당 최대 ~5프레임/s, 틱→전송 최대 200ms 추가
+    # 변경: 전송 루프는 next_snapshot만 대기, 수신 종료(연결 끊김)는 다음 반복에서 감지
+    async def _receive_client():
+        nonlocal last_client_pong
+        global indicator_symbol
+        import time as time_module
+        try:
+            while True:
+                client_msg = await websocket.receive_text()
+                try:
+                    parsed = json.loads(client_msg)
+                except ValueError:
+                    continue
+                if parsed.get("type") == "pong":
+                    last_client_pong = time_module.time()
+                elif parsed.get("type") == "symbol_change":
+                    indicator_symbol = parsed.get("symbol", "BTCUSD")
+                    print(f"[LIVE WS] 📊 심볼 변경: {indicator_symbol}")
+        except Exception:
+            pass  # 수신 실패 = 연결 죽음 → 전송 루프 종료
+
+    _receiver = asyncio.create_task(_receive_client())
+    _live_martin_cache = None  # ★ 프레임용 마틴 상태 (LIVE_MARTIN_REFRESH_SEC마다 백그라운드 재조회)
+    _live_martin_loaded_at = 0.0
+    _live_martin_task = None
+
     while True:
         try:
             import time as time_module
-            current_time = time_module.time()
 
-            # ★★★ MetaAPI 실시간 데이터 (시세 + 캔들 + 인디케이터 동기화) ★★★
-            realtime_data = get_realtime_data()
-            all_prices = realtime_data["prices"]
-            all_candles = realtime_data["candles"]
-            indicators = realtime_data["indicators"]
-            data_timestamp = realtime_data["timestamp"]
-
-            # ★★★ 데이터 변경 시에만 전송 (또는 1초 경과) ★★★
-            should_send = (
-                data_timestamp != last_data_timestamp or
-                (current_time - last_send_time) >= 1.0
-            )
+            if _receiver.done():
+                break
 
-            if not should_send:
-                await asyncio.sleep(0.1)  # 100ms 대기 후 재확인
+            # ★★★ 새 스냅샷 대기 (틱 도착 시 즉시, 없으면 1초 하트비트) ★★★
+            snapshot = await market_hub.next_snapshot(_hub_sub, timeout=1.0)
+            if snapshot is None:
                 continue
+            _frame_started = time_module.perf_counter()
+            current_time = time_module.time()
+            all_prices = snapshot.prices
 
             last_send_time = current_time
-            last_data_timestamp = data_timestamp
-
-            # ★★★ 유저 MT5 계정 정보 주기적 DB 갱신 (30초마다) ★★★
-            if user_id and (current_time - last_user_refresh) > 30:
-                last_user_refresh = current_time
-                try:
-                    _refresh_db = next(get_db())
-                    _refresh_user = _refresh_db.query(User).filter(User.id == user_id).first()
-                    if _refresh_user and _refresh_user.has_mt5_account:
-                        if _refresh_user.mt5_account_number != user_mt5_account:
-                            print(f"[LIVE WS] 🔄 User {user_id} MT5 계정 갱신: {user_mt5_account} → {_refresh_user.mt5_account_number}")
-                        user_mt5_account = _refresh_user.mt5_account_number
-                        user_mt5_server = _refresh_user.mt5_server
-                        user_mt5_balance = _refresh_user.mt5_balance
-                        user_mt5_equity = _refresh_user.mt5_equity
-                        user_mt5_leverage = _refresh_user.mt5_leverage
-
-                        # ★★★ MetaAPI 상태 갱신 ★★★
-                        _old_status = _ws_user_metaapi_status
-                        _ws_user_metaapi_id = _refresh_user.metaapi_account_id
-                        _ws_user_metaapi_status = _refresh_user.metaapi_status
-                        _ws_use_user_metaapi = bool(_ws_user_metaapi_id and _ws_user_metaapi_status == 'deployed')
-                        if _old_status != _ws_user_metaapi_status:
-                            print(f"[LIVE WS] 🔄 User {user_id} MetaAPI 상태 변경: {_old_status} → {_ws_user_metaapi_status}")
-
-                    elif _refresh_user and not _refresh_user.has_mt5_account and user_mt5_account:
-                        print(f"[LIVE WS] 🔄 User {user_id} MT5 계정 해제 감지")
-                        user_mt5_account = None
-                        user_mt5_server = None
-                    _refresh_db.close()
-                except Exception as _refresh_err:
-                    print(f"[LIVE WS] DB refresh error: {_refresh_err}")
-
-            # ★ 주문 후 빠른 동기화 예약 확인
-            if user_id and '_user_sync_soon_map' in globals() and user_id in globals()['_user_sync_soon_map']:
-                _user_sync_soon_at = globals()['_user_sync_soon_map'].pop(user_id)
-                print(f"[LIVE WS] User {user_id} 빠른 동기화 예약 수신: {len(_user_sync_soon_at)}건")
-
-            # ★★★ 유저별 MetaAPI 데이터 동기화 (적응형 주기) ★★★
-            # ★★★ Streaming 연결 시 RPC는 백업용 (30초), 없으면 기존 주기 ★★★
-            if _ws_use_user_metaapi and user_id:
-                _has_streaming = user_id in user_trade_connections and user_trade_connections[user_id].get("streaming") is not None
-                _sync_interval = 30 if _has_streaming else (5 if _user_has_position else 30)
-                _should_sync = (current_time - last_user_metaapi_sync) > _sync_interval
-
-                # ★★★ 첫 연결 시 강제 즉시 동기화 (stale 캐시 방지) ★★★
-                if last_user_metaapi_sync == 0:
-                    _should_sync = True
-                    print(f"[LIVE WS] User {user_id} 첫 연결 - 강제 동기화 실행")
-
-                # ★ 주문 직후 빠른 동기화 (예약된 시간 도달 시)
-                if _user_sync_soon_at and current_time >= _user_sync_soon_at[0]:
-                    _should_sync = True
-                    _user_sync_soon_at.pop(0)
-                    print(f"[LIVE WS] User {user_id} 주문 후 빠른 동기화 실행")
-
-                if _should_sync:
-                    last_user_metaapi_sync = current_time
-                    try:
-                        _u_account = await get_user_account_info(user_id, _ws_user_metaapi_id)
-                        # ★★★ 항상 포지션 조회 (모든 magic 포지션 표시 필요) ★★★
-                        _u_positions = await get_user_positions(user_id, _ws_user_metaapi_id)
-
-                        if _u_account:
-                            user_metaapi_cache[user_id] = {
-                                "account_info": _u_account,
-                                "positions": _u_positions or [],
-                                "last_sync": current_time
-                            }
-                            # ★ 포지션 보유 여부 업데이트 (모든 magic 포지션 기준)
-                            _user_has_position = len(_u_positions or []) > 0
-                    except Exception as _sync_err:
-                        print(f"[LIVE WS] User {user_id} MetaAPI sync error: {_sync_err}")
+            last_data_timestamp = snapshot.timestamp
+
+            # ★★★ 유저 MT5 계정 정보 주기적 DB 갱신 + MetaAPI 동기화 (세션당 1회, 소켓 수 무관) ★★★
+            if _session:
+                await _session.refresh_db(current_time)
+
+                # ★ 주문 후 빠른 동기화 예약 확인
+                if '_user_sync_soon_map' in globals() and user_id in globals()['_user_sync_soon_map']:
+                    _session.sync_soon_at = globals()['_user_sync_soon_map'].pop(user_id)
+                    print(f"[LIVE WS] User {user_id} 빠른 동기화 예약 수신: {len(_session.sync_soon_at)}건")
+
+                await _session.sync_metaapi(current_time)
+
+                user_mt5_account = _session.mt5_account
+                user_mt5_server = _session.mt5_server
+                user_mt5_balance = _session.mt5_balance
+                user_mt5_equity = _session.mt5_equity
+                user_mt5_margin = _session.mt5_margin
+                user_mt5_free_margin = _session.mt5_free_margin
+                user_mt5_leverage = _session.mt5_leverage
+                _ws_user_metaapi_id = _session.metaapi_id
+                _ws_user_metaapi_status = _session.metaapi_status
+                _ws_use_user_metaapi = _session.use_user_metaapi
 
             # ★★★ 유저별 MetaAPI가 deployed면 connected 처리 ★★★
             metaapi_connected = is_metaapi_connected()
@@ -4166,12 +4067,6 @@ async def websocket_endpoint(websocket: WebSocket):
             mt5_connected = mt5_initialize_safe()
             bridge_connected = metaapi_connected
 
-            # ★★★ 인디케이터 값 (동일 데이터에서 계산됨) ★★★
-            buy_count = indicators["buy"]
-            sell_count = indicators["sell"]
-            neutral_count = indicators["neutral"]
-            base_score = indicators["score"]
-
             # ★★★ 유저 라이브 캐시 확인 (주문/청산 직후 데이터) ★★★
             user_cache = user_live_cache.get(user_id) if user_id else None
 
@@ -4191,48 +4086,12 @@ async def websocket_endpoint(websocket: WebSocket):
             _user_ack_time = user_close_acknowledged.get(user_id, 0) if user_id else 0
             _is_user_close_recent = (current_time - _user_ack_time) < 20  # 20초 이내 사용자 청산
 
-            if _ws_use_user_metaapi and user_id:
-                _user_ma_positions_now = user_metaapi_cache.get(user_id, {}).get("positions", [])
-                _user_magic_positions = [p for p in _user_ma_positions_now if p.get("magic", 0) == magic]
-                _has_position_now = len(_user_magic_positions) > 0
-
-                if _prev_user_position and not _has_position_now:
-                    if _is_user_close_recent:
-                        # ★★★ 사용자가 직접 청산 → WS 자동감지 완전 스킵 + 캐시 강제 정리 ★★★
-                        print(f"[LIVE WS] ⏭️ User {user_id} 사용자 청산 후 {current_time - _user_ack_time:.1f}초 — 자동감지 스킵")
-                        # ★ 청산된 포지션만 캐시에서 제거 (다른 포지션은 유지!)
-                        _closed_pos_id = _prev_user_position.get("id") if _prev_user_position else None
-                        if _closed_pos_id and user_id in user_live_cache:
-                            user_live_cache[user_id]["positions"] = [
-                                p for p in user_live_cache[user_id].get("positions", [])
-                                if p.get("id") != _closed_pos_id
-                            ]
-                        _prev_user_position = None
-                        _position_disappeared_count = 0
-                    else:
-                        _position_disappeared_count += 1
-                        # 2회 연속 확인 시 청산으로 확정 (SL/TP 빠른 감지 필요)
-                        if _position_disappeared_count >= 2:
-                            _prev_profit = _prev_user_position.get("profit", 0)
-                            _prev_symbol = _prev_user_position.get("symbol", "")
-                            _is_win = _prev_profit >= 0
-
-                            _user_closed_event = {
-                                "profit": _prev_profit,
-                                "symbol": _prev_symbol,
-                                "is_win": _is_win,
-                                "position_id": _prev_user_position.get("id", ""),
-                            }
-                            print(f"[LIVE WS] 🔔 자동 청산 감지! User {user_id}, {_prev_symbol} P/L=${_prev_profit:.2f}")
-
-                            _prev_user_position = None
-                            _position_disappeared_count = 0
-                elif _has_position_now:
-                    _prev_user_position = _user_magic_positions[0]
-                    _position_disappeared_count = 0
-                    # ★★★ 포지션 있으면 acknowledged 클리어 (새 포지션 진입 의미) ★★★
-                    if user_id and user_id in user_close_acknowledged:
-                        del user_close_acknowledged[user_id]
+            if _ws_use_user_metaapi and _session:
+                # ★ 세션이 magic별로 스냅샷당 1회 판정 → 같은 magic 소켓들은 같은 이벤트를 한 번씩 수신
+                _close_event_id, _close_event = _session.detect_close(magic, snapshot.seq, current_time)
+                if _close_event_id > _last_close_event_id:
+                    _last_close_event_id = _close_event_id
+                    _user_closed_event = _close_event
 
             # ★ 계정 정보 (유저별 MetaAPI > 공유 MetaAPI > user_cache > MT5)
             _user_ma_cache = user_metaapi_cache.get(user_id) if user_id else None
@@ -4483,8 +4342,18 @@ async def websocket_endpoint(websocket: WebSocket):
             martin_state = None
             if user_id:
                 try:
-                    ws_db2 = next(get_db())
-                    live_martin_state = ws_db2.query(LiveMartinState).filter_by(user_id=user_id, magic=magic).first()
+                    # ★ 첫 프레임만 조회 대기, 이후는 백그라운드 재조회 결과를 다음 프레임에 반영 (DB 왕복 동안 프레임 멈춤 없음)
+                    if _live_martin_task is not None and _live_martin_task.done():
+                        _task, _live_martin_task = _live_martin_task, None
+                        _live_martin_cache = _task.result()
+                    if _live_martin_task is None and current_time - _live_martin_loaded_at >= LIVE_MARTIN_REFRESH_SEC:
+                        _first_load = _live_martin_loaded_at == 0
+                        _live_martin_loaded_at = current_time
+                        if _first_load:
+                            _live_martin_cache = await _load_live_martin(user_id, magic)
+                        else:
+                            _live_martin_task = asyncio.create_task(_load_live_martin(user_id, magic))
+                    live_martin_state = _live_martin_cache
                     if live_martin_state:
                         current_lot = live_martin_state.base_lot * (2 ** (live_martin_state.step - 1))
                         martin_state = {
@@ -4497,7 +4366,6 @@ async def websocket_endpoint(websocket: WebSocket):
                             "accumulated_loss": live_martin_state.accumulated_loss,
                             "magic": magic
                         }
-                    ws_db2.close()
                 except Exception as martin_db_err:
                     print(f"[WS] 마틴 상태 조회 오류: {martin_db_err}")
                     martin_state = martin_service.get_state()  # fallback
@@ -4577,15 +4445,13 @@ async def websocket_endpoint(websocket: WebSocket):
                 # ★★★ 라이브 마틴: DB 안 건드림! 현재 값만 읽어서 프론트에 전달 ★★★
                 if user_id:
                     try:
-                        ws_db = next(get_db())
-                        live_martin = ws_db.query(LiveMartinState).filter_by(user_id=user_id, magic=magic).first()
+                        live_martin = await _load_live_martin(user_id, magic)
                         if live_martin and live_martin.enabled:
                             martin_step = live_martin.step
                             martin_accumulated_loss = live_martin.accumulated_loss
                             martin_reset = False
                             martin_step_up = False
                             print(f"[WS MARTIN] User {user_id} P/L=${closed_profit:.2f} (DB 미변경, 프론트 팝업 대기)")
-                        ws_db.close()
                     except Exception as martin_err:
                         print(f"[WS MARTIN] DB 조회 오류: {martin_err}")
 
@@ -4628,15 +4494,13 @@ async def websocket_endpoint(websocket: WebSocket):
                 # ★★★ 라이브 마틴: DB 안 건드림! 현재 값만 읽어서 프론트에 전달 ★★★
                 if user_id:
                     try:
-                        ws_db = next(get_db())
-                        live_martin = ws_db.query(LiveMartinState).filter_by(user_id=user_id, magic=magic).first()
+                        live_martin = await _load_live_martin(user_id, magic)
                         if live_martin and live_martin.enabled:
                             martin_step = live_martin.step
                             martin_accumulated_loss = live_martin.accumulated_loss
                             martin_reset = False
                             martin_step_up = False
                             print(f"[WS MARTIN RPC] User {user_id} P/L=${closed_profit:.2f} (DB 미변경, 프론트 팝업 대기)")
-                        ws_db.close()
                     except Exception as martin_err:
                         print(f"[WS MARTIN RPC] DB 조회 오류: {martin_err}")
 
@@ -4677,15 +4541,13 @@ async def websocket_endpoint(websocket: WebSocket):
                 # ★★★ 라이브 마틴: DB 안 건드림! 현재 값만 읽어서 프론트에 전달 ★★★
                 if user_id:
                     try:
-                        ws_db = next(get_db())
-                        live_martin = ws_db.query(LiveMartinState).filter_by(user_id=user_id, magic=magic).first()
+                        live_martin = await _load_live_martin(user_id, magic)
                         if live_martin and live_martin.enabled:
                             martin_step = live_martin.step
                             martin_accumulated_loss = live_martin.accumulated_loss
                             martin_reset = False
                             martin_step_up = False
                             print(f"[WS MARTIN Events] User {user_id} P/L=${closed_profit:.2f} (DB 미변경, 프론트 팝업 대기)")
-                        ws_db.close()
                     except Exception as martin_err:
                         print(f"[WS MARTIN Events] DB 조회 오류: {martin_err}")
 
@@ -4783,12 +4645,6 @@ async def websocket_endpoint(websocket: WebSocket):
                 "positions_count": positions_count,
                 "position": position_data,
                 "positions": live_positions_list,  # ★★★ Open Positions 탭용 ★★★
-                "buy_count": buy_count,
-                "sell_count": sell_count,
-                "neutral_count": neutral_count,
-                "base_score": base_score,
-                "all_prices": all_prices,
-                "all_candles": all_candles,
                 "martin": martin_state,
                 "user_id": user_id,
                 "history": live_history,  # ★ 거래 히스토리
@@ -4807,8 +4663,11 @@ async def websocket_endpoint(websocket: WebSocket):
                 "martin_accumulated_loss": martin_accumulated_loss
             }
             
-            # ★★★ default=str로 datetime 등 직렬화 안 되는 타입 자동 변환 ★★★
-            await websocket.send_text(json.dumps(data, default=str))
+            # ★★★ 유저 데이터만 직렬화 + 사전 인코딩된 시세/캔들/인디케이터 조각 결합 ★★★
+            frame = compose_frame(data, snapshot)
+            _send_started = frame_built("live", _frame_started)
+            await websocket.send_text(frame)
+            _sent_seq = frame_sent("live", snapshot, _sent_seq, _frame_started, _send_started)
 
             # ★★★ 서버 ping (20초마다) ★★★
             if current_time - last_ping_time > 20:
@@ -4818,36 +4677,26 @@ async def websocket_endpoint(websocket: WebSocket):
                 except Exception:
                     break  # 전송 실패 = 연결 죽음
 
-            # ★★★ 클라이언트 메시지 비동기 수신 (pong 등) ★★★
-            try:
-                client_msg = await asyncio.wait_for(websocket.receive_text(), timeout=0.05)
-                if client_msg:
-                    parsed = json.loads(client_msg)
-                    if parsed.get("type") == "pong":
-                        last_client_pong = current_time
-                    elif parsed.get("type") == "symbol_change":
-                        global indicator_symbol
-                        indicator_symbol = parsed.get("symbol", "BTCUSD")
-                        print(f"[LIVE WS] 📊 심볼 변경: {indicator_symbol}")
-            except asyncio.TimeoutError:
-                pass  # 타임아웃 OK - 클라이언트가 보낸 게 없음
-            except Exception:
-                break  # 수신 실패 = 연결 죽음
-
-            # ★★★ 실시간 전송: 0.2초 간격 (데모와 동일) ★★★
-            await asyncio.sleep(0.15)
-
         except WebSocketDisconnect:
             print(f"[LIVE WS] User {user_id} WebSocket disconnected")
-            # ★ 모니터링: 라이브 WS 해제 카운트
-            try:
-                from app.monitor_counters import ws_disconnect
-                ws_disconnect("live")
-            except Exception:
-                pass
             break
         except Exception as e:
             # ★ 에러 발생해도 WS 연결 유지, 해당 루프만 스킵
             if str(e):
                 print(f"[LIVE WS] WebSocket Error (user {user_id}): {e}")
             await asyncio.sleep(random.uniform(1.0, 3.0))
+
+    _receiver.cancel()
+    if _live_martin_task is not None:
+        _live_martin_task.cancel()
+    market_hub.unsubscribe(_hub_sub)
+    if user_id:
+        user_stream_hub.unregister(user_id, _hub_sub)
+    # ★ 모니터링: 라이브 WS 해제 카운트 (루프 종료 경로 전체 — ping/수신 실패 포함)
+    try:
+        from app.monitor_counters import ws_disconnect
+        ws_disconnect("live")
+    except Exception:
+        pass
+    if _session:
+        live_user_sessions.release(_session)
@@ -0,0 +1,235 @@
+# app/api/principal_cache.py
+"""
+인증 사용자 캐시 — auth/mt5/demo get_current_user 공용
+
+기존: 인증 요청마다 JWT 디코드 → DB 커넥션 체크아웃 → SELECT users
+      (/account-info, /positions 폴링도 매번)
+변경: (user_id, sid) → User 컬럼 스냅샷을 Redis에 짧은 TTL로 캐시 (워커 간 공유)
+  - 캐시 적중 → 요청 세션에 detached 인스턴스로 붙임 (SQL 없음, 커넥션 체크아웃 없음)
+      → 라우트에서 속성 변경 후 db.commit() 하면 기존처럼 UPDATE 됨
+  - 무효화: 캐시된 컬럼(신원/인증/계좌 연결)이 변경되거나 행이 삭제된 트랜잭션 커밋 시 auth:gen:{user_id} 증가
+      → 프로필, MT5 연결/해제, MetaAPI 상태 등 ORM 쓰기에 자동 적용
+      → 캐시 항목은 저장 당시 세대(g)가 현재 세대와 같을 때만 사용
+  - 비밀번호 해시 / MT5 비밀번호는 Redis에 저장하지 않음 → 접근 시 해당 컬럼만 지연 로드
+  - ★ 잔고/자산/last_active 등 자주 바뀌는 컬럼(_VOLATILE)도 캐시하지 않음
+      → 청산·충전·스냅샷 저장마다 무효화되던 문제 제거, 접근 시 DB 최신 값 지연 로드 (쓰기 경로도 최신 값 기준)
+  - ★ 이벤트 루프 경로(resolve_user_async — mt5/demo get_current_user): 비동기 Redis + 비동기 세션으로 조회
+      → 캐시 미스여도 동기 풀 커넥션을 체크아웃하지 않고, 동기 Redis 왕복으로 루프를 막지 않음
+      커밋 시 무효화도 루프 안이면 비동기 Redis로 예약
+
+[키] auth:principal:{user_id}:{sid} — {"g": 세대, "u": 컬럼 dict}
+     auth:gen:{user_id}              — 세대 카운터
+"""
+
+import asyncio
+import json
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import DateTime, event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.util import identity_key
+
+from ..models.user import User
+
+# 캐시 항목 TTL (초) — 무효화 누락(Redis 장애 등) 시 최대 지연
+PRINCIPAL_TTL = 30
+# 세대 카운터 TTL (초) — 항목 TTL보다 충분히 길게
+GEN_TTL = 86400
+# Redis에 두지 않는 컬럼 (필요 시 DB에서 지연 로드)
+_EXCLUDED = {"password_hash", "mt5_password_encrypted"}
+# 자주 바뀌는 컬럼 — 캐시/무효화 대상 아님 (접근 시 DB에서 지연 로드)
+_VOLATILE = {"demo_balance", "demo_equity", "demo_today_profit",
+             "mt5_balance", "mt5_equity", "mt5_margin", "mt5_free_margin", "mt5_profit", "mt5_leverage",
+             "metaapi_last_active", "updated_at"}
+
+_COLUMNS = [c for c in User.__table__.columns if c.key not in _EXCLUDED and c.key not in _VOLATILE]
+_CACHED_KEYS = tuple(c.key for c in _COLUMNS)
+_DATETIME_KEYS = {c.key for c in User.__table__.columns if isinstance(c.type, DateTime)}
+
+stats = {"hit": 0, "miss": 0, "invalidated": 0, "errors": 0}
+
+
+def _principal_key(user_id: int, sid: str) -> str:
+    return f"auth:principal:{user_id}:{sid}"
+
+
+def _gen_key(user_id: int) -> str:
+    return f"auth:gen:{user_id}"
+
+
+def _dump(user: User) -> Dict:
+    data = {}
+    for col in _COLUMNS:
+        value = getattr(user, col.key)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        data[col.key] = value
+    return data
+
+
+def _load(db: Session, data: Dict) -> User:
+    """캐시 dict → 요청 세션에 붙은 User (SQL 없음)"""
+    existing = db.identity_map.get(identity_key(User, data["id"]))
+    if existing is not None:
+        return existing
+    values = dict(data)
+    for key in _DATETIME_KEYS:
+        if isinstance(values.get(key), str):
+            values[key] = datetime.fromisoformat(values[key])
+    user = User(**values)
+    # 세팅한 값은 "DB에서 로드된" 상태로, 빠진 컬럼(_EXCLUDED/_VOLATILE)은 expired로 → 접근 시 지연 로드
+    make_transient_to_detached(user)
+    db.add(user)
+    return user
+
+
+def _report(e: Exception, where: str):
+    stats["errors"] += 1
+    if stats["errors"] % 100 == 1:
+        print(f"[PrincipalCache] ⚠️ {where} 오류: {e}")
+
+
+def resolve_user(db: Session, payload: Dict) -> Optional[User]:
+    """JWT payload → User (캐시 우선, 없으면 DB 조회 후 캐시) — 스레드풀 의존성(auth)용 동기 경로"""
+    from ..redis_client import get_redis
+
+    user_id = int(payload.get("sub"))
+    key = _principal_key(user_id, payload.get("sid") or "-")
+
+    gen = None
+    try:
+        raw, gen = get_redis().mget(key, _gen_key(user_id))
+        gen = int(gen or 0)
+        if raw:
+            entry = json.loads(raw)
+            if entry.get("g") == gen:
+                stats["hit"] += 1
+                return _load(db, entry["u"])
+    except Exception as e:
+        gen = None
+        _report(e, "조회")
+
+    stats["miss"] += 1
+    user = db.query(User).filter(User.id == user_id).first()
+    if user is not None and gen is not None:
+        # 조회 전에 읽은 세대로 저장 → 그 사이 무효화됐으면 다음 조회에서 자동 폐기
+        try:
+            entry = json.dumps({"g": gen, "u": _dump(user)}, separators=(",", ":"))
+            get_redis().set(key, entry, ex=PRINCIPAL_TTL)
+        except Exception as e:
+            _report(e, "저장")
+    return user
+
+
+async def resolve_user_async(db: Session, payload: Dict) -> Optional[User]:
+    """
+    resolve_user의 이벤트 루프용 — 비동기 Redis 조회, 미스 시 비동기 세션으로 로드
+    반환 User는 요청 동기 세션(db)에 붙은 인스턴스 (로드 SQL은 비동기 풀에서 끝남 → 동기 커넥션 체크아웃 없음)
+    """
+    from ..redis_client import get_async_redis
+    from ..database import async_session
+
+    user_id = int(payload.get("sub"))
+    key = _principal_key(user_id, payload.get("sid") or "-")
+
+    gen = None
+    try:
+        raw, gen = await get_async_redis().mget(key, _gen_key(user_id))
+        gen = int(gen or 0)
+        if raw:
+            entry = json.loads(raw)
+            if entry.get("g") == gen:
+                stats["hit"] += 1
+                return _load(db, entry["u"])
+    except Exception as e:
+        gen = None
+        _report(e, "조회")
+
+    stats["miss"] += 1
+    async with async_session() as adb:
+        row = await adb.get(User, user_id)
+        if row is None:
+            return None
+        data = _dump(row)
+        fresh = {k: getattr(row, k) for k in _VOLATILE}
+    if gen is not None:
+        try:
+            entry = json.dumps({"g": gen, "u": data}, separators=(",", ":"))
+            await get_async_redis().set(key, entry, ex=PRINCIPAL_TTL)
+        except Exception as e:
+            _report(e, "저장")
+    # 방금 읽은 값이므로 자주 바뀌는 컬럼도 채워서 붙임 (이번 요청에서 지연 로드 없음)
+    return _load(db, {**data, **fresh})
+
+
+def invalidate_user(user_id: int):
+    """해당 유저의 모든 세션 캐시 무효화 (ORM 밖에서 users 행을 바꾼 경우 직접 호출)"""
+    from ..redis_client import get_redis
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.incr(_gen_key(user_id))
+        pipe.expire(_gen_key(user_id), GEN_TTL)
+        pipe.execute()
+        stats["invalidated"] += 1
+    except Exception as e:
+        _report(e, "무효화")
+
+
+async def invalidate_users_async(user_ids):
+    from ..redis_client import get_async_redis
+    try:
+        async with get_async_redis().pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.incr(_gen_key(user_id))
+                pipe.expire(_gen_key(user_id), GEN_TTL)
+            await pipe.execute()
+        stats["invalidated"] += len(user_ids)
+    except Exception as e:
+        _report(e, "무효화")
+
+
+# ========== 커밋 시 자동 무효화 ==========
+_PENDING = "principal_cache_invalidate"
+
+
+def _cached_columns_changed(obj: User) -> bool:
+    attrs = inspect(obj).attrs
+    return any(attrs[key].history.has_changes() for key in _CACHED_KEYS)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session, flush_context):
+    # after_flush 시점의 dirty/deleted와 속성 history는 아직 flush 이전 상태
+    # 잔고/last_active 등 _VOLATILE만 바뀐 행은 무효화하지 않음 (캐시에 없음)
+    changed = [obj.id for obj in session.dirty
+               if isinstance(obj, User) and obj.id is not None and _cached_columns_changed(obj)]
+    changed += [obj.id for obj in session.deleted if isinstance(obj, User) and obj.id is not None]
+    if changed:
+        session.info.setdefault(_PENDING, set()).update(changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    user_ids = session.info.pop(_PENDING, None)
+    if not user_ids:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    if loop is not None:
+        # 이벤트 루프 안 커밋 (async 라우트) → 동기 Redis 왕복 대신 비동기 발행 예약
+        loop.create_task(invalidate_users_async(list(user_ids)))
+        return
+    for user_id in user_ids:
+        invalidate_user(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING, None)
+
+
+def get_status() -> Dict:
+    return dict(stats)
@@ -0,0 +1,99 @@
+# app/api/redis_writer.py
+"""
+Redis 병합 쓰기 — 시세(price:{symbol}) / 유저 캐시(user:{id}) 병행 저장
+
+기존: QuotePriceListener.on_symbol_price_updated → redis_client.set_price (동기 SET, socket_timeout 3초)
+      → 틱마다(심볼 × 틱 수) 이벤트 루프 안에서 왕복 1회, Redis 지연 = 틱 처리 지연
+      get_user_account_info / get_user_positions / 리스너 → set_user_cache도 동기 SET
+변경: put()은 키별 최신 값만 메모리에 보관 (같은 키 재기록은 덮어씀)
+      FLUSH_INTERVAL마다 비동기 클라이언트로 파이프라인 1회 — MSET + 키별 EXPIRE
+      → 왕복 수 = 플러시 횟수 (틱 수와 무관), Redis가 느려도 틱 처리는 블로킹 없음
+      값은 플러시 시점에 JSON 직렬화 (그 사이 바뀐 캐시 dict는 최신 상태로 저장)
+
+[키/값] 기존 redis_client.set_price / set_user_cache와 동일 → 읽는 쪽(get_price, get_user_cache) 변경 없음
+"""
+
+import asyncio
+import json
+from typing import Any, Dict, Optional, Tuple
+
+# 플러시 간격 (초)
+FLUSH_INTERVAL = 0.1
+# 플러시 실패 시 재시도까지 대기 (초)
+RETRY_DELAY = 1.0
+
+
+class RedisCoalescingWriter:
+    """워커 전역 — key → (값, ttl) 최신 값만 보관 후 주기적 일괄 쓰기"""
+
+    def __init__(self):
+        self._pending: Dict[str, Tuple[Any, int]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"puts": 0, "writes": 0, "flushes": 0, "errors": 0}
+
+    def put(self, key: str, value: Any, ttl: int):
+        self._pending[key] = (value, ttl)
+        self.stats["puts"] += 1
+        if self._task is None or self._task.done():
+            try:
+                self.start()
+            except RuntimeError:
+                # 이벤트 루프 밖 (스레드 등) — 동기 SET으로 대체
+                self._pending.pop(key, None)
+                from ..redis_client import cache_set
+                cache_set(key, value, ttl=ttl)
+
+    # ========== 기존 redis_client 헬퍼와 같은 키/값 ==========
+    def set_price(self, symbol: str, bid: float, ask: float, ttl: int = 15):
+        self.put(f"price:{symbol}", {"bid": bid, "ask": ask}, ttl)
+
+    def set_user_cache(self, user_id: int, data: Dict, ttl: int = 30):
+        self.put(f"user:{user_id}", data, ttl)
+
+    # ========== 플러시 ==========
+    async def flush(self):
+        if not self._pending:
+            return
+        from ..redis_client import get_async_redis
+        batch, self._pending = self._pending, {}
+        try:
+            mapping = {key: json.dumps(value, default=str) for key, (value, _) in batch.items()}
+            pipe = get_async_redis().pipeline(transaction=False)
+            pipe.mset(mapping)
+            for key, (_, ttl) in batch.items():
+                pipe.expire(key, ttl)
+            await pipe.execute()
+        except Exception:
+            # 실패분 복구 (그 사이 들어온 최신 값 우선)
+            for key, item in batch.items():
+                self._pending.setdefault(key, item)
+            raise
+        self.stats["writes"] += len(batch)
+        self.stats["flushes"] += 1
+
+    async def _run(self):
+        print(f"[RedisWriter] 병합 쓰기 루프 시작 ({int(FLUSH_INTERVAL * 1000)}ms)")
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["errors"] += 1
+                if self.stats["errors"] % 100 == 1:
+                    print(f"[RedisWriter] ⚠️ 플러시 오류: {e}")
+                await asyncio.sleep(RETRY_DELAY)
+
+    def start(self):
+        """쓰기 루프 시작 (첫 put 시 보장) — 이벤트 루프 밖이면 RuntimeError"""
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def get_status(self) -> Dict:
+        return {"pending": len(self._pending), **self.stats}
+
+
+# 워커 전역 인스턴스
+redis_writer = RedisCoalescingWriter()
@@ -0,0 +1,162 @@
+# app/api/tick_trace.py
+"""
+틱 지연 추적 — MetaAPI 콜백 → 캔들 갱신 → 스냅샷 생성 → WS 전송 단계별 시간
+
+기존: 화면 시세가 늦을 때 원인이 MetaAPI인지, update_candle_realtime인지, 라이브 WS 루프 대기인지, 클라이언트인지 구분 불가
+      (app.metrics 히스토그램은 틱→전송 전체 구간만)
+변경: 콜백에서 받은 모든 틱이 브로커 시각 + 수신 시각을 들고 다님
+  - 단계 요약: 모든 틱/프레임의 단계별 시간 → 단계마다 최근 RING_SIZE개 링 버퍼 → 백분위 (조회 시 계산)
+  - 샘플 스팬: SAMPLE_EVERY 틱마다 1건, 단계 시각을 스팬 dict에 기록 (최근 SPAN_KEEP건)
+  - 샘플 틱이 담긴 스냅샷은 프레임에 "tick_trace" 포함 → 클라이언트(debug_ws_*.py)가 수신 시각과 비교
+  - GET /debug/tick-trace (워커 단위 — 응답에 worker pid 포함, /api 밖이라 nginx 미노출 — 127.0.0.1:8000 전용)
+
+[단계] broker      브로커 시각 → 콜백 수신 (벽시계, 브로커 시계 오차 포함)
+       candle      콜백 수신 → 캔들 갱신 완료
+       feed        ingest 발행 → 워커 수신 (subscriber 모드만, 벽시계)
+       fanout      워커 도착 → 데모 매칭 + 인디케이터 + 틱 큐 적재 완료
+       hub_wait    틱 큐 적재 → 스냅샷 생성 (틱 병합 대기, MIN_BUILD_INTERVAL)
+       build       스냅샷 생성 + JSON 인코딩
+       socket_wait 스냅샷 발행 → WS 루프가 꺼냄 (소켓 루프의 sleep/수신 대기가 여기 드러남)
+       frame       유저별 프레임 생성
+       send        send_text 완료까지
+       total       워커 도착 → 전송 완료 (스냅샷의 첫 틱 기준)
+"""
+
+import os
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+STAGES = ("broker", "candle", "feed", "fanout", "hub_wait", "build", "socket_wait", "frame", "send", "total")
+# 샘플 스팬 간격 (틱 수) — 0이면 스팬 기록 끔 (단계 요약은 유지)
+SAMPLE_EVERY = int(os.getenv("TICK_TRACE_SAMPLE", "20"))
+# 단계별 요약 표본 수
+RING_SIZE = 2048
+# 보관 샘플 스팬 수
+SPAN_KEEP = 100
+
+
+class _Ring:
+    """고정 크기 표본 버퍼 — 기록은 인덱스 대입 1회"""
+    __slots__ = ("values", "pos", "count")
+
+    def __init__(self, size: int):
+        self.values = [0.0] * size
+        self.pos = 0
+        self.count = 0
+
+    def add(self, value: float):
+        self.values[self.pos] = value
+        self.pos = (self.pos + 1) % len(self.values)
+        self.count += 1
+
+    def summary(self) -> Optional[Dict]:
+        n = min(self.count, len(self.values))
+        if n == 0:
+            return None
+        data = sorted(self.values[:n])
+
+        def _pct(p: float) -> float:
+            return round(data[min(n - 1, int(p * n))] * 1000, 3)
+
+        return {"samples": n, "total": self.count, "p50_ms": _pct(0.5), "p90_ms": _pct(0.9),
+                "p99_ms": _pct(0.99), "max_ms": round(data[-1] * 1000, 3)}
+
+
+class TickTracer:
+    """워커 전역 — 단계 요약 + 샘플 스팬"""
+
+    def __init__(self):
+        self._rings = {stage: _Ring(RING_SIZE) for stage in STAGES}
+        self._spans: deque = deque(maxlen=SPAN_KEEP)
+        self._building: List[Dict] = []   # 생성 중인 스냅샷의 샘플 스팬
+        self._admitted = 0
+
+    def record(self, stage: str, seconds: float):
+        self._rings[stage].add(seconds)
+
+    # ========== 틱 입구 ==========
+    def admit(self, symbol: str, broker_ts: Optional[float], recv_ts: float) -> Optional[Dict]:
+        """틱 1건 수신 — broker 단계 기록, 샘플 대상이면 스팬 dict 반환 (이후 단계는 스팬에 누적)"""
+        if broker_ts:
+            self._rings["broker"].add(recv_ts - broker_ts)
+        self._admitted += 1
+        if not SAMPLE_EVERY or self._admitted % SAMPLE_EVERY:
+            return None
+        span = {"symbol": symbol, "broker_ts": broker_ts, "recv_ts": recv_ts, "ms": {}}
+        if broker_ts:
+            span["ms"]["broker"] = round((recv_ts - broker_ts) * 1000, 3)
+        self._spans.append(span)
+        return span
+
+    def stage(self, span: Optional[Dict], stage: str, seconds: float):
+        """요약 기록 + 샘플 스팬이면 스팬에도 기록"""
+        self._rings[stage].add(seconds)
+        if span is not None:
+            span["ms"][stage] = round(seconds * 1000, 3)
+
+    # ========== 스냅샷 생성 (market_hub._build) ==========
+    def on_build(self, ticks: List[Dict], started: float, seq: int) -> Optional[Dict]:
+        """스냅샷 생성 시작 — 병합된 틱들의 hub_wait 기록 → 프레임에 실을 tick_trace (샘플 틱이 있을 때만)"""
+        hub_wait = self._rings["hub_wait"]
+        building = self._building = []
+        for tick in ticks:
+            rx = tick.get("rx")
+            if rx is None:
+                continue
+            hub_wait.add(started - rx)
+            span = tick.get("trace")
+            if span is not None:
+                span["ms"]["hub_wait"] = round((started - rx) * 1000, 3)
+                span["seq"] = seq
+                building.append(span)
+        if not building:
+            return None
+        marker = building[-1]
+        # 클라이언트 비교용 — 벽시계 (같은 호스트/NTP 기준)
+        return {"seq": seq, "symbol": marker["symbol"], "broker_ts": marker["broker_ts"],
+                "recv_ts": marker["recv_ts"], "built_ts": time.time()}
+
+    def finish_build(self, seconds: float):
+        self._rings["build"].add(seconds)
+        for span in self._building:
+            span["ms"]["build"] = round(seconds * 1000, 3)
+        self._building = []
+
+    # ========== WS 전송 (market_hub.frame_sent) ==========
+    def on_send(self, mode: str, snapshot, started: float, send_started: float, sent_at: float):
+        """소켓 1개가 새 스냅샷을 보낸 직후 (스냅샷·소켓당 1회)"""
+        rings = self._rings
+        socket_wait = started - snapshot.built_at
+        rings["socket_wait"].add(socket_wait)
+        rings["frame"].add(send_started - started)
+        rings["send"].add(sent_at - send_started)
+        if snapshot.tick_at is not None:
+            rings["total"].add(sent_at - snapshot.tick_at)
+        trace = snapshot.trace
+        if trace is None:
+            return
+        # 샘플 스팬은 처음 보낸 소켓 기준으로 1회만 완성
+        for span in reversed(self._spans):
+            if span.get("seq") == snapshot.seq and "send" not in span["ms"]:
+                span["mode"] = mode
+                span["ms"]["socket_wait"] = round(socket_wait * 1000, 3)
+                span["ms"]["frame"] = round((send_started - started) * 1000, 3)
+                span["ms"]["send"] = round((sent_at - send_started) * 1000, 3)
+                if snapshot.tick_at is not None:
+                    span["ms"]["total"] = round((sent_at - snapshot.tick_at) * 1000, 3)
+            elif span.get("seq", snapshot.seq) < snapshot.seq:
+                break
+
+    def get_report(self, spans: int = 20) -> Dict:
+        return {
+            "worker_pid": os.getpid(),
+            "sample_every": SAMPLE_EVERY,
+            "admitted": self._admitted,
+            "stages": {stage: self._rings[stage].summary() for stage in STAGES},
+            "spans": list(self._spans)[-spans:] if spans > 0 else [],
+        }
+
+
+# 워커 전역 인스턴스
+tick_tracer = TickTracer()
@@ -0,0 +1,176 @@
+# app/api/user_snapshot_buffer.py
+"""
+MT5 잔고 스냅샷 / metaapi_last_active write-behind 버퍼
+
+기존: /account-info 폴링마다 (클라이언트 수 × 폴링 주기) users 행에
+      mt5_balance/equity/margin/free_margin/profit/leverage + metaapi_last_active UPDATE + commit
+      주문/청산/deploy 확인마다 metaapi_last_active만 바꾸는 commit
+      → users 행 락 경합 + WAL 증가 (값이 그대로여도 매번 쓰기)
+변경: record()/touch()는 메모리 버퍼에만 기록
+  - FLUSH_INTERVAL마다 변경된 유저만 모아 UPDATE 1회 (한 트랜잭션)
+  - 잔고 값은 마지막 저장값과 다를 때만 쓰기, 큰 변화(BALANCE_EPSILON·URGENT_DELTA 이상)면 즉시 플러시 예약
+  - metaapi_last_active는 ACTIVE_PERSIST_SEC 지났을 때만 쓰기 (슬롯 관리 임계값 최소 3분보다 충분히 짧게)
+  - 슬롯 관리(_auto_undeploy_inactive_users)는 last_active()로 버퍼의 최신 활동 시각을 먼저 확인
+  - 저장 컬럼은 principal_cache에 캐시되지 않음(_VOLATILE) → 저장 후 무효화 불필요
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+# 주기 플러시 간격 (초)
+FLUSH_INTERVAL = 5
+# last_active 저장 최소 간격 (초)
+ACTIVE_PERSIST_SEC = 60
+# 이 값 미만 변화는 같은 값으로 간주
+BALANCE_EPSILON = 0.005
+# 이 값 이상 변화(잔고/자산)면 다음 주기를 기다리지 않고 플러시
+URGENT_DELTA = 1.0
+
+_SNAPSHOT_FIELDS = ("mt5_balance", "mt5_equity", "mt5_margin", "mt5_free_margin", "mt5_profit", "mt5_leverage")
+
+
+class UserSnapshotBuffer:
+    """워커 전역 — 유저별 대기 값 + 마지막 저장 값"""
+
+    def __init__(self):
+        self._pending: Dict[int, Dict] = {}     # user_id → 저장 대기 컬럼
+        self._persisted: Dict[int, Dict] = {}   # user_id → 마지막으로 저장한 컬럼
+        self._active: Dict[int, datetime] = {}  # user_id → 최신 활동 시각 (utc naive)
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"records": 0, "flushes": 0, "rows": 0, "urgent": 0, "errors": 0}
+
+    # ========== 입력 (요청 핸들러) ==========
+    def record(self, user_id: int, balance, equity, margin, free_margin, profit, leverage):
+        """/account-info — 스냅샷 + 활동 시각"""
+        self.start()
+        self.stats["records"] += 1
+        values = {
+            "mt5_balance": balance,
+            "mt5_equity": equity,
+            "mt5_margin": margin,
+            "mt5_free_margin": free_margin,
+            "mt5_profit": profit,
+            "mt5_leverage": leverage,
+        }
+        persisted = self._persisted.get(user_id, {})
+        changed = {k: v for k, v in values.items() if not self._same(persisted.get(k), v)}
+        pending = self._pending.setdefault(user_id, {})
+        for k in _SNAPSHOT_FIELDS:
+            if k in changed:
+                pending[k] = changed[k]
+            else:
+                pending.pop(k, None)  # 저장값으로 되돌아옴 → 쓸 필요 없음
+        self._touch(user_id)
+        if not pending:
+            del self._pending[user_id]
+
+        if any(self._delta(persisted.get(k), changed[k]) >= URGENT_DELTA
+               for k in ("mt5_balance", "mt5_equity") if k in changed):
+            self.stats["urgent"] += 1
+            self._wake.set()
+
+    def touch(self, user_id: int):
+        """주문/청산/deploy 확인 — 활동 시각만"""
+        self.start()
+        self._touch(user_id)
+
+    def _touch(self, user_id: int):
+        now = datetime.utcnow()
+        self._active[user_id] = now
+        last = self._persisted.get(user_id, {}).get("metaapi_last_active")
+        if last is None or (now - last).total_seconds() >= ACTIVE_PERSIST_SEC:
+            self._pending.setdefault(user_id, {})["metaapi_last_active"] = now
+
+    def last_active(self, user_id: int) -> Optional[datetime]:
+        """이 워커에서 본 최신 활동 시각 (DB 미반영분 포함)"""
+        return self._active.get(user_id)
+
+    def is_active_since(self, user_id: int, threshold: datetime) -> bool:
+        last = self._active.get(user_id)
+        return last is not None and last >= threshold
+
+    @staticmethod
+    def _delta(old, new) -> float:
+        try:
+            return abs(float(new) - float(old))
+        except (TypeError, ValueError):
+            return float("inf")
+
+    @classmethod
+    def _same(cls, old, new) -> bool:
+        if old is None or new is None:
+            return old is new
+        return cls._delta(old, new) < BALANCE_EPSILON
+
+    # ========== 플러시 ==========
+    def _write(self, rows: Dict[int, Dict]):
+        from sqlalchemy import update
+        from ..database import SessionLocal
+        from ..models.user import User
+        db = SessionLocal()
+        try:
+            # ORM bulk UPDATE by primary key — 같은 컬럼 조합끼리 executemany
+            db.execute(update(User), [{"id": user_id, **values} for user_id, values in rows.items()])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def flush(self):
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, {}
+        try:
+            await asyncio.to_thread(self._write, rows)
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"[SnapshotBuffer] ⚠️ 플러시 실패 ({len(rows)}명) — 다음 주기 재시도: {e}")
+            for user_id, values in rows.items():
+                # 실패분 복구 (그 사이 들어온 최신 값 우선)
+                self._pending[user_id] = {**values, **self._pending.get(user_id, {})}
+            return
+
+        for user_id, values in rows.items():
+            self._persisted.setdefault(user_id, {}).update(values)
+        self.stats["flushes"] += 1
+        self.stats["rows"] += len(rows)
+
+    async def _run(self):
+        print(f"[SnapshotBuffer] 플러시 루프 시작 ({FLUSH_INTERVAL}초)")
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[SnapshotBuffer] ⚠️ 루프 오류: {e}")
+            self._prune()
+
+    def _prune(self):
+        """오래 활동 없는 유저 상태 정리 (메모리 상한)"""
+        cutoff = datetime.utcnow() - timedelta(hours=1)
+        for user_id in [u for u, t in self._active.items() if t < cutoff and u not in self._pending]:
+            self._active.pop(user_id, None)
+            self._persisted.pop(user_id, None)
+
+    def start(self):
+        """플러시 루프 시작 (main.py startup + 첫 기록 시 보장)"""
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def get_status(self) -> Dict:
+        return {"pending": len(self._pending), "tracked": len(self._active), **self.stats}
+
+
+# 워커 전역 인스턴스
+user_snapshot_buffer = UserSnapshotBuffer()
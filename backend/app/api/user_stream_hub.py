@@ -0,0 +1,209 @@
+# app/api/user_stream_hub.py
+"""
+유저 계정/포지션 푸시 허브 — UserStreamingListener → 해당 유저의 라이브 WS 소켓
+
+기존: 라이브 /api/mt5/ws 소켓마다 5~30초 간격 get_user_account_info + get_user_positions (RPC 2회)
+      → Streaming 리스너가 user_metaapi_cache를 이미 최신으로 유지하는데도 RPC 반복, P/L 반영은 폴링 주기만큼 지연
+변경: 리스너 이벤트(잔고/포지션 변경) → publish(user_id)
+      → 같은 워커의 해당 유저 소켓을 즉시 깨움 (market_hub.wake — 최신 스냅샷 + 새 유저 데이터로 프레임 전송)
+      → Redis pub/sub(user:stream)로 다른 워커에 캐시 전달 (--workers 2: Streaming 연결은 한 워커에만 존재)
+      RPC는 Streaming 이벤트가 끊긴 경우에만 쓰는 긴 주기(RECONCILE_INTERVAL) 보정용
+      ★ 시세 틱마다 오는 equity/margin 갱신(on_symbol_prices_updated)은 publish_account로 유저별 dirty 표시만
+        → ACCOUNT_FLUSH_INTERVAL(5Hz) 주기로 모아서 wake + 바뀐 계정 필드만 발행 (틱당 전체 캐시 JSON 직렬화 제거)
+
+[메시지] 채널 user:stream
+  - 전체: {"u": user_id, "p": 발행 워커 pid, "c": user_metaapi_cache[user_id]}          (포지션/계정 이벤트)
+  - 계정: {"u": user_id, "p": 발행 워커 pid, "a": {바뀐 account_info 필드}, "s": last_sync} (틱 equity/margin)
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+USER_STREAM_CHANNEL = "user:stream"
+# Streaming 이벤트가 이 시간 안에 있었으면 스트림 살아있음으로 판단 (초)
+STREAM_FRESH_SEC = 120
+# 스트림 살아있을 때 RPC 보정 주기 (초)
+RECONCILE_INTERVAL = 300
+# 틱 빈도 계정 갱신(equity/margin) 묶음 전송 주기 (초) — 5Hz
+ACCOUNT_FLUSH_INTERVAL = 0.2
+
+
+class UserStreamHub:
+    """워커당 1개 — 유저별 소켓 구독 목록 + 워커 간 캐시 전달"""
+
+    def __init__(self):
+        self._subscribers: Dict[int, List] = {}
+        self._last_event: Dict[int, float] = {}
+        # 유저별 아직 전송 안 된 계정 필드 (dirty) — 플러시 루프가 비움
+        self._dirty: Dict[int, Dict] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._pid = os.getpid()
+        self.stats = {"local": 0, "remote": 0, "wakes": 0, "errors": 0,
+                      "account_marks": 0, "account_flushed": 0}
+
+    # ========== 구독 (WS 소켓) ==========
+    def register(self, user_id: int, hub_sub):
+        """market_hub 구독을 유저에 연결 — 유저 이벤트 시 해당 구독만 깨움"""
+        self.start()
+        self._subscribers.setdefault(user_id, []).append(hub_sub)
+
+    def unregister(self, user_id: int, hub_sub):
+        subs = self._subscribers.get(user_id)
+        if not subs:
+            return
+        try:
+            subs.remove(hub_sub)
+        except ValueError:
+            pass
+        if not subs:
+            del self._subscribers[user_id]
+
+    def is_streaming(self, user_id: int) -> bool:
+        """최근 Streaming 이벤트 수신 여부 (로컬/원격 워커 무관)"""
+        return time.time() - self._last_event.get(user_id, 0) < STREAM_FRESH_SEC
+
+    # ========== 입력 (UserStreamingListener, 이벤트 루프 안) ==========
+    def publish(self, user_id: int, cache: Dict):
+        self._last_event[user_id] = time.time()
+        self.stats["local"] += 1
+        # 전체 캐시에 대기 중인 계정 필드도 포함됨
+        self._dirty.pop(user_id, None)
+        self._wake(user_id)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        loop.create_task(self._publish_remote(user_id, cache))
+
+    def publish_account(self, user_id: int, fields: Dict):
+        """틱 빈도 계정 필드 변경 — dirty 표시만, 전송은 _flush_loop (ACCOUNT_FLUSH_INTERVAL)"""
+        self._last_event[user_id] = time.time()
+        self.stats["account_marks"] += 1
+        self._dirty.setdefault(user_id, {}).update(fields)
+        if self._flush_task is None or self._flush_task.done():
+            try:
+                self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+            except RuntimeError:
+                pass
+
+    async def _flush_loop(self):
+        from ..redis_client import get_async_redis
+        from .metaapi_service import user_metaapi_cache
+        while True:
+            await asyncio.sleep(ACCOUNT_FLUSH_INTERVAL)
+            if not self._dirty:
+                continue
+            batch, self._dirty = self._dirty, {}
+            msgs = []
+            for user_id, fields in batch.items():
+                self._wake(user_id)
+                last_sync = (user_metaapi_cache.get(user_id) or {}).get("last_sync", time.time())
+                msgs.append(json.dumps({"u": user_id, "p": self._pid, "a": fields, "s": last_sync},
+                                       separators=(",", ":"), default=str))
+            self.stats["account_flushed"] += len(msgs)
+            try:
+                async with get_async_redis().pipeline(transaction=False) as pipe:
+                    for msg in msgs:
+                        pipe.publish(USER_STREAM_CHANNEL, msg)
+                    await pipe.execute()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["errors"] += 1
+                if self.stats["errors"] % 100 == 1:
+                    print(f"[UserStreamHub] ⚠️ 계정 발행 오류: {e}")
+
+    async def _publish_remote(self, user_id: int, cache: Dict):
+        from ..redis_client import get_async_redis
+        try:
+            msg = json.dumps({"u": user_id, "p": self._pid, "c": cache}, separators=(",", ":"), default=str)
+            await get_async_redis().publish(USER_STREAM_CHANNEL, msg)
+        except Exception as e:
+            self.stats["errors"] += 1
+            if self.stats["errors"] % 100 == 1:
+                print(f"[UserStreamHub] ⚠️ 발행 오류: {e}")
+
+    def _wake(self, user_id: int):
+        from .market_hub import market_hub
+        for sub in self._subscribers.get(user_id, ()):
+            market_hub.wake(sub)
+            self.stats["wakes"] += 1
+
+    # ========== 다른 워커 이벤트 수신 ==========
+    def _apply_remote(self, msg: Dict):
+        if msg.get("p") == self._pid:
+            return
+        user_id = int(msg["u"])
+        from .metaapi_service import user_metaapi_cache
+        fields = msg.get("a")
+        if fields is not None:
+            # 계정 필드만 — 아직 전체 캐시를 못 받은 유저는 다음 전체 메시지까지 대기
+            entry = user_metaapi_cache.get(user_id)
+            if entry and entry.get("account_info"):
+                entry["account_info"].update(fields)
+                entry["last_sync"] = msg.get("s", time.time())
+            self._last_event[user_id] = time.time()
+            self.stats["remote"] += 1
+            self._wake(user_id)
+            return
+        cache = msg.get("c") or {}
+        user_metaapi_cache[user_id] = {
+            "positions": cache.get("positions", []),
+            "account_info": cache.get("account_info"),
+            "last_sync": cache.get("last_sync", time.time()),
+        }
+        self._last_event[user_id] = time.time()
+        self.stats["remote"] += 1
+        self._wake(user_id)
+
+    async def _run(self):
+        from ..redis_client import get_async_redis
+        print(f"[UserStreamHub] 구독 루프 시작 (채널 {USER_STREAM_CHANNEL})")
+        while True:
+            pubsub = None
+            try:
+                pubsub = get_async_redis().pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(USER_STREAM_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        self._apply_remote(json.loads(message["data"]))
+                    except Exception as e:
+                        self.stats["errors"] += 1
+                        print(f"[UserStreamHub] ⚠️ 이벤트 적용 오류: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[UserStreamHub] ⚠️ 구독 끊김 — 재연결 대기: {e}")
+                await asyncio.sleep(2.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
+
+    def start(self):
+        """구독 루프 + 계정 플러시 루프 시작 (main.py startup + 첫 소켓 등록 시 보장)"""
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self._flush_loop())
+
+    def get_status(self) -> Dict:
+        return {
+            "users": len(self._subscribers),
+            "sockets": sum(len(s) for s in self._subscribers.values()),
+            "dirty": len(self._dirty),
+            **self.stats,
+        }
+
+
+# 워커 전역 인스턴스
+user_stream_hub = UserStreamHub()
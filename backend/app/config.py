@@ -4,6 +4,13 @@ from functools import lru_cache
 class Settings(BaseSettings):
     # 데이터베이스
     DATABASE_URL: str
+    # 커넥션 풀 (워커당) — 동기: 일반 라우트 스레드풀, 비동기: WS 루프(asyncpg)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    ASYNC_DB_POOL_SIZE: int = 10
+    ASYNC_DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 10      # 커넥션 대기 최대 (초)
+    DB_POOL_RECYCLE: int = 1800    # 커넥션 재생성 주기 (초)
     
     # JWT 설정
     SECRET_KEY: str
@@ -16,6 +23,15 @@ class Settings(BaseSettings):
     HOST: str = "0.0.0.0"
     PORT: int = 8000
 
+    # 시세 수신 모드 (local: 워커가 직접 Quote 연결 / subscriber: ingest 프로세스 피드 구독)
+    MARKET_DATA_MODE: str = "local"
+
+    # 브릿지 주문 대기열 백엔드 (redis: Redis Streams / sqlite: SQLite WAL 파일)
+    BRIDGE_ORDER_QUEUE: str = "redis"
+
+    # GeoIP DB (MaxMind GeoLite2-City .mmdb 경로, 비우면 ip-api.com 사용)
+    GEOIP_DB_PATH: str = ""
+
     # MT5 설정
     MT5_ENABLED: bool = True
     mt5_encrypt_key: str = ""  # MT5 비밀번호 AES 암호화 키
@@ -1,10 +1,31 @@
-from sqlalchemy import create_engine
+import time
+from typing import Dict
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
 
-# 데이터베이스 엔진 생성
-engine = create_engine(settings.DATABASE_URL)
+
+def _pool_kwargs(url, pool_size: int, max_overflow: int) -> Dict:
+    """풀 크기 명시 (sqlite는 드라이버 기본 풀 사용)"""
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+# 데이터베이스 엔진 생성 (동기 — 일반 라우트/백그라운드 스레드)
+engine = create_engine(
+    settings.DATABASE_URL,
+    **_pool_kwargs(settings.DATABASE_URL, settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW)
+)
 
 # 세션 팩토리
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -18,4 +39,146 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def release_session(db):
+    """
+    async 라우트에서 await 전에 호출 — 동기 세션이 쥔 커넥션을 풀에 반납
+    (세션을 쥔 채 RPC/HTTP를 기다리면 동시 요청이 5+10 풀을 다 잡고, 다음 체크아웃이 이벤트 루프를 막음)
+    - 진행 중 트랜잭션은 커밋 (읽기만 했으면 빈 커밋), 로드한 속성은 만료시키지 않음
+    - 이후 쿼리는 새 커넥션을 짧게 체크아웃
+    """
+    if not db.in_transaction():
+        return
+    expire = db.expire_on_commit
+    db.expire_on_commit = False
+    try:
+        db.commit()
+    finally:
+        db.expire_on_commit = expire
+
+
+# ========== 비동기 엔진 (WS 루프 등 이벤트 루프 안 DB 접근) ==========
+# 동기 세션을 이벤트 루프에서 쓰면 느린 쿼리 1개가 워커의 모든 소켓을 멈춤 → asyncpg 엔진 사용
+_async_engine = None
+_async_session_factory = None
+
+
+def _async_url(url: str):
+    u = make_url(url)
+    backend = u.get_backend_name()
+    if backend == "postgresql":
+        return u.set(drivername="postgresql+asyncpg")
+    if backend == "sqlite":
+        return u.set(drivername="sqlite+aiosqlite")
+    return u
+
+
+def get_async_engine():
+    """비동기 엔진 싱글톤 (첫 사용 시 생성 — asyncpg 미사용 프로세스는 import 부담 없음)"""
+    global _async_engine, _async_session_factory
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+        kwargs = _pool_kwargs(settings.DATABASE_URL, settings.ASYNC_DB_POOL_SIZE, settings.ASYNC_DB_MAX_OVERFLOW)
+        u = make_url(settings.DATABASE_URL)
+        if u.get_backend_name() == "sqlite" and u.database not in (None, "", ":memory:"):
+            # aiosqlite 기본은 NullPool → 세션마다 커넥션(+전용 스레드) 새로 생성
+            # 인증 캐시 미스(resolve_user_async)가 동시에 몰리면 요청당 수백 ms → 파일 DB는 커넥션 재사용
+            from sqlalchemy.pool import AsyncAdaptedQueuePool
+            kwargs["poolclass"] = AsyncAdaptedQueuePool
+        _async_engine = create_async_engine(_async_url(settings.DATABASE_URL), **kwargs)
+        _watch_pool(_async_engine.sync_engine, "async")
+        _watch_queries(_async_engine.sync_engine, "async")
+        # expire_on_commit=False — 세션 종료 후에도 읽은 값 그대로 사용
+        _async_session_factory = async_sessionmaker(_async_engine, expire_on_commit=False, autoflush=False)
+    return _async_engine
+
+
+def async_session():
+    """async with async_session() as adb: ..."""
+    get_async_engine()
+    return _async_session_factory()
+
+
+async def dispose_async_engine():
+    """서버 종료 시 비동기 풀 정리"""
+    if _async_engine is not None:
+        await _async_engine.dispose()
+
+
+async def get_async_db():
+    """비동기 의존성 주입용 함수"""
+    async with async_session() as db:
+        yield db
+
+
+# ========== 풀 지표 ==========
+pool_stats: Dict[str, Dict[str, int]] = {}
+
+
+def _watch_pool(sync_engine, name: str):
+    stats = pool_stats.setdefault(name, {"connects": 0, "checkouts": 0, "invalidated": 0, "peak_checked_out": 0})
+
+    @event.listens_for(sync_engine, "connect")
+    def _on_connect(dbapi_conn, record):
+        stats["connects"] += 1
+
+    @event.listens_for(sync_engine, "checkout")
+    def _on_checkout(dbapi_conn, record, proxy):
+        stats["checkouts"] += 1
+        try:
+            stats["peak_checked_out"] = max(stats["peak_checked_out"], sync_engine.pool.checkedout())
+        except Exception:
+            pass
+
+    @event.listens_for(sync_engine, "invalidate")
+    def _on_invalidate(dbapi_conn, record, exception):
+        stats["invalidated"] += 1
+
+
+_watch_pool(engine, "sync")
+
+
+# ========== 쿼리 시간 (app.metrics — 라우트별 DB 시간 합산) ==========
+def _watch_queries(sync_engine, name: str):
+    from .metrics import record_db_query
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_start")
+        if starts:
+            record_db_query(time.perf_counter() - starts.pop(), name)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _on_error(context):
+        # 실패한 쿼리는 after_cursor_execute가 없음 → 시작 시각만 정리
+        conn = context.connection
+        starts = conn.info.get("query_start") if conn is not None else None
+        if starts:
+            starts.pop()
+
+
+_watch_queries(engine, "sync")
+
+
+def _pool_status(sync_engine, name: str) -> Dict:
+    pool = sync_engine.pool
+    status = {"pool": type(pool).__name__, **pool_stats.get(name, {})}
+    for attr in ("size", "checkedin", "checkedout", "overflow"):
+        fn = getattr(pool, attr, None)
+        if callable(fn):
+            status[attr] = fn()
+    return status
+
+
+def get_pool_status() -> Dict:
+    """/api/health — 동기/비동기 커넥션 풀 상태"""
+    status = {"sync": _pool_status(engine, "sync")}
+    if _async_engine is not None:
+        status["async"] = _pool_status(_async_engine.sync_engine, "async")
+    return status
@@ -24,6 +24,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ★ 라우트별 처리/DB/RPC 시간 기록 (app.metrics — 메모리 기록, /metrics로 조회)
+from .metrics import MetricsMiddleware
+app.add_middleware(MetricsMiddleware)
+
 # 라우터 등록
 app.include_router(auth.router, prefix="/api")
 app.include_router(account.router, prefix="/api")
@@ -70,7 +74,8 @@ async def api_health_check():
         db = SessionLocal()
         db.execute(text("SELECT 1"))
         db.close()
-        checks["database"] = {"status": "ok"}
+        from app.database import get_pool_status
+        checks["database"] = {"status": "ok", "pool": get_pool_status()}
     except Exception as e:
         checks["database"] = {"status": "error", "detail": str(e)[:100]}
         overall = "unhealthy"
@@ -83,6 +88,14 @@ async def api_health_check():
             "symbols": len(quote_price_cache),
             "streaming": bool(quote_connected)
         }
+        from app.api.market_feed import get_market_data_mode, market_feed_subscriber, INGEST_ALIVE_KEY
+        mode = get_market_data_mode()
+        checks["metaapi"]["mode"] = mode
+        if mode == "subscriber":
+            from app.redis_client import get_redis
+            r = get_redis()
+            checks["metaapi"]["ingest_alive"] = bool(r and r.exists(INGEST_ALIVE_KEY))
+            checks["metaapi"]["feed"] = market_feed_subscriber.get_status()
     except Exception as e:
         checks["metaapi"] = {"status": "error", "detail": str(e)[:100]}
 
@@ -107,6 +120,19 @@ async def api_health_check():
         "checks": checks
     }
 
+@app.get("/debug/tick-trace")
+async def tick_trace_report(spans: int = 20):
+    """틱 단계별 지연 백분위 + 최근 샘플 스팬 (응답한 워커 기준 — worker_pid 확인), /metrics처럼 /api 밖 → nginx 미노출"""
+    from .api.tick_trace import tick_tracer
+    return tick_tracer.get_report(max(0, min(spans, 100)))
+
+@app.get("/metrics")
+async def prometheus_metrics(scope: str = "all"):
+    """Prometheus 스크랩 — 전체 워커 병합 (scope=local: 응답한 워커만), nginx 미노출 (127.0.0.1:8000)"""
+    from fastapi.responses import PlainTextResponse
+    from .metrics import render_all
+    return PlainTextResponse(await render_all(scope), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.on_event("startup")
 async def startup_event():
     """서버 시작 시 MetaAPI 초기화 (백그라운드 — 서버 즉시 응답 가능)"""
@@ -117,7 +143,10 @@ async def startup_event():
         await asyncio.sleep(2)  # ★ 서버 완전 시작 후 2초 대기
         try:
             from .api.metaapi_service import startup_metaapi
-            await asyncio.wait_for(startup_metaapi(), timeout=90.0)
+            from .api.market_feed import get_market_data_mode
+            # ★ MARKET_DATA_MODE=subscriber → 시세는 ingest 프로세스(app.market_ingest)가 Redis로 발행
+            role = "subscriber" if get_market_data_mode() == "subscriber" else "local"
+            await asyncio.wait_for(startup_metaapi(role=role), timeout=90.0)
             print("[Main] ✅ MetaAPI 백그라운드 초기화 완료")
         except asyncio.TimeoutError:
             print("[Main] ⚠️ MetaAPI 초기화 타임아웃 (90초) - 서버는 계속 실행")
@@ -128,19 +157,52 @@ async def startup_event():
 
     # ★★★ 핵심: await 대신 create_task로 백그라운드 실행 ★★★
     asyncio.create_task(_init_metaapi_background())
+
+    # ★ 데모 매칭 엔진: DB 포지션 로드 + 주기 동기화 시작
+    from .api.demo_matching_engine import demo_matching_engine
+    demo_matching_engine.start()
+
+    # ★ WS 마켓 스냅샷 팬아웃 허브 시작 (틱 큐 소비 + 스냅샷 1회 생성)
+    from .api.market_hub import market_hub
+    market_hub.start()
+
+    # ★ 유저 Streaming 이벤트 푸시 허브 (워커 간 user:stream 구독)
+    from .api.user_stream_hub import user_stream_hub
+    user_stream_hub.start()
+
+    # ★ MT5 잔고 스냅샷 / last_active write-behind 플러시 루프
+    from .api.user_snapshot_buffer import user_snapshot_buffer
+    user_snapshot_buffer.start()
+
+    # ★ MT5 브릿지 델타 구독 (브릿지 WS가 다른 워커에 붙어도 bridge_cache 동기화)
+    from .api.bridge_channel import bridge_channel
+    bridge_channel.start()
+
+    # ★ 워커 지표 스냅샷 발행 + 이벤트 루프 지연 샘플링
+    from .metrics import metrics_exporter
+    metrics_exporter.start()
     print("[Main] 서버 시작 완료 — MetaAPI 백그라운드 초기화 중...")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """서버 종료 시 캔들 캐시 저장 + 연결 해제"""
-    # ★ 캔들 캐시 파일 저장
+    # ★ 캔들 캐시 파일 저장 (subscriber 모드는 ingest 프로세스가 저장 담당)
     try:
         from .api.metaapi_service import save_candle_cache
-        save_candle_cache()
-        print("[Main] 캔들 캐시 저장 완료")
+        from .api.market_feed import get_market_data_mode
+        if get_market_data_mode() != "subscriber":
+            save_candle_cache()
+            print("[Main] 캔들 캐시 저장 완료")
     except Exception as e:
         print(f"[Main] 캔들 캐시 저장 오류: {e}")
 
+    # ★ write-behind 버퍼 잔여분 저장
+    try:
+        from .api.user_snapshot_buffer import user_snapshot_buffer
+        await user_snapshot_buffer.flush()
+    except Exception as e:
+        print(f"[Main] 스냅샷 버퍼 저장 오류: {e}")
+
     # MetaAPI 연결 종료
     try:
         from .api.metaapi_service import metaapi_service
@@ -149,6 +211,13 @@ async def shutdown_event():
     except Exception as e:
         print(f"[Main] MetaAPI 종료 오류: {e}")
 
+    # ★ 비동기 DB 풀 정리
+    try:
+        from .database import dispose_async_engine
+        await dispose_async_engine()
+    except Exception as e:
+        print(f"[Main] 비동기 DB 풀 정리 오류: {e}")
+
     # 기존 MT5 종료
     from .services.mt5_service import MT5Service
     MT5Service.shutdown()
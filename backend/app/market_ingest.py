@@ -0,0 +1,54 @@
+# app/market_ingest.py
+"""
+시세 수집 전용 프로세스 — MetaAPI Quote 스트리밍 1개 + 캔들 빌더 1벌
+
+실행: python -m app.market_ingest  (deploy/trading-x-ingest.service)
+워커 .env: MARKET_DATA_MODE=subscriber → 워커는 Quote 연결 없이 Redis md:tick 구독
+"""
+
+# ★ .env 파일을 os.environ에 로드 (main.py와 동일)
+from pathlib import Path
+from dotenv import load_dotenv
+load_dotenv(Path(__file__).parent.parent / ".env")
+
+import asyncio
+import signal
+
+
+async def _main():
+    from .api.metaapi_service import startup_metaapi, save_candle_cache, metaapi_service
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+
+    if not await startup_metaapi(role="ingest"):
+        print("[Ingest] ⚠️ MetaAPI 초기화 실패 — 종료 (systemd 재시작)")
+        return 1
+
+    # ★ 틱 수신 지표 발행 (워커 /metrics 병합에 포함)
+    from .metrics import metrics_exporter
+    metrics_exporter.start()
+
+    print("[Ingest] ✅ 시세 수집 프로세스 실행 중")
+    await stop.wait()
+
+    # ★ 종료 시 캔들 캐시 저장 (워커 재시작 시 즉시 로드용)
+    try:
+        save_candle_cache()
+        print("[Ingest] 캔들 캐시 저장 완료")
+    except Exception as e:
+        print(f"[Ingest] 캔들 캐시 저장 오류: {e}")
+    try:
+        await metaapi_service.disconnect()
+    except Exception as e:
+        print(f"[Ingest] MetaAPI 종료 오류: {e}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(_main()))
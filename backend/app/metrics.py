@@ -0,0 +1,470 @@
+# app/metrics.py
+"""
+프로세스 내 지표 레지스트리 + /metrics (Prometheus 텍스트 형식)
+
+기존: monitor_counters.py — WS 접속/주문 성공·실패마다 동기 Redis INCR/EXPIRE/LPUSH (요청 경로에서 왕복)
+      지연 분포(틱→WS, 프레임 생성, 주문 RPC, DB)는 측정 수단 없음
+변경: 기록은 프로세스 메모리에만 (락 없음, 표본 1건 = dict 조회 + 정수 증가)
+  - Counter / Gauge / Histogram (고정 버킷 — 버킷 배열은 라벨 조합 첫 기록 시 1회 할당)
+  - MetricsExporter: 워커마다 PUBLISH_INTERVAL 주기로 스냅샷 JSON을 Redis metrics:worker:{pid} (TTL)에 저장
+                     + 이벤트 루프 지연 샘플링 (LAG_INTERVAL)
+  - GET /metrics: 살아 있는 워커 스냅샷 병합 (카운터/히스토그램 합산, 게이지는 merge 방식대로) → 텍스트 출력
+  - MetricsMiddleware: HTTP 라우트별 처리 시간 + 요청 안 DB 시간 + MetaAPI RPC 시간 (주문/청산은 RPC vs 자체 처리로 분리)
+
+[스레드] 스레드풀 라우트에서 동시에 같은 표본을 올리면 드물게 증가분 1건이 유실될 수 있음 — 지표 용도로 허용 (락 없음)
+[라벨] 라벨 1개 지표는 값 문자열 그대로, 2개 이상은 튜플을 키로 사용
+"""
+
+import asyncio
+import bisect
+import json
+import os
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence
+
+# 스냅샷 발행 주기 (초) / 키 TTL (초) — 죽은 워커는 TTL 뒤 병합에서 빠짐
+PUBLISH_INTERVAL = 5.0
+SNAPSHOT_TTL = 30
+SNAPSHOT_KEY_PREFIX = "metrics:worker:"
+# 이벤트 루프 지연 샘플링 간격 (초)
+LAG_INTERVAL = 0.5
+
+# 버킷 (초)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RPC_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 20.0, 30.0)
+
+
+# ============================================================
+# 지표 타입
+# ============================================================
+class Counter:
+    kind = "counter"
+    __slots__ = ("name", "help", "labelnames", "merge", "_values")
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.merge = "sum"
+        self._values: Dict = {}
+
+    def inc(self, key=(), amount=1):
+        values = self._values
+        values[key] = values.get(key, 0) + amount
+
+    def value(self, key=()):
+        return self._values.get(key, 0)
+
+    def export(self) -> List:
+        return [[_key_values(k), v] for k, v in self._values.items()]
+
+
+class Gauge(Counter):
+    """merge: 워커 병합 방식 — "sum" (소켓 수 등) / "max" / "worker" (worker 라벨 붙여 그대로)"""
+    kind = "gauge"
+    __slots__ = ()
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), merge: str = "sum"):
+        super().__init__(name, help, labelnames)
+        self.merge = merge
+
+    def set(self, value, key=()):
+        self._values[key] = value
+
+    def dec(self, key=(), amount=1, floor: Optional[float] = 0):
+        value = self._values.get(key, 0) - amount
+        self._values[key] = value if floor is None else max(value, floor)
+
+
+class Histogram:
+    """고정 버킷 — 시리즈 = [버킷별 개수 ..., +Inf 개수, 합계] (누적은 출력 시 계산)"""
+    kind = "histogram"
+    __slots__ = ("name", "help", "labelnames", "merge", "bounds", "_series")
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.merge = "sum"
+        self.bounds = tuple(sorted(buckets))
+        self._series: Dict = {}
+
+    def observe(self, value: float, key=()):
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [0] * (len(self.bounds) + 1) + [0.0]
+        # le는 상한 포함 → bisect_left
+        series[bisect.bisect_left(self.bounds, value)] += 1
+        series[-1] += value
+
+    def export(self) -> List:
+        return [[_key_values(k), list(s)] for k, s in self._series.items()]
+
+
+def _key_values(key) -> List[str]:
+    if isinstance(key, tuple):
+        return [str(v) for v in key]
+    return [str(key)]
+
+
+# ============================================================
+# 레지스트리
+# ============================================================
+_registry: Dict[str, object] = {}
+_collectors: List[Callable[[], None]] = []
+_info: Dict[str, object] = {}
+
+
+def _register(metric):
+    existing = _registry.get(metric.name)
+    if existing is not None:
+        return existing
+    _registry[metric.name] = metric
+    return metric
+
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+    return _register(Counter(name, help, labelnames))
+
+
+def gauge(name: str, help: str, labelnames: Sequence[str] = (), merge: str = "sum") -> Gauge:
+    return _register(Gauge(name, help, labelnames, merge))
+
+
+def histogram(name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    return _register(Histogram(name, help, labelnames, buckets))
+
+
+def add_collector(fn: Callable[[], None]):
+    """스냅샷 직전 호출 — 게이지를 현재 상태로 채우는 함수 (풀 사용량, 구독 소켓 수 등)"""
+    if fn not in _collectors:
+        _collectors.append(fn)
+
+
+def set_info(key: str, value):
+    """지표가 아닌 보조 값 (최근 주문 실패 사유 등) — 스냅샷 info로 함께 발행"""
+    _info[key] = value
+
+
+def snapshot() -> Dict:
+    """이 프로세스의 전체 지표 (JSON 직렬화 가능)"""
+    for fn in _collectors:
+        try:
+            fn()
+        except Exception as e:
+            print(f"[Metrics] ⚠️ 수집 함수 오류: {e}")
+    metrics = {}
+    for name, m in _registry.items():
+        entry = {"type": m.kind, "help": m.help, "labels": list(m.labelnames), "merge": m.merge, "series": m.export()}
+        if m.kind == "histogram":
+            entry["bounds"] = list(m.bounds)
+        metrics[name] = entry
+    return {"pid": os.getpid(), "ts": time.time(), "metrics": metrics, "info": dict(_info)}
+
+
+# ============================================================
+# 공용 지표 (여러 모듈이 기록)
+# ============================================================
+ticks_total = counter("tradingx_ticks_total", "MetaAPI 시세 콜백 수신 틱 (role: local=워커 직접 연결, ingest=수집 프로세스)", ("symbol", "role"))
+tick_to_ws_send = histogram("tradingx_tick_to_ws_send_seconds", "워커 틱 도착 → 해당 스냅샷이 담긴 WS 프레임 전송 완료", ("mode",))
+ws_frame_build = histogram("tradingx_ws_frame_build_seconds", "스냅샷 수신 → 유저별 WS 프레임 문자열 완성", ("mode",), FAST_BUCKETS)
+ws_open = gauge("tradingx_ws_open", "열린 WebSocket 수", ("mode",))
+ws_connects_total = counter("tradingx_ws_connects_total", "WebSocket 접속 누적", ("mode",))
+orders_total = counter("tradingx_orders_total", "주문 결과 누적", ("result",))
+metaapi_rpc = histogram("tradingx_metaapi_rpc_seconds", "MetaAPI RPC 호출 시간", ("call",), RPC_BUCKETS)
+trade_seconds = histogram("tradingx_trade_seconds", "주문/청산 요청 시간 — part=rpc(MetaAPI 대기) / overhead(자체 처리)", ("op", "part"), RPC_BUCKETS)
+http_request = histogram("tradingx_http_request_seconds", "HTTP 라우트별 처리 시간", ("route",))
+http_db = histogram("tradingx_http_db_seconds", "HTTP 요청 1건 안 DB 쿼리 시간 합계 (쿼리가 있었던 요청만)", ("route",))
+db_query = histogram("tradingx_db_query_seconds", "DB 쿼리 1건 실행 시간 (백그라운드 포함)", ("engine",), FAST_BUCKETS)
+loop_lag = histogram("tradingx_event_loop_lag_seconds", "이벤트 루프 지연 (sleep 초과분)", (), FAST_BUCKETS)
+loop_lag_max = gauge("tradingx_event_loop_lag_max_seconds", "최근 발행 주기 안 최대 이벤트 루프 지연", (), merge="worker")
+
+hub_subscribers = gauge("tradingx_market_hub_subscribers", "market_hub 구독 소켓 수 (demo/live WS 합계)")
+db_pool_checked_out = gauge("tradingx_db_pool_checked_out", "사용 중인 DB 커넥션", ("engine",))
+
+
+def _collect_runtime():
+    """워커 상태 게이지 — 이미 로드된 모듈만 조회 (ingest 프로세스 등에서 불필요한 import 방지)"""
+    import sys
+    hub = sys.modules.get(f"{__package__}.api.market_hub")
+    if hub is not None:
+        hub_subscribers.set(hub.market_hub.get_status()["subscribers"])
+    database = sys.modules.get(f"{__package__}.database")
+    if database is not None:
+        for engine, status in database.get_pool_status().items():
+            if "checkedout" in status:
+                db_pool_checked_out.set(status["checkedout"], engine)
+
+
+add_collector(_collect_runtime)
+
+# 주문/청산 라우트 → op (RPC vs 자체 처리 분리 대상)
+TRADE_ROUTES = {
+    "/api/mt5/order": "order",
+    "/api/mt5/close": "close",
+    "/api/mt5/close-all": "close_all",
+    "/api/mt5/close-by-type": "close_by_type",
+    "/api/mt5/close-by-profit": "close_by_profit",
+    "/api/demo/order": "demo_order",
+    "/api/demo/close": "demo_close",
+    "/api/demo/close-all": "demo_close_all",
+    "/api/demo/close-by-type": "demo_close_by_type",
+    "/api/demo/close-by-profit": "demo_close_by_profit",
+}
+
+
+# ============================================================
+# 요청 단위 시간 (DB / RPC) — contextvar로 스레드풀·자식 태스크까지 공유
+# ============================================================
+class _RequestTiming:
+    __slots__ = ("db", "rpc")
+
+    def __init__(self):
+        self.db = 0.0
+        self.rpc = 0.0
+
+
+_current_request: ContextVar[Optional[_RequestTiming]] = ContextVar("metrics_request", default=None)
+
+
+def record_db_query(elapsed: float, engine: str):
+    """SQLAlchemy after_cursor_execute (database.py)"""
+    db_query.observe(elapsed, engine)
+    req = _current_request.get()
+    if req is not None:
+        req.db += elapsed
+
+
+def record_rpc(call: str, elapsed: float):
+    """MetaAPI RPC 1건 — 히스토그램 + 현재 요청의 RPC 시간 누적"""
+    metaapi_rpc.observe(elapsed, call)
+    req = _current_request.get()
+    if req is not None:
+        req.rpc += elapsed
+
+
+def detach_request():
+    """현재 태스크를 요청 RPC/DB 합산에서 분리 — 병렬 자식 태스크용 (요청 쪽은 배치 전체를 1회 계산)
+    자식 태스크는 생성 시 컨텍스트 복사본을 쓰므로 부모 요청에는 영향 없음"""
+    _current_request.set(None)
+
+
+class RpcTimer:
+    """with rpc_timer("create_order"): await rpc... — RPC 히스토그램 + 현재 요청의 RPC 시간 누적"""
+    __slots__ = ("call", "t0")
+
+    def __init__(self, call: str):
+        self.call = call
+        self.t0 = 0.0
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record_rpc(self.call, time.perf_counter() - self.t0)
+        return False
+
+
+def rpc_timer(call: str) -> RpcTimer:
+    return RpcTimer(call)
+
+
+class MetricsMiddleware:
+    """순수 ASGI 미들웨어 — HTTP 요청만 (WebSocket은 수명이 길어 제외)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timing = _RequestTiming()
+        token = _current_request.set(timing)
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            elapsed = time.perf_counter() - t0
+            _current_request.reset(token)
+            # 라우팅 후 scope["route"] (APIRoute) — 경로 템플릿이라 라벨 수가 라우트 수로 제한됨
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            http_request.observe(elapsed, route)
+            if timing.db:
+                http_db.observe(timing.db, route)
+            op = TRADE_ROUTES.get(route)
+            if op is not None:
+                trade_seconds.observe(timing.rpc, (op, "rpc"))
+                trade_seconds.observe(max(elapsed - timing.rpc, 0.0), (op, "overhead"))
+
+
+# ============================================================
+# 워커 스냅샷 발행 + 루프 지연 샘플링
+# ============================================================
+class MetricsExporter:
+    """워커 전역 — LAG_INTERVAL마다 루프 지연 측정, PUBLISH_INTERVAL마다 스냅샷 발행"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._lag_max = 0.0
+        self.stats = {"publishes": 0, "errors": 0, "lag_samples": 0}
+
+    async def publish(self):
+        from .redis_client import get_async_redis
+        await get_async_redis().set(f"{SNAPSHOT_KEY_PREFIX}{os.getpid()}", json.dumps(snapshot()), ex=SNAPSHOT_TTL)
+        self.stats["publishes"] += 1
+
+    async def _run(self):
+        print(f"[Metrics] 지표 발행 루프 시작 (pid {os.getpid()}, {PUBLISH_INTERVAL:.0f}초)")
+        loop = asyncio.get_running_loop()
+        next_publish = loop.time() + PUBLISH_INTERVAL
+        while True:
+            expected = loop.time() + LAG_INTERVAL
+            await asyncio.sleep(LAG_INTERVAL)
+            now = loop.time()
+            lag = max(now - expected, 0.0)
+            loop_lag.observe(lag)
+            self.stats["lag_samples"] += 1
+            if lag > self._lag_max:
+                self._lag_max = lag
+
+            if now < next_publish:
+                continue
+            next_publish = now + PUBLISH_INTERVAL
+            loop_lag_max.set(round(self._lag_max, 6))
+            self._lag_max = 0.0
+            try:
+                await self.publish()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["errors"] += 1
+                if self.stats["errors"] % 100 == 1:
+                    print(f"[Metrics] ⚠️ 스냅샷 발행 오류: {e}")
+
+    def start(self):
+        """발행 루프 시작 (main.py startup / market_ingest)"""
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def get_status(self) -> Dict:
+        return {"metrics": len(_registry), **self.stats}
+
+
+# 워커 전역 인스턴스
+metrics_exporter = MetricsExporter()
+
+
+# ============================================================
+# 워커 병합 + 텍스트 출력
+# ============================================================
+def load_snapshots(redis_client) -> List[Dict]:
+    """동기 Redis — 살아 있는 프로세스 스냅샷 전체 (리포트 스크립트용)"""
+    keys = list(redis_client.scan_iter(match=f"{SNAPSHOT_KEY_PREFIX}*", count=100))
+    if not keys:
+        return []
+    return [json.loads(raw) for raw in redis_client.mget(keys) if raw]
+
+
+async def load_snapshots_async() -> List[Dict]:
+    from .redis_client import get_async_redis
+    r = get_async_redis()
+    keys = [k async for k in r.scan_iter(match=f"{SNAPSHOT_KEY_PREFIX}*", count=100)]
+    if not keys:
+        return []
+    return [json.loads(raw) for raw in await r.mget(keys) if raw]
+
+
+def merge_snapshots(snapshots: List[Dict]) -> Dict[str, Dict]:
+    """이름별 {"type", "help", "labels", "bounds", "series": {라벨 튜플: 값}}"""
+    merged: Dict[str, Dict] = {}
+    for snap in snapshots:
+        pid = str(snap.get("pid", "?"))
+        for name, m in snap.get("metrics", {}).items():
+            labels = list(m["labels"])
+            if m["type"] == "gauge" and m.get("merge") == "worker":
+                labels.append("worker")
+            target = merged.get(name)
+            if target is None:
+                target = merged[name] = {"type": m["type"], "help": m["help"], "labels": labels,
+                                         "bounds": m.get("bounds"), "series": {}}
+            elif target["bounds"] != m.get("bounds"):
+                continue  # 배포 중 버킷 정의가 다른 워커 — 섞지 않음
+            series = target["series"]
+            for values, value in m["series"]:
+                key = tuple(values) + ((pid,) if len(labels) > len(values) else ())
+                current = series.get(key)
+                if current is None:
+                    series[key] = list(value) if isinstance(value, list) else value
+                elif m["type"] == "histogram":
+                    series[key] = [a + b for a, b in zip(current, value)]
+                elif m["type"] == "gauge" and m.get("merge") == "max":
+                    series[key] = max(current, value)
+                else:
+                    series[key] = current + value
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(value) -> str:
+    if isinstance(value, float):
+        return repr(value) if value == value and value not in (float("inf"), float("-inf")) else str(value)
+    return str(value)
+
+
+_LE_INF = 'le="+Inf"'
+
+
+def render(merged: Dict[str, Dict]) -> str:
+    """Prometheus 텍스트 형식 0.0.4"""
+    lines = []
+    for name in sorted(merged):
+        m = merged[name]
+        lines.append(f"# HELP {name} {m['help']}")
+        lines.append(f"# TYPE {name} {m['type']}")
+        names = m["labels"]
+        for values in sorted(m["series"]):
+            value = m["series"][values]
+            if m["type"] != "histogram":
+                lines.append(f"{name}{_labels_text(names, values)} {_num(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(m["bounds"], value):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{name}_bucket{_labels_text(names, values, le)} {cumulative}")
+            cumulative += value[len(m["bounds"])]
+            lines.append(f"{name}_bucket{_labels_text(names, values, _LE_INF)} {cumulative}")
+            lines.append(f"{name}_sum{_labels_text(names, values)} {_num(value[-1])}")
+            lines.append(f"{name}_count{_labels_text(names, values)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+async def render_all(scope: str = "all") -> str:
+    """/metrics — scope="all": 워커 병합 (Redis 실패 시 이 워커만) / "local": 이 워커만"""
+    local = snapshot()
+    snapshots = [local]
+    if scope != "local":
+        try:
+            others = [s for s in await load_snapshots_async() if s.get("pid") != local["pid"]]
+            snapshots.extend(others)
+        except Exception as e:
+            print(f"[Metrics] ⚠️ 워커 스냅샷 조회 실패 (이 워커만 출력): {e}")
+    merged = merge_snapshots(snapshots)
+    merged["tradingx_metrics_processes"] = {"type": "gauge", "help": "병합된 프로세스 수", "labels": [],
+                                            "bounds": None, "series": {(): len(snapshots)}}
+    return render(merged)
@@ -1,7 +1,8 @@
 from .user import User
 from .mt5_account import MT5Account
-from .demo_trade import DemoTrade, DemoPosition, DemoTransaction
+from .demo_trade import DemoTrade, DemoPosition, DemoTransaction, DemoDailyRollup, DemoRollupState
 from .live_martin_state import LiveMartinState
 from .grade_config import GradeConfig
 from .live_trade import LiveTrade
-from .login_history import LoginHistory
\ No newline at end of file
+from .login_history import LoginHistory
+from .live_deal import LiveDeal, LiveDealSync
\ No newline at end of file
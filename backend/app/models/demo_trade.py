@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, Date, ForeignKey, Boolean, Text, UniqueConstraint
 from sqlalchemy.sql import func
 from ..database import Base
 
@@ -63,4 +63,32 @@ class DemoTransaction(Base):
     balance_after = Column(Float, default=0.0)      # 변동 후 잔고
     description = Column(String(200), default="")   # 설명 (예: "리셋", "충전 $5,000", "BTCUSD BUY +$150")
     reference_id = Column(Integer, nullable=True)    # trade인 경우 DemoTrade.id 참조
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+# ========== 데모 일별 롤업 (트레이딩 리포트용) ==========
+class DemoDailyRollup(Base):
+    """(user_id, day)별 거래/충전 집계 — record_trade_transaction / topup_account와 같은 트랜잭션에서 갱신"""
+    __tablename__ = "demo_daily_rollups"
+    __table_args__ = (
+        UniqueConstraint('user_id', 'day', name='uq_demo_daily_rollups_user_day'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    day = Column(Date, nullable=False)              # closed_at / created_at 날짜 (서버 로컬)
+    trade_count = Column(Integer, default=0)
+    win_count = Column(Integer, default=0)
+    trade_pl = Column(Float, default=0.0)
+    volume = Column(Float, default=0.0)
+    topup = Column(Float, default=0.0)
+    detail = Column(Text, default="{}")              # JSON: 종목/방향/시간대 버킷, 최대·최소 거래, 연속 승패 구간
+
+
+# ========== 데모 롤업 생성 상태 ==========
+class DemoRollupState(Base):
+    """기존 거래로 롤업을 한 번 채운 유저 표시 — 이후는 증분 갱신"""
+    __tablename__ = "demo_rollup_states"
+
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    built_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
@@ -0,0 +1,38 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.sql import func
+from ..database import Base
+
+class LiveDeal(Base):
+    """유저별 MetaAPI 딜 원본 (스트리밍 on_deal_added + RPC 백필) — 히스토리/리포트 로컬 조회용"""
+    __tablename__ = "live_deals"
+    __table_args__ = (
+        UniqueConstraint('user_id', 'deal_id', name='uq_live_deals_user_deal'),
+        Index('idx_live_deals_user_time', 'user_id', 'time'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    deal_id = Column(String(100), nullable=False)        # MT5 딜 ID
+    deal_type = Column(String(50), nullable=True)        # DEAL_TYPE_BUY / SELL / BALANCE ...
+    entry_type = Column(String(50), nullable=True)       # DEAL_ENTRY_IN / OUT
+    symbol = Column(String(50), nullable=True)
+    volume = Column(Float, default=0.0)
+    price = Column(Float, default=0.0)
+    profit = Column(Float, default=0.0)
+    commission = Column(Float, default=0.0)
+    swap = Column(Float, default=0.0)
+    position_id = Column(String(100), nullable=True)
+    order_id = Column(String(100), nullable=True)
+    magic = Column(Integer, default=0)
+    time = Column(DateTime(timezone=True), nullable=False)  # 체결 시각 (UTC)
+
+
+class LiveDealSync(Base):
+    """유저별 딜 저장 구간 (high-water mark) — [covered_from, covered_to] 는 RPC로 채워진 구간"""
+    __tablename__ = "live_deal_sync"
+
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    metaapi_account_id = Column(String(100), nullable=True)  # 계정 변경 시 저장분 폐기
+    covered_from = Column(DateTime(timezone=True), nullable=False)
+    covered_to = Column(DateTime(timezone=True), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -2,67 +2,94 @@
 Trading-X 모니터링 카운터
 - WebSocket 접속자 수
 - 주문 성공/실패 카운터
-- Redis 기반 (워커 간 공유)
+- 프로세스 메모리 기록 (app.metrics) → 워커별 스냅샷을 Redis에 주기 발행, 조회 시 합산
+
+기존: 호출마다 동기 Redis INCR/DECR/EXPIRE/LPUSH (요청 경로·WS 루프에서 왕복)
+변경: 호출은 메모리 카운터만 증가 — Redis 쓰기는 metrics_exporter가 5초마다 1회
+      주문 카운터는 기존 TTL 동작 유지 (마지막 주문 후 1시간 지나면 0부터)
 """
 
+import time
+from collections import deque
+
+from app import metrics
+
+# 주문 카운터 유지 시간 (초) — 기존 Redis TTL과 동일 (주문마다 연장)
+ORDER_WINDOW_SEC = 3600
+
+_order_window = {"success": 0, "fail": 0, "last": 0.0}
+_fail_reasons = deque(maxlen=5)  # (시각, 사유)
+
+
+def _touch_order_window():
+    now = time.time()
+    if now - _order_window["last"] > ORDER_WINDOW_SEC:
+        _order_window["success"] = 0
+        _order_window["fail"] = 0
+        _fail_reasons.clear()
+    _order_window["last"] = now
+    return now
+
+
 def ws_connect(mode="demo"):
     """WebSocket 접속 시 호출"""
-    try:
-        from app.redis_client import get_redis
-        r = get_redis()
-        r.incr(f"monitor:ws:{mode}")
-    except Exception:
-        pass
+    metrics.ws_open.inc(mode)
+    metrics.ws_connects_total.inc(mode)
+
 
 def ws_disconnect(mode="demo"):
-    """WebSocket 해제 시 호출"""
-    try:
-        from app.redis_client import get_redis
-        r = get_redis()
-        r.decr(f"monitor:ws:{mode}")
-        # 음수 방지
-        val = int(r.get(f"monitor:ws:{mode}") or 0)
-        if val < 0:
-            r.set(f"monitor:ws:{mode}", 0)
-    except Exception:
-        pass
+    """WebSocket 해제 시 호출 (음수 방지)"""
+    metrics.ws_open.dec(mode)
+
 
 def order_success():
     """주문 성공 시 호출"""
-    try:
-        from app.redis_client import get_redis
-        r = get_redis()
-        r.incr("monitor:order:success")
-        # 1시간 후 자동 리셋 (TTL)
-        r.expire("monitor:order:success", 3600)
-    except Exception:
-        pass
+    _touch_order_window()
+    _order_window["success"] += 1
+    metrics.orders_total.inc("success")
+
 
 def order_fail(reason="unknown"):
     """주문 실패 시 호출"""
-    try:
-        from app.redis_client import get_redis
-        r = get_redis()
-        r.incr("monitor:order:fail")
-        r.expire("monitor:order:fail", 3600)
-        # 최근 실패 사유 저장 (최대 5개)
-        r.lpush("monitor:order:fail_reasons", reason[:100])
-        r.ltrim("monitor:order:fail_reasons", 0, 4)
-        r.expire("monitor:order:fail_reasons", 3600)
-    except Exception:
-        pass
+    now = _touch_order_window()
+    _order_window["fail"] += 1
+    _fail_reasons.appendleft((now, str(reason)[:100]))
+    metrics.orders_total.inc("fail")
+
+
+def _collect():
+    """스냅샷 직전 — 1시간 창 카운터 + 최근 실패 사유"""
+    expired = time.time() - _order_window["last"] > ORDER_WINDOW_SEC
+    metrics.set_info("orders_window", {
+        "success": 0 if expired else _order_window["success"],
+        "fail": 0 if expired else _order_window["fail"],
+        "fail_reasons": [] if expired else [list(item) for item in _fail_reasons],
+    })
+
+
+metrics.add_collector(_collect)
+
 
 def get_stats() -> dict:
-    """현재 카운터 조회 (리포트 스크립트에서 사용)"""
+    """현재 카운터 조회 (리포트 스크립트에서 사용) — 살아 있는 워커 스냅샷 합산"""
     try:
         from app.redis_client import get_redis
-        r = get_redis()
+        snapshots = metrics.load_snapshots(get_redis())
+        merged = metrics.merge_snapshots(snapshots)
+        ws = merged.get("tradingx_ws_open", {}).get("series", {})
+        success, fail, reasons = 0, 0, []
+        for snap in snapshots:
+            window = snap.get("info", {}).get("orders_window") or {}
+            success += window.get("success", 0)
+            fail += window.get("fail", 0)
+            reasons.extend(window.get("fail_reasons", []))
+        reasons.sort(key=lambda item: item[0], reverse=True)
         return {
-            "ws_demo": int(r.get("monitor:ws:demo") or 0),
-            "ws_live": int(r.get("monitor:ws:live") or 0),
-            "order_success": int(r.get("monitor:order:success") or 0),
-            "order_fail": int(r.get("monitor:order:fail") or 0),
-            "fail_reasons": r.lrange("monitor:order:fail_reasons", 0, 4) or []
+            "ws_demo": int(ws.get(("demo",), 0)),
+            "ws_live": int(ws.get(("live",), 0)),
+            "order_success": success,
+            "order_fail": fail,
+            "fail_reasons": [reason for _, reason in reasons[:5]]
         }
     except Exception:
         return {"ws_demo": 0, "ws_live": 0, "order_success": 0, "order_fail": 0, "fail_reasons": []}
@@ -28,6 +28,25 @@ def get_redis() -> redis.Redis:
     return _redis
 
 
+# ★ 비동기 Redis 연결 (pub/sub, 배치 쓰기 등 이벤트 루프용)
+_async_redis = None
+
+def get_async_redis():
+    """비동기 Redis 연결 싱글톤 (redis.asyncio)"""
+    global _async_redis
+    if _async_redis is None:
+        import redis.asyncio as aioredis
+        _async_redis = aioredis.Redis(
+            host='127.0.0.1',
+            port=6379,
+            db=0,
+            decode_responses=True,
+            socket_connect_timeout=3,
+            retry_on_timeout=True,
+        )
+    return _async_redis
+
+
 def is_redis_available() -> bool:
     """Redis 연결 상태 확인"""
     try:
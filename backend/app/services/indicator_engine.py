@@ -0,0 +1,479 @@
+# app/services/indicator_engine.py
+"""
+인디케이터 계산 엔진 — O(n) 롤링 계산 + 형성 중 캔들 O(1) 갱신
+
+기존: calculate_macd → i마다 calculate_ema(closes[:i+1]) 재계산 (O(n²))
+      calculate_chart_indicators → 캔들마다 20개 윈도우 합계/분산/가중합 재계산 (O(n·period)), /candles 호출마다
+      RSI/Stochastic/CCI/W%R/ADX → 호출마다 윈도우 재집계, 시리즈 없음
+변경: - ema_series / macd: 1회 순회 O(n)
+      - rolling_bollinger / rolling_lwma: 합계·제곱합·가중합 슬라이딩 O(n)
+      - rsi_series / adx_series: 상승·하락폭, ±DM/TR 합계 슬라이딩 O(n)
+      - stochastic_series / williams_r_series: 단조 deque 롤링 최고가/최저가 O(n)
+      - cci_series: TP 합계 슬라이딩 (평균편차는 정의상 윈도우 순회 O(period))
+        값은 IndicatorService 단일값 함수와 동일 (Stochastic %D만 기존 %K 복사 → %K의 d_period 평균)
+      - ChartIndicatorCache / OscillatorCache: (symbol, timeframe, count, 마지막 캔들 time)별 결과 캐시
+          같은 마지막 캔들 + 과거 구간 동일 → 마지막 점만 O(1) 재계산 (틱은 형성 중 캔들만 바꿈)
+          새 캔들(마지막 time 변경) → 새 키, 같은 time이라도 과거 구간이 바뀌었으면(백필/재배치) 전체 O(n) 재계산
+"""
+
+import math
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+# ============================================================
+# 시리즈 계산 (O(n))
+# ============================================================
+def ema_series(closes: Sequence[float], period: int) -> List[Optional[float]]:
+    """EMA 시리즈 — SMA(period)로 시작, period-1 이전은 None"""
+    n = len(closes)
+    out: List[Optional[float]] = [None] * n
+    if n < period or period <= 0:
+        return out
+    k = 2 / (period + 1)
+    ema = sum(closes[:period]) / period
+    out[period - 1] = ema
+    for i in range(period, n):
+        ema = (closes[i] - ema) * k + ema
+        out[i] = ema
+    return out
+
+
+def macd(closes: Sequence[float], fast: int = 12, slow: int = 26, signal_period: int = 9) -> Tuple[float, float]:
+    """MACD 라인 + 시그널(최근 signal_period개 MACD 평균) — IndicatorService.calculate_macd와 동일 값"""
+    n = len(closes)
+    if n < slow + signal_period:
+        return 0, 0
+    ef = ema_series(closes, fast)
+    es = ema_series(closes, slow)
+    macd_line = ef[-1] - es[-1]
+    signal_line = sum(ef[i] - es[i] for i in range(n - signal_period, n)) / signal_period
+    return macd_line, signal_line
+
+
+def rolling_bollinger(closes: Sequence[float], period: int = 20, std_dev: float = 2) -> Tuple[List, List, List]:
+    """볼린저 밴드 시리즈 (upper, middle, lower) — 윈도우 합계/제곱합 슬라이딩"""
+    n = len(closes)
+    upper: List[Optional[float]] = [None] * n
+    middle: List[Optional[float]] = [None] * n
+    lower: List[Optional[float]] = [None] * n
+    if n < period:
+        return upper, middle, lower
+    s = 0.0
+    ss = 0.0
+    for i in range(n):
+        x = closes[i]
+        s += x
+        ss += x * x
+        if i >= period:
+            y = closes[i - period]
+            s -= y
+            ss -= y * y
+        if i >= period - 1:
+            sma = s / period
+            std = math.sqrt(max(ss / period - sma * sma, 0.0))
+            middle[i] = sma
+            upper[i] = sma + std_dev * std
+            lower[i] = sma - std_dev * std
+    return upper, middle, lower
+
+
+def rolling_lwma(closes: Sequence[float], period: int = 20) -> List[Optional[float]]:
+    """LWMA 시리즈 — 가중합 W(i) = W(i-1) + period·x(i) - S(i-1) 슬라이딩"""
+    n = len(closes)
+    out: List[Optional[float]] = [None] * n
+    if n < period:
+        return out
+    denom = period * (period + 1) / 2
+    w = sum((j + 1) * closes[j] for j in range(period))
+    s = sum(closes[:period])
+    out[period - 1] = w / denom
+    for i in range(period, n):
+        w += period * closes[i] - s
+        s += closes[i] - closes[i - period]
+        out[i] = w / denom
+    return out
+
+
+def rsi_series(closes: Sequence[float], period: int = 14) -> List[Optional[float]]:
+    """RSI 시리즈 — 최근 period개 변화량의 상승/하락 단순평균 (IndicatorService.calculate_rsi와 동일 정의)"""
+    n = len(closes)
+    out: List[Optional[float]] = [None] * n
+    if n < period + 1 or period <= 0:
+        return out
+    gains = [0.0] * n
+    losses = [0.0] * n
+    for i in range(1, n):
+        change = closes[i] - closes[i - 1]
+        gains[i] = max(0, change)
+        losses[i] = max(0, -change)
+    g = sum(gains[1:period])
+    l = sum(losses[1:period])
+    nl = sum(1 for x in losses[1:period] if x > 0)  # 하락 횟수 — 슬라이딩 합의 부동소수 잔차와 무관하게 0 판정
+    for i in range(period, n):
+        g += gains[i]
+        l += losses[i]
+        nl += losses[i] > 0
+        if i > period:
+            g -= gains[i - period]
+            l -= losses[i - period]
+            nl -= losses[i - period] > 0
+        out[i] = _rsi_value(g, l if nl else 0.0, period)
+    return out
+
+
+def _rsi_value(gain_sum: float, loss_sum: float, period: int) -> float:
+    if loss_sum == 0:
+        return 100.0
+    return 100 - (100 / (1 + (gain_sum / period) / (loss_sum / period)))
+
+
+def _rolling_extreme(values: Sequence[float], period: int, is_max: bool) -> List[Optional[float]]:
+    """윈도우 최고/최저 — 단조 deque (원소당 push/pop 1회, O(n))"""
+    n = len(values)
+    out: List[Optional[float]] = [None] * n
+    dq: deque = deque()
+    for i in range(n):
+        x = values[i]
+        if is_max:
+            while dq and values[dq[-1]] <= x:
+                dq.pop()
+        else:
+            while dq and values[dq[-1]] >= x:
+                dq.pop()
+        dq.append(i)
+        if dq[0] <= i - period:
+            dq.popleft()
+        if i >= period - 1:
+            out[i] = values[dq[0]]
+    return out
+
+
+def _stoch_k(close: float, hh: float, ll: float) -> float:
+    return 50.0 if hh == ll else (close - ll) / (hh - ll) * 100
+
+
+def _willr(close: float, hh: float, ll: float) -> float:
+    return -50.0 if hh == ll else (hh - close) / (hh - ll) * -100
+
+
+def stochastic_series(closes: Sequence[float], highs: Sequence[float], lows: Sequence[float],
+                      k_period: int = 14, d_period: int = 3) -> Tuple[List, List]:
+    """Stochastic (%K, %D) 시리즈 — %D = %K의 d_period 단순평균 (앞쪽 %D가 없으면 None)"""
+    n = len(closes)
+    hh = _rolling_extreme(highs, k_period, True)
+    ll = _rolling_extreme(lows, k_period, False)
+    k: List[Optional[float]] = [None] * n
+    d: List[Optional[float]] = [None] * n
+    s = 0.0
+    for i in range(k_period - 1, n):
+        k[i] = _stoch_k(closes[i], hh[i], ll[i])
+        s += k[i]
+        if i - d_period >= k_period - 1:
+            s -= k[i - d_period]
+        if i >= k_period - 1 + d_period - 1:
+            d[i] = s / d_period
+    return k, d
+
+
+def williams_r_series(closes: Sequence[float], highs: Sequence[float], lows: Sequence[float],
+                      period: int = 14) -> List[Optional[float]]:
+    """Williams %R 시리즈 (고가=저가 구간은 -50)"""
+    hh = _rolling_extreme(highs, period, True)
+    ll = _rolling_extreme(lows, period, False)
+    return [None if hh[i] is None else _willr(closes[i], hh[i], ll[i]) for i in range(len(closes))]
+
+
+def _cci_value(tps: Sequence[float], tp_sum: float, period: int) -> float:
+    sma = tp_sum / period
+    mean_dev = sum(abs(x - sma) for x in tps) / period
+    if mean_dev == 0:
+        return 0
+    return (tps[-1] - sma) / (0.015 * mean_dev)
+
+
+def cci_series(closes: Sequence[float], highs: Sequence[float], lows: Sequence[float],
+               period: int = 20) -> List[Optional[float]]:
+    """CCI 시리즈 — TP 합계 슬라이딩, 평균편차는 윈도우 순회"""
+    n = len(closes)
+    out: List[Optional[float]] = [None] * n
+    if n < period or period <= 0:
+        return out
+    tp = [(highs[i] + lows[i] + closes[i]) / 3 for i in range(n)]
+    s = sum(tp[:period - 1])
+    for i in range(period - 1, n):
+        s += tp[i]
+        if i >= period:
+            s -= tp[i - period]
+        out[i] = _cci_value(tp[i - period + 1:i + 1], s, period)
+    return out
+
+
+def _dm_tr(h: float, l: float, prev_h: float, prev_l: float, prev_c: float) -> Tuple[float, float, float]:
+    high_diff = h - prev_h
+    low_diff = prev_l - l
+    pdm = high_diff if high_diff > low_diff and high_diff > 0 else 0
+    mdm = low_diff if low_diff > high_diff and low_diff > 0 else 0
+    return pdm, mdm, max(h - l, abs(h - prev_c), abs(l - prev_c))
+
+
+def _adx_value(pdm_sum: float, mdm_sum: float, tr_sum: float, period: int) -> Tuple[float, float, float]:
+    atr = tr_sum / period
+    if atr == 0:
+        return 25.0, 25.0, 25.0
+    plus_di = (pdm_sum / period) / atr * 100
+    minus_di = (mdm_sum / period) / atr * 100
+    dx = abs(plus_di - minus_di) / (plus_di + minus_di) * 100 if (plus_di + minus_di) > 0 else 0
+    return dx, plus_di, minus_di
+
+
+def adx_series(closes: Sequence[float], highs: Sequence[float], lows: Sequence[float],
+               period: int = 14) -> List[Optional[Tuple[float, float, float]]]:
+    """(ADX, +DI, -DI) 시리즈 — 최근 period개 ±DM/TR 합계 슬라이딩 (IndicatorService.calculate_adx와 동일 정의: ADX=DX)"""
+    n = len(closes)
+    out: List[Optional[Tuple[float, float, float]]] = [None] * n
+    if n < period + 1 or period <= 0:
+        return out
+    dm = [(0.0, 0.0, 0.0)] + [_dm_tr(highs[i], lows[i], highs[i - 1], lows[i - 1], closes[i - 1]) for i in range(1, n)]
+    p = sum(x[0] for x in dm[1:period])
+    m = sum(x[1] for x in dm[1:period])
+    t = sum(x[2] for x in dm[1:period])
+    nt = sum(1 for x in dm[1:period] if x[2] > 0)  # TR>0 개수 — ATR 0 판정용 (슬라이딩 잔차 무시)
+    for i in range(period, n):
+        p += dm[i][0]
+        m += dm[i][1]
+        t += dm[i][2]
+        nt += dm[i][2] > 0
+        if i > period:
+            p -= dm[i - period][0]
+            m -= dm[i - period][1]
+            t -= dm[i - period][2]
+            nt -= dm[i - period][2] > 0
+        out[i] = _adx_value(p, m, t if nt else 0.0, period)
+    return out
+
+
+# ============================================================
+# 차트 인디케이터 캐시 (/candles/{symbol})
+# ============================================================
+BB_PERIOD = 20
+BB_STD = 2
+LWMA_PERIOD = 20
+
+RSI_PERIOD = 14
+STOCH_K = 14
+STOCH_D = 3
+CCI_PERIOD = 20
+WILLR_PERIOD = 14
+ADX_PERIOD = 14
+
+
+def _points(times: Sequence[int], values: Sequence[Optional[float]]) -> List[Dict]:
+    return [{"time": t, "value": v} for t, v in zip(times, values) if v is not None]
+
+
+class _LastCandleCache:
+    """(symbol, timeframe, count) + 마지막 캔들 time → 항목. 같은 기본 키의 이전 time 항목은 새 항목 저장 시 제거"""
+
+    def __init__(self, max_entries: int = 256):
+        self._entries: Dict[tuple, object] = {}
+        self._latest: Dict[tuple, tuple] = {}   # 기본 키 → 현재 캐시 키
+        self.max_entries = max_entries
+        self.stats = {"full": 0, "incremental": 0, "hit": 0}
+
+    def _lookup(self, key: tuple, last_time: int):
+        return self._entries.get(key + (last_time,))
+
+    def _store(self, key: tuple, last_time: int, entry):
+        ck = key + (last_time,)
+        old = self._latest.get(key)
+        if old is not None and old != ck:
+            self._entries.pop(old, None)
+        if len(self._entries) >= self.max_entries and ck not in self._entries:
+            evicted = next(iter(self._entries))
+            self._entries.pop(evicted)
+            self._latest.pop(evicted[:-1], None)
+        self._entries[ck] = entry
+        self._latest[key] = ck
+        self.stats["full"] += 1
+
+
+class _ChartEntry:
+    __slots__ = ("times", "closes", "result", "bb_sum", "bb_sumsq", "lwma_base")
+
+
+class ChartIndicatorCache(_LastCandleCache):
+    """(symbol, timeframe, count, 마지막 캔들 time) → 차트 인디케이터 결과 + 마지막 점 갱신용 부분합"""
+
+    def get(self, key: tuple, times: List[int], closes: List[float]) -> Dict:
+        n = len(closes)
+        if n < max(BB_PERIOD, LWMA_PERIOD):
+            return {}
+
+        # 같은 마지막 캔들이라도 과거 구간(백필/재배치)이 바뀌었으면 전체 재계산
+        entry = self._lookup(key, times[-1])
+        if entry is not None and entry.times == times and entry.closes[:-1] == closes[:-1]:
+            if entry.closes[-1] == closes[-1]:
+                self.stats["hit"] += 1
+                return entry.result
+            self._update_last(entry, closes[-1])
+            self.stats["incremental"] += 1
+            return entry.result
+
+        entry = self._build(times, closes)
+        self._store(key, times[-1], entry)
+        return entry.result
+
+    def update_last(self, key: tuple, last_time: int, close: float) -> Optional[Dict]:
+        """
+        캐시된 항목의 형성 중 캔들 close만 갱신 (전체 리스트 비교 없이)
+        마지막 캔들 time이 다르면 None — 과거 구간 동일성은 호출자(candle_response_cache: 링 uid/배치/append 수)가 보장
+        """
+        entry = self._lookup(key, last_time)
+        if entry is None:
+            return None
+        if entry.closes[-1] != close:
+            self._update_last(entry, close)
+            self.stats["incremental"] += 1
+        return entry.result
+
+    @staticmethod
+    def _build(times: List[int], closes: List[float]) -> _ChartEntry:
+        upper, middle, lower = rolling_bollinger(closes, BB_PERIOD, BB_STD)
+        lwma = rolling_lwma(closes, LWMA_PERIOD)
+
+        entry = _ChartEntry()
+        entry.times = list(times)
+        entry.closes = list(closes)
+        # 마지막 캔들을 제외한 윈도우 부분합 (형성 중 캔들 갱신 시 재사용)
+        bb_win = closes[-BB_PERIOD:-1]
+        entry.bb_sum = sum(bb_win)
+        entry.bb_sumsq = sum(x * x for x in bb_win)
+        entry.lwma_base = sum((j + 1) * x for j, x in enumerate(closes[-LWMA_PERIOD:-1]))
+        entry.result = {
+            "bb_upper": _points(times, upper),
+            "bb_middle": _points(times, middle),
+            "bb_lower": _points(times, lower),
+            "lwma": _points(times, lwma),
+        }
+        return entry
+
+    @staticmethod
+    def _update_last(entry: _ChartEntry, close: float):
+        """형성 중 캔들 close만 변경 → 각 시리즈 마지막 점만 재계산 O(1)"""
+        entry.closes[-1] = close
+        t = entry.times[-1]
+
+        s = entry.bb_sum + close
+        sma = s / BB_PERIOD
+        std = math.sqrt(max((entry.bb_sumsq + close * close) / BB_PERIOD - sma * sma, 0.0))
+        lw = (entry.lwma_base + LWMA_PERIOD * close) / (LWMA_PERIOD * (LWMA_PERIOD + 1) / 2)
+
+        prev = entry.result
+        # 응답에 이미 나간 리스트는 건드리지 않고 마지막 원소만 바꾼 새 리스트로 교체
+        entry.result = {
+            "bb_upper": prev["bb_upper"][:-1] + [{"time": t, "value": sma + BB_STD * std}],
+            "bb_middle": prev["bb_middle"][:-1] + [{"time": t, "value": sma}],
+            "bb_lower": prev["bb_lower"][:-1] + [{"time": t, "value": sma - BB_STD * std}],
+            "lwma": prev["lwma"][:-1] + [{"time": t, "value": lw}],
+        }
+
+
+# ============================================================
+# 오실레이터 (RSI / Stochastic / CCI / W%R / ADX) — 마지막 값 + 형성 중 캔들 갱신
+# ============================================================
+class OscillatorState:
+    """
+    마지막 캔들을 뺀 윈도우 부분합/극값 보관 → 형성 중 캔들(close/high/low) 변경 시 마지막 값만 재계산
+    O(1) (CCI 평균편차만 정의상 O(CCI_PERIOD))
+    """
+
+    __slots__ = ("prev", "rsi_g", "rsi_l", "rsi_nl", "st_hh", "st_ll", "st_k", "wr_hh", "wr_ll",
+                 "cci_tp", "cci_sum", "adx_p", "adx_m", "adx_t", "adx_nt")
+
+    MIN_CANDLES = max(RSI_PERIOD + 1, STOCH_K + STOCH_D - 1, CCI_PERIOD, WILLR_PERIOD, ADX_PERIOD + 1) + 1
+
+    def __init__(self, closes: Sequence[float], highs: Sequence[float], lows: Sequence[float]):
+        n = len(closes)
+        self.prev = (closes[-2], highs[-2], lows[-2])
+
+        changes = [closes[i] - closes[i - 1] for i in range(n - RSI_PERIOD, n - 1)]
+        self.rsi_g = sum(max(0, c) for c in changes)
+        self.rsi_l = sum(max(0, -c) for c in changes)
+        self.rsi_nl = sum(1 for c in changes if c < 0)
+
+        self.st_hh = max(highs[n - STOCH_K:n - 1])
+        self.st_ll = min(lows[n - STOCH_K:n - 1])
+        ks, _ = stochastic_series(closes[n - STOCH_K - STOCH_D + 1:n - 1], highs[n - STOCH_K - STOCH_D + 1:n - 1],
+                                  lows[n - STOCH_K - STOCH_D + 1:n - 1], STOCH_K, STOCH_D)
+        self.st_k = [k for k in ks if k is not None]
+
+        self.wr_hh = max(highs[n - WILLR_PERIOD:n - 1])
+        self.wr_ll = min(lows[n - WILLR_PERIOD:n - 1])
+
+        self.cci_tp = [(highs[i] + lows[i] + closes[i]) / 3 for i in range(n - CCI_PERIOD, n - 1)]
+        self.cci_sum = sum(self.cci_tp)
+
+        dm = [_dm_tr(highs[i], lows[i], highs[i - 1], lows[i - 1], closes[i - 1]) for i in range(n - ADX_PERIOD, n - 1)]
+        self.adx_p = sum(x[0] for x in dm)
+        self.adx_m = sum(x[1] for x in dm)
+        self.adx_t = sum(x[2] for x in dm)
+        self.adx_nt = sum(1 for x in dm if x[2] > 0)
+
+    def values(self, close: float, high: float, low: float) -> Dict[str, float]:
+        prev_c, prev_h, prev_l = self.prev
+        change = close - prev_c
+        loss = max(0, -change)
+        rsi = _rsi_value(self.rsi_g + max(0, change), (self.rsi_l + loss) if (self.rsi_nl or loss > 0) else 0.0, RSI_PERIOD)
+
+        k = _stoch_k(close, max(self.st_hh, high), min(self.st_ll, low))
+        d = (sum(self.st_k) + k) / STOCH_D
+
+        tp = (high + low + close) / 3
+        cci = _cci_value(self.cci_tp + [tp], self.cci_sum + tp, CCI_PERIOD)
+
+        pdm, mdm, tr = _dm_tr(high, low, prev_h, prev_l, prev_c)
+        adx, plus_di, minus_di = _adx_value(self.adx_p + pdm, self.adx_m + mdm,
+                                            (self.adx_t + tr) if (self.adx_nt or tr > 0) else 0.0, ADX_PERIOD)
+        return {
+            "rsi": rsi, "stoch_k": k, "stoch_d": d, "cci": cci,
+            "williams_r": _willr(close, max(self.wr_hh, high), min(self.wr_ll, low)),
+            "adx": adx, "plus_di": plus_di, "minus_di": minus_di,
+        }
+
+
+class _OscEntry:
+    __slots__ = ("times", "closes", "highs", "lows", "state", "result")
+
+
+class OscillatorCache(_LastCandleCache):
+    """(symbol, timeframe, count, 마지막 캔들 time) → 오실레이터 마지막 값 (형성 중 캔들 변경은 OscillatorState로 O(1))"""
+
+    def get(self, key: tuple, times: List[int], closes: List[float], highs: List[float], lows: List[float]) -> Dict:
+        if len(closes) < OscillatorState.MIN_CANDLES:
+            return {}
+        entry = self._lookup(key, times[-1])
+        if entry is not None and entry.times == times and entry.closes[:-1] == closes[:-1] \
+                and entry.highs[:-1] == highs[:-1] and entry.lows[:-1] == lows[:-1]:
+            last = (closes[-1], highs[-1], lows[-1])
+            if (entry.closes[-1], entry.highs[-1], entry.lows[-1]) == last:
+                self.stats["hit"] += 1
+                return entry.result
+            entry.closes[-1], entry.highs[-1], entry.lows[-1] = last
+            entry.result = entry.state.values(*last)
+            self.stats["incremental"] += 1
+            return entry.result
+
+        entry = _OscEntry()
+        entry.times = list(times)
+        entry.closes = list(closes)
+        entry.highs = list(highs)
+        entry.lows = list(lows)
+        entry.state = OscillatorState(closes, highs, lows)
+        entry.result = entry.state.values(closes[-1], highs[-1], lows[-1])
+        self._store(key, times[-1], entry)
+        return entry.result
+
+
+chart_indicator_cache = ChartIndicatorCache()
+oscillator_cache = OscillatorCache()
@@ -8,6 +8,11 @@ import time
 import random
 from typing import Dict, List, Optional
 
+from .indicator_engine import (
+    macd as _macd, rolling_bollinger, rolling_lwma, rsi_series, stochastic_series, cci_series,
+    williams_r_series, adx_series, chart_indicator_cache, oscillator_cache,
+)
+
 # MetaAPI 캐시 참조 (lazy import)
 def _get_quote_caches():
     from app.api.metaapi_service import quote_price_cache, quote_candle_cache
@@ -46,27 +51,10 @@ class IndicatorService:
     
     @staticmethod
     def calculate_rsi(closes: List[float], period: int = 14) -> float:
-        """RSI 계산"""
+        """RSI 계산 (최근 period+1개 종가 — indicator_engine.rsi_series 마지막 값)"""
         if len(closes) < period + 1:
             return 50.0
-        
-        gains = []
-        losses = []
-        
-        for i in range(1, len(closes)):
-            change = closes[i] - closes[i-1]
-            gains.append(max(0, change))
-            losses.append(max(0, -change))
-        
-        avg_gain = sum(gains[-period:]) / period
-        avg_loss = sum(losses[-period:]) / period
-        
-        if avg_loss == 0:
-            return 100.0
-        
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-        return rsi
+        return rsi_series(closes[-(period + 1):], period)[-1]
     
     @staticmethod
     def calculate_ema(closes: List[float], period: int) -> float:
@@ -84,113 +72,59 @@ class IndicatorService:
     
     @staticmethod
     def calculate_macd(closes: List[float], fast: int = 12, slow: int = 26, signal_period: int = 9) -> tuple:
-        """MACD 계산"""
-        if len(closes) < slow + signal_period:
-            return 0, 0
-        
-        ema_fast = IndicatorService.calculate_ema(closes, fast)
-        ema_slow = IndicatorService.calculate_ema(closes, slow)
-        macd_line = ema_fast - ema_slow
-        
-        macd_values = []
-        for i in range(slow - 1, len(closes)):
-            ef = IndicatorService.calculate_ema(closes[:i+1], fast)
-            es = IndicatorService.calculate_ema(closes[:i+1], slow)
-            macd_values.append(ef - es)
-        
-        if len(macd_values) >= signal_period:
-            signal_line = sum(macd_values[-signal_period:]) / signal_period
-        else:
-            signal_line = macd_line
-        
-        return macd_line, signal_line
+        """MACD 계산 (EMA 시리즈 1회 순회 — indicator_engine.macd)"""
+        return _macd(closes, fast, slow, signal_period)
     
     @staticmethod
     def calculate_stochastic(closes: List[float], highs: List[float], lows: List[float], 
                             k_period: int = 14, d_period: int = 3) -> tuple:
-        """Stochastic 계산"""
+        """Stochastic 계산 — %K + %D(%K의 d_period 평균, 캔들 부족 시 %K)"""
         if len(closes) < k_period:
             return 50.0, 50.0
-        
-        highest_high = max(highs[-k_period:])
-        lowest_low = min(lows[-k_period:])
-        
-        if highest_high == lowest_low:
-            k = 50.0
-        else:
-            k = ((closes[-1] - lowest_low) / (highest_high - lowest_low)) * 100
-        
-        d = k
-        return k, d
+        w = k_period + d_period - 1
+        k, d = stochastic_series(closes[-w:], highs[-w:], lows[-w:], k_period, d_period)
+        return k[-1], d[-1] if d[-1] is not None else k[-1]
     
     @staticmethod
     def calculate_cci(closes: List[float], highs: List[float], lows: List[float], period: int = 20) -> float:
-        """CCI 계산"""
+        """CCI 계산 (최근 period개 — indicator_engine.cci_series 마지막 값)"""
         if len(closes) < period:
             return 0
-        
-        tp_list = [(highs[i] + lows[i] + closes[i]) / 3 for i in range(len(closes))]
-        tp = tp_list[-1]
-        tp_sma = sum(tp_list[-period:]) / period
-        
-        mean_deviation = sum(abs(tp_list[i] - tp_sma) for i in range(-period, 0)) / period
-        
-        if mean_deviation == 0:
-            return 0
-        
-        cci = (tp - tp_sma) / (0.015 * mean_deviation)
-        return cci
+        return cci_series(closes[-period:], highs[-period:], lows[-period:], period)[-1]
     
     @staticmethod
     def calculate_williams_r(closes: List[float], highs: List[float], lows: List[float], period: int = 14) -> float:
-        """Williams %R 계산"""
+        """Williams %R 계산 (최근 period개 — indicator_engine.williams_r_series 마지막 값)"""
         if len(closes) < period:
             return -50.0
-        
-        highest_high = max(highs[-period:])
-        lowest_low = min(lows[-period:])
-        
-        if highest_high == lowest_low:
-            return -50.0
-        
-        willr = ((highest_high - closes[-1]) / (highest_high - lowest_low)) * -100
-        return willr
+        return williams_r_series(closes[-period:], highs[-period:], lows[-period:], period)[-1]
     
     @staticmethod
     def calculate_adx(closes: List[float], highs: List[float], lows: List[float], period: int = 14) -> tuple:
-        """ADX 계산"""
+        """ADX 계산 → (ADX, +DI, -DI) (최근 period+1개 — indicator_engine.adx_series 마지막 값)"""
         if len(closes) < period + 1:
             return 25.0, 25.0, 25.0
-        
-        plus_dm = []
-        minus_dm = []
-        tr_list = []
-        
-        for i in range(1, len(closes)):
-            high_diff = highs[i] - highs[i-1]
-            low_diff = lows[i-1] - lows[i]
-            
-            plus_dm.append(high_diff if high_diff > low_diff and high_diff > 0 else 0)
-            minus_dm.append(low_diff if low_diff > high_diff and low_diff > 0 else 0)
-            
-            tr = max(highs[i] - lows[i], abs(highs[i] - closes[i-1]), abs(lows[i] - closes[i-1]))
-            tr_list.append(tr)
-        
-        if len(tr_list) < period:
-            return 25.0, 25.0, 25.0
-        
-        atr = sum(tr_list[-period:]) / period
-        
-        if atr == 0:
-            return 25.0, 25.0, 25.0
-        
-        plus_di = (sum(plus_dm[-period:]) / period) / atr * 100
-        minus_di = (sum(minus_dm[-period:]) / period) / atr * 100
-        
-        dx = abs(plus_di - minus_di) / (plus_di + minus_di) * 100 if (plus_di + minus_di) > 0 else 0
-        adx = dx
-        
-        return adx, plus_di, minus_di
+        w = period + 1
+        return adx_series(closes[-w:], highs[-w:], lows[-w:], period)[-1]
+    
+    @staticmethod
+    def calculate_oscillators(candles: List[Dict], closes: List[float], highs: List[float], lows: List[float],
+                              cache_key: Optional[tuple] = None) -> Dict:
+        """RSI/Stochastic/CCI/W%R/ADX 마지막 값 — cache_key=(symbol, timeframe, count) 지정 시 마지막 캔들 time 기준 캐시
+        (형성 중 캔들만 바뀌면 O(1) 갱신)"""
+        times = [c["time"] for c in candles]
+        if cache_key is not None:
+            return oscillator_cache.get(cache_key, times, closes, highs, lows)
+        if not closes:
+            return {}
+        k, d = IndicatorService.calculate_stochastic(closes, highs, lows)
+        adx, plus_di, minus_di = IndicatorService.calculate_adx(closes, highs, lows)
+        return {
+            "rsi": IndicatorService.calculate_rsi(closes), "stoch_k": k, "stoch_d": d,
+            "cci": IndicatorService.calculate_cci(closes, highs, lows),
+            "williams_r": IndicatorService.calculate_williams_r(closes, highs, lows),
+            "adx": adx, "plus_di": plus_di, "minus_di": minus_di,
+        }
     
     @staticmethod
     def calculate_bollinger(closes: List[float], period: int = 20, std_dev: int = 2) -> tuple:
@@ -510,49 +444,30 @@ class IndicatorService:
     
     @staticmethod
     def calculate_chart_indicators(candles: List[Dict], closes: List[float], 
-                                   highs: List[float], lows: List[float]) -> Dict:
-        """차트용 인디케이터 계산"""
+                                   highs: List[float], lows: List[float],
+                                   cache_key: Optional[tuple] = None) -> Dict:
+        """차트용 인디케이터 계산 (BB 20/2 + LWMA 20, O(n) 롤링)
+        cache_key=(symbol, timeframe, count) 지정 시 마지막 캔들 time 기준 캐시 — 형성 중 캔들만 바뀐 경우 마지막 점만 재계산
+        """
         n = len(closes)
         if n < 20:
             return {}
-        
-        bb_period = 20
-        bb_std = 2
-        bb_upper = []
-        bb_middle = []
-        bb_lower = []
-        
-        for i in range(n):
-            if i < bb_period - 1:
-                bb_upper.append(None)
-                bb_middle.append(None)
-                bb_lower.append(None)
-            else:
-                window = closes[i - bb_period + 1:i + 1]
-                sma = sum(window) / bb_period
-                variance = sum((x - sma) ** 2 for x in window) / bb_period
-                std = variance ** 0.5
-                bb_middle.append({"time": candles[i]["time"], "value": sma})
-                bb_upper.append({"time": candles[i]["time"], "value": sma + bb_std * std})
-                bb_lower.append({"time": candles[i]["time"], "value": sma - bb_std * std})
-        
-        lwma_period = 20
-        lwma = []
-        for i in range(n):
-            if i < lwma_period - 1:
-                lwma.append(None)
-            else:
-                window = closes[i - lwma_period + 1:i + 1]
-                weights = list(range(1, lwma_period + 1))
-                weighted_sum = sum(w * c for w, c in zip(weights, window))
-                weight_total = sum(weights)
-                lwma.append({"time": candles[i]["time"], "value": weighted_sum / weight_total})
-        
+
+        times = [c["time"] for c in candles]
+        if cache_key is not None:
+            return chart_indicator_cache.get(cache_key, times, closes)
+
+        bb_upper, bb_middle, bb_lower = rolling_bollinger(closes, 20, 2)
+        lwma = rolling_lwma(closes, 20)
+
+        def _points(values):
+            return [{"time": t, "value": v} for t, v in zip(times, values) if v is not None]
+
         return {
-            "bb_upper": [x for x in bb_upper if x],
-            "bb_middle": [x for x in bb_middle if x],
-            "bb_lower": [x for x in bb_lower if x],
-            "lwma": [x for x in lwma if x]
+            "bb_upper": _points(bb_upper),
+            "bb_middle": _points(bb_middle),
+            "bb_lower": _points(bb_lower),
+            "lwma": _points(lwma)
         }
 
 
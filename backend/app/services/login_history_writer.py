@@ -0,0 +1,108 @@
+"""로그인 기록 백그라운드 저장
+- 기존: login 핸들러 안에서 UA 파싱 + IP 위치 조회(ip-api.com, 최대 3초) + INSERT → 느린 조회가 스레드풀 슬롯 점유
+- 변경: login은 submit()으로 큐에 넣고 바로 토큰 반환 (로그인 지연 = 비밀번호 해시 검증뿐)
+        워커 스레드 1개가 큐를 비우며 위치 조회 + 여러 건을 한 트랜잭션으로 INSERT
+- created_at은 로그인 시각으로 고정 (저장 지연과 무관)
+- 큐가 가득 차면 해당 기록만 버림 (로그인에는 영향 없음)
+"""
+import queue
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+# 대기 큐 최대 길이
+QUEUE_MAX = 10000
+# 한 번에 INSERT할 최대 건수
+BATCH_MAX = 100
+
+
+class LoginHistoryWriter:
+    """워커 프로세스당 1개 — 데몬 스레드가 지연 시작"""
+
+    def __init__(self):
+        self._queue: "queue.Queue[Dict]" = queue.Queue(maxsize=QUEUE_MAX)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.stats = {"queued": 0, "written": 0, "dropped": 0, "errors": 0}
+
+    def submit(self, user_id: int, ip: str, user_agent: str, session_id: str):
+        """로그인 핸들러에서 호출 — 블로킹 없음"""
+        self._ensure_thread()
+        job = {
+            "user_id": user_id,
+            "ip": ip,
+            "user_agent": user_agent,
+            "session_id": session_id,
+            "created_at": datetime.now(timezone.utc),
+        }
+        try:
+            self._queue.put_nowait(job)
+            self.stats["queued"] += 1
+        except queue.Full:
+            self.stats["dropped"] += 1
+            print(f"[LOGIN HISTORY] ⚠️ 큐 가득 참 — User {user_id} 기록 생략")
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="login-history-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            jobs = [self._queue.get()]
+            while len(jobs) < BATCH_MAX:
+                try:
+                    jobs.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(jobs)
+                self.stats["written"] += len(jobs)
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"[LOGIN HISTORY] 기록 저장 실패 ({len(jobs)}건): {e}")
+
+    @staticmethod
+    def _build(job: Dict):
+        from ..models.login_history import LoginHistory
+        from ..utils.ua_parser import parse_user_agent
+        from ..utils.ip_location import get_ip_location
+
+        ua_info = parse_user_agent(job["user_agent"])
+        # IP 위치 조회 (GeoIP DB / LRU 캐시)
+        loc_info = get_ip_location(job["ip"])
+        return LoginHistory(
+            user_id=job["user_id"],
+            ip_address=job["ip"],
+            user_agent=job["user_agent"],
+            browser=ua_info["browser"],
+            os_name=ua_info["os"],
+            device_type=ua_info["device_type"],
+            location=loc_info.get("location", ""),
+            country_code=loc_info.get("country_code", ""),
+            city=loc_info.get("city", ""),
+            session_id=job["session_id"],
+            created_at=job["created_at"],
+        )
+
+    def _write(self, jobs):
+        from ..database import SessionLocal
+        db = SessionLocal()
+        try:
+            db.add_all([self._build(job) for job in jobs])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def get_status(self) -> Dict:
+        return {"pending": self._queue.qsize(), **self.stats}
+
+
+# 워커 전역 인스턴스
+login_history_writer = LoginHistoryWriter()
@@ -0,0 +1,211 @@
+# app/services/market_calendar.py
+"""
+종목별 거래시간 캘린더 — symbol_config._MARKET_SCHEDULE 사전 컴파일
+
+기존: _is_market_open이 틱마다(심볼 × 틱 수)
+      - _get_mt5_offset: 3월/10월 마지막 일요일을 날짜 순회로 다시 계산
+      - "00:02-23:57,12:30-14:00" 스케줄 문자열 split/int 파싱
+변경: 시작 시 심볼별 1회 컴파일
+      - 세션 → MT5 서버시간 기준 주간 분(minute-of-week) 구간 배열 (정렬·병합, 일요일→월요일 연결 포함)
+      - 유럽 DST 전환 시각(UTC)을 연도별로 미리 계산
+      - 마지막 판정 결과 + "이 시각까지 유효" 경계 캐시 → 대부분의 틱은 정수 비교 1회
+      - next_open / next_close: UI 표시, 캔들 빌더용
+
+[시간] MT5 서버시간 = UTC+2 (겨울) / UTC+3 (여름, 3월 마지막 일요일 01:00 UTC ~ 10월 마지막 일요일 01:00 UTC)
+[세션] "HH:MM-HH:MM" — 마감 분 포함 (기존 open_min <= current_min <= close_min 과 동일)
+"""
+
+import bisect
+import calendar
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+WEEK_SEC = 7 * 86400
+# 1970-01-01(목) 기준 → 월요일 00:00 정렬 보정
+_MONDAY_SHIFT = 3 * 86400
+_DAY_KEYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+# 판정 경계 최대 길이 (초) — 스케줄 없는 심볼 등 경계가 무한일 때 재계산 주기
+_MAX_HOLD = 3600
+
+
+# ============================================================
+# DST (연도별 전환 시각 사전 계산)
+# ============================================================
+_dst_cache: Dict[int, Tuple[int, int]] = {}
+
+
+def _last_sunday(year: int, month: int) -> int:
+    last_day = calendar.monthrange(year, month)[1]
+    return last_day - (calendar.weekday(year, month, last_day) + 1) % 7
+
+
+def dst_bounds(year: int) -> Tuple[int, int]:
+    """(여름시간 시작, 종료) UTC epoch 초 — 3월/10월 마지막 일요일 01:00 UTC"""
+    bounds = _dst_cache.get(year)
+    if bounds is None:
+        start = calendar.timegm((year, 3, _last_sunday(year, 3), 1, 0, 0))
+        end = calendar.timegm((year, 10, _last_sunday(year, 10), 1, 0, 0))
+        bounds = _dst_cache[year] = (start, end)
+    return bounds
+
+
+def server_offset(ts: float) -> Tuple[int, int]:
+    """(MT5 서버 오프셋 초, 이 오프셋이 유지되는 마지막 시각 epoch 초)"""
+    year = time.gmtime(ts).tm_year
+    start, end = dst_bounds(year)
+    if ts < start:
+        return 2 * 3600, start
+    if ts < end:
+        return 3 * 3600, end
+    return 2 * 3600, dst_bounds(year + 1)[0]
+
+
+# ============================================================
+# 스케줄 컴파일
+# ============================================================
+def _parse_hm(text: str) -> Optional[int]:
+    parts = text.strip().split(":")
+    if len(parts) != 2:
+        return None
+    return int(parts[0]) * 60 + int(parts[1])
+
+
+def compile_schedule(schedule: Dict[str, str]) -> List[Tuple[int, int]]:
+    """요일별 세션 문자열 → 주간 초 구간 [(시작, 끝) ...] (끝 미포함, 정렬·병합)"""
+    raw = []
+    for day_index, day_key in enumerate(_DAY_KEYS):
+        day_hours = schedule.get(day_key)
+        if not day_hours:
+            continue
+        for session in day_hours.split(","):
+            parts = session.strip().split("-")
+            if len(parts) != 2:
+                continue
+            open_min = _parse_hm(parts[0])
+            close_min = _parse_hm(parts[1])
+            if open_min is None or close_min is None or open_min > close_min:
+                continue
+            base = day_index * 1440
+            # 마감 분 포함 → 다음 분 시작에서 닫힘
+            raw.append(((base + open_min) * 60, (base + close_min + 1) * 60))
+    raw.sort()
+
+    merged: List[Tuple[int, int]] = []
+    for start, end in raw:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class SessionCalendar:
+    """심볼 1개의 컴파일된 거래시간"""
+
+    __slots__ = ("intervals", "_starts", "_always_open", "_open", "_until")
+
+    def __init__(self, schedule: Optional[Dict[str, str]]):
+        self.intervals = compile_schedule(schedule) if schedule else []
+        self._starts = [s for s, _ in self.intervals]
+        # 스케줄 없음 = 항상 열림 (기존 동작), 주 전체를 덮는 경우도 동일
+        self._always_open = not schedule or self.intervals == [(0, WEEK_SEC)]
+        self._open = False
+        self._until = 0.0
+
+    def _locate(self, sow: int) -> Tuple[bool, int]:
+        """주간 초 → (열림 여부, 상태가 바뀌는 주간 초 — 주 경계를 넘으면 WEEK_SEC 이상)"""
+        intervals = self.intervals
+        if not intervals:
+            return False, sow + WEEK_SEC
+        i = bisect.bisect_right(self._starts, sow) - 1
+        if i >= 0 and sow < intervals[i][1]:
+            end = intervals[i][1]
+            # 일요일 마감 == 월요일 시작이면 다음 주로 이어짐
+            if end == WEEK_SEC and intervals[0][0] == 0:
+                end = WEEK_SEC + intervals[0][1]
+            return True, end
+        if i + 1 < len(intervals):
+            return False, intervals[i + 1][0]
+        return False, WEEK_SEC + intervals[0][0]
+
+    def state(self, ts: float) -> Tuple[bool, float]:
+        """(열림 여부, 상태 유지 마지막 시각 epoch 초)"""
+        if self._always_open:
+            return True, ts + _MAX_HOLD
+        offset, offset_until = server_offset(ts)
+        sow = int(ts + offset + _MONDAY_SHIFT) % WEEK_SEC
+        is_open, change = self._locate(sow)
+        until = ts - (ts + offset + _MONDAY_SHIFT) % WEEK_SEC + change
+        # DST 전환 시 서버시간이 1시간 이동 → 전환 시각에서 다시 계산
+        return is_open, min(until, offset_until)
+
+    def is_open(self, ts: Optional[float] = None) -> bool:
+        """틱 경로 — 캐시된 경계 전이면 비교 1회"""
+        if ts is None:
+            ts = time.time()
+        if ts < self._until:
+            return self._open
+        self._open, self._until = self.state(ts)
+        return self._open
+
+    def _next_change(self, ts: float, want_open: bool) -> Optional[float]:
+        # DST 경계에서 끊긴 구간을 건너뛰며 원하는 상태가 시작되는 시각 탐색 (최대 2주)
+        limit = ts + 2 * WEEK_SEC
+        while ts < limit:
+            is_open, until = self.state(ts)
+            if is_open == want_open:
+                return ts
+            ts = until
+        return None
+
+    def next_open(self, ts: Optional[float] = None) -> Optional[float]:
+        """다음 개장 시각 (지금 열려 있으면 지금) — 항상 닫힘이면 None"""
+        if self._always_open:
+            return ts if ts is not None else time.time()
+        return self._next_change(ts if ts is not None else time.time(), True)
+
+    def next_close(self, ts: Optional[float] = None) -> Optional[float]:
+        """다음 마감 시각 (지금 닫혀 있으면 지금) — 항상 열림이면 None"""
+        if self._always_open:
+            return None
+        return self._next_change(ts if ts is not None else time.time(), False)
+
+
+class MarketCalendar:
+    """전체 심볼 캘린더 (시작 시 1회 컴파일)"""
+
+    def __init__(self, schedules: Dict[str, Dict[str, str]]):
+        self._calendars = {sym: SessionCalendar(s) for sym, s in schedules.items()}
+        self._default = SessionCalendar(None)
+
+    def get(self, symbol: str) -> SessionCalendar:
+        return self._calendars.get(symbol, self._default)
+
+    def is_open(self, symbol: str, ts: Optional[float] = None) -> bool:
+        return self.get(symbol).is_open(ts)
+
+    def session_info(self, symbol: str, ts: Optional[float] = None) -> Dict:
+        """UI용 — 열림 여부 + 다음 개장/마감 (ISO UTC)"""
+        if ts is None:
+            ts = time.time()
+        cal = self.get(symbol)
+
+        def _iso(v):
+            return datetime.fromtimestamp(v, tz=timezone.utc).isoformat() if v is not None else None
+
+        is_open = cal.is_open(ts)
+        return {
+            "open": is_open,
+            "next_open": None if is_open else _iso(cal.next_open(ts)),
+            "next_close": _iso(cal.next_close(ts)) if is_open else None,
+        }
+
+
+def _build() -> MarketCalendar:
+    from ..symbol_config import _MARKET_SCHEDULE
+    return MarketCalendar(_MARKET_SCHEDULE)
+
+
+market_calendar = _build()
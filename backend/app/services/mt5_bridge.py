@@ -51,6 +51,7 @@ if MT5_AVAILABLE:
 
 INTERVAL = 0.5  # 시세 전송 주기 (초) - 실시간 업데이트용
 CANDLE_INTERVAL = 60  # 캔들 전송 주기 (초)
+ORDER_WAIT = 20  # 주문 롱폴링 대기 (초) - 서버가 주문 도착 시 즉시 응답
 
 def init_mt5():
     """MT5 초기화"""
@@ -198,11 +199,11 @@ def send_all_candles(symbol: str, count: int = 100):
 
 
 # ========== 주문 처리 함수들 ==========
-def fetch_pending_orders():
-    """서버에서 대기 중인 주문 가져오기"""
+def fetch_pending_orders(wait: float = 0):
+    """서버에서 대기 중인 주문 가져오기 (wait초 동안 서버에서 롱폴링)"""
     try:
         url = f"{SERVER_URL}/api/mt5/bridge/orders/pending"
-        response = requests.get(url, timeout=5)
+        response = requests.get(url, params={"wait": wait}, timeout=wait + 5)
         if response.status_code == 200:
             data = response.json()
             return data.get("orders", [])
@@ -318,9 +319,9 @@ def send_order_result(order_id: str, result: dict):
         return False
 
 
-def process_pending_orders():
+def process_pending_orders(wait: float = 0):
     """대기 중인 주문 처리"""
-    orders = fetch_pending_orders()
+    orders = fetch_pending_orders(wait)
 
     for order_data in orders:
         order_id = order_data.get("order_id")
@@ -340,6 +341,17 @@ def process_pending_orders():
         print(f"[Order] 완료: {order_id} - {result.get('success')} - {result.get('message')}")
 
 
+def order_thread_func(stop_event):
+    """별도 스레드: 주문 롱폴링 — 주문이 들어오면 즉시 반환, 없으면 ORDER_WAIT초 후 재요청"""
+    print(f"[Order Thread] 시작 (롱폴링 {ORDER_WAIT}초)")
+    while not stop_event.is_set():
+        try:
+            process_pending_orders(wait=ORDER_WAIT)
+        except Exception as e:
+            print(f"\n[Order Thread] 오류: {e}")
+            stop_event.wait(1)
+
+
 def candle_thread_func(stop_event):
     """별도 스레드: 캔들 데이터를 CANDLE_INTERVAL 초마다 전송"""
     print(f"[Candle Thread] 시작 (주기: {CANDLE_INTERVAL}초)")
@@ -391,6 +403,10 @@ def main():
     candle_thread = threading.Thread(target=candle_thread_func, args=(stop_event,), daemon=True)
     candle_thread.start()
 
+    # ★ 주문 처리 스레드 시작 (롱폴링 — 시세 루프와 분리)
+    order_thread = threading.Thread(target=order_thread_func, args=(stop_event,), daemon=True)
+    order_thread.start()
+
     print(f"\n실시간 시세 전송 시작 (주기: {INTERVAL}초)")
     print("-" * 50)
 
@@ -455,9 +471,6 @@ def main():
                 symbol_count = 0
                 print(f"\n[Batch] 전송 실패: {e}")
 
-            # ★ 주문 처리 (이건 별도 요청 필요)
-            process_pending_orders()
-
             # ★★★ 계정 검증 처리 (추가) ★★★
             if VERIFY_AVAILABLE:
                 process_pending_verifications()
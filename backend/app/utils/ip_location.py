@@ -1,10 +1,30 @@
-"""IP → 국가/도시 변환 (ip-api.com 무료 API)
-- 무료: 분당 45건 (로그인 시에만 호출하므로 충분)
+"""IP → 국가/도시 변환
+- 1순위: 로컬 GeoLite2-City DB (settings.GEOIP_DB_PATH, maxminddb MODE_MMAP — 네트워크 없음)
+- 2순위: ip-api.com 무료 API (DB 미설정 시, 분당 45건)
+- 조회 결과는 LRU 캐시 (같은 IP 재로그인 시 재조회 없음)
 - 응답: country, countryCode, city, regionName, timezone 등
 - 실패 시 빈 값 반환 (로그인에 영향 없음)
+★ 로그인 요청 경로에서는 호출하지 않음 — services/login_history_writer 백그라운드 스레드에서만 사용
 """
+import ipaddress
+import threading
+from collections import OrderedDict
+from typing import Optional
+
 import requests
 
+try:
+    import maxminddb
+    MAXMINDDB_AVAILABLE = True
+except ImportError:
+    maxminddb = None
+    MAXMINDDB_AVAILABLE = False
+
+from ..config import settings
+
+# LRU 캐시 크기 (IP 개수)
+LOOKUP_CACHE_SIZE = 4096
+
 # 국가코드 → 한국어 이름 매핑
 COUNTRY_NAMES = {
     'KR': '대한민국', 'US': '미국', 'JP': '일본', 'CN': '중국',
@@ -25,6 +45,99 @@ COUNTRY_TO_LANG = {
 }
 
 
+# CGNAT (100.64.0.0/10) — ipaddress.is_private에 포함되지 않음
+_CGNAT = ipaddress.ip_network('100.64.0.0/10')
+
+_reader = None
+_reader_failed = False
+_cache: "OrderedDict[str, dict]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _get_reader():
+    """GeoIP DB 리더 (지연 오픈, 1회) — 미설정/오류 시 None"""
+    global _reader, _reader_failed
+    if _reader is not None or _reader_failed:
+        return _reader
+    path = settings.GEOIP_DB_PATH
+    if not path or not MAXMINDDB_AVAILABLE:
+        _reader_failed = True
+        return None
+    try:
+        _reader = maxminddb.open_database(path, maxminddb.MODE_MMAP)
+        print(f"[IP-LOCATION] GeoIP DB 로드: {path}")
+    except Exception as e:
+        _reader_failed = True
+        print(f"[IP-LOCATION] GeoIP DB 열기 실패 ({path}): {e} — ip-api.com 사용")
+    return _reader
+
+
+def _empty_result() -> dict:
+    return {
+        "country": "", "country_code": "", "city": "",
+        "region": "", "location": "", "timezone": "", "lang": "en"
+    }
+
+
+def _fill(result: dict, cc: str, country: str, city: str, region: str, timezone: str):
+    result["country"] = country
+    result["country_code"] = cc
+    result["city"] = city
+    result["region"] = region
+    result["timezone"] = timezone
+
+    # 위치 문자열 조합
+    if city and country:
+        result["location"] = f"{city}, {country}"
+    elif country:
+        result["location"] = country
+
+    # 추천 언어
+    result["lang"] = COUNTRY_TO_LANG.get(cc, "en")
+
+
+def _lookup_db(reader, ip_address: str) -> dict:
+    """GeoLite2-City 레코드 → 결과 dict (레코드 없으면 빈 값)"""
+    result = _empty_result()
+    record = reader.get(ip_address) or {}
+    country = record.get("country") or record.get("registered_country") or {}
+    subdivisions = record.get("subdivisions") or [{}]
+    _fill(
+        result,
+        cc=country.get("iso_code", ""),
+        country=(country.get("names") or {}).get("en", ""),
+        city=((record.get("city") or {}).get("names") or {}).get("en", ""),
+        region=(subdivisions[0].get("names") or {}).get("en", ""),
+        timezone=(record.get("location") or {}).get("time_zone", ""),
+    )
+    return result
+
+
+def _lookup_api(ip_address: str) -> Optional[dict]:
+    """ip-api.com 조회 — 실패 시 None (캐시하지 않음)"""
+    try:
+        resp = requests.get(
+            f"http://ip-api.com/json/{ip_address}?fields=status,country,countryCode,regionName,city,timezone",
+            timeout=3
+        )
+        data = resp.json()
+    except Exception as e:
+        print(f"[IP-LOCATION] 조회 실패 ({ip_address}): {e}")
+        return None
+
+    result = _empty_result()
+    if data.get("status") == "success":
+        _fill(
+            result,
+            cc=data.get("countryCode", ""),
+            country=data.get("country", ""),
+            city=data.get("city", ""),
+            region=data.get("regionName", ""),
+            timezone=data.get("timezone", ""),
+        )
+    return result
+
+
 def get_ip_location(ip_address: str) -> dict:
     """IP 주소로 위치 정보 조회
     
@@ -39,56 +152,50 @@ def get_ip_location(ip_address: str) -> dict:
             "lang": "ko"
         }
     """
-    result = {
-        "country": "", "country_code": "", "city": "",
-        "region": "", "location": "", "timezone": "", "lang": "en"
-    }
+    result = _empty_result()
 
     # 로컬 IP는 조회 불가
-    if not ip_address or ip_address in ('127.0.0.1', 'localhost', '::1', 'unknown'):
+    if not ip_address or ip_address in ('localhost', 'unknown'):
+        result["location"] = "Local"
+        return result
+    try:
+        addr = ipaddress.ip_address(ip_address)
+    except ValueError:
+        return result
+    if addr.is_loopback:
         result["location"] = "Local"
         return result
 
-    # 사설 IP 체크
-    if ip_address.startswith(('10.', '172.16.', '172.17.', '172.18.', '172.19.',
-                               '172.20.', '172.21.', '172.22.', '172.23.',
-                               '172.24.', '172.25.', '172.26.', '172.27.',
-                               '172.28.', '172.29.', '172.30.', '172.31.',
-                               '192.168.')):
+    # 사설 IP 체크 (RFC 1918, CGNAT, 링크 로컬, IPv6 ULA 등)
+    if addr.is_private or addr.is_link_local or addr.is_reserved or addr in _CGNAT:
         result["location"] = "Private Network"
         return result
 
-    try:
-        resp = requests.get(
-            f"http://ip-api.com/json/{ip_address}?fields=status,country,countryCode,regionName,city,timezone",
-            timeout=3
-        )
-        data = resp.json()
+    key = addr.compressed
+    with _lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            return dict(cached)
 
-        if data.get("status") == "success":
-            cc = data.get("countryCode", "")
-            city = data.get("city", "")
-            country = data.get("country", "")
-            region = data.get("regionName", "")
-
-            result["country"] = country
-            result["country_code"] = cc
-            result["city"] = city
-            result["region"] = region
-            result["timezone"] = data.get("timezone", "")
-
-            # 위치 문자열 조합
-            if city and country:
-                result["location"] = f"{city}, {country}"
-            elif country:
-                result["location"] = country
-            
-            # 추천 언어
-            result["lang"] = COUNTRY_TO_LANG.get(cc, "en")
-
-            print(f"[IP-LOCATION] {ip_address} → {city}, {cc} (lang: {result['lang']})")
+    reader = _get_reader()
+    if reader is not None:
+        try:
+            found = _lookup_db(reader, key)
+        except Exception as e:
+            print(f"[IP-LOCATION] GeoIP DB 조회 실패 ({key}): {e}")
+            return result
+    else:
+        found = _lookup_api(key)
+        if found is None:
+            return result
 
-    except Exception as e:
-        print(f"[IP-LOCATION] 조회 실패 ({ip_address}): {e}")
+    if found["country_code"]:
+        print(f"[IP-LOCATION] {key} → {found['city']}, {found['country_code']} (lang: {found['lang']})")
 
-    return result
+    with _lock:
+        _cache[key] = found
+        _cache.move_to_end(key)
+        while len(_cache) > LOOKUP_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return dict(found)
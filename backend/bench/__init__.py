@@ -0,0 +1,16 @@
+"""
+Trading-X 실시간 스택 벤치마크 (오프라인)
+
+기존: 워커 1개가 /api/mt5/ws · /api/demo/ws 동시 접속을 몇 개까지 버티는지 재현할 방법 없음
+      (debug_ws_gauge.py / test_bridge.py 같은 단발 스크립트 — 실서버 + 실 MetaAPI 필요)
+변경: 실제 app.main을 로컬 DB + MetaAPI 대역으로 띄우고 부하를 걸어 수치 리포트
+  - stub_broker.py     MetaAPI 대역 — FakeRpc(유저 주문/청산/포지션) + TickReplayer(QuotePriceListener로 틱 재생)
+  - server.py          벤치 서버 — 유저/포지션 시드 + 대역 설치 + uvicorn 1 워커
+  - realtime_bench.py  드라이버 — 서버 기동, WS 클라이언트 N개, 주문/청산 버스트, 리포트 + 기준선 비교
+  - baselines/         체크인된 기준선 (--baseline으로 비교, --save-baseline으로 갱신)
+
+실행 (backend 디렉터리, 네트워크 불필요):
+  pip install -r bench/requirements.txt
+  python -m bench.realtime_bench --baseline bench/baselines/small.json
+  python -m bench.realtime_bench --baseline bench/baselines/burst10.json   # 동시 주문 20건 (동기 풀 5+10 초과)
+"""
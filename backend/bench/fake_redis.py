@@ -0,0 +1,33 @@
+"""
+벤치마크용 로컬 Redis 대역 — fakeredis TCP 서버 (127.0.0.1:6379, app.redis_client 고정 주소)
+
+Redis 없이 app을 띄우면 동기 클라이언트의 연결 재시도가 이벤트 루프를 막아 수치가 무의미해짐
+→ 드라이버가 별도 프로세스로 띄움 (서버 프로세스 CPU/RSS 측정에 섞이지 않게)
+실 Redis가 이미 떠 있으면 --redis external 로 그대로 사용 (db 0에 벤치 키가 쓰임 — 운영 Redis 금지)
+"""
+
+import argparse
+import socket
+
+
+def port_in_use(port: int, host: str = "127.0.0.1") -> bool:
+    with socket.socket() as s:
+        s.settimeout(0.5)
+        return s.connect_ex((host, port)) == 0
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="fakeredis TCP 서버 (벤치 전용)")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=6379)
+    args = p.parse_args(argv)
+
+    from fakeredis import TcpFakeServer
+    server = TcpFakeServer((args.host, args.port), server_type="redis")
+    server.daemon_threads = True
+    print(f"[FakeRedis] ✅ {args.host}:{args.port} 대기 중", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
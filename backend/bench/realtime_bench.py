@@ -0,0 +1,534 @@
+"""
+실시간 스택 부하/지연 벤치마크 드라이버
+
+  1. bench.server 서브프로세스 기동 (로컬 DB + MetaAPI 대역, uvicorn 1 워커) → /health + 첫 틱 대기
+  2. WS 클라이언트 N개 접속 (/api/demo/ws, /api/mt5/ws — 시드 유저 토큰, 포지션 분포는 server.POSITION_MIX)
+  2-1. 예열 버스트 (warm_bursts회, 결과 버림) — 비동기 풀 연결 생성·인증 캐시·첫 주문 경로를 측정 전에 데움
+  3. 측정 구간(duration) 동안 프레임 수신 + 주문/청산 버스트 (bursts회, 회당 burst_size 유저 동시)
+  4. 리포트 — 처리량, 지연 p50/p99, 서버 CPU · RSS (클라이언트당), 서버 단계별 지연(/debug/tick-trace)
+     버스트가 stall_sec 넘게 안 끝나면 서버에 SIGUSR1 → server.log에 전체 스레드 스택 (이벤트 루프가 어디서 막혔는지)
+  5. --baseline 비교 (허용 오차 초과 시 종료 코드 1) / --save-baseline 기록
+     --tolerance를 주고 기록하면 기준선에 같이 저장 → 비교 시 명령행 값이 없으면 기준선 값 (없으면 25%)
+
+[지연] 클라이언트 수신 시각 - tick_trace.recv_ts (같은 호스트 벽시계, 샘플 틱이 담긴 프레임만)
+[Redis] 기본은 fakeredis 별도 프로세스 (fake_redis.py) — 실 Redis보다 왕복이 느리고 같은 코어를 나눠 씀 (CPU 따로 보고)
+[버스트 크기] 데모/라이브 각 burst_size 동시 요청 (기본 10 — 합계 20으로 동기 풀 5+10보다 많게)
+             과거: 세션을 쥔 채 RPC를 await하는 주문 요청이 풀을 다 잡으면 get_current_user의 동기 풀 대기가
+             이벤트 루프를 막아 풀 타임아웃까지 워커 전체가 멈춤 → 비동기 인증 조회 + await 전 release_session으로 해소
+             baselines/burst10.json이 이 경로의 기준선 (정체 1회·주문 실패 1건도 회귀로 판정)
+             동시 20건이 1코어를 포화시켜 지연은 실행마다 2배 가까이 흔들림 → 허용 오차 200%로 기록 (지연은 3배 이상만)
+[예열] 예열 없이 재면 첫 버스트가 빈 비동기 풀(연결 생성)과 콜드 캐시를 떠안아 p50/p99가 실행마다 흔들림
+       → 측정 전 warm_bursts회 버스트를 돌리고 결과는 버림 (유저 추첨은 별도 시드 — 측정 버스트 유저는 그대로)
+[CPU/RSS] /proc/<서버 pid> — 측정 구간 CPU 시간 / 클라이언트 수 / 초, RSS 증가분 / 클라이언트 수
+          드라이버 자신의 CPU도 같이 보고 (같은 코어를 나눠 쓰면 서버 수치가 낮게/지연이 높게 나옴)
+
+실행 (backend 디렉터리):
+  python -m bench.realtime_bench --demo-clients 100 --live-clients 50 --duration 30
+  python -m bench.realtime_bench --baseline bench/baselines/small.json
+  python -m bench.realtime_bench --baseline bench/baselines/burst10.json
+  python -m bench.realtime_bench --ticks ticks.jsonl --save-baseline bench/baselines/recorded.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+
+DEFAULT_TOLERANCE = 0.25
+
+# 기준선 비교 지표 (경로, 좋은 방향, 절대 허용치) — 절대 허용치 이하 차이는 소음으로 무시
+# ★ p99 / 주문 지연은 표본이 적어(WS 꼬리, 주문 버스트 3×size건) 같은 코드 재실행에도 크게 흔들림
+#   → 절대 허용치를 반복 실행 편차 이상으로 (small.json 15회: 데모 주문 p50 169~523ms · p99 300~1069ms, WS p99 145~345ms)
+#   1코어 호스트(서버·드라이버·Redis 한 코어)에선 실행 단위로 주문 지연이 통째로 밀림 — 2배 미만 변화는 못 잡음
+#   풀/락 회귀(2~3배)와 정체·실패 건수가 감시 대상
+COMPARE_KEYS = (
+    ("ws.demo.frames_per_sec", "higher", 0.2),
+    ("ws.live.frames_per_sec", "higher", 0.2),
+    ("ws.demo.latency_p50_ms", "lower", 2.0),
+    ("ws.demo.latency_p99_ms", "lower", 150.0),
+    ("ws.live.latency_p50_ms", "lower", 2.0),
+    ("ws.live.latency_p99_ms", "lower", 150.0),
+    ("ws.demo.errors", "lower", 0),
+    ("ws.live.errors", "lower", 0),
+    ("orders.demo_order.p50_ms", "lower", 250.0),
+    ("orders.demo_order.p99_ms", "lower", 500.0),
+    ("orders.demo_close.p50_ms", "lower", 250.0),
+    ("orders.demo_close.p99_ms", "lower", 500.0),
+    ("orders.live_order.p50_ms", "lower", 250.0),
+    ("orders.live_order.p99_ms", "lower", 500.0),
+    ("orders.live_close.p50_ms", "lower", 250.0),
+    ("orders.live_close.p99_ms", "lower", 500.0),
+    ("orders.demo_order.fail", "lower", 0),
+    ("orders.demo_close.fail", "lower", 0),
+    ("orders.live_order.fail", "lower", 0),
+    ("orders.live_close.fail", "lower", 0),
+    ("server.stalls", "lower", 0),
+    ("server.cpu_ms_per_client_sec", "lower", 0.05),
+    ("server.rss_kb_per_client", "lower", 16.0),
+)
+
+
+def _pct(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    data = sorted(values)
+    return round(data[min(len(data) - 1, int(p * len(data)))], 2)
+
+
+def _latency_summary(values: List[float]) -> Dict:
+    return {"n": len(values), "p50_ms": _pct(values, 0.5), "p99_ms": _pct(values, 0.99),
+            "max_ms": round(max(values), 2) if values else None}
+
+
+# ========== 서버 프로세스 ==========
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _proc_sample(pid: int) -> Dict:
+    """/proc/<pid> — 누적 CPU 초(user+sys), RSS KB"""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / CLK_TCK
+    rss = 0
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                rss = int(line.split()[1])
+                break
+    return {"cpu": cpu, "rss_kb": rss, "at": time.monotonic()}
+
+
+def _driver_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _start_redis(args, workdir: str) -> Optional[subprocess.Popen]:
+    """--redis fake: fakeredis 별도 프로세스 (6379가 비어 있어야 함) / external: 이미 떠 있는 로컬 Redis"""
+    from bench.fake_redis import port_in_use
+    if args.redis == "external":
+        if not port_in_use(6379):
+            raise RuntimeError("--redis external 인데 127.0.0.1:6379 응답 없음")
+        print("[Bench] ⚠️ 로컬 Redis 사용 — db 0에 벤치 키가 쓰임 (운영 Redis 금지)")
+        return None
+    if port_in_use(6379):
+        raise RuntimeError("127.0.0.1:6379 사용 중 — 실 Redis면 --redis external (운영 Redis 금지)")
+    log = open(os.path.join(workdir, "redis.log"), "w")
+    proc = subprocess.Popen([sys.executable, "-m", "bench.fake_redis"], cwd=BACKEND_DIR, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + 15
+    while not port_in_use(6379):
+        if proc.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError("fakeredis 기동 실패 — redis.log 확인 (pip install -r bench/requirements.txt)")
+        time.sleep(0.1)
+    return proc
+
+
+def _stop(proc: Optional[subprocess.Popen]):
+    if proc is None:
+        return
+    proc.terminate()
+    try:
+        proc.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def _start_server(args, workdir: str, port: int) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "bench.server", "--workdir", workdir, "--port", str(port),
+           "--demo-users", str(max(args.demo_clients, args.burst_size)),
+           "--live-users", str(max(args.live_clients, args.burst_size)),
+           "--tick-rate", str(args.tick_rate), "--rpc-ms", str(args.rpc_ms), "--seed", str(args.seed)]
+    if args.db:
+        cmd += ["--db", args.db]
+    if args.ticks:
+        cmd += ["--ticks", os.path.abspath(args.ticks)]
+    log = open(os.path.join(workdir, "server.log"), "w")
+    return subprocess.Popen(cmd, cwd=BACKEND_DIR, stdout=log, stderr=subprocess.STDOUT)
+
+
+async def _wait_ready(http, base: str, proc: subprocess.Popen, timeout: float = 90.0):
+    """/health 응답 + 틱 재생 시작 (startup에서 2초 대기 후 대역 초기화)"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"벤치 서버 종료됨 (code={proc.returncode}) — server.log 확인")
+        try:
+            resp = await http.get(f"{base}/api/bench/status")
+            if resp.status_code == 200 and resp.json()["replayer"]["ticks"] > 0:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError("벤치 서버 준비 타임아웃")
+
+
+# ========== WS 클라이언트 ==========
+class WsClient:
+    """소켓 1개 — 프레임 수/바이트 + tick_trace 프레임 지연 (파싱은 tick_trace 프레임만)"""
+
+    def __init__(self, mode: str, url: str):
+        self.mode = mode
+        self.url = url
+        self.connect_ms: Optional[float] = None
+        self.frames = 0
+        self.bytes = 0
+        self.latency: List[float] = []
+        self.error: Optional[str] = None
+        self.measuring = False
+
+    async def run(self, stop: asyncio.Event):
+        import websockets
+        started = time.perf_counter()
+        try:
+            async with websockets.connect(self.url, max_size=None, open_timeout=30, ping_interval=None) as ws:
+                self.connect_ms = (time.perf_counter() - started) * 1000
+                while not stop.is_set():
+                    try:
+                        msg = await asyncio.wait_for(ws.recv(), timeout=1.0)
+                    except asyncio.TimeoutError:
+                        continue
+                    received_at = time.time()
+                    if not self.measuring:
+                        continue
+                    self.frames += 1
+                    self.bytes += len(msg)
+                    if '"tick_trace"' in msg:
+                        trace = json.loads(msg).get("tick_trace") or {}
+                        if trace.get("recv_ts"):
+                            self.latency.append((received_at - trace["recv_ts"]) * 1000)
+        except Exception as e:
+            if not stop.is_set():
+                self.error = f"{type(e).__name__}: {e}"[:120]
+
+
+def _ws_summary(clients: List[WsClient], seconds: float) -> Dict:
+    if not clients:
+        return {"clients": 0}
+    connected = [c for c in clients if c.connect_ms is not None]
+    latency = [v for c in clients for v in c.latency]
+    frames = sum(c.frames for c in clients)
+    return {
+        "clients": len(clients),
+        "connected": len(connected),
+        "errors": sum(1 for c in clients if c.error),
+        "connect_p50_ms": _pct([c.connect_ms for c in connected], 0.5),
+        "connect_p99_ms": _pct([c.connect_ms for c in connected], 0.99),
+        "frames_total": frames,
+        "frames_per_sec": round(frames / len(clients) / seconds, 2),
+        "kb_per_sec": round(sum(c.bytes for c in clients) / len(clients) / seconds / 1024, 2),
+        "latency_n": len(latency),
+        "latency_p50_ms": _pct(latency, 0.5),
+        "latency_p99_ms": _pct(latency, 0.99),
+        "latency_max_ms": round(max(latency), 2) if latency else None,
+        "error_samples": sorted({c.error for c in clients if c.error})[:3],
+    }
+
+
+# ========== 주문/청산 버스트 ==========
+async def _timed(http, results: Dict, key: str, url: str, token: str, params: Dict) -> Dict:
+    started = time.perf_counter()
+    try:
+        resp = await http.post(url, params=params, headers={"Authorization": f"Bearer {token}"})
+        body = resp.json() if resp.headers.get("content-type", "").startswith("application/json") else {}
+        ok = resp.status_code == 200 and bool(body.get("success"))
+    except Exception as e:
+        body, ok = {"error": f"{type(e).__name__}: {e}"}, False
+    entry = results.setdefault(key, {"ms": [], "ok": 0, "fail": 0, "fail_samples": []})
+    entry["ms"].append((time.perf_counter() - started) * 1000)
+    if ok:
+        entry["ok"] += 1
+    else:
+        entry["fail"] += 1
+        if len(entry["fail_samples"]) < 3:
+            entry["fail_samples"].append(str(body.get("message") or body.get("detail") or body.get("error") or body)[:120])
+    return body
+
+
+async def _demo_round_trip(http, base: str, token: str, results: Dict):
+    body = await _timed(http, results, "demo_order", f"{base}/api/demo/order", token,
+                        {"symbol": "BTCUSD", "order_type": "BUY", "volume": 0.01, "target": 50, "magic": 100004})
+    if body.get("position_id"):
+        await _timed(http, results, "demo_close", f"{base}/api/demo/close", token, {"ticket": body["position_id"]})
+
+
+async def _live_round_trip(http, base: str, token: str, results: Dict):
+    # Chart 매직(100004) — 같은 종목 중복 진입 허용 (시드 포지션과 충돌 없음)
+    body = await _timed(http, results, "live_order", f"{base}/api/mt5/order", token,
+                        {"symbol": "BTCUSD", "order_type": "BUY", "volume": 0.01, "target": 50, "magic": 100004})
+    if body.get("positionId"):
+        await _timed(http, results, "live_close", f"{base}/api/mt5/close", token,
+                     {"symbol": "BTCUSD", "magic": 100004, "position_id": body["positionId"]})
+
+
+async def _burst(http, base: str, tokens: Dict, size: int, rng: random.Random, results: Dict):
+    """데모/라이브 각 size명 동시 주문 → 체결된 건 즉시 청산"""
+    demo = rng.sample(tokens["demo"], min(size, len(tokens["demo"])))
+    live = rng.sample(tokens["live"], min(size, len(tokens["live"])))
+    await asyncio.gather(*[_demo_round_trip(http, base, t["token"], results) for t in demo],
+                         *[_live_round_trip(http, base, t["token"], results) for t in live])
+
+
+def _orders_summary(results: Dict) -> Dict:
+    out = {}
+    for key in ("demo_order", "demo_close", "live_order", "live_close"):
+        entry = results.get(key)
+        if not entry:
+            continue
+        out[key] = {"ok": entry["ok"], "fail": entry["fail"], **_latency_summary(entry["ms"]),
+                    "fail_samples": entry["fail_samples"]}
+        del out[key]["n"]
+    return out
+
+
+# ========== 실행 ==========
+async def run_bench(args) -> Dict:
+    import httpx
+
+    workdir = tempfile.mkdtemp(prefix="tradingx-bench-")
+    port = args.port or _free_port()
+    base = f"http://127.0.0.1:{port}"
+    redis_proc = proc = None
+    rng = random.Random(args.seed)
+    try:
+        redis_proc = _start_redis(args, workdir)
+        proc = _start_server(args, workdir, port)
+        async with httpx.AsyncClient(timeout=60, limits=httpx.Limits(max_connections=args.burst_size * 2 + 8)) as http:
+            await _wait_ready(http, base, proc)
+            with open(os.path.join(workdir, "tokens.json"), encoding="utf-8") as f:
+                tokens = json.load(f)
+            idle = _proc_sample(proc.pid)
+
+            # 1. 접속 — 동시 접속 폭주 대신 소폭 분산 (실서비스 재접속 패턴)
+            stop = asyncio.Event()
+            clients = [WsClient("demo", f"ws://127.0.0.1:{port}/api/demo/ws?token={t['token']}&magic=100001")
+                       for t in tokens["demo"][:args.demo_clients]]
+            clients += [WsClient("live", f"ws://127.0.0.1:{port}/api/mt5/ws?token={t['token']}&magic=100001")
+                        for t in tokens["live"][:args.live_clients]]
+            rng.shuffle(clients)
+            tasks = []
+            for i, client in enumerate(clients):
+                tasks.append(asyncio.create_task(client.run(stop)))
+                if i % 20 == 19:
+                    await asyncio.sleep(0.05)
+            await asyncio.sleep(args.warmup)
+            # ★ 예열 버스트 — 결과는 버림 (측정 구간 추첨 rng와 분리)
+            warm_rng = random.Random(args.seed + 1)
+            for _ in range(args.warm_bursts):
+                await _burst(http, base, tokens, args.burst_size, warm_rng, {})
+            connected = _proc_sample(proc.pid)
+
+            # 2. 측정 구간 — 프레임 수신 + 주문/청산 버스트
+            status_before = (await http.get(f"{base}/api/bench/status")).json()
+            for client in clients:
+                client.measuring = True
+            driver_cpu = _driver_cpu()
+            redis_before = _proc_sample(redis_proc.pid) if redis_proc else None
+            started = time.monotonic()
+            peak_rss = connected["rss_kb"]
+            order_results: Dict = {}
+            burst_at = [started + args.duration * (i + 1) / (args.bursts + 1) for i in range(args.bursts)]
+            bursts: List[Dict] = []   # {"task", "at", "dumped"}
+            stalls = 0
+            while time.monotonic() - started < args.duration or any(not b["task"].done() for b in bursts):
+                now = time.monotonic()
+                if burst_at and now >= burst_at[0]:
+                    burst_at.pop(0)
+                    bursts.append({"task": asyncio.create_task(_burst(http, base, tokens, args.burst_size, rng, order_results)),
+                                   "at": now, "dumped": False})
+                # ★ 버스트가 stall_sec 넘게 안 끝나면 서버 스택 1회 덤프 (server.log — faulthandler)
+                for b in bursts:
+                    if not b["task"].done() and not b["dumped"] and now - b["at"] > args.stall_sec:
+                        b["dumped"] = True
+                        stalls += 1
+                        os.kill(proc.pid, signal.SIGUSR1)
+                        print(f"[Bench] ⚠️ 버스트 {args.stall_sec:.0f}초 초과 — 서버 스택 덤프 (server.log)")
+                peak_rss = max(peak_rss, _proc_sample(proc.pid)["rss_kb"])
+                await asyncio.sleep(0.25)
+            seconds = time.monotonic() - started
+            end = _proc_sample(proc.pid)
+            redis_after = _proc_sample(redis_proc.pid) if redis_proc else None
+            driver_cpu = _driver_cpu() - driver_cpu
+            for client in clients:
+                client.measuring = False
+
+            status_after = (await http.get(f"{base}/api/bench/status")).json()
+            stages = (await http.get(f"{base}/debug/tick-trace", params={"spans": 0})).json().get("stages", {})
+            stop.set()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        _stop(proc)
+        _stop(redis_proc)
+        if args.keep_workdir:
+            print(f"[Bench] 작업 디렉터리 유지: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    n_clients = max(1, len(clients))
+    server_cpu = end["cpu"] - connected["cpu"]
+    ticks = status_after["replayer"]["ticks"] - status_before["replayer"]["ticks"]
+    return {
+        "config": {key: getattr(args, key) for key in ("demo_clients", "live_clients", "duration", "tick_rate",
+                                                         "ticks", "rpc_ms", "bursts", "burst_size", "warm_bursts", "seed")},
+        "host": {"cpus": os.cpu_count(), "python": platform.python_version(), "machine": platform.machine(),
+                 "db": (args.db or "sqlite").split("://")[0], "redis": args.redis, "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S")},
+        "ws": {"demo": _ws_summary([c for c in clients if c.mode == "demo"], seconds),
+               "live": _ws_summary([c for c in clients if c.mode == "live"], seconds)},
+        "orders": _orders_summary(order_results),
+        "server": {
+            "ticks_per_sec": round(ticks / seconds, 1),
+            "replay_behind_max_ms": status_after["replayer"]["behind_max_ms"],
+            "cpu_percent": round(server_cpu / seconds * 100, 1),
+            "cpu_ms_per_client_sec": round(server_cpu * 1000 / n_clients / seconds, 3),
+            "rss_mb_idle": round(idle["rss_kb"] / 1024, 1),
+            "rss_mb_peak": round(peak_rss / 1024, 1),
+            "rss_kb_per_client": round((connected["rss_kb"] - idle["rss_kb"]) / n_clients, 1),
+            "stalls": stalls,
+            "rpc_calls": status_after["rpc_calls"],
+        },
+        "driver": {"cpu_percent": round(driver_cpu / seconds * 100, 1),
+                   "fake_redis_cpu_percent": round((redis_after["cpu"] - redis_before["cpu"]) / seconds * 100, 1)
+                   if redis_proc else None},
+        "stages": {stage: {"p50_ms": s["p50_ms"], "p99_ms": s["p99_ms"]} for stage, s in stages.items() if s},
+    }
+
+
+# ========== 리포트 / 기준선 ==========
+def _get(report: Dict, path: str):
+    node = report
+    for part in path.split("."):
+        if not isinstance(node, dict) or part not in node:
+            return None
+        node = node[part]
+    return node
+
+
+def print_report(report: Dict):
+    cfg = report["config"]
+    print("=" * 78)
+    print(f"Trading-X 실시간 벤치 — 데모 {cfg['demo_clients']} + 라이브 {cfg['live_clients']} 소켓, "
+          f"{cfg['duration']}초, 틱 {cfg['tick_rate']}/s, RPC {cfg['rpc_ms']}ms")
+    print("=" * 78)
+    for mode, ws in report["ws"].items():
+        if not ws.get("clients"):
+            continue
+        print(f"[WS {mode:<4}] 접속 {ws['connected']}/{ws['clients']} (오류 {ws['errors']})  "
+              f"프레임 {ws['frames_per_sec']}/s·소켓  {ws['kb_per_sec']}KB/s·소켓  "
+              f"지연 p50={ws['latency_p50_ms']}ms p99={ws['latency_p99_ms']}ms (n={ws['latency_n']})")
+        for sample in ws["error_samples"]:
+            print(f"           ⚠️ {sample}")
+    for key, o in report["orders"].items():
+        print(f"[{key:<10}] 성공 {o['ok']} 실패 {o['fail']}  p50={o['p50_ms']}ms p99={o['p99_ms']}ms max={o['max_ms']}ms")
+        for sample in o["fail_samples"]:
+            print(f"             ⚠️ {sample}")
+    s = report["server"]
+    print(f"[서버] CPU {s['cpu_percent']}% ({s['cpu_ms_per_client_sec']}ms/소켓·초)  "
+          f"RSS 유휴 {s['rss_mb_idle']}MB → 최대 {s['rss_mb_peak']}MB ({s['rss_kb_per_client']}KB/소켓)  "
+          f"틱 {s['ticks_per_sec']}/s (재생 밀림 최대 {s['replay_behind_max_ms']}ms)")
+    d = report["driver"]
+    print(f"[드라이버] CPU {d['cpu_percent']}%"
+          + (f" + fakeredis {d['fake_redis_cpu_percent']}%" if d.get("fake_redis_cpu_percent") is not None else "")
+          + " (서버와 같은 코어를 쓰면 수치 왜곡)")
+    if s["stalls"]:
+        print(f"[서버] ⚠️ 버스트 정체 {s['stalls']}회 — server.log 스택 덤프 확인 (--keep-workdir)")
+    if report["stages"]:
+        print("[서버 단계] " + "  ".join(f"{k}={v['p50_ms']}/{v['p99_ms']}" for k, v in report["stages"].items())
+              + "  (p50/p99 ms)")
+
+
+def compare_baseline(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """허용 오차(비율) + 절대 허용치 둘 다 넘은 악화만 회귀로 판정"""
+    if baseline.get("config") != report["config"]:
+        print("[Bench] ⚠️ 기준선과 설정이 다름 — 비교 결과는 참고용")
+    if baseline.get("host", {}).get("cpus") != report["host"]["cpus"]:
+        print(f"[Bench] ⚠️ 기준선 CPU 수({baseline.get('host', {}).get('cpus')}) ≠ 현재({report['host']['cpus']})")
+    regressions = []
+    for path, better, slack in COMPARE_KEYS:
+        old, new = _get(baseline, path), _get(report, path)
+        if old is None or new is None:
+            continue
+        worse = (new - old) if better == "lower" else (old - new)
+        if worse > slack and worse > abs(old) * tolerance:
+            regressions.append(f"{path}: {old} → {new}")
+    return regressions
+
+
+def _parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Trading-X 실시간 스택 부하/지연 벤치마크 (오프라인)")
+    p.add_argument("--demo-clients", type=int, default=50)
+    p.add_argument("--live-clients", type=int, default=50)
+    p.add_argument("--duration", type=float, default=20.0, help="측정 구간 (초)")
+    p.add_argument("--warmup", type=float, default=3.0, help="접속 후 측정 전 대기 (초)")
+    p.add_argument("--tick-rate", type=float, default=50.0, help="초당 틱 (전체 심볼 합)")
+    p.add_argument("--ticks", default="", help="녹화 틱 JSONL ({symbol,bid,ask,time} 한 줄씩)")
+    p.add_argument("--rpc-ms", type=float, default=80.0, help="MetaAPI 대역 RPC 평균 지연 (ms)")
+    p.add_argument("--bursts", type=int, default=3, help="측정 구간 중 주문/청산 버스트 횟수")
+    p.add_argument("--burst-size", type=int, default=10, help="버스트당 동시 주문 유저 수 (데모/라이브 각각)")
+    p.add_argument("--warm-bursts", type=int, default=1, help="측정 전 예열 버스트 횟수 (결과 제외)")
+    p.add_argument("--stall-sec", type=float, default=10.0, help="버스트가 이 시간 넘게 안 끝나면 서버 스택 덤프")
+    p.add_argument("--db", default="", help="DATABASE_URL (기본: 임시 SQLite, 빈 DB만 허용)")
+    p.add_argument("--redis", choices=("fake", "external"), default="fake",
+                   help="fake: fakeredis 별도 프로세스 / external: 이미 떠 있는 로컬 Redis")
+    p.add_argument("--port", type=int, default=0)
+    p.add_argument("--seed", type=int, default=7)
+    p.add_argument("--json", default="", help="리포트 JSON 저장 경로")
+    p.add_argument("--baseline", default="", help="비교할 기준선 JSON (설정도 기준선 값을 사용)")
+    p.add_argument("--save-baseline", default="", help="이번 결과를 기준선으로 저장")
+    p.add_argument("--tolerance", type=float, default=None,
+                   help=f"기준선 대비 허용 악화 비율 (기본: 기준선에 기록된 값, 없으면 {DEFAULT_TOLERANCE})")
+    p.add_argument("--keep-workdir", action="store_true", help="DB/토큰/server.log 유지")
+    return p.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        # 기준선과 같은 조건으로 측정 (명령행 값보다 우선)
+        for key, value in baseline.get("config", {}).items():
+            setattr(args, key, value)
+
+    report = asyncio.run(run_bench(args))
+    print_report(report)
+    if args.tolerance is not None:
+        report["tolerance"] = args.tolerance
+
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+                f.write("\n")
+            print(f"[Bench] 저장: {path}")
+
+    if baseline is not None:
+        tolerance = args.tolerance if args.tolerance is not None else baseline.get("tolerance", DEFAULT_TOLERANCE)
+        regressions = compare_baseline(report, baseline, tolerance)
+        if regressions:
+            print(f"[Bench] ❌ 기준선 대비 회귀 {len(regressions)}건 (허용 {tolerance:.0%}):")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print(f"[Bench] ✅ 기준선 이내 (허용 {tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
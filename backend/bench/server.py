@@ -0,0 +1,173 @@
+"""
+벤치마크 서버 — 실제 app.main을 로컬 DB + MetaAPI 대역으로 기동 (uvicorn 1 워커 = 측정 단위)
+
+  1. 환경변수 고정 (DATABASE_URL은 --db 또는 작업 디렉터리의 SQLite — 셸의 운영 DB 설정을 절대 쓰지 않음)
+  2. 빈 DB에 테이블 생성 + 데모/라이브 유저 · 포지션 시드 (포지션 수는 POSITION_MIX 분포)
+  3. 토큰 파일 기록 → 드라이버(realtime_bench.py)가 WS/주문 요청에 사용
+  4. stub_broker.install() → startup_metaapi 대체, 라이브 유저 RPC 풀 사전 적재
+  5. GET /api/bench/status (재생기/대역 RPC 호출 수) 추가 후 uvicorn 실행
+  SIGUSR1 → 전체 스레드 스택 덤프 (faulthandler)
+
+단독 실행 (backend 디렉터리):
+  python -m bench.server --workdir /tmp/tx-bench --demo-users 50 --live-users 50 --port 8100
+"""
+
+import argparse
+import faulthandler
+import json
+import os
+import random
+import signal
+import sys
+from datetime import timedelta
+
+# 유저당 열린 포지션 수 분포 (개수, 가중치) — 대부분 0~1개, 일부 마틴/차트 다중 진입
+POSITION_MIX = ((0, 35), (1, 35), (2, 15), (3, 8), (5, 5), (10, 2))
+# 포지션 심볼 분포 (심볼, 가중치) — 크립토/골드 위주
+SYMBOL_MIX = (("BTCUSD", 45), ("XAUUSD.r", 20), ("ETHUSD", 10), ("EURUSD.r", 8), ("US100.", 7),
+              ("USDJPY.r", 5), ("GBPUSD.r", 5))
+# 매직 분포 — Buy/Sell, Quick&Easy, Chart
+MAGIC_MIX = ((100001, 60), (100003, 25), (100004, 15))
+
+
+def _pick(rng: random.Random, mix):
+    values, weights = zip(*mix)
+    return rng.choices(values, weights=weights)[0]
+
+
+def _parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Trading-X 벤치마크 서버")
+    p.add_argument("--workdir", required=True, help="DB/토큰/로그 작업 디렉터리")
+    p.add_argument("--db", default="", help="DATABASE_URL (기본: workdir/bench.db SQLite, WAL) — 빈 DB만 허용")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8100)
+    p.add_argument("--demo-users", type=int, default=50)
+    p.add_argument("--live-users", type=int, default=50)
+    p.add_argument("--tick-rate", type=float, default=50.0, help="초당 틱 (전체 심볼 합)")
+    p.add_argument("--ticks", default="", help="녹화 틱 JSONL (없으면 합성 랜덤워크)")
+    p.add_argument("--tick-speed", type=float, default=1.0, help="녹화 틱 배속")
+    p.add_argument("--rpc-ms", type=float, default=80.0, help="대역 RPC 평균 지연 (ms)")
+    p.add_argument("--rpc-jitter-ms", type=float, default=30.0)
+    p.add_argument("--seed", type=int, default=7)
+    return p.parse_args(argv)
+
+
+def _prepare_env(args) -> str:
+    """app import 전에 호출 — 설정은 import 시점에 고정됨"""
+    os.makedirs(args.workdir, exist_ok=True)
+    db_url = args.db or "sqlite:///" + os.path.join(os.path.abspath(args.workdir), "bench.db")
+    os.environ["DATABASE_URL"] = db_url
+    os.environ.setdefault("SECRET_KEY", "bench-secret-key")
+    os.environ["MARKET_DATA_MODE"] = "local"
+    os.environ["MT5_ENABLED"] = "false"
+    return db_url
+
+
+def _seed(args, rng: random.Random):
+    """빈 DB에 유저/포지션 시드 → (토큰 dict, 라이브 계정 목록)"""
+    from app.database import Base, engine, SessionLocal
+    from app.models import User, DemoPosition
+    from app.utils.security import create_access_token
+    from bench.stub_broker import BASE_PRICES, make_position
+
+    Base.metadata.create_all(bind=engine)
+    if engine.dialect.name == "sqlite":
+        # WAL은 DB 파일 속성 (이후 모든 연결에 유지) — 읽기가 쓰기 잠금에 막히지 않게 (Postgres MVCC에 가깝게)
+        with engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+    db = SessionLocal()
+    try:
+        if db.query(User).count():
+            raise SystemExit("[Bench] ❌ users 테이블이 비어 있지 않음 — 벤치는 빈 DB에서만 실행")
+
+        users = []
+        for i in range(args.demo_users):
+            users.append(User(email=f"bench-demo-{i}@bench.local", password_hash="-", name=f"demo{i}",
+                              demo_account_number=f"D-9{i:07d}", demo_balance=10000.0, demo_equity=10000.0))
+        for i in range(args.live_users):
+            users.append(User(email=f"bench-live-{i}@bench.local", password_hash="-", name=f"live{i}",
+                              has_mt5_account=True, mt5_account_number=str(90_000_000 + i), mt5_server="Bench-MT5",
+                              mt5_balance=10000.0, mt5_equity=10000.0, mt5_margin=0.0, mt5_free_margin=10000.0,
+                              mt5_profit=0.0, mt5_leverage=500, mt5_currency="USD",
+                              metaapi_account_id=f"bench-{i:08d}-0000-0000-0000-000000000000", metaapi_status="deployed"))
+        db.add_all(users)
+        db.commit()
+
+        tokens = {"demo": [], "live": []}
+        live_accounts = []
+        demo_rows = 0
+        expires = timedelta(hours=12)
+        for user in users:
+            mode = "live" if user.metaapi_status == "deployed" else "demo"
+            tokens[mode].append({"user_id": user.id, "token": create_access_token({"sub": str(user.id)}, expires)})
+            count = _pick(rng, POSITION_MIX)
+            specs = [(_pick(rng, SYMBOL_MIX), rng.random() < 0.5, _pick(rng, MAGIC_MIX)) for _ in range(count)]
+            if mode == "demo":
+                for symbol, is_buy, magic in specs:
+                    price = BASE_PRICES[symbol]
+                    # TP/SL ±1.5% — 합성 시세에서 가끔 도달 (매칭 엔진 청산 경로도 부하에 포함)
+                    band = price * 0.015
+                    db.add(DemoPosition(user_id=user.id, symbol=symbol, trade_type="BUY" if is_buy else "SELL",
+                                        volume=0.01, entry_price=price, target_profit=100.0, magic=magic,
+                                        tp_price=price + band if is_buy else price - band,
+                                        sl_price=price - band if is_buy else price + band))
+                    demo_rows += 1
+            else:
+                live_accounts.append({
+                    "user_id": user.id, "account_id": user.metaapi_account_id,
+                    "login": int(user.mt5_account_number),
+                    "positions": [make_position(symbol, is_buy, 0.01, BASE_PRICES[symbol], magic)
+                                  for symbol, is_buy, magic in specs],
+                })
+        db.commit()
+    finally:
+        db.close()
+
+    live_rows = sum(len(acc["positions"]) for acc in live_accounts)
+    print(f"[Bench] 시드 완료 — 데모 {args.demo_users}명/포지션 {demo_rows}개, 라이브 {args.live_users}명/포지션 {live_rows}개")
+    return tokens, live_accounts
+
+
+def _add_status_route(app, replayer, rpcs):
+    """정적 마운트("/")보다 앞에 등록해야 가려지지 않음"""
+    async def bench_status():
+        calls = {}
+        for rpc in rpcs.values():
+            for call, n in rpc.calls.items():
+                calls[call] = calls.get(call, 0) + n
+        return {"pid": os.getpid(), "replayer": replayer.get_status(), "rpc_calls": calls}
+
+    app.add_api_route("/api/bench/status", bench_status, methods=["GET"])
+    app.router.routes.insert(0, app.router.routes.pop())
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    # 드라이버가 정체 감지 시 SIGUSR1 → 전체 스레드 스택을 로그로 (이벤트 루프를 막은 동기 호출 확인용)
+    faulthandler.register(signal.SIGUSR1, all_threads=True)
+    db_url = _prepare_env(args)
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+
+    # 벤치 패키지는 backend 디렉터리 기준 (python -m bench.server)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    tokens, live_accounts = _seed(args, rng)
+    tokens_path = os.path.join(args.workdir, "tokens.json")
+    with open(tokens_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(tokens, f)
+    os.replace(tokens_path + ".tmp", tokens_path)
+
+    from bench.stub_broker import TickReplayer, install
+    replayer = TickReplayer(rate=args.tick_rate, path=args.ticks or None, speed=args.tick_speed, seed=args.seed)
+    rpcs = install(replayer, live_accounts, args.rpc_ms / 1000, args.rpc_jitter_ms / 1000)
+
+    import uvicorn
+    from app.main import app
+    _add_status_route(app, replayer, rpcs)
+    print(f"[Bench] 서버 시작 — {args.host}:{args.port} (DB: {db_url.split('://')[0]})")
+    uvicorn.run(app, host=args.host, port=args.port, workers=1, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
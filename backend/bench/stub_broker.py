@@ -0,0 +1,245 @@
+"""
+벤치마크용 MetaAPI 대역 — 네트워크 없이 시세 수신 · 유저 주문/청산 경로 재현
+
+  - FakeRpc       유저 RPC 연결 대역 (주문/청산/포지션/계정 — 메모리, 호출마다 지연 주입)
+  - TickReplayer  QuotePriceListener.on_symbol_price_updated 로 틱 재생 (합성 랜덤워크 또는 JSONL 녹화본)
+  - install()     startup_metaapi 대체 + 유저 연결 풀(user_trade_connections) 사전 적재
+
+콜백 이후(캔들 갱신 → 데모 매칭 → market_hub → WS 루프)와 주문 라우트는 실제 코드 그대로 실행
+app을 import하는 함수는 전부 지연 import (server.py가 환경변수 설정 후 호출)
+"""
+
+import asyncio
+import itertools
+import json
+import random
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+# 합성 시세 시작가 (대략적인 수준만 맞춤 — 절대값은 벤치 결과에 영향 없음)
+BASE_PRICES = {
+    "BTCUSD": 68000.0, "ETHUSD": 3500.0,
+    "EURUSD.r": 1.0850, "USDJPY.r": 151.20, "GBPUSD.r": 1.2700, "AUDUSD.r": 0.6600, "USDCAD.r": 1.3600,
+    "XAUUSD.r": 2350.0, "XAGUSD.r": 28.0,
+    "US100.": 18000.0, "US500.": 5200.0, "US30.": 39000.0,
+    "XBRUSD": 82.0, "XTIUSD": 78.0,
+}
+
+_ticket_seq = itertools.count(70_000_000)
+
+
+def _new_ticket() -> str:
+    return str(next(_ticket_seq))
+
+
+def make_position(symbol: str, is_buy: bool, volume: float, price: float, magic: int) -> Dict:
+    """MetaAPI 포지션 dict 형식 (UserStreamingListener / get_positions 응답과 같은 키)"""
+    return {
+        "id": _new_ticket(),
+        "type": "POSITION_TYPE_BUY" if is_buy else "POSITION_TYPE_SELL",
+        "symbol": symbol,
+        "magic": magic,
+        "time": datetime.now(timezone.utc).isoformat(),
+        "openPrice": price,
+        "currentPrice": price,
+        "volume": volume,
+        "profit": 0.0,
+        "swap": 0.0,
+        "commission": 0.0,
+        "comment": "Trading-X",
+    }
+
+
+class FakeRpc:
+    """유저 RPC 연결 대역 — 호출마다 latency(±jitter) 대기 후 메모리 상태로 응답"""
+
+    def __init__(self, login: int, positions: Optional[List[Dict]] = None,
+                 latency: float = 0.08, jitter: float = 0.03, balance: float = 10000.0):
+        self.login = login
+        self.latency = latency
+        self.jitter = jitter
+        self.balance = balance
+        self.positions: Dict[str, Dict] = {p["id"]: p for p in (positions or [])}
+        self.calls: Dict[str, int] = {}
+
+    async def _wait(self, call: str):
+        self.calls[call] = self.calls.get(call, 0) + 1
+        delay = self.latency + random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def get_account_information(self) -> Dict:
+        await self._wait("account_information")
+        profit = sum(p.get("profit", 0) for p in self.positions.values())
+        margin = sum(p.get("volume", 0) * 500 for p in self.positions.values())
+        equity = self.balance + profit
+        return {
+            "broker": "Bench Broker", "balance": self.balance, "equity": equity,
+            "margin": margin, "freeMargin": equity - margin, "leverage": 500,
+            "currency": "USD", "login": self.login,
+        }
+
+    async def get_positions(self) -> List[Dict]:
+        await self._wait("positions")
+        return [dict(p) for p in self.positions.values()]
+
+    async def _market_order(self, symbol: str, volume: float, options: Optional[Dict], is_buy: bool) -> Dict:
+        await self._wait("create_order")
+        from app.api.metaapi_service import quote_price_cache
+        quote = quote_price_cache.get(symbol) or {}
+        price = quote.get("ask" if is_buy else "bid") or BASE_PRICES.get(symbol, 1.0)
+        pos = make_position(symbol, is_buy, volume, price, (options or {}).get("magic", 100000))
+        self.positions[pos["id"]] = pos
+        return {"numericCode": 10009, "stringCode": "TRADE_RETCODE_DONE",
+                "orderId": _new_ticket(), "positionId": pos["id"]}
+
+    async def create_market_buy_order(self, symbol: str, volume: float, stop_loss=None, take_profit=None, options=None):
+        return await self._market_order(symbol, volume, options, True)
+
+    async def create_market_sell_order(self, symbol: str, volume: float, stop_loss=None, take_profit=None, options=None):
+        return await self._market_order(symbol, volume, options, False)
+
+    async def modify_position(self, position_id: str, stop_loss=None, take_profit=None, options=None):
+        await self._wait("modify_position")
+        pos = self.positions.get(str(position_id))
+        if pos is None:
+            return {"numericCode": 10036, "stringCode": "TRADE_RETCODE_POSITION_CLOSED", "description": "Position not found"}
+        if stop_loss is not None:
+            pos["stopLoss"] = stop_loss
+        if take_profit is not None:
+            pos["takeProfit"] = take_profit
+        return {"numericCode": 10009, "stringCode": "TRADE_RETCODE_DONE", "positionId": pos["id"]}
+
+    async def close_position(self, position_id: str, options=None):
+        await self._wait("close_position")
+        pos = self.positions.pop(str(position_id), None)
+        if pos is None:
+            return {"numericCode": 10036, "stringCode": "TRADE_RETCODE_POSITION_CLOSED", "description": "Position not found"}
+        self.balance += pos.get("profit", 0)
+        return {"numericCode": 10009, "stringCode": "TRADE_RETCODE_DONE", "positionId": pos["id"]}
+
+    async def get_deals_by_time_range(self, start_time, end_time, offset: int = 0, limit: int = 1000):
+        await self._wait("deals")
+        return {"deals": [], "synchronizing": False}
+
+    async def close(self):
+        return None
+
+
+class TickReplayer:
+    """
+    틱 재생기 — QuotePriceListener 콜백을 직접 호출 (MetaAPI 스트리밍 콜백과 같은 입구)
+      path 없음: 심볼 순환 랜덤워크, 초당 rate틱
+      path 있음: JSONL 한 줄 = {"symbol", "bid", "ask", "time"(epoch 초, 선택)} — time 있으면 녹화 간격 / speed 배속, 없으면 rate
+    """
+
+    def __init__(self, rate: float = 50.0, path: Optional[str] = None, speed: float = 1.0, seed: int = 7):
+        self.rate = rate
+        self.path = path
+        self.speed = speed
+        self._rng = random.Random(seed)
+        self.stats = {"ticks": 0, "behind_max_ms": 0.0, "loops": 0}
+        self._task: Optional[asyncio.Task] = None
+
+    def initial_quotes(self) -> Dict[str, Dict]:
+        from app.symbol_config import SYMBOLS, SYMBOL_SPECS, SYMBOL_VOLATILITY
+        quotes = {}
+        for symbol in SYMBOLS:
+            bid = BASE_PRICES.get(symbol, 100.0)
+            spread = max(SYMBOL_SPECS[symbol]["tick_size"] * 2, SYMBOL_VOLATILITY[symbol] * 0.3)
+            quotes[symbol] = {"bid": bid, "ask": round(bid + spread, 8), "spread": spread}
+        return quotes
+
+    def _synthetic(self):
+        from app.symbol_config import SYMBOLS, SYMBOL_SPECS, SYMBOL_VOLATILITY
+        quotes = self.initial_quotes()
+        for symbol in itertools.cycle(SYMBOLS):
+            q = quotes[symbol]
+            digits = SYMBOL_SPECS[symbol]["digits"]
+            q["bid"] = round(max(q["bid"] + self._rng.gauss(0, SYMBOL_VOLATILITY[symbol] * 0.2), SYMBOL_SPECS[symbol]["tick_size"]), digits)
+            yield symbol, q["bid"], round(q["bid"] + q["spread"], digits), None
+
+    def _recorded(self):
+        while True:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    row = json.loads(line)
+                    yield row["symbol"], float(row["bid"]), float(row["ask"]), row.get("time")
+            self.stats["loops"] += 1
+
+    async def run(self):
+        from app.api.metaapi_service import QuotePriceListener
+        listener = QuotePriceListener()
+        source = self._recorded() if self.path else self._synthetic()
+        interval = 1.0 / self.rate if self.rate > 0 else 0.0
+        next_at = time.perf_counter()
+        last_recorded = None
+        for symbol, bid, ask, recorded_at in source:
+            # 녹화 시각이 있으면 녹화 간격 그대로 (배속), 없으면 고정 rate
+            if recorded_at is not None and last_recorded is not None:
+                next_at += max(0.0, float(recorded_at) - last_recorded) / self.speed
+            else:
+                next_at += interval
+            last_recorded = float(recorded_at) if recorded_at is not None else None
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # 재생이 밀림 = 콜백 처리가 틱 간격보다 느림 (이벤트 루프 포화)
+                self.stats["behind_max_ms"] = max(self.stats["behind_max_ms"], round(-delay * 1000, 1))
+                if delay < -1.0:
+                    next_at = time.perf_counter()  # 1초 이상 밀리면 따라잡기 포기 (버스트 폭주 방지)
+            await listener.on_symbol_price_updated(0, {
+                "symbol": symbol, "bid": bid, "ask": ask, "time": datetime.now(timezone.utc),
+            })
+            self.stats["ticks"] += 1
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    def get_status(self) -> Dict:
+        return {"rate": self.rate, "path": self.path, **self.stats}
+
+
+def install(replayer: TickReplayer, live_accounts: List[Dict], rpc_latency: float, rpc_jitter: float) -> Dict[int, FakeRpc]:
+    """
+    app.main 기동 전에 호출
+      - startup_metaapi → 대역 (초기 시세 + 합성 캔들 + 틱 재생 시작, 주기 동기화/undeploy 루프 없음)
+      - live_accounts [{"user_id", "account_id", "login", "positions"}] → 연결 풀 + user_metaapi_cache 사전 적재
+        (get_user_trade_connection은 풀에 있으면 그대로 반환 — 실제 연결 생성 없음)
+    """
+    from app.api import metaapi_service as ms
+
+    rpcs: Dict[int, FakeRpc] = {}
+    now = time.time()
+    for acc in live_accounts:
+        rpc = FakeRpc(acc["login"], acc["positions"], latency=rpc_latency, jitter=rpc_jitter)
+        rpcs[acc["user_id"]] = rpc
+        ms.user_trade_connections[acc["user_id"]] = {
+            "rpc": rpc, "streaming": None, "listener": None, "account": None,
+            "metaapi_account_id": acc["account_id"], "last_active": now, "connected_at": now,
+        }
+        ms.user_metaapi_cache[acc["user_id"]] = {
+            "positions": [dict(p) for p in acc["positions"]],
+            "account_info": {"balance": rpc.balance, "equity": rpc.balance, "margin": 0,
+                             "freeMargin": rpc.balance, "leverage": 500, "currency": "USD", "login": rpc.login},
+            "last_sync": now,
+        }
+
+    async def _bench_startup(role: str = "local"):
+        ms._market_role = role
+        for symbol, q in replayer.initial_quotes().items():
+            ms.quote_price_cache[symbol] = {"bid": q["bid"], "ask": q["ask"], "time": int(time.time())}
+            ms.initialize_candles_synthetic(symbol, q["bid"])
+        ms.quote_connected = True
+        replayer.start()
+        print(f"[Bench] ✅ MetaAPI 대역 시작 — 틱 {replayer.rate}/s, 유저 RPC {len(rpcs)}개 (지연 {rpc_latency * 1000:.0f}ms)")
+        return True
+
+    ms.startup_metaapi = _bench_startup
+    return rpcs
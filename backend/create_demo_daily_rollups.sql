@@ -0,0 +1,18 @@
+CREATE TABLE IF NOT EXISTS demo_daily_rollups (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    day DATE NOT NULL,
+    trade_count INTEGER DEFAULT 0,
+    win_count INTEGER DEFAULT 0,
+    trade_pl FLOAT DEFAULT 0.0,
+    volume FLOAT DEFAULT 0.0,
+    topup FLOAT DEFAULT 0.0,
+    detail TEXT DEFAULT '{}',
+    CONSTRAINT uq_demo_daily_rollups_user_day UNIQUE (user_id, day)
+);
+
+-- 유저별 롤업 최초 생성 여부 (기존 demo_trades/demo_transactions는 첫 리포트 조회 시 채움)
+CREATE TABLE IF NOT EXISTS demo_rollup_states (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id),
+    built_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
@@ -0,0 +1,28 @@
+CREATE TABLE IF NOT EXISTS live_deals (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    deal_id VARCHAR(100) NOT NULL,
+    deal_type VARCHAR(50),
+    entry_type VARCHAR(50),
+    symbol VARCHAR(50),
+    volume FLOAT DEFAULT 0.0,
+    price FLOAT DEFAULT 0.0,
+    profit FLOAT DEFAULT 0.0,
+    commission FLOAT DEFAULT 0.0,
+    swap FLOAT DEFAULT 0.0,
+    position_id VARCHAR(100),
+    order_id VARCHAR(100),
+    magic INTEGER DEFAULT 0,
+    time TIMESTAMP WITH TIME ZONE NOT NULL,
+    CONSTRAINT uq_live_deals_user_deal UNIQUE (user_id, deal_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_live_deals_user_time ON live_deals(user_id, time);
+
+CREATE TABLE IF NOT EXISTS live_deal_sync (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id),
+    metaapi_account_id VARCHAR(100),
+    covered_from TIMESTAMP WITH TIME ZONE NOT NULL,
+    covered_to TIMESTAMP WITH TIME ZONE NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
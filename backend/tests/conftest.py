@@ -0,0 +1,16 @@
+# backend/tests/conftest.py — backend 디렉터리를 import 경로에 추가 (app 패키지)
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app.config는 import 시점에 설정 고정 — 테스트 전용 SQLite 파일 (셸의 운영 DB 설정은 쓰지 않음)
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.gettempdir(), f"tx-tests-{os.getpid()}.db")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+
+
+def pytest_sessionfinish(session, exitstatus):
+    path = os.environ["DATABASE_URL"][len("sqlite:///"):]
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,135 @@
+"""
+CandleRing ↔ 기존 dict 리스트 경로 동등성
+
+기존 경로: 캔들 = dict 리스트, 새 캔들 append 후 용량 초과 시 pop(0), 히스토리 병합 = time 기준 dict 병합 후 최근 limit개
+"""
+
+import random
+
+import pytest
+
+from app.api.candle_store import CandleRing, merge_rows, rows_to_columns
+
+
+def _candle(t, rng):
+    o = round(rng.uniform(90, 110), 2)
+    c = round(rng.uniform(90, 110), 2)
+    return {"time": t, "open": o, "high": max(o, c) + 1, "low": min(o, c) - 1, "close": c,
+            "volume": rng.randint(0, 50)}
+
+
+def _list_merge(existing, incoming, limit):
+    """기존 리스트 경로 — time 키 dict (같은 time은 신규 우선) → 정렬 → 최근 limit개"""
+    by_time = {c["time"]: c for c in existing}
+    for c in incoming:
+        by_time[c["time"]] = c
+    return [by_time[t] for t in sorted(by_time)][-limit:]
+
+
+def _ring(rows, capacity):
+    """append로 채움 — 용량보다 많으면 랩어라운드 상태(_start != 0)가 됨"""
+    ring = CandleRing(capacity)
+    for c in rows:
+        ring.append_dict(c)
+    return ring
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_merge_columns_matches_list_path(seed):
+    rng = random.Random(seed)
+    capacity = rng.randint(3, 20)
+    base = rng.randrange(0, 100) * 60
+    existing = [_candle(base + i * 60, rng) for i in range(rng.randint(0, capacity + 10))]
+    span = len(existing) + 15
+    times = rng.sample(range(span), rng.randint(1, min(span, capacity + 10)))
+    incoming = [_candle(base + (t - 5) * 60, rng) for t in times]
+    if rng.random() < 0.5:
+        incoming.sort(key=lambda c: c["time"])
+    if rng.random() < 0.3:
+        incoming.append(dict(incoming[-1], close=incoming[-1]["close"] + 1))  # 배치 내 중복 time
+
+    ring = _ring(existing, capacity)
+    before = {c["time"] for c in ring}
+    added, replaced = ring.merge_columns(rows_to_columns(incoming))
+
+    # 정렬된 배치에서 같은 time은 마지막 값 (비정렬 배치의 중복은 기존 경로도 순서 의존이라 비교 제외)
+    expected = _list_merge(existing[-capacity:], incoming, capacity)
+    assert ring.to_list() == expected
+    assert list(ring) == expected
+    if incoming == sorted(incoming, key=lambda c: c["time"]):
+        assert merge_rows(existing[-capacity:], incoming, capacity) == expected
+
+    # 추가/교체 수 = 병합 후 링에 남은 캔들 기준
+    remaining = [c["time"] for c in expected]
+    incoming_times = {c["time"] for c in incoming}
+    assert added == sum(1 for t in remaining if t not in before)
+    assert replaced == sum(1 for t in remaining if t in before and t in incoming_times)
+
+
+def test_merge_columns_trimmed_rows_not_counted():
+    rng = random.Random(1)
+    ring = _ring([_candle(i * 60, rng) for i in range(5)], 5)
+    # 전부 기존보다 오래된 캔들 → 용량 초과로 모두 잘림
+    added, replaced = ring.merge_columns(rows_to_columns([_candle(-i * 60, rng) for i in range(10, 0, -1)]))
+    assert (added, replaced) == (0, 0)
+    # 용량보다 긴 신규 배치 (빠른 경로) → 남는 건 용량만큼
+    added, replaced = ring.merge_columns(rows_to_columns([_candle(t * 60, rng) for t in range(4, 20)]))
+    assert (added, replaced) == (5, 0)
+    assert [c["time"] for c in ring] == [t * 60 for t in range(15, 20)]
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_append_and_update_last_match_list_path(seed):
+    rng = random.Random(seed)
+    capacity = rng.randint(1, 12)
+    ring = CandleRing(capacity)
+    candles = []
+    t = 0
+    for _ in range(rng.randint(1, 60)):
+        if candles and rng.random() < 0.6:
+            price = round(rng.uniform(80, 120), 2)
+            ring.update_last(price)
+            last = candles[-1]
+            last["close"] = price
+            last["high"] = max(last["high"], price)
+            last["low"] = min(last["low"], price)
+        else:
+            t += 60
+            c = _candle(t, rng)
+            ring.append_dict(c)
+            candles.append(dict(c))
+            if len(candles) > capacity:
+                candles.pop(0)
+        assert ring.last_time == candles[-1]["time"]
+    assert ring.to_list() == candles
+    assert len(ring) == len(candles)
+    assert ring[-1] == candles[-1]
+    for count in (1, 3, capacity, capacity + 5):
+        assert ring[-count:] == candles[-count:]
+        assert ring.to_list(count) == candles[-count:]
+
+
+def test_reads_do_not_relayout_ring(tmp_path):
+    """랩어라운드 상태에서 슬라이스/컬럼 읽기 → 링 불변, 다음 저장은 증분(patch)"""
+    from app.api.candle_store import CandleFileStore
+
+    rng = random.Random(3)
+    ring = _ring([_candle(i * 60, rng) for i in range(25)], 10)
+    assert ring._start != 0
+    store = CandleFileStore(tmp_path)
+    cache = {"BTCUSD": {"M1": ring}}
+    assert store.write(store.snapshot(cache))["full"] == 1
+
+    expected = ring.to_list()
+    layout, start = ring._layout, ring._start
+    assert ring[-4:] == expected[-4:]
+    assert ring[2:9] == expected[2:9]
+    assert ring[5:3] == []
+    assert [list(c) for c in ring.columns(7).values()] == [list(c) for c in ring.columns(7, len(ring)).values()]
+    assert (ring._layout, ring._start) == (layout, start)
+
+    ring.append_dict(_candle(25 * 60, rng))
+    ring[-100:]
+    stats = store.write(store.snapshot(cache))
+    assert (stats["full"], stats["patch"]) == (0, 1)
+    assert store.load()["BTCUSD"]["M1"].to_list() == ring.to_list()
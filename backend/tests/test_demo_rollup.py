@@ -0,0 +1,71 @@
+"""
+데모 일별 롤업 버킷 — 연속 승/패 요약(head/tail/max_win/max_loss) ↔ 거래 순회
+
+기존 경로: 분석 리포트가 기간 내 거래를 순서대로 순회하며 최장 연속 승/패(같은 길이면 먼저 나온 구간)
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from app.api.demo_service import _merge_bucket, _new_bucket, _trade_bucket
+
+
+def _walk(profits):
+    """거래 순회 — (최장 승 [건수, 손익], 최장 패 [건수, 손익], 첫 구간, 마지막 구간 [승?, 건수, 손익])"""
+    max_win = max_loss = head = run = None
+    for p in profits:
+        p = round(p, 2)
+        is_win = p > 0
+        if run is not None and run[0] == is_win:
+            run[1] += 1
+            run[2] += p
+        else:
+            run = [is_win, 1, p]
+            if head is None:
+                head = run
+        # 더 길어질 때만 교체 → 같은 길이면 먼저 나온 구간 유지
+        if is_win and (max_win is None or run[1] > max_win[0]):
+            max_win = [run[1], run[2]]
+        if not is_win and (max_loss is None or run[1] > max_loss[0]):
+            max_loss = [run[1], run[2]]
+    return max_win, max_loss, head and list(head), run and list(run)
+
+
+def _bucket(profits, t0):
+    b = _new_bucket()
+    for i, p in enumerate(profits):
+        _merge_bucket(b, _trade_bucket("BTCUSD", "BUY", 0.01, p, t0 + timedelta(minutes=i)))
+    return b
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_chunked_merge_matches_walk(seed):
+    rng = random.Random(seed)
+    profits = [rng.choice((-1, 1)) * rng.randint(0, 5) for _ in range(rng.randint(0, 60))]
+    t0 = datetime(2026, 1, 1)
+
+    # 날짜 행처럼 임의 구간으로 나눈 버킷을 시간순 병합 (빈 구간 포함)
+    acc = _new_bucket()
+    i = 0
+    while i < len(profits):
+        n = rng.randint(0, 8)
+        _merge_bucket(acc, _bucket(profits[i:i + n], t0))
+        i += n
+    _merge_bucket(acc, _new_bucket())
+
+    max_win, max_loss, head, tail = _walk(profits)
+    assert acc["max_win"] == max_win
+    assert acc["max_loss"] == max_loss
+    assert acc["head"] == head
+    assert acc["tail"] == tail
+    assert acc["trade_count"] == len(profits)
+
+
+def test_detail_stays_bounded_on_alternation():
+    b = _bucket([1 if i % 2 else -1 for i in range(500)], datetime(2026, 1, 1))
+    assert b["max_win"] == [1, 1] and b["max_loss"] == [1, -1]
+    assert "runs" not in b
@@ -0,0 +1,144 @@
+"""
+indicator_engine 시리즈/증분 갱신 ↔ 기존 윈도우 재계산 동등성
+
+기준 구현 = IndicatorService의 기존 단일값 계산 (윈도우를 매번 다시 집계)
+"""
+
+import math
+import random
+
+import pytest
+
+from app.services import indicator_engine as ie
+
+
+def _ohlc(n, seed):
+    rng = random.Random(seed)
+    closes, highs, lows = [], [], []
+    price = 100.0
+    for i in range(n):
+        # 일부 구간은 가격 고정 (손실 0, 고가=저가, TR 0 분기 확인용)
+        if rng.random() < 0.15:
+            c = price
+            h = l = price
+        else:
+            c = round(price + rng.gauss(0, 1), 2)
+            h = max(price, c) + round(rng.random(), 2)
+            l = min(price, c) - round(rng.random(), 2)
+        closes.append(c)
+        highs.append(h)
+        lows.append(l)
+        price = c
+    return closes, highs, lows
+
+
+def _ref_rsi(closes, period=14):
+    closes = closes[-(period + 1):]
+    gains = [max(0, closes[i] - closes[i - 1]) for i in range(1, len(closes))]
+    losses = [max(0, closes[i - 1] - closes[i]) for i in range(1, len(closes))]
+    avg_gain = sum(gains) / period
+    avg_loss = sum(losses) / period
+    if avg_loss == 0:
+        return 100.0
+    return 100 - (100 / (1 + avg_gain / avg_loss))
+
+
+def _ref_k(closes, highs, lows, period=14):
+    hh, ll = max(highs[-period:]), min(lows[-period:])
+    return 50.0 if hh == ll else (closes[-1] - ll) / (hh - ll) * 100
+
+
+def _ref_willr(closes, highs, lows, period=14):
+    hh, ll = max(highs[-period:]), min(lows[-period:])
+    return -50.0 if hh == ll else (hh - closes[-1]) / (hh - ll) * -100
+
+
+def _ref_cci(closes, highs, lows, period=20):
+    tp = [(highs[i] + lows[i] + closes[i]) / 3 for i in range(len(closes) - period, len(closes))]
+    sma = sum(tp) / period
+    md = sum(abs(x - sma) for x in tp) / period
+    return 0 if md == 0 else (tp[-1] - sma) / (0.015 * md)
+
+
+def _ref_adx(closes, highs, lows, period=14):
+    p = m = t = 0.0
+    for i in range(len(closes) - period, len(closes)):
+        hd, ld = highs[i] - highs[i - 1], lows[i - 1] - lows[i]
+        p += hd if hd > ld and hd > 0 else 0
+        m += ld if ld > hd and ld > 0 else 0
+        t += max(highs[i] - lows[i], abs(highs[i] - closes[i - 1]), abs(lows[i] - closes[i - 1]))
+    atr = t / period
+    if atr == 0:
+        return 25.0, 25.0, 25.0
+    pdi, mdi = (p / period) / atr * 100, (m / period) / atr * 100
+    return (abs(pdi - mdi) / (pdi + mdi) * 100 if pdi + mdi > 0 else 0), pdi, mdi
+
+
+def _close(a, b):
+    if isinstance(a, tuple):
+        return all(_close(x, y) for x, y in zip(a, b))
+    return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-7)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_series_match_window_recompute(seed):
+    closes, highs, lows = _ohlc(300, seed)
+    rsi = ie.rsi_series(closes)
+    k, d = ie.stochastic_series(closes, highs, lows)
+    wr = ie.williams_r_series(closes, highs, lows)
+    cci = ie.cci_series(closes, highs, lows)
+    adx = ie.adx_series(closes, highs, lows)
+    for i in range(len(closes)):
+        c, h, l = closes[:i + 1], highs[:i + 1], lows[:i + 1]
+        assert (rsi[i] is None) == (i < 14) and (rsi[i] is None or _close(rsi[i], _ref_rsi(c)))
+        assert (k[i] is None) == (i < 13) and (k[i] is None or _close(k[i], _ref_k(c, h, l)))
+        assert (wr[i] is None) == (i < 13) and (wr[i] is None or _close(wr[i], _ref_willr(c, h, l)))
+        assert (cci[i] is None) == (i < 19) and (cci[i] is None or _close(cci[i], _ref_cci(c, h, l)))
+        assert (adx[i] is None) == (i < 14) and (adx[i] is None or _close(adx[i], _ref_adx(c, h, l)))
+        if i >= 15:
+            assert _close(d[i], sum(_ref_k(c[:j], h[:j], l[:j]) for j in (i - 1, i, i + 1)) / 3)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_oscillator_state_matches_full_recompute(seed):
+    closes, highs, lows = _ohlc(80, seed)
+    rng = random.Random(seed)
+    state = ie.OscillatorState(closes, highs, lows)
+    for _ in range(20):
+        # 형성 중 캔들 틱: close 변경, high/low는 확장만
+        c = round(closes[-2] + rng.gauss(0, 1.5), 2)
+        highs[-1], lows[-1], closes[-1] = max(highs[-1], c), min(lows[-1], c), c
+        got = state.values(closes[-1], highs[-1], lows[-1])
+        k, d = ie.stochastic_series(closes, highs, lows)
+        assert _close(got["rsi"], ie.rsi_series(closes)[-1])
+        assert _close(got["stoch_k"], k[-1]) and _close(got["stoch_d"], d[-1])
+        assert _close(got["williams_r"], ie.williams_r_series(closes, highs, lows)[-1])
+        assert _close(got["cci"], ie.cci_series(closes, highs, lows)[-1])
+        assert _close((got["adx"], got["plus_di"], got["minus_di"]), ie.adx_series(closes, highs, lows)[-1])
+
+
+def test_chart_cache_keyed_on_last_candle_time():
+    cache = ie.ChartIndicatorCache()
+    closes, _, _ = _ohlc(60, 1)
+    times = [i * 60 for i in range(60)]
+    key = ("BTCUSD", "M1", 60)
+    cache.get(key, times, closes)
+
+    # 형성 중 캔들 갱신 — 같은 마지막 time만
+    assert cache.update_last(key, times[-1], closes[-1] + 1) is not None
+    assert cache.update_last(key, times[-1] + 60, closes[-1] + 1) is None
+
+    # 같은 count · 같은 마지막 time 이지만 과거 구간이 바뀜(백필) → 전체 재계산 결과와 동일
+    backfilled = list(closes)
+    backfilled[-1] += 1
+    backfilled[30] += 5
+    full = cache.stats["full"]
+    got = cache.get(key, times, backfilled)
+    assert cache.stats["full"] == full + 1
+    upper, middle, lower = ie.rolling_bollinger(backfilled, ie.BB_PERIOD, ie.BB_STD)
+    assert [p["value"] for p in got["bb_middle"]] == [v for v in middle if v is not None]
+
+    # 새 캔들 → 새 키, 이전 time 항목은 제거
+    cache.get(key, times[1:] + [times[-1] + 60], backfilled[1:] + [backfilled[-1]])
+    assert cache.update_last(key, times[-1], 1.0) is None
+    assert len(cache._entries) == 1
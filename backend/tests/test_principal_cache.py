@@ -0,0 +1,93 @@
+"""
+인증 사용자 캐시 — 잔고 등 자주 바뀌는 컬럼은 캐시/무효화 대상 아님, 신원 컬럼 변경만 무효화
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("aiosqlite")
+fakeredis = pytest.importorskip("fakeredis")
+
+from app import redis_client
+from app.api import principal_cache
+from app.database import Base, SessionLocal, dispose_async_engine, engine
+from app.models.user import User
+
+
+@pytest.fixture
+def user_id(monkeypatch):
+    server = fakeredis.FakeServer()
+    sync_redis = fakeredis.FakeRedis(server=server)
+    monkeypatch.setattr(redis_client, "get_redis", lambda: sync_redis)
+    # 비동기 클라이언트는 이벤트 루프마다 새로 (asyncio.run 단위)
+    monkeypatch.setattr(redis_client, "get_async_redis",
+                        lambda: fakeredis.aioredis.FakeRedis(server=server, decode_responses=True))
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        user = User(email=f"pc-{id(server)}@test.local", password_hash="-", name="before",
+                    demo_balance=10000.0, demo_equity=10000.0)
+        db.add(user)
+        db.commit()
+        yield user.id
+    finally:
+        db.close()
+
+
+def _resolve(user_id):
+    async def run():
+        db = SessionLocal()
+        try:
+            user = await principal_cache.resolve_user_async(db, {"sub": str(user_id), "sid": "s1"})
+            return user.name, user.demo_balance
+        finally:
+            db.close()
+            await dispose_async_engine()
+    return asyncio.run(run())
+
+
+def _update(user_id, **values):
+    db = SessionLocal()
+    try:
+        user = db.get(User, user_id)
+        for key, value in values.items():
+            setattr(user, key, value)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_balance_write_keeps_entry_and_reads_fresh(user_id):
+    _resolve(user_id)
+    hits = principal_cache.stats["hit"]
+    invalidated = principal_cache.stats["invalidated"]
+
+    _update(user_id, demo_balance=12345.0, demo_equity=12345.0)
+
+    assert _resolve(user_id) == ("before", 12345.0)
+    assert principal_cache.stats["hit"] == hits + 1
+    assert principal_cache.stats["invalidated"] == invalidated
+
+
+def test_identity_write_invalidates(user_id):
+    _resolve(user_id)
+    misses = principal_cache.stats["miss"]
+
+    _update(user_id, name="after")
+
+    assert _resolve(user_id)[0] == "after"
+    assert principal_cache.stats["miss"] == misses + 1
+
+
+def test_commit_on_loop_invalidates_async(user_id):
+    _resolve(user_id)
+
+    async def run():
+        _update(user_id, name="loop")
+        await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+    assert redis_client.get_redis().get(principal_cache._gen_key(user_id)) == b"1"
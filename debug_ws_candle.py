@@ -1,10 +1,14 @@
 #!/usr/bin/env python3
 """
-WS 데이터 10초간 캡처 - 캔들 방향 vs score 검증
+WS 데이터 10초간 캡처 + tick_trace 프레임 기준 지연 측정 - 캔들 방향 vs score 검증
 """
 import asyncio
 import websockets
 import json
+import time
+
+from debug_ws_latency import new_latency, record_trace, print_latency
+
 
 async def capture_ws_data():
     uri = "ws://localhost:8000/api/mt5/ws"
@@ -20,12 +24,16 @@ async def capture_ws_data():
             start_time = asyncio.get_event_loop().time()
             count = 0
             errors = 0
+            latency = new_latency()
 
             while (asyncio.get_event_loop().time() - start_time) < 10:
                 try:
                     msg = await asyncio.wait_for(ws.recv(), timeout=2.0)
+                    received_at = time.time()
                     data = json.loads(msg)
 
+                    record_trace(latency, data, received_at)
+
                     buy = data.get('buy_count', 0)
                     sell = data.get('sell_count', 0)
                     score = data.get('base_score', 0)
@@ -70,6 +78,8 @@ async def capture_ws_data():
             else:
                 print(f"\n❌ {errors}개 불일치 발견!")
 
+            print_latency(latency)
+
     except Exception as e:
         print(f"연결 오류: {e}")
 
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+debug_ws_*.py 공용 — tick_trace 프레임 기준 지연 수집/출력
+
+  latency = new_latency()
+  record_trace(latency, data, received_at)   # WS 프레임마다 (tick_trace 없으면 무시)
+  print_latency(latency)                     # 클라이언트 측 p50/p99 + 서버 단계별 요약
+
+서버 단계 요약은 /debug/tick-trace (nginx 미노출 — 서버 호스트에서 127.0.0.1:8000으로만 조회)
+"""
+import json
+import urllib.request
+
+TRACE_URL = "http://localhost:8000/debug/tick-trace?spans=0"
+
+
+def _pct(values, p):
+    data = sorted(values)
+    return data[min(len(data) - 1, int(p * len(data)))]
+
+
+def new_latency():
+    return {"broker": [], "recv": [], "built": []}
+
+
+def record_trace(latency, data, received_at):
+    """프레임의 tick_trace(broker_ts/recv_ts/built_ts)와 수신 시각 차이 (ms)"""
+    trace = data.get('tick_trace')
+    if not trace:
+        return
+    if trace.get('broker_ts'):
+        latency["broker"].append((received_at - trace['broker_ts']) * 1000)
+    latency["recv"].append((received_at - trace['recv_ts']) * 1000)
+    latency["built"].append((received_at - trace['built_ts']) * 1000)
+
+
+def print_latency(latency):
+    """tick_trace 프레임 기준 실측 지연 (같은 호스트 — 벽시계 비교)"""
+    print("-" * 70)
+    if not latency["recv"]:
+        print("지연: tick_trace 프레임 없음 (틱 없음 또는 TICK_TRACE_SAMPLE=0)")
+        return
+    for key, label in (("broker", "브로커 → 클라이언트"), ("recv", "서버 수신 → 클라이언트"), ("built", "스냅샷 생성 → 클라이언트")):
+        values = latency[key]
+        if values:
+            print(f"{label:<16} n={len(values):<4} p50={_pct(values, 0.5):8.1f}ms  p99={_pct(values, 0.99):8.1f}ms  max={max(values):8.1f}ms")
+    try:
+        with urllib.request.urlopen(TRACE_URL, timeout=3) as resp:
+            report = json.loads(resp.read())
+        print(f"서버 단계별 p50/p99 (worker {report.get('worker_pid')}):")
+        for stage, summary in report.get("stages", {}).items():
+            if summary:
+                print(f"  {stage:<12} p50={summary['p50_ms']:8.2f}ms  p99={summary['p99_ms']:8.2f}ms")
+    except Exception as e:
+        print(f"서버 단계 조회 실패: {e}")
@@ -534,7 +534,10 @@ async function pollOrderResult(orderId, orderType) {
         try {
             const res = await apiCall(`/mt5/bridge/orders/result/${orderId}`, 'GET');
             if (res && res.status !== 'pending') {
-                if (res.success) {
+                if (res.status === 'unknown') {
+                    // ★ 브릿지 결과 유실 — 이미 체결됐을 수 있음 (재주문 전에 포지션 확인)
+                    showToast('Order status unknown - check positions', 'warning');
+                } else if (res.success) {
                     showToast('주문 성공!', orderType.toLowerCase() === 'buy' ? 'buy' : 'sell');
                     playSound(orderType.toLowerCase());
                     if (typeof fetchDemoData === 'function') fetchDemoData();
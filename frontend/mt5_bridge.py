@@ -9,9 +9,21 @@ except ImportError:
     MT5_AVAILABLE = False
 import requests
 import time
+import json
+import os
+import queue
+import sqlite3
 import threading
 from datetime import datetime
 
+# ★ 상시 연결 채널 (websockets >= 12 동기 클라이언트) — 없으면 HTTP 폴링으로 동작
+try:
+    from websockets.sync.client import connect as ws_connect
+    WS_AVAILABLE = True
+except ImportError:
+    ws_connect = None
+    WS_AVAILABLE = False
+
 # ★★★ 계정 검증 모듈 import ★★★
 try:
     from verify_endpoint import process_pending_verifications
@@ -49,8 +61,77 @@ if MT5_AVAILABLE:
         "D1": mt5.TIMEFRAME_D1,
     }
 
+# 타임프레임별 초 (캔들 갭 계산용)
+TF_SECONDS = {"M1": 60, "M5": 300, "M15": 900, "M30": 1800, "H1": 3600, "H4": 14400, "D1": 86400}
+
 INTERVAL = 0.2  # 시세 전송 주기 (초) - 실시간 업데이트용 (손익 게이지 즉시 반영)
 CANDLE_INTERVAL = 60  # 캔들 전송 주기 (초)
+ORDER_WAIT = 20  # 주문 롱폴링 대기 (초) - 서버가 주문 도착 시 즉시 응답
+
+# ★ WebSocket 모드 (바뀐 값만 전송, 주문은 서버가 즉시 푸시)
+WS_URL = SERVER_URL.replace("https://", "wss://").replace("http://", "ws://") + "/api/mt5/bridge/ws"
+TICK_INTERVAL = 0.1  # 시세/계정/포지션 변화 확인 주기 (초) - 변화 없으면 전송 없음
+CANDLE_DELTA_INTERVAL = 5  # 캔들 델타 확인 주기 (초) - TF별 최근 3봉 중 바뀐 봉만 전송
+CANDLE_RESYNC_SEC = 600  # 캔들 전체 재전송 주기 (초) - 새로 뜬 서버 워커 보정
+FULL_RESYNC_SEC = 30  # 계정/포지션 전체 재전송 주기 (초)
+PING_INTERVAL = 5  # 전송할 변화가 없을 때 하트비트 (초)
+WS_RETRY_SEC = 30  # WS 연결 실패 시 HTTP 모드로 동작할 시간 (초)
+VERIFY_INTERVAL = 0.5  # 계정 검증 폴링 주기 (초) - 시세 루프와 분리
+JOURNAL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mt5_bridge_orders.db")  # 주문 실행 기록
+JOURNAL_TTL = 86400  # 실행 기록 보관 (초) - 서버 재배달 기한(ORDER_EXPIRE 120초)보다 충분히 길게
+
+
+# ========== 주문 실행 기록 (중복 실행 방지) ==========
+class OrderJournal:
+    """
+    order_id → 실행 결과 (SQLite 파일 — 브릿지 재시작 후에도 유지)
+    서버는 결과가 확인되지 않은 주문을 다시 보냄 (claim 후 CLAIM_TIMEOUT 경과 / 푸시 도중 연결 끊김 → "redelivered")
+    - 실행 직전 'running' 기록 → 실행 후 결과 저장 ('done')
+    - 결과가 기록된 order_id → 실행하지 않고 저장된 결과 재전송
+    - 'running'으로 남은 order_id (실행 중 오류/브릿지 종료) → 체결 여부를 알 수 없으므로 실행하지 않고 unknown 결과
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()  # 연결 1개를 스레드 간 공유
+
+    def _db(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("""CREATE TABLE IF NOT EXISTS orders (
+                order_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                result TEXT,
+                updated_at REAL NOT NULL
+            )""")
+            conn.execute("DELETE FROM orders WHERE updated_at < ?", (time.time() - JOURNAL_TTL,))
+            self._conn = conn
+        return self._conn
+
+    def begin(self, order_id: str):
+        """실행 시작 기록 — 이미 기록된 주문이면 보낼 결과 반환 (None이면 실행)"""
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT status, result FROM orders WHERE order_id=?", (order_id,)).fetchone()
+            if row is None:
+                db.execute("INSERT INTO orders (order_id, status, updated_at) VALUES (?, 'running', ?)",
+                           (order_id, time.time()))
+                return None
+        status, result = row
+        if status == "done" and result:
+            return json.loads(result)
+        return {"success": False, "status": "unknown",
+                "message": "이전 실행 결과 미확인 — 체결 여부를 MT5 포지션에서 확인하세요 (재실행하지 않음)"}
+
+    def finish(self, order_id: str, result: dict):
+        with self._lock:
+            self._db().execute("UPDATE orders SET status='done', result=?, updated_at=? WHERE order_id=?",
+                               (json.dumps(result, default=str), time.time(), order_id))
+
+
+journal = OrderJournal(JOURNAL_PATH)
+
 
 def init_mt5():
     """MT5 초기화"""
@@ -197,12 +278,283 @@ def send_all_candles(symbol: str, count: int = 100):
     return success
 
 
+def send_candles_bulk(count: int = 1000):
+    """
+    전 심볼 × 전 TF 캔들을 요청 1회로 전송 (컬럼 배치)
+    서버 워터마크(보관 중인 마지막 캔들) 이후 갭만 — 서버가 이미 가진 히스토리는 다시 보내지 않음
+    """
+    try:
+        response = requests.get(f"{SERVER_URL}/api/mt5/bridge/candles/watermarks", timeout=5)
+        watermarks = response.json() if response.status_code == 200 else {}
+    except Exception as e:
+        print(f"[Candles] 워터마크 조회 실패 - 전체 전송: {e}")
+        watermarks = {}
+
+    now = time.time()
+    series = []
+    for symbol in SYMBOLS:
+        for tf_name in TIMEFRAMES.keys():
+            mark = watermarks.get(symbol, {}).get(tf_name)
+            n = count
+            if mark:
+                n = max(2, min(count, int((now - mark["last"]) // TF_SECONDS[tf_name]) + 2))
+            candles = collect_candles(symbol, tf_name, n)
+            if not candles:
+                continue
+            series.append({
+                "symbol": symbol,
+                "tf": tf_name,
+                "time": [c["time"] for c in candles],
+                "open": [c["open"] for c in candles],
+                "high": [c["high"] for c in candles],
+                "low": [c["low"] for c in candles],
+                "close": [c["close"] for c in candles],
+                "volume": [c["volume"] for c in candles],
+            })
+
+    try:
+        response = requests.post(f"{SERVER_URL}/api/mt5/bridge/candles/bulk", json={"series": series}, timeout=30)
+        if response.status_code == 200:
+            total = sum(len(s["time"]) for s in series)
+            print(f"  [OK] {len(series)}개 시리즈, {total}캔들 일괄 전송")
+            return True
+        print(f"  [FAIL] 일괄 전송 실패: {response.status_code} - TF별 전송으로 대체")
+    except requests.exceptions.RequestException as e:
+        print(f"  [FAIL] 일괄 전송 오류: {e} - TF별 전송으로 대체")
+    return False
+
+
+# ========== 수집 함수 (HTTP / WS 공통) ==========
+def collect_prices():
+    prices = {}
+    for symbol in SYMBOLS:
+        tick = mt5.symbol_info_tick(symbol)
+        if tick:
+            prices[symbol] = {
+                "bid": tick.bid,
+                "ask": tick.ask,
+                "last": tick.last,
+                "volume": tick.volume,
+                "time": tick.time
+            }
+    return prices
+
+
+def collect_account():
+    account = mt5.account_info()
+    if not account:
+        return None
+    return {
+        "broker": account.company,
+        "login": account.login,
+        "server": account.server,
+        "balance": account.balance,
+        "equity": account.equity,
+        "margin": account.margin,
+        "free_margin": account.margin_free,
+        "leverage": account.leverage
+    }
+
+
+def collect_positions():
+    positions = mt5.positions_get()
+    if not positions:
+        return []
+    return [
+        {
+            "ticket": pos.ticket,
+            "symbol": pos.symbol,
+            "type": pos.type,
+            "volume": pos.volume,
+            "price_open": pos.price_open,
+            "profit": pos.profit,
+            "magic": pos.magic,
+            "comment": pos.comment
+        }
+        for pos in positions
+    ]
+
+
+def collect_candles(symbol: str, timeframe: str, count: int):
+    tf = TIMEFRAMES.get(timeframe)
+    if tf is None:
+        return []
+    rates = mt5.copy_rates_from_pos(symbol, tf, 0, count)
+    if rates is None or len(rates) == 0:
+        return []
+    return [
+        {
+            "time": int(r['time']),
+            "open": float(r['open']),
+            "high": float(r['high']),
+            "low": float(r['low']),
+            "close": float(r['close']),
+            "volume": int(r['tick_volume'])
+        }
+        for r in rates
+    ]
+
+
+# ========== 상시 연결 채널 (WebSocket) ==========
+class BridgeChannel:
+    """
+    서버 /api/mt5/bridge/ws 연결 1개 유지
+    - 바뀐 시세/계정/포지션/캔들만 전송 (연결 직후 전체 1회)
+    - 서버가 푸시한 주문은 self.orders에 넣고 주문 스레드가 순서대로 실행
+    - 같은 order_id가 대기/실행 중이면 넣지 않음 (푸시 도중 끊김 → 서버 requeue로 재수신)
+      이미 실행을 마친 order_id는 process_order가 journal 기록으로 결과만 재전송
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.ws = None
+        self._send_lock = threading.Lock()
+        self.orders = queue.Queue()
+        self._pending_ids = set()  # self.orders에 넣었고 아직 처리 안 끝난 order_id
+        self._pending_lock = threading.Lock()
+        self._reset_state()
+
+    def _reset_state(self):
+        self.last_prices = {}
+        self.last_account = None
+        self.last_positions = {}
+        self.last_candles = {}  # (symbol, tf) → {time: candle}
+        self.last_sent = 0.0
+        self.last_full = 0.0
+        self.last_candle_full = 0.0
+
+    @property
+    def connected(self):
+        return self.ws is not None
+
+    def connect(self):
+        self.ws = ws_connect(self.url, open_timeout=10, max_size=None, compression=None)
+        self._reset_state()
+        threading.Thread(target=self._recv_loop, args=(self.ws,), daemon=True).start()
+        print(f"[WS] 연결 성공: {self.url}")
+
+    def close(self):
+        ws, self.ws = self.ws, None
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+    def send(self, payload: dict):
+        ws = self.ws
+        if ws is None:
+            raise ConnectionError("WS 연결 없음")
+        try:
+            with self._send_lock:
+                ws.send(json.dumps(payload))
+            self.last_sent = time.time()
+        except Exception:
+            self.close()
+            raise
+
+    def _recv_loop(self, ws):
+        try:
+            for raw in ws:
+                msg = json.loads(raw)
+                if msg.get("t") == "orders":
+                    for order_data in msg.get("orders", []):
+                        if self._mark_pending(order_data.get("order_id")):
+                            self.orders.put(order_data)
+        except Exception as e:
+            print(f"\n[WS] 수신 종료: {e}")
+        if self.ws is ws:
+            self.close()
+
+    def _mark_pending(self, order_id) -> bool:
+        """대기열에 넣을 주문인지 — 같은 order_id가 이미 대기/실행 중이면 False (중복 수신 무시)"""
+        if not order_id:
+            return True
+        with self._pending_lock:
+            if order_id in self._pending_ids:
+                print(f"[WS] ♻️ 중복 주문 수신 무시: {order_id}")
+                return False
+            self._pending_ids.add(order_id)
+        return True
+
+    def done(self, order_id):
+        """주문 스레드가 처리 완료 후 호출"""
+        with self._pending_lock:
+            self._pending_ids.discard(order_id)
+
+    # ----- 델타 전송 -----
+    def push_state(self):
+        """시세/계정/포지션 — 바뀐 값만 (FULL_RESYNC_SEC마다 계정/포지션 전체)"""
+        now = time.time()
+        full = now - self.last_full >= FULL_RESYNC_SEC
+
+        prices = collect_prices()
+        changed = {}
+        for symbol, p in prices.items():
+            prev = self.last_prices.get(symbol)
+            if prev is None or prev["bid"] != p["bid"] or prev["ask"] != p["ask"] or prev["last"] != p["last"]:
+                changed[symbol] = p
+        if changed:
+            self.send({"t": "tick", "p": changed})
+            self.last_prices.update(changed)
+
+        account = collect_account()
+        if account and (full or account != self.last_account):
+            self.send({"t": "account", "a": account})
+            self.last_account = account
+
+        positions = {p["ticket"]: p for p in collect_positions()}
+        if full:
+            self.send({"t": "pos", "full": list(positions.values())})
+        else:
+            up = [p for t, p in positions.items() if self.last_positions.get(t) != p]
+            rm = [t for t in self.last_positions if t not in positions]
+            if up or rm:
+                self.send({"t": "pos", "up": up, "rm": rm})
+        self.last_positions = positions
+
+        if full:
+            self.last_full = now
+        if now - self.last_sent >= PING_INTERVAL:
+            self.send({"t": "ping"})
+        return len(changed)
+
+    def push_candles(self):
+        """TF별 최근 3봉 중 바뀐 봉만 (CANDLE_RESYNC_SEC마다 1000봉 전체)"""
+        now = time.time()
+        full = now - self.last_candle_full >= CANDLE_RESYNC_SEC
+        for symbol in SYMBOLS:
+            for tf_name in TIMEFRAMES.keys():
+                candles = collect_candles(symbol, tf_name, 1000 if full else 3)
+                if not candles:
+                    continue
+                key = (symbol, tf_name)
+                if full:
+                    self.send({"t": "candles", "s": symbol, "tf": tf_name, "c": candles, "replace": True})
+                    self.last_candles[key] = {c["time"]: c for c in candles[-3:]}
+                    continue
+                sent = self.last_candles.setdefault(key, {})
+                changed = [c for c in candles if sent.get(c["time"]) != c]
+                if changed:
+                    self.send({"t": "candles", "s": symbol, "tf": tf_name, "c": changed})
+                    for c in changed:
+                        sent[c["time"]] = c
+                    # 최근 봉만 비교용으로 보관
+                    for t in sorted(sent)[:-3]:
+                        del sent[t]
+        if full:
+            self.last_candle_full = now
+
+
+channel = BridgeChannel(WS_URL) if WS_AVAILABLE else None
+
+
 # ========== 주문 처리 함수들 ==========
-def fetch_pending_orders():
-    """서버에서 대기 중인 주문 가져오기"""
+def fetch_pending_orders(wait: float = 0):
+    """서버에서 대기 중인 주문 가져오기 (wait초 동안 서버에서 롱폴링)"""
     try:
         url = f"{SERVER_URL}/api/mt5/bridge/orders/pending"
-        response = requests.get(url, timeout=5)
+        response = requests.get(url, params={"wait": wait}, timeout=wait + 5)
         if response.status_code == 200:
             data = response.json()
             return data.get("orders", [])
@@ -534,8 +886,14 @@ def execute_close(order_data: dict):
 
 def send_order_result(order_id: str, result: dict):
     """주문 결과를 서버로 전송"""
+    result["order_id"] = order_id
+    if channel is not None and channel.connected:
+        try:
+            channel.send({"t": "result", **result})
+            return True
+        except Exception as e:
+            print(f"[Order] WS 결과 전송 실패 - HTTP 재시도: {e}")
     try:
-        result["order_id"] = order_id
         url = f"{SERVER_URL}/api/mt5/bridge/orders/result"
         response = requests.post(url, json=result, timeout=5)
         return response.status_code == 200
@@ -544,32 +902,82 @@ def send_order_result(order_id: str, result: dict):
         return False
 
 
-def process_pending_orders():
-    """대기 중인 주문 처리"""
-    orders = fetch_pending_orders()
+def process_order(order_data: dict):
+    """주문 1건 실행 + 결과 전송 (이미 실행한 order_id는 기록된 결과만 재전송)"""
+    order_id = order_data.get("order_id")
+    action = order_data.get("action")
+
+    print(f"\n[Order] 처리 중: {order_id} - {action}")
 
-    for order_data in orders:
-        order_id = order_data.get("order_id")
-        action = order_data.get("action")
+    # ★ 서버 재배달(redelivered) / 중복 수신 — 실행 기록이 있으면 MT5에 다시 보내지 않음
+    previous = journal.begin(order_id) if order_id else None
+    if previous is not None:
+        print(f"[Order] ♻️ 이미 처리된 주문 - 실행 생략, 결과 재전송: {order_id} "
+              f"(redelivered={bool(order_data.get('redelivered'))}, status={previous.get('status', 'done')})")
+        send_order_result(order_id, previous)
+        return
 
-        print(f"\n[Order] 처리 중: {order_id} - {action}")
+    if action == "order":
+        result = execute_order(order_data)
+    elif action == "close":
+        result = execute_close(order_data)
+    else:
+        result = {"success": False, "message": f"알 수 없는 액션: {action}"}
 
-        if action == "order":
-            result = execute_order(order_data)
-        elif action == "close":
-            result = execute_close(order_data)
-        else:
-            result = {"success": False, "message": f"알 수 없는 액션: {action}"}
+    # 결과 기록 후 전송 (전송이 유실돼도 재배달 시 기록된 결과로 응답)
+    if order_id:
+        journal.finish(order_id, result)
+    send_order_result(order_id, result)
+    print(f"[Order] 완료: {order_id} - {result.get('success')} - {result.get('message')}")
+
+
+def process_pending_orders(wait: float = 0):
+    """대기 중인 주문 처리"""
+    for order_data in fetch_pending_orders(wait):
+        process_order(order_data)
 
-        # 결과 전송
-        send_order_result(order_id, result)
-        print(f"[Order] 완료: {order_id} - {result.get('success')} - {result.get('message')}")
+
+def order_thread_func(stop_event):
+    """
+    별도 스레드: 주문 실행
+    - WS 연결 중: 서버가 푸시한 주문을 channel.orders에서 꺼내 실행
+    - WS 없음: 롱폴링 — 주문이 들어오면 즉시 반환, 없으면 ORDER_WAIT초 후 재요청
+    """
+    print(f"[Order Thread] 시작 (WS 푸시 / 롱폴링 {ORDER_WAIT}초)")
+    while not stop_event.is_set():
+        try:
+            if channel is not None and (channel.connected or not channel.orders.empty()):
+                try:
+                    order_data = channel.orders.get(timeout=1)
+                except queue.Empty:
+                    continue
+                try:
+                    process_order(order_data)
+                finally:
+                    channel.done(order_data.get("order_id"))
+                continue
+            process_pending_orders(wait=ORDER_WAIT)
+        except Exception as e:
+            print(f"\n[Order Thread] 오류: {e}")
+            stop_event.wait(1)
 
 
 def candle_thread_func(stop_event):
-    """별도 스레드: 캔들 데이터를 CANDLE_INTERVAL 초마다 전송"""
-    print(f"[Candle Thread] 시작 (주기: {CANDLE_INTERVAL}초)")
+    """별도 스레드: WS 연결 중이면 CANDLE_DELTA_INTERVAL마다 바뀐 봉만, 아니면 CANDLE_INTERVAL마다 HTTP 전송"""
+    print(f"[Candle Thread] 시작 (WS 델타 {CANDLE_DELTA_INTERVAL}초 / HTTP {CANDLE_INTERVAL}초)")
+    last_http = 0.0
     while not stop_event.is_set():
+        if channel is not None and channel.connected:
+            try:
+                channel.push_candles()
+            except Exception as e:
+                print(f"\n[Candle Thread] WS 전송 오류: {e}")
+            stop_event.wait(CANDLE_DELTA_INTERVAL)
+            continue
+        if time.time() - last_http < CANDLE_INTERVAL:
+            stop_event.wait(1)
+            continue
+        last_http = time.time()
         try:
             timestamp = datetime.now().strftime("%H:%M:%S")
             print(f"\n[{timestamp}] [Candle Thread] 캔들 데이터 업데이트...")
@@ -580,8 +988,16 @@ def candle_thread_func(stop_event):
         except Exception as e:
             print(f"\n[Candle Thread] 오류: {e}")
 
-        # CANDLE_INTERVAL 동안 대기하되, stop_event로 즉시 종료 가능
-        stop_event.wait(CANDLE_INTERVAL)
+
+def verify_thread_func(stop_event):
+    """별도 스레드: 계정 검증 폴링 (기존: 시세 루프 안에서 0.2초마다)"""
+    print(f"[Verify Thread] 시작 (주기: {VERIFY_INTERVAL}초)")
+    while not stop_event.is_set():
+        try:
+            process_pending_verifications()
+        except Exception as e:
+            print(f"\n[Verify Thread] 오류: {e}")
+        stop_event.wait(VERIFY_INTERVAL)
 
 
 # ★★★ 포지션 동기화 스레드 (SL/TP 청산 감지) ★★★
@@ -755,72 +1171,66 @@ def main():
     # ★★★ 추가 ★★★
     send_all_symbol_info()
 
-    # 초기 캔들 히스토리 전송 (모든 타임프레임)
+    # 초기 캔들 히스토리 전송 (모든 타임프레임) — 일괄 전송, 구버전 서버면 TF별 전송
     print("\n캔들 히스토리 전송 중 (모든 타임프레임)...")
-    for symbol in SYMBOLS:
-        tf_count = send_all_candles(symbol, 1000)
-        print(f"  [{symbol}] {tf_count}/{len(TIMEFRAMES)} 타임프레임 전송 완료")
+    if not send_candles_bulk(1000):
+        for symbol in SYMBOLS:
+            tf_count = send_all_candles(symbol, 1000)
+            print(f"  [{symbol}] {tf_count}/{len(TIMEFRAMES)} 타임프레임 전송 완료")
 
     # ★ 캔들 전송 스레드 시작
     stop_event = threading.Event()
     candle_thread = threading.Thread(target=candle_thread_func, args=(stop_event,), daemon=True)
     candle_thread.start()
 
+    # ★ 주문 처리 스레드 시작 (롱폴링 — 시세 루프와 분리)
+    order_thread = threading.Thread(target=order_thread_func, args=(stop_event,), daemon=True)
+    order_thread.start()
+
     # ★ 포지션 동기화 스레드 시작
     sync_thread = threading.Thread(target=sync_thread_func, args=(stop_event,), daemon=True)
     sync_thread.start()
 
-    print(f"\n실시간 시세 전송 시작 (주기: {INTERVAL}초)")
+    # ★ 계정 검증 스레드 시작 (시세 루프와 분리)
+    if VERIFY_AVAILABLE:
+        verify_thread = threading.Thread(target=verify_thread_func, args=(stop_event,), daemon=True)
+        verify_thread.start()
+
+    if WS_AVAILABLE:
+        print(f"\n실시간 전송 시작 (WS 델타, 확인 주기: {TICK_INTERVAL}초 / 실패 시 HTTP {INTERVAL}초)")
+    else:
+        print(f"\n실시간 시세 전송 시작 (HTTP, 주기: {INTERVAL}초) - websockets 미설치")
     print("-" * 50)
 
-    # 실시간 시세 전송 루프 (가격 + 계정 + 포지션 + 주문만)
+    # 실시간 전송 루프 (가격 + 계정 + 포지션)
+    ws_retry_at = 0.0
     while True:
         try:
-            # ★ 배치 전송: 모든 가격 + 계정 + 포지션을 한번에!
-            batch_data = {"prices": {}, "account": None, "positions": []}
-
-            # 모든 심볼 가격 수집
-            for symbol in SYMBOLS:
-                tick = mt5.symbol_info_tick(symbol)
-                if tick:
-                    batch_data["prices"][symbol] = {
-                        "bid": tick.bid,
-                        "ask": tick.ask,
-                        "last": tick.last,
-                        "volume": tick.volume,
-                        "time": tick.time
-                    }
-
-            # 계정 정보 수집
-            account = mt5.account_info()
-            if account:
-                batch_data["account"] = {
-                    "broker": account.company,
-                    "login": account.login,
-                    "server": account.server,
-                    "balance": account.balance,
-                    "equity": account.equity,
-                    "margin": account.margin,
-                    "free_margin": account.margin_free,
-                    "leverage": account.leverage
-                }
+            timestamp = datetime.now().strftime("%H:%M:%S")
 
-            # 포지션 수집
-            positions = mt5.positions_get()
-            if positions:
-                batch_data["positions"] = [
-                    {
-                        "ticket": pos.ticket,
-                        "symbol": pos.symbol,
-                        "type": pos.type,
-                        "volume": pos.volume,
-                        "price_open": pos.price_open,
-                        "profit": pos.profit,
-                        "magic": pos.magic,
-                        "comment": pos.comment
-                    }
-                    for pos in positions
-                ]
+            # ★ WS 모드: 연결 유지 + 바뀐 값만 전송
+            if channel is not None and (channel.connected or time.time() >= ws_retry_at):
+                try:
+                    if not channel.connected:
+                        channel.connect()
+                    changed = channel.push_state()
+                    if changed:
+                        print(f"[{timestamp}] WS: {changed} 심볼 변경 전송", end="\r")
+                    time.sleep(TICK_INTERVAL)
+                    continue
+                except KeyboardInterrupt:
+                    raise
+                except Exception as e:
+                    channel.close()
+                    ws_retry_at = time.time() + WS_RETRY_SEC
+                    print(f"\n[WS] 연결 실패 - {WS_RETRY_SEC}초간 HTTP 모드: {e}")
+
+            # ★ HTTP 모드 (폴백): 모든 가격 + 계정 + 포지션을 한번에!
+            batch_data = {
+                "prices": collect_prices(),
+                "account": collect_account(),
+                "positions": collect_positions(),
+            }
 
             # ★ 한번에 전송! (11개 → 1개 HTTP)
             try:
@@ -834,20 +1244,14 @@ def main():
                 symbol_count = 0
                 print(f"\n[Batch] 전송 실패: {e}")
 
-            # ★ 주문 처리 (이건 별도 요청 필요)
-            process_pending_orders()
-
-            # ★★★ 계정 검증 처리 (추가) ★★★
-            if VERIFY_AVAILABLE:
-                process_pending_verifications()
-
-            timestamp = datetime.now().strftime("%H:%M:%S")
             print(f"[{timestamp}] Batch: {symbol_count} 심볼 전송", end="\r")
 
             time.sleep(INTERVAL)
         except KeyboardInterrupt:
             print("\n\n브릿지 종료...")
             stop_event.set()
+            if channel is not None:
+                channel.close()
             candle_thread.join(timeout=5)
             break
         except Exception as e: